@@ -0,0 +1,57 @@
+// src/hooks/useReportEvents.js
+import { useEffect, useRef } from "react";
+
+const EVENTS_URL = `${import.meta.env.VITE_API_BASE}/api/reports/events`;
+const RECONNECT_MS = 5000; // after the server refuses the stream (503) or the network drops
+
+/**
+ * Live report changes from GET /api/reports/events (Server-Sent Events).
+ *
+ * lastEventId: the X-Last-Event-Id header of the list the page just loaded
+ *   (null until then; the stream starts once it is known).
+ * onReport(report, kind): a report was created or updated ("created" | "updated").
+ * onReset(): the server can't replay that far back, reload the list.
+ *
+ * EventSource resumes with Last-Event-ID on its own when the server ends a
+ * stream; we only step in when it gives up (state CLOSED).
+ */
+export default function useReportEvents(lastEventId, onReport, onReset) {
+  const handlers = useRef({ onReport, onReset });
+  handlers.current = { onReport, onReset };
+
+  useEffect(() => {
+    if (lastEventId === null || lastEventId === undefined || typeof EventSource === "undefined") return;
+
+    let source = null;
+    let timer = null;
+    let resumeFrom = lastEventId;
+
+    const connect = () => {
+      source = new EventSource(`${EVENTS_URL}?last_event_id=${resumeFrom}`);
+      source.addEventListener("report", (e) => {
+        resumeFrom = e.lastEventId || resumeFrom;
+        try {
+          const event = JSON.parse(e.data);
+          handlers.current.onReport(event.report, event.kind);
+        } catch (err) {
+          console.warn("Bad report event:", err);
+        }
+      });
+      source.addEventListener("reset", () => {
+        source.close();
+        handlers.current.onReset(); // reloading yields a new lastEventId, which reconnects
+      });
+      source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED) {
+          timer = setTimeout(connect, RECONNECT_MS);
+        }
+      };
+    };
+
+    connect();
+    return () => {
+      clearTimeout(timer);
+      if (source) source.close();
+    };
+  }, [lastEventId]);
+}
@@ -2,6 +2,7 @@
 import React, { useEffect, useState } from "react";
 import axios from "axios";
 import { useNavigate } from "react-router-dom";
+import useReportEvents from "../hooks/useReportEvents";
 
 const API_BASE = `${import.meta.env.VITE_API_BASE}/api/reports`;
 const API_ROOT = import.meta.env.VITE_API_BASE; // ✅ root URL, not reports
@@ -14,6 +15,7 @@ export default function GovtValidateStatus() {
   const [precautionMap, setPrecautionMap] = useState({});
   const [actionMap, setActionMap] = useState({});
   const [proofFiles, setProofFiles] = useState({});
+  const [lastEventId, setLastEventId] = useState(null); // live updates resume from here
 
   const navigate = useNavigate();
 
@@ -37,6 +39,7 @@ export default function GovtValidateStatus() {
       });
       setPrecautionMap(prec);
       setActionMap(act);
+      setLastEventId(res.headers["x-last-event-id"] ?? null);
       setError(null);
     } catch (err) {
       console.error("Failed to fetch approved reports:", err);
@@ -50,6 +53,21 @@ export default function GovtValidateStatus() {
     fetchApproved();
   }, []);
 
+  // ✅ Live updates: reports appear here as soon as they are finalized
+  useReportEvents(
+    lastEventId,
+    (report) => {
+      setApprovedReports((prev) => {
+        const rest = prev.filter((r) => r.id !== report.id);
+        if (report.status !== "finalized") return rest;
+        return rest.length === prev.length ? [report, ...prev] : prev.map((r) => (r.id === report.id ? report : r));
+      });
+      setPrecautionMap((m) => (m[report.id] ? m : { ...m, [report.id]: report.precautions ?? "" }));
+      setActionMap((m) => (m[report.id] ? m : { ...m, [report.id]: report.action_taken ?? "" }));
+    },
+    fetchApproved
+  );
+
   const handleSendPrecautions = async (reportId) => {
     setBusy((b) => ({ ...b, [reportId]: true }));
     try {
@@ -263,7 +281,7 @@ export default function GovtValidateStatus() {
                       <input
                         type="file"
                         multiple
-                        accept="image/*"
+                        accept="image/jpeg,image/png,image/webp"
                         onChange={(e) =>
                           handleProofSelect(report.id, e.target.files)
                         }
@@ -3,6 +3,7 @@ import React, { useEffect, useState, useRef } from "react";
 import { motion } from "framer-motion";
 import { Camera } from "lucide-react";
 import axios from "axios";
+import useReportEvents from "../hooks/useReportEvents";
 
 const API_BASE = `${import.meta.env.VITE_API_BASE}/api/reports`;
 
@@ -15,6 +16,7 @@ export default function ValidationPortal() {
   const [busy, setBusy] = useState({});
   const [isMobile, setIsMobile] = useState(false);
   const [proofFile, setProofFile] = useState({}); // govt proof
+  const [lastEventId, setLastEventId] = useState(null); // live updates resume from here
 
   const fileInputRefs = useRef({});
 
@@ -44,6 +46,7 @@ export default function ValidationPortal() {
       setActionTaken(preAction);
       setPrecautionSent(preSent);
       setReports(visible);
+      setLastEventId(res.headers["x-last-event-id"] ?? null);
     } catch (err) {
       console.error("Error fetching reports:", err);
     } finally {
@@ -51,6 +54,30 @@ export default function ValidationPortal() {
     }
   };
 
+  // ✅ Live updates: new uploads appear, reports finished elsewhere drop out
+  useReportEvents(
+    lastEventId,
+    (report) => {
+      const isVisible =
+        ["approved", "verified"].includes(report.status) &&
+        !(report.precautions && report.action_taken);
+      setReports((prev) => {
+        const rest = prev.filter((r) => r.id !== report.id);
+        if (!isVisible) return rest;
+        return rest.length === prev.length ? [report, ...prev] : prev.map((r) => (r.id === report.id ? report : r));
+      });
+      // fill in values saved elsewhere, but never overwrite what the user is typing
+      if (report.precautions) {
+        setPrecaution((p) => (p[report.id] ? p : { ...p, [report.id]: report.precautions }));
+        setPrecautionSent((s) => ({ ...s, [report.id]: true }));
+      }
+      if (report.action_taken) {
+        setActionTaken((a) => (a[report.id] ? a : { ...a, [report.id]: report.action_taken }));
+      }
+    },
+    fetchReports
+  );
+
   const broadcastUpdate = (msg) => {
     try {
       const bc = new BroadcastChannel("reports_channel");
@@ -238,7 +265,7 @@ export default function ValidationPortal() {
                   <div className="mb-3 flex gap-3 items-center">
                     <input
                       type="file"
-                      accept="image/*"
+                      accept="image/jpeg,image/png,image/webp"
                       capture={isMobile ? "environment" : undefined}
                       ref={(el) => (fileInputRefs.current[report.id] = el)}
                       onChange={(e) =>
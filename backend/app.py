@@ -1,8 +1,9 @@
 import os
-from flask import Flask
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from extensions import db   # ✅ shared db instance
+from database import configure_database
 
 
 def create_app():
@@ -19,7 +20,7 @@ def create_app():
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "super-secret-key-change-this")
 
     # --- Uploads ---
-    app.config["UPLOAD_FOLDER"] = os.path.join(basedir, "uploads")
+    app.config["UPLOAD_FOLDER"] = os.getenv("UPLOAD_FOLDER", os.path.join(basedir, "uploads"))
     app.config["VERIFIED_FOLDER"] = os.path.join(app.config["UPLOAD_FOLDER"], "verified")
     app.config["REJECTED_FOLDER"] = os.path.join(app.config["UPLOAD_FOLDER"], "rejected")
 
@@ -28,14 +29,26 @@ def create_app():
     os.makedirs(app.config["VERIFIED_FOLDER"], exist_ok=True)
     os.makedirs(app.config["REJECTED_FOLDER"], exist_ok=True)
 
+    # ✅ New images go to the content-addressed blob store (local dir or S3; see services/blob_store.py)
+    from services.blob_store import create_blob_store
+    app.extensions["blob_store"] = create_blob_store(app)
+
     # --- CORS (allow frontend origin) ---
     frontend_origin = os.getenv("FRONTEND_ORIGIN", "http://localhost:5173")
-    CORS(app, resources={r"/*": {"origins": [frontend_origin, "http://127.0.0.1:5173"]}})
+    CORS(
+        app,
+        resources={r"/*": {"origins": [frontend_origin, "http://127.0.0.1:5173"]}},
+        expose_headers=["X-Last-Event-Id"],
+    )
 
-    # --- Initialize DB + JWT ---
-    db.init_app(app)
+    # --- Initialize DB (engine tuning + SQLite pragmas) + JWT ---
+    configure_database(app)
     JWTManager(app)
 
+    # ✅ Dashboard rollups follow every report write (services/rollups.py)
+    from services.rollups import install as install_rollups
+    install_rollups()
+
     # --- Register Blueprints ---
     from routes.auth_routes import auth_bp
     from routes.report_routes import report_bp
@@ -47,9 +60,48 @@ def create_app():
     app.register_blueprint(government_bp, url_prefix="/api/government")
     app.register_blueprint(aqi_bp, url_prefix="/api/aqi")   # ✅ AQI endpoints
 
-    # --- Auto-create tables ---
-    with app.app_context():
-        db.create_all()
+    # --- Prometheus metrics (aggregated across gunicorn workers, see docs/observability.md) ---
+    from services.metrics import METRICS_TOKEN, metrics_response
+
+    @app.route("/metrics")
+    def metrics():
+        if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+            return jsonify({"error": "Unauthorized"}), 401
+        return metrics_response()
+
+    # --- Sampled request profiling (hooks only installed when enabled, see docs/observability.md) ---
+    profile_sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+    if profile_sample_rate > 0 or os.getenv("PROFILE_TOKEN"):
+        from services.profiling import RequestProfiler
+        app.extensions["profiler"] = RequestProfiler(
+            app,
+            output_dir=os.getenv("PROFILE_DIR", os.path.join(basedir, "data", "profiles")),
+            sample_rate=profile_sample_rate,
+            token=os.getenv("PROFILE_TOKEN"),
+            ring_size=int(os.getenv("PROFILE_RING_SIZE", 50)),
+            min_ms=float(os.getenv("PROFILE_MIN_MS", 0)),
+            endpoints=[e.strip() for e in os.getenv("PROFILE_ENDPOINTS", "").split(",") if e.strip()],
+        )
+
+    # --- Optional group commit for report writes (useful with threaded workers, e.g. gunicorn gthread) ---
+    if os.getenv("REPORT_GROUP_COMMIT", "0") == "1":
+        from services.group_commit import GroupCommitter
+        app.extensions["group_commit"] = GroupCommitter(
+            app,
+            window_ms=float(os.getenv("GROUP_COMMIT_WINDOW_MS", 5)),
+            max_batch=int(os.getenv("GROUP_COMMIT_MAX_BATCH", 256)),
+        )
+
+    # --- Keep hot AQI cells warm (optional background thread per worker) ---
+    if os.getenv("AQI_PREFETCH_ENABLED", "0") == "1":
+        from routes.aqi_routes import prefetch_scheduler
+        prefetch_scheduler.start()
+
+    # --- Apply pending schema migrations (disable with DB_AUTO_MIGRATE=0 and run `flask --app manage db-upgrade`) ---
+    if os.getenv("DB_AUTO_MIGRATE", "1") == "1":
+        import migrations
+        with app.app_context():
+            migrations.upgrade(db.engine, log=app.logger.info)
 
     return app
 
@@ -0,0 +1,63 @@
+# backend/benchmarks/bench_clip_backends.py
+"""
+CPU latency of the CLIP backends on the description-match call.
+
+    cd backend
+    python -m benchmarks.bench_clip_backends
+    CLIP_NUM_THREADS=4 python -m benchmarks.bench_clip_backends --batch-sizes 1,16 --repeat 20
+
+For each backend and batch size this times match_scores end to end
+(preprocessing, image + text towers, softmax) — the same call ml_service makes
+per upload (batch 1) and per bulk/reverify batch. Run clip_parity before
+switching CLIP_BACKEND on the strength of these numbers.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.clip_parity import load_fixtures  # noqa: E402
+from services.ML.backends import CLIP_BACKENDS, create_backend, match_scores  # noqa: E402
+
+
+def time_backend(backend, images, descriptions, batch_size, repeat, warmup=2):
+    batch = (images * batch_size)[:batch_size], (descriptions * batch_size)[:batch_size]
+    for _ in range(warmup):
+        match_scores(backend, *batch)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        match_scores(backend, *batch)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), min(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the CLIP inference backends on CPU.")
+    parser.add_argument("--backends", default=",".join(CLIP_BACKENDS))
+    parser.add_argument("--batch-sizes", default="1,16")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--model", default=os.getenv("CLIP_MODEL_NAME", "openai/clip-vit-base-patch32"))
+    args = parser.parse_args(argv)
+
+    images, descriptions = load_fixtures()
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+    names = [b.strip() for b in args.backends.split(",") if b.strip()]
+
+    print(f"{'backend':<11} {'batch':>5} {'median ms':>10} {'ms/image':>9} {'speedup':>8}")
+    baseline = {}
+    for name in names:
+        backend = create_backend(name, args.model)
+        for size in batch_sizes:
+            median, _ = time_backend(backend, images, descriptions, size, args.repeat)
+            baseline.setdefault(size, median)
+            print(f"{name:<11} {size:>5} {median * 1000:>10.1f} {median * 1000 / size:>9.1f} "
+                  f"{baseline[size] / median:>7.2f}x")
+        del backend
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# backend/benchmarks/bench_group_commit.py
+"""
+Report-insert throughput: per-request commit vs GroupCommitter.
+
+    cd backend
+    python -m benchmarks.bench_group_commit --threads 16 --reports 4000
+    SQLITE_SYNCHRONOUS=FULL python -m benchmarks.bench_group_commit   # fsync on every commit
+    python -m benchmarks.bench_group_commit --database-url postgresql://...
+
+Each thread plays one request handler: build a Report, persist it, wait for
+the commit to return (per-request) or for the batch acknowledgement (group).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flask import Flask  # noqa: E402
+
+import migrations  # noqa: E402
+from database import configure_database  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Report  # noqa: E402
+from services.group_commit import GroupCommitter  # noqa: E402
+
+
+def make_report(i):
+    now = datetime.utcnow()
+    return Report(
+        user_name=f"bench_{i % 50}", description="smoke over the lake", image_filename=f"{i}.jpg",
+        image_hash=f"{i:064x}", lat=12.9 + i * 1e-5, lng=77.5, status="verified",
+        pollution_confidence=60.0, description_match_confidence=0.7, details={"bench": True},
+        awarded_credits=100, points=100, created_at=now, last_checked_at=now,
+    )
+
+
+def run(app, threads, per_thread, persist):
+    barrier = threading.Barrier(threads + 1)
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(t):
+        local = []
+        with app.app_context():
+            barrier.wait()
+            for n in range(per_thread):
+                start = time.perf_counter()
+                persist(make_report(t * per_thread + n))
+                local.append(time.perf_counter() - start)
+            db.session.remove()
+        with lock:
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for th in pool:
+        th.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for th in pool:
+        th.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "reports": len(latencies),
+        "seconds": round(elapsed, 3),
+        "reports_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--reports", type=int, default=4000, help="total reports per mode")
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_group_commit_")
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = args.database_url or f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"pool_size": args.threads + 2, "max_overflow": 0}
+    configure_database(app)
+    with app.app_context():
+        migrations.upgrade(db.engine)
+
+    per_thread = max(1, args.reports // args.threads)
+
+    def per_request(report):
+        db.session.add(report)
+        db.session.commit()
+
+    committer = GroupCommitter(app, window_ms=args.window_ms)
+
+    def grouped(report):
+        committer.insert(report).result(timeout=60)
+
+    print(f"database: {app.config['SQLALCHEMY_DATABASE_URI']}  threads={args.threads}  "
+          f"synchronous={os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')}")
+    for name, persist in (("per-request commit", per_request), ("group commit", grouped)):
+        print(f"{name:>20}: {run(app, args.threads, per_thread, persist)}")
+    print(f"{'':>20}  group batches={committer.stats['batches']} writes={committer.stats['writes']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# backend/benchmarks/clip_parity.py
+"""
+Accuracy parity of the CLIP backends against the fp32 torch reference.
+
+    cd backend
+    python -m benchmarks.clip_parity                          # torch-int8, onnx, onnx-int8
+    python -m benchmarks.clip_parity --backends onnx --images uploads/verified
+
+Every fixture image is paired with every fixture description and scored by
+each backend. A backend passes when its DESCRIPTION_MATCH_THRESHOLD decision
+agrees with the reference on every pair whose reference probability is more
+than --margin away from the threshold (pairs sitting right on the threshold
+may legitimately flip). Exits non-zero on any disagreement, so it can gate a
+backend switch in CI or before a deploy.
+"""
+import argparse
+import glob
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from PIL import Image  # noqa: E402
+
+from services.ML.backends import create_backend, match_scores  # noqa: E402
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+FIXTURE_DIRS = [os.path.join(BACKEND_DIR, "uploads", "verified"), os.path.join(BACKEND_DIR, "uploads", "rejected")]
+FIXTURE_DESCRIPTIONS = [
+    "thick black smoke rising from a factory chimney",
+    "garbage being burned on the roadside",
+    "forest fire with heavy smoke",
+    "dense smog over the city skyline",
+    "a clear blue sky over a park",
+    "vehicle exhaust in heavy traffic",
+]
+
+
+def load_fixtures(dirs=FIXTURE_DIRS, descriptions=FIXTURE_DESCRIPTIONS):
+    """(images, descriptions) as aligned lists: every image paired with every description."""
+    paths = sorted(p for d in dirs for p in glob.glob(os.path.join(d, "*")) if os.path.isfile(p))
+    images, texts = [], []
+    for path in paths:
+        try:
+            image = Image.open(path).convert("RGB")
+        except Exception:
+            continue
+        for description in descriptions:
+            images.append(image)
+            texts.append(description)
+    return images, texts
+
+
+def score(backend, images, descriptions, negative_prompt, batch_size=16):
+    probs = []
+    for start in range(0, len(images), batch_size):
+        probs.extend(match_scores(
+            backend, images[start:start + batch_size], descriptions[start:start + batch_size], negative_prompt
+        ))
+    return probs
+
+
+def main(argv=None):
+    # ml_service loads the reference at import; keep the environment from swapping it out
+    os.environ.pop("CLIP_SERVER_SOCKET", None)
+    os.environ["CLIP_BACKEND"] = "torch"
+    from services.ML.ml_service import CLIP_MODEL_NAME, DESCRIPTION_MATCH_THRESHOLD, NEGATIVE_PROMPT, load_clip
+
+    parser = argparse.ArgumentParser(description="Check CLIP backend decisions against the fp32 reference.")
+    parser.add_argument("--backends", default="torch-int8,onnx,onnx-int8")
+    parser.add_argument("--images", action="append", help="Fixture image folder (repeatable)")
+    parser.add_argument("--threshold", type=float, default=DESCRIPTION_MATCH_THRESHOLD)
+    parser.add_argument("--margin", type=float, default=0.02)
+    args = parser.parse_args(argv)
+
+    images, descriptions = load_fixtures(args.images or FIXTURE_DIRS)
+    if not images:
+        print("No fixture images found")
+        return 1
+    print(f"{len(images)} image/description pairs, threshold {args.threshold}, margin ±{args.margin}")
+
+    reference = score(load_clip(), images, descriptions, NEGATIVE_PROMPT)
+    failed = False
+    for name in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        probs = score(create_backend(name, CLIP_MODEL_NAME), images, descriptions, NEGATIVE_PROMPT)
+        max_diff = max(abs(p - r) for p, r in zip(probs, reference))
+        flips = [
+            i for i, (p, r) in enumerate(zip(probs, reference))
+            if (p > args.threshold) != (r > args.threshold)
+        ]
+        hard = [i for i in flips if abs(reference[i] - args.threshold) > args.margin]
+        status = "FAIL" if hard else "ok"
+        print(f"{name:<11} max |Δp| {max_diff:.4f}  flips {len(flips)} (outside margin {len(hard)})  {status}")
+        for i in hard:
+            print(f"    pair {i}: '{descriptions[i]}' reference {reference[i]:.3f} vs {probs[i]:.3f}")
+        failed = failed or bool(hard)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
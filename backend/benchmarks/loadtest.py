@@ -0,0 +1,351 @@
+# backend/benchmarks/loadtest.py
+"""
+End-to-end load test: gunicorn + create_app against a local WAQI stub.
+
+    cd backend
+    python -m benchmarks.loadtest --users 50 --duration 60                  # stub CLIP, 2 workers
+    python -m benchmarks.loadtest --workers 4 --threads 8 --clip-latency-ms 250
+    python -m benchmarks.loadtest --clip real --users 10                    # the configured CLIP_BACKEND
+    python -m benchmarks.loadtest --url http://10.0.0.5:5001 --users 200    # an already running node
+
+Unless --url is given, the harness:
+- starts benchmarks.waqi_stub with --waqi-latency-ms and --waqi-error-rate;
+- seeds a throwaway SQLite DB with --seed-reports synthetic reports;
+- launches `gunicorn app:app` with every data path (DB, users.json,
+  uploads, embedding store, station file, metrics dir) pointed into a temp
+  folder.
+The working tree is never touched.
+
+Each virtual user:
+1. signs up and logs in;
+2. loops until the deadline, picking actions by --mix weights
+   (upload, list, leaderboard, aqi, pdf) with exponential think time.
+
+Requests finished during --warmup are not counted. The report gives
+throughput and p50/p95/p99 per endpoint, plus status code counts.
+
+The per-user upload rate limit is disabled unless ML_USER_RATE_PER_MINUTE is
+set in the environment. Otherwise every virtual user past its burst would
+get 429. The abuse detector is off too unless ABUSE_DETECTION is set,
+because flagged uploads skip ML.
+
+On a small box the client competes with the server for CPU. For sustained
+numbers, run the server elsewhere and point --url at it.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import requests  # noqa: E402
+
+from benchmarks import synthetic  # noqa: E402
+from benchmarks.waqi_stub import WaqiStub  # noqa: E402
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_MIX = "upload=1,list=2,leaderboard=3,aqi=5,pdf=1"
+UPLOAD_IMAGE_SIZES = ((640, 480), (1280, 960), (1920, 1080))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ACTIONS:
+            raise SystemExit(f"unknown action '{name.strip()}' in --mix (use: {', '.join(ACTIONS)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# --- Server under test ---
+class Server:
+    """gunicorn app:app with all state in `workdir`."""
+
+    def __init__(self, workdir, port, args, waqi_url):
+        self.workdir = workdir
+        self.port = port
+        self.log_path = os.path.join(workdir, "gunicorn.log")
+        env = dict(os.environ)
+        env.update({
+            "PORT": str(port),
+            "WEB_CONCURRENCY": str(args.workers),
+            "GUNICORN_THREADS": str(args.threads),
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'load.db')}",
+            "USERS_FILE": os.path.join(workdir, "users.json"),
+            "UPLOAD_FOLDER": os.path.join(workdir, "uploads"),
+            "EMBEDDING_STORE_DIR": os.path.join(workdir, "embeddings"),
+            "AQI_STATIONS_FILE": os.path.join(workdir, "aqi_stations.json"),
+            "PROMETHEUS_MULTIPROC_DIR": os.path.join(workdir, "prometheus"),
+            "WAQI_API_URL": waqi_url,
+            "FRONTEND_ORIGIN": "http://localhost",
+        })
+        env.setdefault("ML_USER_RATE_PER_MINUTE", "0")
+        env.setdefault("ABUSE_DETECTION", "0")  # flagged uploads skip ML and would flatter the numbers
+        if args.clip == "stub":
+            env.update({"CLIP_BACKEND": "stub", "CLIP_STUB_LATENCY_MS": str(args.clip_latency_ms)})
+            env.pop("CLIP_SERVER_SOCKET", None)
+        self.env = env
+        self.proc = None
+
+    def seed(self, reports, users, seed):
+        if reports:
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.synthetic", "--database-url", self.env["DATABASE_URL"],
+                 "--reports", str(reports), "--users", str(users), "--seed", str(seed),
+                 "--users-json", self.env["USERS_FILE"]],
+                cwd=BACKEND_DIR, env=self.env, check=True, stdout=subprocess.DEVNULL,
+            )
+
+    def start(self, timeout=180):
+        self.log = open(self.log_path, "w")
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "app:app"], cwd=BACKEND_DIR, env=self.env,
+            stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        url = f"http://127.0.0.1:{self.port}"
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise SystemExit(f"gunicorn exited with {self.proc.returncode}; see {self.log_path}")
+            try:
+                if requests.get(f"{url}/api/reports/leaderboard", timeout=2).status_code == 200:
+                    return url
+            except requests.RequestException:
+                pass
+            time.sleep(0.5)
+        self.stop()
+        raise SystemExit(f"gunicorn did not become ready within {timeout}s; see {self.log_path}")
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.send_signal(signal.SIGTERM)
+            try:
+                self.proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        if self.proc:
+            self.log.close()
+
+
+# --- Virtual users ---
+class Recorder:
+    def __init__(self, measure_from):
+        self.measure_from = measure_from
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)  # endpoint -> [seconds]
+        self.statuses = defaultdict(Counter)  # endpoint -> Counter(status)
+
+    def record(self, endpoint, status, seconds, finished_at):
+        if finished_at < self.measure_from:
+            return
+        with self._lock:
+            self.samples[endpoint].append(seconds)
+            self.statuses[endpoint][status] += 1
+
+
+class VirtualUser:
+    def __init__(self, n, base_url, recorder, images, mix, think_ms, seed):
+        self.n = n
+        self.base_url = base_url
+        self.recorder = recorder
+        self.images = images
+        self.actions = list(mix)
+        self.weights = list(mix.values())
+        self.think_ms = think_ms
+        self.rng = random.Random(seed * 100003 + n)
+        self.session = requests.Session()
+        self.token = None
+        self.clinical = None
+        self.city = self.rng.choices(synthetic.CITIES, weights=[c[4] for c in synthetic.CITIES])[0]
+
+    def call(self, endpoint, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=120, **kwargs)
+            status = response.status_code
+        except requests.RequestException as e:
+            response, status = None, type(e).__name__
+        self.recorder.record(endpoint, status, time.perf_counter() - start, time.monotonic())
+        return response
+
+    def coordinate(self):
+        _, lat, lng, spread, _ = self.city
+        return round(lat + self.rng.gauss(0, spread), 5), round(lng + self.rng.gauss(0, spread), 5)
+
+    def login(self):
+        email, password = f"vu{self.n:05d}.{os.getpid()}@load.local", "load-test"
+        self.call("signup", "POST", "/api/auth/signup", json={"name": f"vu{self.n:05d}", "email": email, "password": password})
+        response = self.call("login", "POST", "/api/auth/login", json={"email": email, "password": password})
+        if response is not None and response.status_code == 200:
+            self.token = response.json()["access_token"]
+
+    def run(self, deadline):
+        self.login()
+        while time.monotonic() < deadline:
+            getattr(self, f"do_{self.rng.choices(self.actions, weights=self.weights)[0]}")()
+            if self.think_ms:
+                time.sleep(min(self.rng.expovariate(1000.0 / self.think_ms), max(0.0, deadline - time.monotonic())))
+
+    def do_upload(self):
+        if not self.token:
+            return self.login()
+        jpeg = self.rng.choice(self.images)
+        # trailing bytes after the JPEG end marker are ignored by decoders but give every upload a new sha256
+        body = jpeg + self.rng.getrandbits(128).to_bytes(16, "little")
+        lat, lng = self.coordinate()
+        self.call("upload", "POST", "/api/reports/upload", headers={"Authorization": f"Bearer {self.token}"},
+                  files={"image": ("load.jpg", io.BytesIO(body), "image/jpeg")},
+                  data={"description": "thick smoke from a chimney", "lat": lat, "lng": lng})
+
+    def do_list(self):
+        self.call("list", "GET", "/api/reports/")
+
+    def do_leaderboard(self):
+        self.call("leaderboard", "GET", "/api/reports/leaderboard")
+
+    def do_aqi(self):
+        lat, lng = self.coordinate()
+        response = self.call("aqi", "GET", "/api/aqi/", params={"lat": lat, "lon": lng})
+        if response is not None and response.status_code == 200:
+            self.clinical = response.json().get("clinical")
+
+    def do_pdf(self):
+        body = self.clinical or {"summary": {"overall_category": "Moderate"}}
+        self.call("pdf", "POST", "/api/aqi/pdf", json=body)
+
+
+ACTIONS = ("upload", "list", "leaderboard", "aqi", "pdf")
+
+
+def load_images(seed):
+    images = []
+    for i, (w, h) in enumerate(UPLOAD_IMAGE_SIZES):
+        buf = io.BytesIO()
+        synthetic.synthetic_image(w, h, seed + i, smoky=True).save(buf, "JPEG", quality=88)
+        images.append(buf.getvalue())
+    return images
+
+
+# --- Report ---
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+def summarize(recorder, seconds):
+    rows = {}
+    for endpoint in sorted(recorder.samples):
+        values = sorted(recorder.samples[endpoint])
+        statuses = recorder.statuses[endpoint]
+        ok = sum(c for s, c in statuses.items() if isinstance(s, int) and s < 400)
+        rows[endpoint] = {
+            "requests": len(values),
+            "rps": round(len(values) / seconds, 2),
+            "ok_rps": round(ok / seconds, 2),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+            "max_ms": round(values[-1] * 1000, 1),
+            "statuses": {str(s): c for s, c in sorted(statuses.items(), key=lambda kv: str(kv[0]))},
+        }
+    return rows
+
+
+def print_report(rows, seconds, users):
+    total = sum(r["requests"] for r in rows.values())
+    print(f"\n{users} virtual users, {seconds:.0f} s measured, {total} requests ({total / seconds:.1f} req/s)\n")
+    print(f"{'endpoint':<12}{'reqs':>7}{'req/s':>8}{'ok/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}  statuses")
+    for endpoint, r in rows.items():
+        statuses = " ".join(f"{s}:{c}" for s, c in r["statuses"].items())
+        print(f"{endpoint:<12}{r['requests']:>7}{r['rps']:>8}{r['ok_rps']:>8}{r['p50_ms']:>9}{r['p95_ms']:>9}"
+              f"{r['p99_ms']:>9}{r['max_ms']:>9}  {statuses}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive mixed traffic at gunicorn + create_app and report latency.")
+    parser.add_argument("--url", help="Target a running server instead of launching one")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds of load, warm-up included")
+    parser.add_argument("--warmup", type=float, default=10, help="Seconds not counted in the report")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Action weights (default {DEFAULT_MIX})")
+    parser.add_argument("--think-ms", type=float, default=200, help="Mean think time between actions (0 = none)")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--clip", choices=("stub", "real"), default="stub")
+    parser.add_argument("--clip-latency-ms", type=float, default=150)
+    parser.add_argument("--waqi-latency-ms", type=float, default=120)
+    parser.add_argument("--waqi-error-rate", type=float, default=0.01)
+    parser.add_argument("--seed-reports", type=int, default=5000, help="Synthetic reports loaded before the run")
+    parser.add_argument("--seed", type=int, default=synthetic.DEFAULT_SEED)
+    parser.add_argument("--json", metavar="PATH", help="Write the per-endpoint results here")
+    parser.add_argument("--keep", action="store_true", help="Keep the temp folder (DB, logs, uploads)")
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    stub = server = None
+    workdir = tempfile.mkdtemp(prefix="loadtest_")
+    try:
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            stub = WaqiStub(latency_ms=args.waqi_latency_ms, error_rate=args.waqi_error_rate, seed=args.seed).start()
+            server = Server(workdir, free_port(), args, stub.url)
+            print(f"Seeding {args.seed_reports} report(s) into {workdir} ...")
+            server.seed(args.seed_reports, max(1, args.seed_reports // 50), args.seed)
+            print(f"Starting gunicorn ({args.workers} worker(s) x {args.threads} thread(s), CLIP {args.clip}) ...")
+            base_url = server.start()
+
+        images = load_images(args.seed)
+        start = time.monotonic()
+        recorder = Recorder(measure_from=start + args.warmup)
+        deadline = start + args.duration
+        vus = [VirtualUser(n, base_url, recorder, images, mix, args.think_ms, args.seed) for n in range(args.users)]
+        threads = [threading.Thread(target=vu.run, args=(deadline,), daemon=True) for vu in vus]
+        print(f"Driving {args.users} virtual user(s) for {args.duration:.0f} s (warm-up {args.warmup:.0f} s) ...")
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        measured = max(1e-9, time.monotonic() - recorder.measure_from)
+
+        rows = summarize(recorder, measured)
+        print_report(rows, measured, args.users)
+        if stub:
+            print(f"\nWAQI stub: {stub.requests} request(s), {stub.errors} injected error(s)")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"args": vars(args), "seconds": measured, "endpoints": rows}, f, indent=2)
+            print(f"✅ Results written to {args.json}")
+    finally:
+        if server:
+            server.stop()
+        if stub:
+            stub.stop()
+        if args.keep or (server and server.proc and server.proc.returncode not in (0, -signal.SIGTERM)):
+            print(f"Work folder kept: {workdir}")
+        else:
+            import shutil
+            shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,349 @@
+# backend/benchmarks/microbench.py
+"""
+Microbenchmarks for the hot functions, with a stored baseline to compare against.
+
+    cd backend
+    python -m benchmarks.microbench                                   # run all, print a table
+    python -m benchmarks.microbench --save-baseline benchmarks/baseline.json
+    python -m benchmarks.microbench --compare benchmarks/baseline.json  # exit 1 on a regression
+    python -m benchmarks.microbench --only leaderboard,serialize --reports 50000
+
+The DB is a throwaway SQLite file filled by benchmarks.synthetic, and the
+images are synthetic JPEGs in several sizes. The same --seed/--users/--reports
+give the same data, so numbers from two commits on the same machine can be
+compared. Baselines are machine specific: record them on the box that runs
+the comparison.
+
+Time is the median over --repeat samples. Each sample runs the function
+enough times to last at least --min-time, so fast functions are not
+swamped by timer noise. "peak KiB" is the tracemalloc peak of one extra
+call. It covers Python and numpy allocations but not OpenCV/torch internals.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks import synthetic  # noqa: E402
+
+SERIALIZE_PAGE = 100  # reports serialised per serialize_report call-set (one API page)
+ALERT_SUBSCRIPTIONS = 100_000
+ALERT_STATIONS = 2000
+BENCHMARKS = []  # (name, factory(ctx) -> zero-arg callable)
+
+
+def benchmark(name):
+    def register(factory):
+        BENCHMARKS.append((name, factory))
+        return factory
+    return register
+
+
+class Context:
+    """Lazily built fixtures shared by the benchmarks: app + synthetic DB, images, WAQI payloads."""
+
+    def __init__(self, args):
+        self.args = args
+        self.tmpdir = tempfile.mkdtemp(prefix="microbench_")
+        self._app = None
+        self._images = None
+
+    @property
+    def app(self):
+        if self._app is None:
+            os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(self.tmpdir, 'bench.db')}"
+            os.environ.setdefault("DB_AUTO_MIGRATE", "1")
+            from app import create_app
+            from extensions import db
+
+            self._app = create_app()
+            with self._app.app_context():
+                synthetic.populate(self.args.users, self.args.reports, self.args.seed)
+                db.session.remove()
+        return self._app
+
+    @property
+    def images(self):
+        if self._images is None:
+            self._images = synthetic.write_images(
+                os.path.join(self.tmpdir, "images"), synthetic.parse_sizes(self.args.image_sizes), seed=self.args.seed
+            )
+        return self._images
+
+
+# --- Benchmarks ---
+def image_benchmarks(prefix, make, sizes):
+    """One entry per image size (the sizes come from the command line)."""
+    def factory_for(index):
+        def factory(ctx):
+            path, _ = ctx.images[index]
+            return make(path)
+        return factory
+    return [(f"{prefix}[{w}x{h}]", factory_for(i)) for i, (w, h) in enumerate(sizes)]
+
+
+def _analyze(path):
+    from services.ML.ml_service import analyze_image_for_pollution
+    return lambda: analyze_image_for_pollution(path)
+
+
+def _describe(path):
+    from services.ML.ml_service import verify_description_match
+    return lambda: verify_description_match(path, "thick black smoke rising from a factory chimney")
+
+
+@benchmark("serialize_report")
+def _serialize(ctx):
+    from models import Report
+    from routes.report_routes import serialize_report
+
+    app = ctx.app
+
+    def run():
+        with app.test_request_context("/api/reports/"):
+            reports = Report.query.order_by(Report.id).limit(SERIALIZE_PAGE).all()
+            return [serialize_report(r) for r in reports]
+    return run
+
+
+@benchmark("leaderboard")
+def _leaderboard(ctx):
+    from routes.report_routes import _list_bodies
+
+    client = ctx.app.test_client()
+
+    def run():
+        _list_bodies.clear()  # as after a write: measure the rebuild, not the cached body
+        response = client.get("/api/reports/leaderboard")
+        assert response.status_code == 200, response.status_code
+    return run
+
+
+@benchmark("leaderboard[304]")
+def _leaderboard_not_modified(ctx):
+    client = ctx.app.test_client()
+    etag = client.get("/api/reports/leaderboard").headers["ETag"]
+
+    def run():
+        response = client.get("/api/reports/leaderboard", headers={"If-None-Match": etag})
+        assert response.status_code == 304, response.status_code
+    return run
+
+
+@benchmark("aggregate_advice")
+def _aggregate_advice(ctx):
+    from services.AQI.main import AQIClinicalService
+
+    service = AQIClinicalService()
+    payloads = [synthetic.waqi_payload(ctx.args.seed, i) for i in range(64)]
+    state = {"i": 0}
+
+    def run():
+        state["i"] = (state["i"] + 1) % len(payloads)
+        return service.aggregate_advice(payloads[state["i"]])
+    return run
+
+
+@benchmark("get_pdf")
+def _get_pdf(ctx):
+    from services.AQI.main import AQIClinicalService
+
+    client = ctx.app.test_client()
+    body = AQIClinicalService().aggregate_advice(synthetic.waqi_payload(ctx.args.seed))
+
+    def run():
+        response = client.post("/api/aqi/pdf", json=body)
+        assert response.status_code == 200, response.status_code
+        return response.data
+    return run
+
+
+@benchmark("alert_cycle[100k]")
+def _alert_cycle(ctx):
+    import random
+    from datetime import datetime, timedelta
+
+    from sqlalchemy import insert
+
+    from extensions import db
+    from models import AlertSubscription
+    from services.AQI import geohash
+    from services.AQI.alerts import ALERT_GEOHASH_PRECISION, AlertBook, AlertEvaluator
+    from services.AQI.main import AQIClinicalService
+    from services.AQI.stations import ReadingCache, StationRegistry
+
+    app = ctx.app
+    rng = random.Random(ctx.args.seed)
+    registry = StationRegistry(path=None)
+    readings = ReadingCache(ttl_seconds=10**9)
+    for uid in range(ALERT_STATIONS):
+        lat, lng = geohash.decode(geohash.encode(rng.uniform(8, 35), rng.uniform(68, 90), ALERT_GEOHASH_PRECISION))
+        registry.add(uid, f"station {uid}", lat, lng)
+        readings.put(uid, {"station_uid": uid, "payload": {"aqius": rng.randint(20, 250), "ts": "2025-01-01 00:00:00"}})
+    stations = [registry.get(uid) for uid in range(ALERT_STATIONS)]
+    categories = AQIClinicalService().severity_order[1:]
+    created = datetime.utcnow() - timedelta(days=1)
+    rows = []
+    for i in range(ALERT_SUBSCRIPTIONS):
+        station = stations[i % ALERT_STATIONS]
+        rows.append({
+            "user_id": f"bench{i}@example.com", "lat": station["lat"], "lng": station["lng"],
+            "cell": geohash.encode(station["lat"], station["lng"], ALERT_GEOHASH_PRECISION),
+            "category": categories[i % len(categories)], "active": True, "alerting": False,
+            "created_at": created, "updated_at": created,
+        })
+    evaluator = AlertEvaluator(AlertBook(AQIClinicalService()), registry, readings, snap_km=5.0)
+    with app.app_context():
+        db.session.execute(insert(AlertSubscription), rows)
+        db.session.commit()
+        evaluator.run_cycle()  # first cycle loads the book and sends the initial alerts
+
+    def run():
+        # steady state: sync (no edits), one reading per cell, compare all subscriptions
+        with app.app_context():
+            return evaluator.run_cycle()
+    return run
+
+
+# --- Measurement ---
+def measure(fn, repeat, min_time):
+    fn()  # warm-up (imports, caches, lazy model init)
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    samples.sort()
+    return {
+        "median_us": round(statistics.median(samples) * 1e6, 1),
+        "min_us": round(samples[0] * 1e6, 1),
+        "p95_us": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1e6, 1),
+        "loops": number,
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """{name: (time ratio, memory ratio, regressed)} for benchmarks present in both runs."""
+    verdicts = {}
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base or "median_us" not in result:
+            continue
+        time_ratio = result["median_us"] / max(base["median_us"], 1e-9)
+        mem_ratio = result["peak_kib"] / max(base["peak_kib"], 1e-9)
+        # ignore tiny absolute memory changes: a few KiB is allocator noise
+        mem_regressed = mem_ratio > 1 + tolerance and result["peak_kib"] - base["peak_kib"] > 64
+        verdicts[name] = (time_ratio, mem_ratio, time_ratio > 1 + tolerance or mem_regressed)
+    return verdicts
+
+
+def _fmt_us(us):
+    return f"{us / 1000:.2f} ms" if us >= 1000 else f"{us:.1f} µs"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the microbenchmark suite.")
+    parser.add_argument("--only", help="Comma-separated substrings; run benchmarks whose name contains one")
+    parser.add_argument("--skip", help="Comma-separated substrings to leave out (e.g. verify_description_match)")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--reports", type=int, default=10000)
+    parser.add_argument("--image-sizes", default="640x480,1280x960,4032x3024")
+    parser.add_argument("--seed", type=int, default=synthetic.DEFAULT_SEED)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.05, help="Seconds per sample")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.20, help="Allowed slowdown / memory growth")
+    parser.add_argument("--json", metavar="PATH", help="Also write this run's results here")
+    args = parser.parse_args(argv)
+
+    sizes = synthetic.parse_sizes(args.image_sizes)
+    selected = (
+        image_benchmarks("analyze_image_for_pollution", _analyze, sizes)
+        + image_benchmarks("verify_description_match", _describe, sizes)
+        + BENCHMARKS
+    )
+    if args.only:
+        wanted = [w.strip() for w in args.only.split(",") if w.strip()]
+        selected = [(n, f) for n, f in selected if any(w in n for w in wanted)]
+    if args.skip:
+        unwanted = [w.strip() for w in args.skip.split(",") if w.strip()]
+        selected = [(n, f) for n, f in selected if not any(w in n for w in unwanted)]
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    ctx = Context(args)
+    results = {}
+    print(f"{'benchmark':<44} {'median':>10} {'p95':>10} {'peak KiB':>10}  {'vs baseline':>12}")
+    for name, factory in selected:
+        try:
+            results[name] = measure(factory(ctx), args.repeat, args.min_time)
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+            print(f"{name:<44} ERROR {results[name]['error']}")
+            continue
+        r = results[name]
+        verdict = ""
+        if baseline:
+            v = compare({name: r}, baseline, args.tolerance).get(name)
+            verdict = "new" if v is None else f"{v[0]:.2f}x{' REGRESSED' if v[2] else ''}"
+        print(f"{name:<44} {_fmt_us(r['median_us']):>10} {_fmt_us(r['p95_us']):>10} {r['peak_kib']:>10.1f}  {verdict:>12}")
+
+    run = {
+        "meta": {
+            "python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+            "users": args.users, "reports": args.reports, "seed": args.seed, "image_sizes": args.image_sizes,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    for path in filter(None, (args.save_baseline, args.json)):
+        with open(path, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"✅ Results written to {path}")
+
+    if baseline:
+        if {k: baseline["meta"].get(k) for k in ("users", "reports", "seed")} != \
+                {k: run["meta"][k] for k in ("users", "reports", "seed")}:
+            print("⚠️  Baseline was recorded with a different data set; ratios are not comparable")
+        regressed = [n for n, v in compare(results, baseline, args.tolerance).items() if v[2]]
+        failed = [n for n, r in results.items() if "error" in r]
+        if regressed or failed:
+            print(f"❌ {len(regressed)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressed) or '-'}"
+                  + (f"; {len(failed)} error(s)" if failed else ""))
+            return 1
+        print(f"✅ No regressions beyond {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
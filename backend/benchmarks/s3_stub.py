@@ -0,0 +1,255 @@
+# backend/benchmarks/s3_stub.py
+"""
+In-memory stand-in for an S3-compatible object store (the subset services.blob_store uses).
+
+    cd backend
+    python -m benchmarks.s3_stub --port 9000
+    BLOB_BACKEND=s3 S3_BUCKET=breathesmart S3_ENDPOINT_URL=http://127.0.0.1:9000 \
+        AWS_ACCESS_KEY_ID=stub AWS_SECRET_ACCESS_KEY=stub gunicorn app:app
+
+Path-style requests only (/<bucket>/<key>). Signatures are not checked.
+Supported operations:
+- Put / Get (with Range) / Head / Delete / Copy object
+- ListObjectsV2 (prefix, max-keys, continuation token)
+- Multipart uploads: create, upload part, complete, abort
+
+Buckets spring into existence on first use. Like waqi_stub, --latency-ms
+adds a delay to every request so remote-store round trips show up in
+load tests.
+"""
+import argparse
+import hashlib
+import re
+import sys
+import threading
+import time
+import uuid
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+PART_RE = re.compile(r"<PartNumber>(\d+)</PartNumber>")
+
+
+class S3Stub:
+    """The stub server; start() runs it on a daemon thread."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0.0):
+        stub = self
+        self.latency_ms = latency_ms
+        self.objects = {}  # (bucket, key) -> (bytes, content type, modified unix time)
+        self.uploads = {}  # upload id -> {"bucket", "key", "content_type", "parts": {n: bytes}}
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub._handle(self, "GET")
+
+            def do_HEAD(self):
+                stub._handle(self, "HEAD")
+
+            def do_PUT(self):
+                stub._handle(self, "PUT")
+
+            def do_POST(self):
+                stub._handle(self, "POST")
+
+            def do_DELETE(self):
+                stub._handle(self, "DELETE")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    # --- HTTP plumbing ---
+    def _reply(self, handler, status, body=b"", headers=None, method="GET"):
+        if isinstance(body, str):
+            body = body.encode()
+        handler.send_response(status)
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        if "Content-Length" not in (headers or {}):
+            handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        if method != "HEAD" and body:
+            handler.wfile.write(body)
+
+    def _error(self, handler, status, code, method):
+        body = f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code><Message>{code}</Message></Error>'
+        self._reply(handler, status, body if method != "HEAD" else b"", {"Content-Type": "application/xml"}, method)
+
+    def _handle(self, handler, method):
+        with self._lock:
+            self.requests += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        url = urlsplit(handler.path)
+        query = {k: v[0] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+        bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length) if length else b""
+
+        if not key:
+            if method == "GET" and query.get("list-type") == "2":
+                return self._list(handler, bucket, query)
+            return self._reply(handler, 200, method=method)  # create / head bucket
+        if method == "POST" and "uploads" in query:
+            return self._create_multipart(handler, bucket, key)
+        if method == "PUT" and "uploadId" in query:
+            return self._upload_part(handler, query, body)
+        if method == "POST" and "uploadId" in query:
+            return self._complete_multipart(handler, query, body)
+        if method == "DELETE" and "uploadId" in query:
+            with self._lock:
+                self.uploads.pop(query["uploadId"], None)
+            return self._reply(handler, 204, method=method)
+        if method == "PUT":
+            return self._put(handler, bucket, key, body)
+        if method in ("GET", "HEAD"):
+            return self._get(handler, bucket, key, method)
+        if method == "DELETE":
+            with self._lock:
+                self.objects.pop((bucket, key), None)
+            return self._reply(handler, 204, method=method)
+        return self._error(handler, 405, "MethodNotAllowed", method)
+
+    # --- Operations ---
+    def _put(self, handler, bucket, key, body):
+        source = handler.headers.get("x-amz-copy-source")
+        if source:
+            src_bucket, _, src_key = unquote(source).lstrip("/").partition("/")
+            with self._lock:
+                found = self.objects.get((src_bucket, src_key))
+                if found is None:
+                    return self._error(handler, 404, "NoSuchKey", "PUT")
+                self.objects[(bucket, key)] = (found[0], found[1], time.time())
+            etag = hashlib.md5(found[0]).hexdigest()
+            xml = (f'<?xml version="1.0" encoding="UTF-8"?><CopyObjectResult><ETag>"{etag}"</ETag>'
+                   f"<LastModified>{_iso(time.time())}</LastModified></CopyObjectResult>")
+            return self._reply(handler, 200, xml, {"Content-Type": "application/xml"})
+        content_type = handler.headers.get("Content-Type", "application/octet-stream")
+        with self._lock:
+            self.objects[(bucket, key)] = (body, content_type, time.time())
+        return self._reply(handler, 200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+
+    def _get(self, handler, bucket, key, method):
+        with self._lock:
+            found = self.objects.get((bucket, key))
+        if found is None:
+            return self._error(handler, 404, "NoSuchKey", method)
+        data, content_type, modified = found
+        headers = {
+            "Content-Type": content_type,
+            "Last-Modified": formatdate(modified, usegmt=True),
+            "ETag": f'"{hashlib.md5(data).hexdigest()}"',
+            "Accept-Ranges": "bytes",
+        }
+        match = RANGE_RE.match(handler.headers.get("Range", ""))
+        if method == "GET" and match:
+            start, end = match.groups()
+            if start == "":
+                start, end = max(0, len(data) - int(end)), len(data) - 1
+            else:
+                start, end = int(start), min(int(end) if end else len(data) - 1, len(data) - 1)
+            if start >= len(data) or start > end:
+                return self._error(handler, 416, "InvalidRange", method)
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            return self._reply(handler, 206, data[start:end + 1], headers, method)
+        headers["Content-Length"] = str(len(data))
+        return self._reply(handler, 200, data, headers, method)
+
+    def _list(self, handler, bucket, query):
+        prefix = query.get("prefix", "")
+        max_keys = int(query.get("max-keys", 1000))
+        after = query.get("continuation-token") or query.get("start-after") or ""
+        with self._lock:
+            keys = sorted(k for (b, k) in self.objects if b == bucket and k.startswith(prefix) and k > after)
+            page = [(k, self.objects[(bucket, k)]) for k in keys[:max_keys]]
+        truncated = len(keys) > max_keys
+        contents = "".join(
+            f"<Contents><Key>{escape(k)}</Key><LastModified>{_iso(modified)}</LastModified>"
+            f'<ETag>"{hashlib.md5(data).hexdigest()}"</ETag><Size>{len(data)}</Size>'
+            f"<StorageClass>STANDARD</StorageClass></Contents>"
+            for k, (data, _, modified) in page
+        )
+        token = f"<NextContinuationToken>{escape(page[-1][0])}</NextContinuationToken>" if truncated else ""
+        xml = (f'<?xml version="1.0" encoding="UTF-8"?><ListBucketResult><Name>{escape(bucket)}</Name>'
+               f"<Prefix>{escape(prefix)}</Prefix><KeyCount>{len(page)}</KeyCount><MaxKeys>{max_keys}</MaxKeys>"
+               f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>{token}{contents}</ListBucketResult>")
+        return self._reply(handler, 200, xml, {"Content-Type": "application/xml"})
+
+    def _create_multipart(self, handler, bucket, key):
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self.uploads[upload_id] = {
+                "bucket": bucket, "key": key, "parts": {},
+                "content_type": handler.headers.get("Content-Type", "application/octet-stream"),
+            }
+        xml = (f'<?xml version="1.0" encoding="UTF-8"?><InitiateMultipartUploadResult><Bucket>{escape(bucket)}</Bucket>'
+               f"<Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>")
+        return self._reply(handler, 200, xml, {"Content-Type": "application/xml"})
+
+    def _upload_part(self, handler, query, body):
+        with self._lock:
+            upload = self.uploads.get(query["uploadId"])
+            if upload is None:
+                return self._error(handler, 404, "NoSuchUpload", "PUT")
+            upload["parts"][int(query["partNumber"])] = body
+        return self._reply(handler, 200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+
+    def _complete_multipart(self, handler, query, body):
+        numbers = [int(n) for n in PART_RE.findall(body.decode())]
+        with self._lock:
+            upload = self.uploads.pop(query["uploadId"], None)
+            if upload is None or any(n not in upload["parts"] for n in numbers):
+                return self._error(handler, 400, "InvalidPart", "POST")
+            data = b"".join(upload["parts"][n] for n in numbers)
+            self.objects[(upload["bucket"], upload["key"])] = (data, upload["content_type"], time.time())
+        xml = (f'<?xml version="1.0" encoding="UTF-8"?><CompleteMultipartUploadResult>'
+               f"<Bucket>{escape(upload['bucket'])}</Bucket><Key>{escape(upload['key'])}</Key>"
+               f'<ETag>"{hashlib.md5(data).hexdigest()}-{len(numbers)}"</ETag></CompleteMultipartUploadResult>')
+        return self._reply(handler, 200, xml, {"Content-Type": "application/xml"})
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _iso(ts):
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(ts))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve an in-memory S3-compatible object store.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    stub = S3Stub(args.host, args.port, args.latency_ms)
+    print(f"S3 stub on {stub.url} (latency {args.latency_ms} ms)")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
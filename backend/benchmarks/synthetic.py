@@ -0,0 +1,227 @@
+# backend/benchmarks/synthetic.py
+"""
+Deterministic synthetic data for benchmarks and load tests.
+
+    cd backend
+    python -m benchmarks.synthetic --database-url sqlite:////tmp/bench.db --users 200 --reports 20000
+    python -m benchmarks.synthetic --images /tmp/bench_images --image-sizes 640x480,1280x960,4032x3024
+
+The same seed always yields the same users, reports, WAQI payloads and images,
+so timings from two runs (or two commits) are comparable. Reports cluster
+around a handful of cities, with a realistic mix of statuses, decision
+details, precautions and awarded credits.
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np  # noqa: E402
+from PIL import Image, ImageDraw, ImageFilter  # noqa: E402
+
+DEFAULT_SEED = 1234
+EPOCH = datetime(2025, 1, 1)  # fixed, so generated timestamps do not depend on "now"
+
+# (name, lat, lng, spread in degrees, weight)
+CITIES = [
+    ("Bengaluru", 12.9716, 77.5946, 0.15, 0.30),
+    ("Delhi", 28.6139, 77.2090, 0.20, 0.25),
+    ("Mumbai", 19.0760, 72.8777, 0.15, 0.20),
+    ("Kolkata", 22.5726, 88.3639, 0.12, 0.10),
+    ("Chennai", 13.0827, 80.2707, 0.12, 0.10),
+    ("Pune", 18.5204, 73.8567, 0.10, 0.05),
+]
+STATUSES = [("verified", 0.45), ("rejected", 0.35), ("approved", 0.12), ("finalized", 0.05), ("pending", 0.03)]
+SOURCES = ["factory chimney", "garbage burning", "vehicle exhaust", "construction dust", "crop stubble fire",
+           "diesel generator", "brick kiln", "forest fire", "traffic junction", "landfill"]
+OBSERVATIONS = ["thick black smoke from", "grey haze around", "dense smog near", "white smoke rising over",
+                "dust cloud at", "burning smell from"]
+PRECAUTIONS = ["Wear an N95 mask outdoors.", "Keep windows closed.", "Avoid the area during peak hours.",
+               "Children and elderly should stay indoors.", ""]
+ACTIONS = ["Inspection scheduled with the pollution control board.", "Fine issued to the site operator.",
+           "Municipal crew dispatched to clear the burning waste.", ""]
+POLLUTANTS = ["pm25", "pm10", "o3", "no2", "so2", "co"]
+
+
+def _pick(rng, weighted):
+    return rng.choices([v for v, _ in weighted], weights=[w for _, w in weighted])[0]
+
+
+# --- Users / reports ---
+def generate_users(n, seed=DEFAULT_SEED):
+    """users.json-style records: name, email, password, role."""
+    rng = random.Random(seed)
+    return [
+        {"name": f"user{i:05d}", "email": f"user{i:05d}@bench.local", "password": f"pw{rng.randrange(10**6):06d}",
+         "role": "citizen"}
+        for i in range(n)
+    ]
+
+
+def generate_reports(n, users, seed=DEFAULT_SEED):
+    """Column dicts for Report (insertable with db.session.execute(insert(Report), rows))."""
+    rng = random.Random(seed + 1)
+    # a few prolific reporters, a long tail of occasional ones (Zipf-like)
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(users))))
+    cities = [(c[1], c[2], c[3]) for c in CITIES]
+    city_weights = [c[4] for c in CITIES]
+    rows = []
+    for i in range(n):
+        user = rng.choices(users, cum_weights=cum_weights)[0]
+        lat, lng, spread = rng.choices(cities, weights=city_weights)[0]
+        status = _pick(rng, STATUSES)
+        verified = status in ("verified", "approved", "finalized")
+        pollution = rng.uniform(46, 100) if verified else rng.uniform(0, 100)
+        desc_conf = rng.uniform(0.6, 1.0) if verified else rng.uniform(0.0, 0.6)
+        created = EPOCH + timedelta(seconds=rng.randrange(180 * 86400))
+        details = {
+            "edge_density_score": f"{pollution:.2f}%",
+            "_decision": {
+                "pollution_conf_pct": pollution, "desc_conf_frac": desc_conf,
+                "pollution_threshold": 45.0, "description_threshold": 0.6, "verified": verified,
+            },
+        }
+        if rng.random() < 0.05:
+            details["near_duplicates"] = [{"report_id": rng.randrange(max(i, 1)) + 1, "similarity": 0.97}]
+        if status in ("approved", "finalized") and rng.random() < 0.5:
+            details["govt_proofs"] = [f"govt_actions/govt_{i:06d}.jpg"]
+        rows.append({
+            "user_name": user["name"],
+            "description": f"{rng.choice(OBSERVATIONS)} {rng.choice(SOURCES)}",
+            "image_filename": f"{i:08d}_bench.jpg",
+            "image_hash": f"{rng.getrandbits(256):064x}",
+            "lat": lat + rng.gauss(0, spread),
+            "lng": lng + rng.gauss(0, spread),
+            "aqi": float(rng.randrange(20, 450)),
+            "points": 100 if verified else 0,
+            "status": status,
+            "pollution_confidence": pollution,
+            "description_match_confidence": desc_conf,
+            "details": details,
+            "precautions": rng.choice(PRECAUTIONS) if status in ("approved", "finalized") else None,
+            "govt_action": rng.choice(ACTIONS) if status == "finalized" else None,
+            "awarded_credits": 100 if verified else 0,
+            "created_at": created,
+            "last_checked_at": created,
+            "updated_at": created,
+        })
+    return rows
+
+
+def populate(users=200, reports=10000, seed=DEFAULT_SEED, chunk_size=5000):
+    """Insert generated reports into the app's DB (call inside an app context). Returns the user records."""
+    from sqlalchemy import insert
+
+    from extensions import db
+    from models import Report
+
+    user_rows = generate_users(users, seed)
+    report_rows = generate_reports(reports, user_rows, seed)
+    for start in range(0, len(report_rows), chunk_size):
+        db.session.execute(insert(Report), report_rows[start:start + chunk_size])
+    db.session.commit()
+    return user_rows
+
+
+def waqi_payload(seed=DEFAULT_SEED, i=0):
+    """A flattened WAQI reading as stored by aqi_routes.fetch_reading (input to aggregate_advice)."""
+    rng = random.Random(seed * 7919 + i)
+    iaqi = {pol: {"v": rng.randrange(5, 400)} for pol in rng.sample(POLLUTANTS, rng.randrange(2, len(POLLUTANTS) + 1))}
+    iaqi.update({"t": {"v": 29.5}, "h": {"v": 64}, "p": {"v": 1008}})  # weather keys WAQI mixes in
+    dominant = max((p for p in iaqi if p in POLLUTANTS), key=lambda p: iaqi[p]["v"])
+    return {"city": f"Bench Station {i}", "aqius": iaqi[dominant]["v"], "mainus": dominant,
+            "ts": "2025-01-01 08:00:00", "iaqi": iaqi}
+
+
+# --- Images ---
+def synthetic_image(width, height, seed=DEFAULT_SEED, smoky=True):
+    """
+    A sky/ground scene with a sensor-noise texture; smoky=True adds blurred
+    plumes and structures so the Canny stage sees both hard and soft edges.
+    """
+    rng = np.random.default_rng(seed)
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None, None]
+    sky = np.array([120, 170, 230], dtype=np.float32) * (1 - y) + np.array([90, 80, 70], dtype=np.float32) * y
+    pixels = np.broadcast_to(sky, (height, width, 3)) + rng.normal(0, 6, (height, width, 3))
+    image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+    draw = ImageDraw.Draw(image)
+    scale = min(width, height)
+    for _ in range(int(rng.integers(3, 9))):  # buildings / chimneys
+        x = int(rng.integers(0, width))
+        w, h = int(scale * rng.uniform(0.03, 0.12)), int(scale * rng.uniform(0.1, 0.5))
+        shade = int(rng.integers(30, 90))
+        draw.rectangle([x, height - h, x + w, height], fill=(shade, shade, shade + 10))
+    if smoky:
+        plume = Image.new("L", (width, height), 0)
+        pdraw = ImageDraw.Draw(plume)
+        for _ in range(int(rng.integers(6, 20))):
+            cx, cy = int(rng.integers(0, width)), int(rng.integers(0, height // 2 + 1))
+            r = int(scale * rng.uniform(0.03, 0.15))
+            pdraw.ellipse([cx - r, cy - r, cx + r, cy + r], fill=int(rng.integers(90, 220)))
+        plume = plume.filter(ImageFilter.GaussianBlur(scale * 0.02))
+        image = Image.composite(Image.new("RGB", (width, height), (45, 45, 45)), image, plume)
+    return image
+
+
+def parse_sizes(text):
+    return [tuple(int(v) for v in size.lower().split("x")) for size in text.split(",") if size.strip()]
+
+
+def write_images(folder, sizes=((640, 480), (1280, 960), (1920, 1080), (4032, 3024)), per_size=1,
+                 seed=DEFAULT_SEED, quality=88):
+    """JPEGs of every size (alternating smoky / clear); returns [(path, (w, h)), ...] in a stable order."""
+    os.makedirs(folder, exist_ok=True)
+    written = []
+    for s, (width, height) in enumerate(sizes):
+        for k in range(per_size):
+            path = os.path.join(folder, f"synthetic_{width}x{height}_{k}.jpg")
+            if not os.path.exists(path):
+                synthetic_image(width, height, seed + s * 1000 + k, smoky=k % 2 == 0).save(path, "JPEG", quality=quality)
+            written.append((path, (width, height)))
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate deterministic synthetic reports and images.")
+    parser.add_argument("--database-url", help="Fill this DB (migrated first) with users' reports")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--reports", type=int, default=10000)
+    parser.add_argument("--users-json", help="Also write the generated users to this users.json-style file")
+    parser.add_argument("--images", help="Write synthetic JPEGs to this folder")
+    parser.add_argument("--image-sizes", default="640x480,1280x960,1920x1080,4032x3024")
+    parser.add_argument("--per-size", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        import json
+
+        from flask import Flask
+
+        import migrations
+        from database import configure_database
+        from extensions import db
+
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = args.database_url
+        configure_database(app)
+        with app.app_context():
+            migrations.upgrade(db.engine)
+            users = populate(args.users, args.reports, args.seed)
+        print(f"✅ {args.reports} report(s) from {args.users} user(s) in {args.database_url}")
+        if args.users_json:
+            with open(args.users_json, "w") as f:
+                json.dump(users, f, indent=2)
+            print(f"✅ Users written to {args.users_json}")
+    if args.images:
+        written = write_images(args.images, parse_sizes(args.image_sizes), args.per_size, args.seed)
+        print(f"✅ {len(written)} image(s) in {args.images}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# backend/benchmarks/waqi_stub.py
+"""
+Local stand-in for api.waqi.info's `/feed/geo:<lat>;<lng>/` endpoint.
+
+    cd backend
+    python -m benchmarks.waqi_stub --port 8765 --latency-ms 120 --error-rate 0.02
+    WAQI_API_URL=http://127.0.0.1:8765 gunicorn app:app
+
+Coordinates snap to a 0.1° grid, and each grid cell is one station with a
+stable uid, name and position. So the app's station index and reading
+cache behave as they do against the real feed. Readings are random but
+seeded per station.
+
+Failure modes:
+- --error-rate: the fraction of requests answered with WAQI's
+  {"status": "error"} body.
+- --latency-ms / --jitter: add a delay to every response.
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FEED_RE = re.compile(r"^/feed/geo:(-?[\d.]+);(-?[\d.]+)/?$")
+POLLUTANTS = ("pm25", "pm10", "o3", "no2", "so2", "co")
+
+
+def station_for(lat, lng):
+    """(uid, name, lat, lng) of the grid cell containing the coordinate."""
+    row, col = round(lat * 10), round(lng * 10)
+    uid = 100000 + (row + 900) * 3600 + (col + 1800)
+    return uid, f"Stub station {row / 10:.1f},{col / 10:.1f}", row / 10, col / 10
+
+
+def feed(lat, lng, rng):
+    uid, name, s_lat, s_lng = station_for(lat, lng)
+    seeded = random.Random(uid)
+    iaqi = {p: {"v": seeded.randrange(5, 300) + rng.randrange(-5, 6)} for p in seeded.sample(POLLUTANTS, 4)}
+    iaqi.update({"t": {"v": 28.0}, "h": {"v": 60}})
+    dominant = max((p for p in iaqi if p in POLLUTANTS), key=lambda p: iaqi[p]["v"])
+    return {
+        "status": "ok",
+        "data": {
+            "aqi": iaqi[dominant]["v"],
+            "idx": uid,
+            "city": {"name": name, "geo": [s_lat, s_lng]},
+            "dominentpol": dominant,
+            "iaqi": iaqi,
+            "time": {"s": time.strftime("%Y-%m-%d %H:00:00")},
+        },
+    }
+
+
+class WaqiStub:
+    """The stub server; start() runs it on a daemon thread (used by benchmarks.loadtest)."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=100.0, jitter=0.5, error_rate=0.0, seed=0):
+        stub = self
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handle(self, handler):
+        with self._lock:
+            self.requests += 1
+            delay = self.latency_ms * (1 + self.jitter * (2 * self._rng.random() - 1)) / 1000.0
+            fail = self._rng.random() < self.error_rate
+            rng = random.Random(self._rng.random())
+        time.sleep(max(0.0, delay))
+
+        match = FEED_RE.match(handler.path.split("?", 1)[0])
+        if fail:
+            with self._lock:
+                self.errors += 1
+            status, body = 200, {"status": "error", "data": "Over quota"}  # WAQI reports errors with HTTP 200
+        elif not match:
+            status, body = 404, {"status": "error", "data": "Unknown endpoint"}
+        else:
+            status, body = 200, feed(float(match.group(1)), float(match.group(2)), rng)
+
+        data = json.dumps(body).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a stand-in for the WAQI geo feed.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter", type=float, default=0.5, help="± fraction of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    stub = WaqiStub(args.host, args.port, args.latency_ms, args.jitter, args.error_rate, args.seed)
+    print(f"WAQI stub on {stub.url} (latency {args.latency_ms} ms ±{args.jitter:.0%}, errors {args.error_rate:.1%})")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
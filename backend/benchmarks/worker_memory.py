@@ -0,0 +1,53 @@
+# backend/benchmarks/worker_memory.py
+"""
+Per-process memory of a running gunicorn tree (Linux, reads /proc/<pid>/smaps_rollup).
+
+    python -m benchmarks.worker_memory <gunicorn-master-pid> [<model-server-pid>]
+
+RSS counts shared pages in every process; PSS divides each shared page between
+the processes mapping it, so the PSS column sums to the real footprint.
+"""
+import os
+import sys
+
+
+def rollup(pid):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[0].endswith(":") and parts[2] == "kB":
+                values[parts[0][:-1]] = int(parts[1]) / 1024.0
+    return values
+
+
+def children(pid):
+    found = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            found.extend(int(c) for c in f.read().split())
+    return found
+
+
+def main(argv):
+    if not argv:
+        print(__doc__)
+        return 1
+    master = int(argv[0])
+    rows = [("master", master)] + [("worker", c) for c in children(master)]
+    rows += [("model-server", int(p)) for p in argv[1:]]
+
+    print(f"{'role':<14}{'pid':>8}{'RSS MiB':>12}{'PSS MiB':>12}{'private MiB':>14}")
+    total_pss = 0.0
+    for role, pid in rows:
+        m = rollup(pid)
+        private = m.get("Private_Clean", 0) + m.get("Private_Dirty", 0)
+        total_pss += m.get("Pss", 0)
+        print(f"{role:<14}{pid:>8}{m.get('Rss', 0):>12.1f}{m.get('Pss', 0):>12.1f}{private:>14.1f}")
+    workers = len(rows) - 1 - len(argv[1:])
+    print(f"total PSS {total_pss:.1f} MiB across {workers} worker(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,69 @@
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from extensions import db
+
+# --- SQLite tuning (WAL lets readers run alongside the single writer) ---
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),  # safe with WAL, one fsync per checkpoint
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)),  # wait for the write lock instead of failing
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    "temp_store": "MEMORY",
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE_KB", 20000)) * -1,  # negative = KiB
+}
+
+
+def normalize_database_url(url):
+    """Heroku/Render style 'postgres://' URLs are rejected by SQLAlchemy 2.x."""
+    if url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def engine_options(url):
+    """SQLAlchemy engine kwargs for the configured backend."""
+    backend = make_url(url).get_backend_name()
+
+    if backend == "sqlite":
+        # pysqlite's own lock timeout (seconds) should match busy_timeout
+        return {"connect_args": {"timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000.0}}
+
+    options = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", 30)),
+        "pool_pre_ping": True,
+    }
+    if backend == "mysql":
+        # MySQL drops idle connections after wait_timeout (8h default); recycle well before that
+        options["pool_recycle"] = int(os.getenv("DB_POOL_RECYCLE", 3600))
+    elif os.getenv("DB_POOL_RECYCLE"):
+        options["pool_recycle"] = int(os.getenv("DB_POOL_RECYCLE"))
+    return options
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def configure_database(app):
+    """Set engine options before db.init_app, then attach per-connection SQLite pragmas."""
+    url = normalize_database_url(app.config["SQLALCHEMY_DATABASE_URI"])
+    app.config["SQLALCHEMY_DATABASE_URI"] = url
+
+    options = dict(app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    for key, value in engine_options(url).items():
+        options.setdefault(key, value)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+    db.init_app(app)
+
+    if make_url(url).get_backend_name() == "sqlite":
+        with app.app_context():
+            event.listen(db.engine, "connect", _apply_sqlite_pragmas)
@@ -0,0 +1,59 @@
+# backend/gunicorn.conf.py — picked up automatically by `gunicorn app:app` from this folder
+import gc
+import os
+import shutil
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+
+# ✅ CLIP sharing (see docs/ml_serving.md):
+#   - CLIP_SERVER_SOCKET set -> workers call the shared model server, nothing to preload
+#   - otherwise preload the app so CLIP is loaded once in the master and shared copy-on-write
+# ✅ Prometheus multiprocess mode: each worker writes its samples to files here and
+# /metrics sums them (see docs/observability.md). Must be set before the app is imported.
+prometheus_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "prometheus")
+)
+shutil.rmtree(prometheus_dir, ignore_errors=True)  # samples from a previous run would be summed in
+os.makedirs(prometheus_dir, exist_ok=True)
+
+preload_app = not os.getenv("CLIP_SERVER_SOCKET") and os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+
+def when_ready(server):
+    if preload_app:
+        # move everything allocated during preload (model included) out of the GC's reach,
+        # so collections in the workers don't write to — and un-share — those pages
+        gc.freeze()
+        if os.getenv("AQI_PREFETCH_ENABLED", "0") == "1":
+            # the master only forks: the workers elect one scheduler among themselves
+            from routes.aqi_routes import prefetch_scheduler
+            prefetch_scheduler.stop()
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from app import app
+    from extensions import db
+
+    # pooled DB connections opened in the master (migrations) must not be shared with children
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+    # the preloaded app started the AQI prefetch thread in the master; start this worker's own
+    if os.getenv("AQI_PREFETCH_ENABLED", "0") == "1":
+        from routes.aqi_routes import prefetch_scheduler
+        prefetch_scheduler.restart_after_fork()
+
+    # one intra-op pool per worker sized to its share of the cores
+    import torch
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -2,22 +2,378 @@
 import os
 import click
 from flask.cli import with_appcontext
+from sqlalchemy import MetaData
 from app import create_app
 from extensions import db
+import migrations
 
 app = create_app()
 
-# Path to your SQLite DB file
-DB_PATH = os.path.join(os.path.dirname(__file__), "breathe_smart.db")
+SQLITE_SIDE_FILES = ("", "-wal", "-shm", "-journal")  # a stale WAL would be replayed into the new file
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", f"http://localhost:{os.getenv('PORT', 5001)}")  # image URLs in events
+PUBLISH_BATCH = 500
+
+
+def publish_updated(report_ids):
+    """
+    Stage `updated` change-log events for rows a command rewrote, as the API's
+    record_changes does. Call it before the commit that carries the rewrite.
+    """
+    from models import Report
+    from routes.report_routes import record_changes
+
+    db.session.flush()
+    with app.test_request_context(base_url=PUBLIC_BASE_URL):  # serialize_report builds absolute URLs
+        for i in range(0, len(report_ids), PUBLISH_BATCH):
+            reports = (Report.query.filter(Report.id.in_(report_ids[i:i + PUBLISH_BATCH])).order_by(Report.id)
+                       .populate_existing().all())  # bulk UPDATEs bypass the identity map
+            record_changes([(report, "updated") for report in reports])
+
 
 @app.cli.command("reset-db")
 @with_appcontext
 def reset_db():
-    """Drop all tables and recreate them (also deletes SQLite file)."""
-    if os.path.exists(DB_PATH):
-        click.echo(f"⚠️  Deleting old database file: {DB_PATH}")
-        os.remove(DB_PATH)
+    """Drop all tables and recreate them (SQLite: deletes the database file and its WAL/SHM files)."""
+    url = db.engine.url
+    db.engine.dispose()  # close pooled connections before the files go
+
+    if url.get_backend_name() == "sqlite":
+        if url.database and url.database != ":memory:":
+            for suffix in SQLITE_SIDE_FILES:
+                path = f"{url.database}{suffix}"
+                if os.path.exists(path):
+                    click.echo(f"⚠️  Deleting old database file: {path}")
+                    os.remove(path)
+    else:
+        click.echo(f"⚠️  Dropping every table in {url.render_as_string(hide_password=True)}")
+        meta = MetaData()
+        meta.reflect(bind=db.engine)
+        meta.drop_all(bind=db.engine)
 
     click.echo("✅ Creating fresh database...")
-    db.create_all()
-    click.echo("🎉 Database reset complete.")
\ No newline at end of file
+    migrations.upgrade(db.engine, log=click.echo)
+    click.echo("🎉 Database reset complete.")
+
+
+@app.cli.command("db-upgrade")
+@click.option("--target", type=int, default=None, help="Stop at this migration version.")
+@with_appcontext
+def db_upgrade(target):
+    """Apply pending schema migrations."""
+    applied = migrations.upgrade(db.engine, target=target, log=click.echo)
+    click.echo(f"✅ Schema at version {migrations.head() if target is None else target} ({len(applied)} applied).")
+
+@app.cli.command("import-stations")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+def import_stations(path):
+    """Bulk import AQI stations (JSON, WAQI map/bounds JSON or CSV) into the nearest-station index."""
+    from routes.aqi_routes import station_registry
+
+    added = station_registry.load_file(path)
+    click.echo(f"✅ Imported {added} station(s); registry now holds {len(station_registry)}.")
+
+
+@app.cli.command("prefetch-aqi")
+@click.option("--once", is_flag=True, help="Run a single scheduling pass and exit.")
+@click.option("--no-alerts", is_flag=True, help="Do not evaluate AQI alert subscriptions after each pass.")
+def prefetch_aqi(once, no_alerts):
+    """Refresh hot AQI cells ahead of expiry (needs AQI_CACHE_DIR shared with the web workers)."""
+    import json
+    import time
+    from routes.aqi_routes import AQI_CACHE_DIR, alert_book, alert_evaluator, demand_tracker, prefetch_scheduler
+
+    if not AQI_CACHE_DIR:
+        click.echo("⚠️  AQI_CACHE_DIR is not set: readings fetched here will not reach the web workers.")
+
+    while True:
+        if AQI_CACHE_DIR:
+            demand_tracker.load_snapshots()
+        if not no_alerts:
+            alert_book.sync()  # subscribed cells are refreshed too
+        refreshed = prefetch_scheduler.run_once()
+        click.echo(f"🔄 Refreshed {refreshed} cell(s)")
+        if not no_alerts:
+            cycle = alert_evaluator.run_cycle()
+            click.echo(f"🔔 {cycle['alerts']} alert(s), {cycle['clears']} clear(s) over "
+                       f"{cycle['subscriptions']} subscription(s) in {cycle['took_ms']} ms")
+        if once:
+            break
+        time.sleep(prefetch_scheduler.interval_seconds)
+
+    click.echo(json.dumps(prefetch_scheduler.report(), indent=2))
+
+
+@app.cli.command("evaluate-alerts")
+@click.option("--once", is_flag=True, help="Run a single evaluation cycle and exit.")
+@click.option("--interval", type=float, default=30, show_default=True, help="Seconds between cycles.")
+def evaluate_alerts(once, interval):
+    """Check AQI alert subscriptions against cached readings (when `prefetch-aqi --no-alerts` runs elsewhere)."""
+    import time
+    from routes.aqi_routes import AQI_CACHE_DIR, alert_evaluator, station_registry
+
+    if not AQI_CACHE_DIR:
+        click.echo("⚠️  AQI_CACHE_DIR is not set: only readings fetched by this process can be seen.")
+
+    stations_mtime = None
+    while True:
+        try:
+            mtime = os.path.getmtime(station_registry.path)
+        except (OSError, TypeError):
+            mtime = None
+        if mtime is not None and mtime != stations_mtime:
+            station_registry.load_file(station_registry.path, persist=False)  # stations the web workers found
+            stations_mtime = mtime
+        cycle = alert_evaluator.run_cycle()
+        click.echo(f"🔔 {cycle['alerts']} alert(s), {cycle['clears']} clear(s) over {cycle['subscriptions']} "
+                   f"subscription(s) in {cycle['cells']} cell(s), {cycle['took_ms']} ms")
+        if once:
+            break
+        time.sleep(interval)
+
+
+@app.cli.command("reverify-reports")
+@click.option("--workers", type=int, default=None, help="Scoring processes (default: CPU count).")
+@click.option("--chunk-size", type=int, default=16, show_default=True, help="Images per batched CLIP call.")
+@click.option("--commit-every", type=int, default=500, show_default=True, help="Reports per DB transaction.")
+@click.option("--checkpoint", default=os.path.join(os.path.dirname(__file__), "data", "reverify_checkpoint.json"),
+              show_default=True, help="Progress file used to resume.")
+@click.option("--status", "statuses", multiple=True, type=click.Choice(["verified", "rejected"]),
+              default=("verified", "rejected"), show_default=True)
+@click.option("--pollution-threshold", type=float, default=None, help="Override POLLUTION_THRESHOLD_PERCENT.")
+@click.option("--description-threshold", type=float, default=None, help="Override DESCRIPTION_THRESHOLD_FRACTION.")
+@click.option("--dry-run", is_flag=True, help="Score and count flips without writing to the DB or moving files.")
+@click.option("--restart", is_flag=True, help="Ignore an existing checkpoint.")
+@with_appcontext
+def reverify_reports_command(workers, chunk_size, commit_every, checkpoint, statuses,
+                             pollution_threshold, description_threshold, dry_run, restart):
+    """Re-run verify_image over stored report images (parallel, resumable)."""
+    import json
+    from routes.report_routes import decide
+    from services.ML.reverify import reverify_reports
+
+    if dry_run:
+        checkpoint = f"{checkpoint}.dry-run"
+    state = reverify_reports(
+        app, decide, workers=workers, chunk_size=chunk_size, commit_every=commit_every,
+        checkpoint_path=checkpoint, dry_run=dry_run, restart=restart, statuses=statuses,
+        pollution_threshold=pollution_threshold, description_threshold=description_threshold,
+        log=click.echo, publish=publish_updated,
+    )
+    click.echo(json.dumps(state, indent=2))
+    flips = state["flipped_to_verified"] + state["flipped_to_rejected"]
+    click.echo(f"{'Would flip' if dry_run else 'Flipped'} {flips} of {state['processed']} decision(s).")
+
+
+@app.cli.command("embed-reports")
+@click.option("--batch-size", type=int, default=32, show_default=True, help="Items per CLIP encoder call.")
+@click.option("--all", "reembed", is_flag=True, help="Re-encode reports that already have embeddings.")
+@with_appcontext
+def embed_reports_command(batch_size, reembed):
+    """Backfill the CLIP image and description embedding stores for existing reports."""
+    import tempfile
+    from PIL import Image
+    from models import Report
+    from services.ML.embedding_store import description_store, embedding_store
+    from services.ML.ml_service import load_clip
+    from services.ML.reverify import stored_image_path
+
+    backend = load_clip()
+    stored = {"image": 0, "description": 0}
+    images, texts = [], []  # (report_id, PIL image) / (report_id, description)
+
+    def flush(force=False):
+        nonlocal images, texts
+        if images and (force or len(images) >= batch_size):
+            embedding_store.add_many([rid for rid, _ in images], backend.encode_images([img for _, img in images]))
+            stored["image"] += len(images)
+            images = []
+        if texts and (force or len(texts) >= batch_size):
+            description_store.add_many([rid for rid, _ in texts], backend.encode_texts([t for _, t in texts]))
+            stored["description"] += len(texts)
+            texts = []
+
+    with tempfile.TemporaryDirectory(prefix="embed_") as tmpdir:
+        for report in Report.query.order_by(Report.id).yield_per(500):
+            if report.description and (reembed or description_store.get(report.id) is None):
+                texts.append((report.id, report.description))
+            if report.image_filename and (reembed or embedding_store.get(report.id) is None):
+                path = stored_image_path(app, report, tmpdir)
+                try:
+                    if path:
+                        images.append((report.id, Image.open(path).convert("RGB")))
+                except Exception as e:
+                    click.echo(f"⚠️ report {report.id}: {e}")
+                finally:
+                    if path and path.startswith(tmpdir):
+                        os.remove(path)  # downloaded from a remote blob store
+            flush()
+        flush(force=True)
+
+    click.echo(f"✅ Stored {stored['image']} image and {stored['description']} description embedding(s)")
+    for name, store in (("image", embedding_store), ("description", description_store)):
+        if store.build_index():
+            click.echo(f"✅ Trained the {name} IVF index")
+
+
+@app.cli.command("build-embedding-index")
+@click.option("--force", is_flag=True, help="Re-train even if the current centroids are not stale.")
+def build_embedding_index(force):
+    """Train the IVF indexes of the embedding stores (run after bulk imports, or from cron)."""
+    from services.ML.embedding_store import description_store, embedding_store
+
+    for name, store in (("image", embedding_store), ("description", description_store)):
+        if store.build_index(force=force):
+            click.echo(f"✅ Trained the {name} IVF index ({len(store)} report(s))")
+        else:
+            click.echo(f"ℹ️  The {name} index is up to date (or the store is below the IVF size)")
+
+
+@app.cli.command("profile-stats")
+@click.argument("endpoint", required=False)
+@click.option("--last", type=int, default=10, show_default=True, help="Merge this many of the newest profiles.")
+@click.option("--sort", default="cumulative", show_default=True, help="pstats sort key (cumulative, tottime, ...).")
+@click.option("--limit", type=int, default=30, show_default=True, help="Functions to print.")
+def profile_stats(endpoint, last, sort, limit):
+    """Summarise sampled request profiles; without ENDPOINT, list what has been captured."""
+    import pstats
+
+    profile_dir = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(__file__), "data", "profiles"))
+    if not endpoint:
+        for name in sorted(os.listdir(profile_dir)) if os.path.isdir(profile_dir) else []:
+            files = sorted(os.listdir(os.path.join(profile_dir, name)), reverse=True)
+            click.echo(f"{name:<40} {len(files):>4} profile(s), newest {files[0] if files else '-'}")
+        return
+
+    folder = os.path.join(profile_dir, endpoint)
+    files = sorted(f for f in os.listdir(folder) if f.endswith(".pstats"))[-last:] if os.path.isdir(folder) else []
+    if not files:
+        click.echo(f"⚠️  No profiles for {endpoint} in {profile_dir}")
+        return
+    click.echo(f"📊 {len(files)} profile(s): {files[0]} .. {files[-1]}")
+    stats = pstats.Stats(*(os.path.join(folder, f) for f in files))
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+
+
+@app.cli.command("storage-maintenance")
+@click.option("--steps", default="orphans,retention,archive", show_default=True,
+              help="Comma-separated subset of: orphans, retention, archive (run in that order).")
+@click.option("--archive-after-days", type=int, default=None, help="Archive rejected images older than this (default: STORAGE_ARCHIVE_AFTER_DAYS).")
+@click.option("--retention-days", type=int, default=None, help="Delete rejected images older than this; 0 keeps them (default: STORAGE_REJECTED_RETENTION_DAYS).")
+@click.option("--orphan-grace-hours", type=float, default=None, help="Leave unreferenced files younger than this alone.")
+@click.option("--dry-run", is_flag=True, help="Report what would be deleted/archived without changing anything.")
+@click.option("--force", is_flag=True, help="Delete orphans even when most files look orphaned.")
+@with_appcontext
+def storage_maintenance(steps, archive_after_days, retention_days, orphan_grace_hours, dry_run, force):
+    """Delete orphaned uploads, archive old rejected images and enforce the retention policy."""
+    from services import storage_maintenance as storage
+
+    wanted = [s.strip() for s in steps.split(",") if s.strip()]
+    unknown = set(wanted) - {"orphans", "archive", "retention"}
+    if unknown:
+        raise click.BadParameter(f"unknown step(s): {', '.join(sorted(unknown))}", param_hint="--steps")
+
+    def mib(n):
+        return f"{n / 1048576:.1f} MiB"
+
+    prefix = "🔍 [dry run] " if dry_run else "✅ "
+    try:
+        with storage.MaintenanceLock(app):
+            if "orphans" in wanted:
+                grace = storage.ORPHAN_GRACE_HOURS if orphan_grace_hours is None else orphan_grace_hours
+                s = storage.delete_orphans(app, grace_hours=grace, dry_run=dry_run, force=force)
+                click.echo(f"{prefix}Orphans: {s['files']} file(s), {mib(s['bytes'])}")
+            if "retention" in wanted:  # before archiving, so nothing is archived only to expire
+                days = storage.REJECTED_RETENTION_DAYS if retention_days is None else retention_days
+                s = storage.enforce_retention(app, retention_days=days, dry_run=dry_run, publish=publish_updated)
+                click.echo(f"{prefix}Expired: {s['files']} rejected image(s) ({s['archives']} archive(s)), {mib(s['bytes'])}")
+            if "archive" in wanted:
+                days = storage.ARCHIVE_AFTER_DAYS if archive_after_days is None else archive_after_days
+                s = storage.archive_rejected(app, after_days=days, dry_run=dry_run)
+                click.echo(f"{prefix}Archived: {s['files']} rejected image(s), {mib(s['bytes'])}"
+                           + ("" if dry_run else f" -> {mib(s['archived_bytes'])} compressed"))
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+
+@app.cli.command("import-blobs")
+@click.option("--batch-size", type=int, default=500, show_default=True, help="Reports per commit.")
+@click.option("--dry-run", is_flag=True, help="Count what would be imported without writing anything.")
+@with_appcontext
+def import_blobs(batch_size, dry_run):
+    """Copy legacy uploads (verified/, rejected/, archives, proofs) into the blob store and repoint the reports."""
+    from sqlalchemy import select
+    from models import Report
+    from services.blob_store import READ_CHUNK, blob_ref, blob_store, parse_ref
+    from services.storage_maintenance import read_archived
+
+    store = blob_store()
+    folders = (app.config["VERIFIED_FOLDER"], app.config["REJECTED_FOLDER"])
+
+    def chunks(path):
+        with open(path, "rb") as f:
+            while chunk := f.read(READ_CHUNK):
+                yield chunk
+
+    def import_file(name, search=folders):
+        """Blob reference for a legacy filename, or None if its bytes are gone."""
+        for folder in search:
+            path = os.path.join(folder, name)
+            if os.path.isfile(path):
+                return blob_ref(store.put_stream(chunks(path))) if not dry_run else name
+        data = read_archived(app, name)
+        if data is None:
+            return None
+        return blob_ref(store.put(data)) if not dry_run else name
+
+    # legacy: an image_filename that is not a blob reference, or proofs under verified/govt_actions/
+    page = select(Report).order_by(Report.id).limit(batch_size)
+    stats = {"images": 0, "proofs": 0, "missing": 0}
+    after_id = 0
+    while reports := db.session.execute(page.where(Report.id > after_id)).scalars().all():
+        after_id = reports[-1].id
+        changed = []
+        for report in reports:
+            if report.image_filename and not parse_ref(report.image_filename):
+                ref = import_file(report.image_filename)
+                if ref is None:
+                    stats["missing"] += 1
+                else:
+                    stats["images"] += 1
+                    if not dry_run:
+                        report.image_filename = ref
+                        changed.append(report.id)
+            proofs = (report.details or {}).get("govt_proofs") or []
+            if any(not parse_ref(p) for p in proofs):
+                converted = []
+                for proof in proofs:
+                    ref = proof if parse_ref(proof) else import_file(proof, folders[:1])
+                    if ref is None:
+                        stats["missing"] += 1
+                        ref = proof  # keep the legacy name: still listed, served if it reappears
+                    elif not parse_ref(proof):
+                        stats["proofs"] += 1
+                    converted.append(ref)
+                if not dry_run:
+                    report.details = {**report.details, "govt_proofs": converted}  # new dict: JSON columns track assignment only
+                    changed.append(report.id)
+        if changed:
+            publish_updated(sorted(set(changed)))  # image URLs changed: open live views get the new ones
+            db.session.commit()
+        db.session.expunge_all()
+
+    prefix = "🔍 [dry run] " if dry_run else "✅ "
+    click.echo(f"{prefix}Imported {stats['images']} image(s) and {stats['proofs']} proof(s); {stats['missing']} file(s) missing")
+    if not dry_run and stats["images"] + stats["proofs"]:
+        click.echo("   The legacy copies are now unreferenced: `flask storage-maintenance --steps orphans` removes them.")
+
+
+@app.cli.command("rebuild-rollups")
+@click.option("--since", type=click.DateTime(formats=["%Y-%m-%d"]), default=None,
+              help="Only recompute days from this date (YYYY-MM-DD) on; default: everything.")
+@with_appcontext
+def rebuild_rollups(since):
+    """Backfill (or repair) the per-day, per-geohash report rollups behind /api/reports/stats."""
+    from services.rollups import ROLLUP_GEOHASH_PRECISION, rebuild
+
+    counted, rows = rebuild(since.date() if since else None)
+    click.echo(f"✅ Rolled up {counted} report(s) into {rows} day/cell/status row(s) (geohash precision {ROLLUP_GEOHASH_PRECISION})")
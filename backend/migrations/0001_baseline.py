@@ -0,0 +1,39 @@
+# Baseline schema as originally created by db.create_all()
+from sqlalchemy import JSON, Column, DateTime, Float, ForeignKey, Integer, MetaData, String, Table, Text
+
+from migrations import create_index_if_missing, create_table_if_missing
+
+meta = MetaData()
+
+user = Table(
+    "user", meta,
+    Column("id", String, primary_key=True),
+    Column("username", String(80), unique=True, nullable=False),
+)
+
+report = Table(
+    "report", meta,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", String, ForeignKey("user.id"), nullable=True),
+    Column("user_name", String(80)),
+    Column("description", Text, nullable=False),
+    Column("image_filename", String(256)),
+    Column("image_hash", String(64)),
+    Column("lat", Float, nullable=False),
+    Column("lng", Float, nullable=False),
+    Column("aqi", Float),
+    Column("points", Integer),
+    Column("status", String(20)),
+    Column("pollution_confidence", Float),
+    Column("description_match_confidence", Float),
+    Column("details", JSON),
+    Column("awarded_credits", Integer),
+    Column("created_at", DateTime),
+    Column("last_checked_at", DateTime),
+)
+
+
+def upgrade(conn):
+    create_table_if_missing(conn, user)
+    create_table_if_missing(conn, report)
+    create_index_if_missing(conn, "ix_report_image_hash", "report", ["image_hash"])
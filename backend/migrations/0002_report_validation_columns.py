@@ -0,0 +1,7 @@
+# Validator / government fields (previously hand-applied by migrate.py)
+from migrations import add_column_if_missing
+
+
+def upgrade(conn):
+    add_column_if_missing(conn, "report", "precautions", "TEXT")
+    add_column_if_missing(conn, "report", "govt_action", "TEXT")
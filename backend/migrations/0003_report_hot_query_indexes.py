@@ -0,0 +1,9 @@
+# Indexes for the list endpoints:
+#   get_reports / get_approved_reports -> WHERE status IN (...) / status = 'finalized'
+#   leaderboard -> WHERE status IN (...), reads user_name + awarded_credits (covering)
+from migrations import create_index_if_missing
+
+
+def upgrade(conn):
+    create_index_if_missing(conn, "ix_report_status_created_at", "report", ["status", "created_at"])
+    create_index_if_missing(conn, "ix_report_leaderboard", "report", ["status", "user_name", "awarded_credits"])
@@ -0,0 +1,10 @@
+# Last-modified timestamp, so in-memory indexes (search) can pick up changed rows incrementally
+from sqlalchemy import DateTime
+
+from migrations import add_column_if_missing, create_index_if_missing
+
+
+def upgrade(conn):
+    add_column_if_missing(conn, "report", "updated_at", DateTime().compile(dialect=conn.dialect))
+    conn.exec_driver_sql("UPDATE report SET updated_at = COALESCE(last_checked_at, created_at) WHERE updated_at IS NULL")
+    create_index_if_missing(conn, "ix_report_updated_at", "report", ["updated_at"])
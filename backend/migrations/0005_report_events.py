@@ -0,0 +1,20 @@
+# Report change log tailed by the live-update stream (services/change_log.py)
+from sqlalchemy import JSON, Column, DateTime, Integer, MetaData, String, Table
+
+from migrations import create_index_if_missing, create_table_if_missing
+
+meta = MetaData()
+
+report_event = Table(
+    "report_event", meta,
+    Column("id", Integer, primary_key=True),
+    Column("report_id", Integer, nullable=False),
+    Column("kind", String(20), nullable=False),
+    Column("payload", JSON, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+)
+
+
+def upgrade(conn):
+    create_table_if_missing(conn, report_event)
+    create_index_if_missing(conn, "ix_report_event_report_id", "report_event", ["report_id"])
@@ -0,0 +1,21 @@
+# Per-day, per-geohash-cell report aggregates behind /api/reports/stats (services/rollups.py)
+from sqlalchemy import Column, Date, Float, Integer, MetaData, String, Table
+
+from migrations import create_table_if_missing
+
+meta = MetaData()
+
+report_rollup = Table(
+    "report_rollup", meta,
+    Column("day", Date, primary_key=True),
+    Column("cell", String(12), primary_key=True),
+    Column("status", String(20), primary_key=True),
+    Column("report_count", Integer, nullable=False, default=0),
+    Column("confidence_sum", Float, nullable=False, default=0.0),
+    Column("confidence_count", Integer, nullable=False, default=0),
+)
+
+
+def upgrade(conn):
+    # filled by `flask rebuild-rollups`; kept current by every report write afterwards
+    create_table_if_missing(conn, report_rollup)
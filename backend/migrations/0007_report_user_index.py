@@ -0,0 +1,7 @@
+# Index for the abuse detector's per-user seed query (services/abuse_detector.py):
+#   WHERE user_name = ? ORDER BY id DESC LIMIT n
+from migrations import create_index_if_missing
+
+
+def upgrade(conn):
+    create_index_if_missing(conn, "ix_report_user_name_id", "report", ["user_name", "id"])
@@ -0,0 +1,45 @@
+# AQI threshold alert subscriptions and their outbox (services/AQI/alerts.py)
+from sqlalchemy import Boolean, Column, DateTime, Float, Integer, MetaData, String, Table
+
+from migrations import create_index_if_missing, create_table_if_missing
+
+meta = MetaData()
+
+alert_subscription = Table(
+    "alert_subscription", meta,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", String(120), nullable=False),
+    Column("lat", Float, nullable=False),
+    Column("lng", Float, nullable=False),
+    Column("cell", String(12), nullable=False),
+    Column("category", String(40), nullable=False),
+    Column("active", Boolean, nullable=False, default=True),
+    Column("alerting", Boolean, nullable=False, default=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+    Column("last_alert_at", DateTime),
+)
+
+alert_outbox = Table(
+    "alert_outbox", meta,
+    Column("id", Integer, primary_key=True),
+    Column("subscription_id", Integer, nullable=False),
+    Column("user_id", String(120), nullable=False),
+    Column("kind", String(10), nullable=False),
+    Column("category", String(40), nullable=False),
+    Column("aqi", Float, nullable=False),
+    Column("observed_category", String(40), nullable=False),
+    Column("cell", String(12), nullable=False),
+    Column("station_uid", Integer),
+    Column("reading_ts", String(40)),
+    Column("created_at", DateTime, nullable=False),
+    Column("delivered_at", DateTime),
+)
+
+
+def upgrade(conn):
+    create_table_if_missing(conn, alert_subscription)
+    create_index_if_missing(conn, "ix_alert_subscription_user_id", "alert_subscription", ["user_id"])
+    create_index_if_missing(conn, "ix_alert_subscription_updated_at", "alert_subscription", ["updated_at"])
+    create_table_if_missing(conn, alert_outbox)
+    create_index_if_missing(conn, "ix_alert_outbox_user_id_id", "alert_outbox", ["user_id", "id"])
@@ -0,0 +1,7 @@
+# Index for the abuse detector's rate query (services/abuse_detector.py):
+#   WHERE user_name = ? AND created_at >= ?  -- count(DISTINCT created_at), min(created_at)
+from migrations import create_index_if_missing
+
+
+def upgrade(conn):
+    create_index_if_missing(conn, "ix_report_user_name_created_at", "report", ["user_name", "created_at"])
@@ -0,0 +1,24 @@
+# One report per image: makes duplicate detection hold under concurrent uploads,
+# including a retry while the first insert is still queued for group commit.
+from sqlalchemy import inspect
+
+_INDEX = "ix_report_image_hash"
+
+
+def upgrade(conn):
+    duplicates = conn.exec_driver_sql(
+        "SELECT COUNT(*) FROM (SELECT image_hash FROM report WHERE image_hash IS NOT NULL "
+        "GROUP BY image_hash HAVING COUNT(*) > 1) AS d"
+    ).scalar()
+    if duplicates:
+        raise RuntimeError(
+            f"{duplicates} image hash(es) are shared by several reports; "
+            "keep one report per hash (or clear image_hash on the others) and re-run the migration"
+        )
+
+    existing = {ix["name"]: ix for ix in inspect(conn).get_indexes("report")}
+    if _INDEX in existing and existing[_INDEX].get("unique"):
+        return
+    if _INDEX in existing:
+        conn.exec_driver_sql(f"DROP INDEX {_INDEX}" if conn.dialect.name != "mysql" else f"DROP INDEX {_INDEX} ON report")
+    conn.exec_driver_sql(f"CREATE UNIQUE INDEX {_INDEX} ON report (image_hash)")
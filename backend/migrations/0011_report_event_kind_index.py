@@ -0,0 +1,7 @@
+# Index for the list versions (services/collection_version.py):
+#   SELECT max(id) FROM report_event WHERE kind = 'updated'
+from migrations import create_index_if_missing
+
+
+def upgrade(conn):
+    create_index_if_missing(conn, "ix_report_event_kind_id", "report_event", ["kind", "id"])
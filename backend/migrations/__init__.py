@@ -0,0 +1,130 @@
+# backend/migrations/__init__.py
+"""
+Versioned schema migrations.
+
+Each module in this package named `NNNN_description.py` defines `upgrade(conn)`,
+which receives a SQLAlchemy Connection inside a transaction. Applied versions are
+recorded in the `schema_version` table; `upgrade()` runs whatever is pending, in order.
+"""
+import contextlib
+import importlib
+import os
+import re
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, text
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+_MODULE_RE = re.compile(r"^(\d{4})_(\w+)\.py$")
+_LOCK_KEY = 7262021  # arbitrary advisory-lock id shared by every app node
+
+_meta = MetaData()
+schema_version = Table(
+    "schema_version", _meta,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(128), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def discover():
+    """[(version, name, module), ...] sorted by version."""
+    found = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = _MODULE_RE.match(filename)
+        if match:
+            module = importlib.import_module(f"{__name__}.{filename[:-3]}")
+            found.append((int(match.group(1)), match.group(2), module))
+    return found
+
+
+def applied_versions(conn):
+    if not inspect(conn).has_table("schema_version"):
+        return set()
+    return {row[0] for row in conn.execute(schema_version.select().with_only_columns(schema_version.c.version))}
+
+
+def head():
+    migrations = discover()
+    return migrations[-1][0] if migrations else 0
+
+
+@contextlib.contextmanager
+def _migration_lock(engine):
+    """Serialize concurrent boots (several gunicorn workers or app nodes)."""
+    backend = engine.url.get_backend_name()
+
+    if backend == "sqlite":
+        database = engine.url.database
+        if not database or database == ":memory:":
+            yield
+            return
+        try:
+            import fcntl
+        except ImportError:  # Windows dev box: single process anyway
+            yield
+            return
+        with open(f"{database}.migrate.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return
+
+    with engine.connect() as conn:
+        if backend == "postgresql":
+            conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": _LOCK_KEY})
+            release = text("SELECT pg_advisory_unlock(:k)")
+        elif backend == "mysql":
+            conn.execute(text("SELECT GET_LOCK(:k, 600)"), {"k": str(_LOCK_KEY)})
+            release = text("SELECT RELEASE_LOCK(:k)")
+        else:
+            release = None
+        try:
+            yield
+        finally:
+            if release is not None:
+                conn.execute(release, {"k": _LOCK_KEY if backend == "postgresql" else str(_LOCK_KEY)})
+
+
+def upgrade(engine, target=None, log=None):
+    """Apply pending migrations up to `target` (default: latest). Returns applied versions."""
+    applied = []
+    with _migration_lock(engine):
+        with engine.begin() as conn:
+            schema_version.create(conn, checkfirst=True)
+            done = applied_versions(conn)
+
+        for version, name, module in discover():
+            if version in done or (target is not None and version > target):
+                continue
+            with engine.begin() as conn:
+                module.upgrade(conn)
+                conn.execute(schema_version.insert().values(
+                    version=version, name=name, applied_at=datetime.utcnow()
+                ))
+            applied.append(version)
+            if log:
+                log(f"Applied migration {version:04d}_{name}")
+    return applied
+
+
+# --- Helpers for idempotent DDL (legacy databases were built with create_all) ---
+def has_column(conn, table, column):
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+def add_column_if_missing(conn, table, column, ddl_type):
+    if not has_column(conn, table, column):
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}")
+
+
+def create_index_if_missing(conn, name, table, columns):
+    existing = {ix["name"] for ix in inspect(conn).get_indexes(table)}
+    if name not in existing:
+        conn.exec_driver_sql(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})")
+
+
+def create_table_if_missing(conn, table):
+    table.create(conn, checkfirst=True)
@@ -16,6 +16,14 @@ class User(db.Model):
 
 
 class Report(db.Model):
+    # ✅ Hot-query indexes (kept in sync with migrations/0003_report_hot_query_indexes.py)
+    __table_args__ = (
+        db.Index("ix_report_status_created_at", "status", "created_at"),
+        db.Index("ix_report_leaderboard", "status", "user_name", "awarded_credits"),
+        db.Index("ix_report_user_name_id", "user_name", "id"),  # 0007: abuse detector, latest uploads
+        db.Index("ix_report_user_name_created_at", "user_name", "created_at"),  # 0009: abuse detector, rate window
+    )
+
     id = db.Column(db.Integer, primary_key=True)
 
     # ✅ Link to user
@@ -25,7 +33,7 @@ class Report(db.Model):
     # ✅ Report details
     description = db.Column(db.Text, nullable=False)
     image_filename = db.Column(db.String(256))
-    image_hash = db.Column(db.String(64), index=True)  # for duplicate detection
+    image_hash = db.Column(db.String(64), index=True, unique=True)  # for duplicate detection (0010)
 
     # ✅ Location fields
     lat = db.Column(db.Float, nullable=False)
@@ -49,3 +57,64 @@ class Report(db.Model):
     # ✅ Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_checked_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # 0004
+
+
+class ReportEvent(db.Model):
+    # ✅ Change log behind /api/reports/events (migrations/0005_report_events.py)
+    __tablename__ = "report_event"
+    __table_args__ = (db.Index("ix_report_event_kind_id", "kind", "id"),)  # 0011: list versions
+
+    id = db.Column(db.Integer, primary_key=True)
+    report_id = db.Column(db.Integer, nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False)  # created | updated
+    payload = db.Column(db.JSON, nullable=False)  # serialize_report() at the time of the change
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class ReportRollup(db.Model):
+    # ✅ Aggregates behind /api/reports/stats, maintained by services/rollups.py (migrations/0006_report_rollups.py)
+    __tablename__ = "report_rollup"
+
+    day = db.Column(db.Date, primary_key=True)  # UTC day of created_at
+    cell = db.Column(db.String(12), primary_key=True)  # geohash at ROLLUP_GEOHASH_PRECISION
+    status = db.Column(db.String(20), primary_key=True)
+    report_count = db.Column(db.Integer, nullable=False, default=0)
+    confidence_sum = db.Column(db.Float, nullable=False, default=0.0)  # of non-null pollution_confidence
+    confidence_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class AlertSubscription(db.Model):
+    # ✅ AQI threshold alerts, evaluated per geohash cell by services/AQI/alerts.py (migrations/0008_aqi_alerts.py)
+    __tablename__ = "alert_subscription"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(120), nullable=False, index=True)  # JWT identity (email)
+    lat = db.Column(db.Float, nullable=False)
+    lng = db.Column(db.Float, nullable=False)
+    cell = db.Column(db.String(12), nullable=False)  # geohash at ALERT_GEOHASH_PRECISION
+    category = db.Column(db.String(40), nullable=False)  # alert once the reading reaches this category
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    alerting = db.Column(db.Boolean, nullable=False, default=False)  # an alert is out and not yet cleared
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)  # user edits only
+    last_alert_at = db.Column(db.DateTime)
+
+
+class AlertOutbox(db.Model):
+    # ✅ Alerts waiting to be picked up by the citizen app (migrations/0008_aqi_alerts.py)
+    __tablename__ = "alert_outbox"
+    __table_args__ = (db.Index("ix_alert_outbox_user_id_id", "user_id", "id"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    subscription_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.String(120), nullable=False)
+    kind = db.Column(db.String(10), nullable=False)  # alert | clear
+    category = db.Column(db.String(40), nullable=False)  # the subscribed threshold
+    aqi = db.Column(db.Float, nullable=False)
+    observed_category = db.Column(db.String(40), nullable=False)
+    cell = db.Column(db.String(12), nullable=False)
+    station_uid = db.Column(db.Integer)
+    reading_ts = db.Column(db.String(40))  # WAQI time.s of the reading
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    delivered_at = db.Column(db.DateTime)
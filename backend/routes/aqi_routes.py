@@ -1,7 +1,20 @@
 import io
+import os
+import tempfile
+import time
 import requests
+from datetime import datetime
 from flask import Blueprint, request, jsonify, send_file
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import select, update
+from extensions import db
+from models import AlertOutbox, AlertSubscription
 from services.AQI.main import AQIClinicalService
+from services.AQI.alerts import (AlertBook, AlertError, AlertEvaluator, serialize_outbox,
+                                 serialize_subscription, subscribe, unsubscribe)
+from services.AQI.stations import StationRegistry, ReadingCache
+from services.AQI.prefetch import DemandTracker, PrefetchScheduler
+from services.metrics import pdf_build_seconds, record_cache, waqi_request_seconds
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
@@ -9,7 +22,118 @@ from reportlab.lib.styles import getSampleStyleSheet
 aqi_bp = Blueprint("aqi", __name__)
 clinical_service = AQIClinicalService()
 
-WAQI_TOKEN = "e41160d5fba33f215eeb1ae22e570054c56921d3"  # replace with your token
+WAQI_TOKEN = os.getenv("WAQI_TOKEN", "e41160d5fba33f215eeb1ae22e570054c56921d3")  # replace with your token
+WAQI_API_URL = os.getenv("WAQI_API_URL", "https://api.waqi.info").rstrip("/")  # e.g. the load-test stub
+
+# --- Station index + reading cache ---
+AQI_CACHE_TTL_SECONDS = int(os.getenv("AQI_CACHE_TTL_SECONDS", 900))
+STATION_SNAP_RADIUS_KM = float(os.getenv("AQI_STATION_SNAP_KM", 5.0))
+NEARBY_STATION_COUNT = int(os.getenv("AQI_NEARBY_COUNT", 5))
+NEARBY_RADIUS_KM = float(os.getenv("AQI_NEARBY_RADIUS_KM", 50.0))
+
+# optional directory shared by all workers and the `prefetch-aqi` command
+AQI_CACHE_DIR = os.getenv("AQI_CACHE_DIR")
+
+station_registry = StationRegistry()
+reading_cache = ReadingCache(AQI_CACHE_TTL_SECONDS, shared_dir=AQI_CACHE_DIR)
+
+
+class WAQIError(Exception):
+    def __init__(self, details):
+        super().__init__("Failed to fetch AQI")
+        self.details = details
+
+
+def fetch_reading(lat, lon):
+    """Fetch the WAQI feed for a coordinate, register its station and cache the reading."""
+    url = f"{WAQI_API_URL}/feed/geo:{lat};{lon}/?token={WAQI_TOKEN}"
+    start = time.perf_counter()
+    try:
+        response = requests.get(url, timeout=10)
+        data = response.json()
+    except requests.exceptions.Timeout:
+        waqi_request_seconds.labels(outcome="timeout").observe(time.perf_counter() - start)
+        raise
+    except Exception:
+        waqi_request_seconds.labels(outcome="error").observe(time.perf_counter() - start)
+        raise
+    waqi_request_seconds.labels(outcome="ok" if data.get("status") == "ok" else "error").observe(
+        time.perf_counter() - start
+    )
+
+    if data.get("status") != "ok":
+        raise WAQIError(data)
+
+    # Standard payload (flattened WAQI response)
+    payload = {
+        "city": data["data"]["city"]["name"],
+        "aqius": data["data"]["aqi"],
+        "mainus": data["data"].get("dominentpol", "unknown"),
+        "ts": data["data"]["time"]["s"],
+        "iaqi": data["data"].get("iaqi", {})  # 🔹 include pollutant details
+    }
+    cached = {
+        "station_uid": station_registry.observe(data["data"]),
+        "payload": payload,
+        "clinical": clinical_service.aggregate_advice(payload),
+    }
+    if cached["station_uid"] is not None:
+        reading_cache.put(cached["station_uid"], cached)
+    return cached
+
+
+def reading_age(lat, lon):
+    """Age in seconds of the cached reading that would serve this coordinate (None if none)."""
+    station = station_registry.snap(lat, lon, STATION_SNAP_RADIUS_KM)
+    return reading_cache.age(station["uid"]) if station else None
+
+
+# --- Threshold alerts (evaluated by `prefetch-aqi` / `evaluate-alerts`, never in the web workers) ---
+alert_book = AlertBook(clinical_service)
+alert_evaluator = AlertEvaluator(alert_book, station_registry, reading_cache, STATION_SNAP_RADIUS_KM)
+OUTBOX_PAGE_LIMIT = 500
+
+# --- Prefetch scheduler (hot geohash cells kept warm) ---
+demand_tracker = DemandTracker(
+    precision=int(os.getenv("AQI_PREFETCH_PRECISION", 5)),
+    half_life_seconds=float(os.getenv("AQI_PREFETCH_HALF_LIFE", 3600)),
+    snapshot_dir=AQI_CACHE_DIR,
+)
+prefetch_scheduler = PrefetchScheduler(
+    demand_tracker,
+    refresh=fetch_reading,
+    reading_age=reading_age,
+    ttl_seconds=AQI_CACHE_TTL_SECONDS,
+    top_n=int(os.getenv("AQI_PREFETCH_TOP_N", 50)),
+    lead_seconds=float(os.getenv("AQI_PREFETCH_LEAD_SECONDS", 120)),
+    budget_per_minute=int(os.getenv("AQI_PREFETCH_BUDGET_PER_MIN", 30)),
+    interval_seconds=float(os.getenv("AQI_PREFETCH_INTERVAL", 30)),
+    pinned_cells=alert_book.cell_centres,  # empty until this process runs the evaluator
+    # in-app mode: one worker per host runs the passes (the budget is per host, not per worker)
+    leader_lock=os.path.join(AQI_CACHE_DIR or tempfile.gettempdir(), "aqi_prefetch.lock"),
+)
+
+
+def build_nearby(lat, lon, exclude_uid=None):
+    """Nearest known stations that have a fresh cached reading."""
+    nearby = []
+    for station, km in station_registry.nearest(lat, lon, k=NEARBY_STATION_COUNT + 1, max_km=NEARBY_RADIUS_KM):
+        if station["uid"] == exclude_uid:
+            continue
+        cached = reading_cache.get(station["uid"])
+        if cached is None:
+            continue
+        nearby.append({
+            "uid": station["uid"],
+            "name": station["name"],
+            "lat": station["lat"],
+            "lng": station["lng"],
+            "distance_km": round(km, 2),
+            "aqius": cached["payload"]["aqius"],
+            "ts": cached["payload"]["ts"],
+        })
+    return nearby[:NEARBY_STATION_COUNT]
+
 
 @aqi_bp.route("/", methods=["GET"])
 def get_aqi():
@@ -20,23 +144,22 @@ def get_aqi():
         return jsonify({"error": "lat and lon are required"}), 400
 
     try:
-        url = f"https://api.waqi.info/feed/geo:{lat};{lon}/?token={WAQI_TOKEN}"
-        response = requests.get(url, timeout=10)
-        data = response.json()
+        lat_f, lon_f = float(lat), float(lon)
+    except ValueError:
+        return jsonify({"error": "lat and lon must be numbers"}), 400
+
+    try:
+        # 🔹 Snap to the nearest known station so neighbouring coordinates share a cache entry
+        station = station_registry.snap(lat_f, lon_f, STATION_SNAP_RADIUS_KM)
+        cached = reading_cache.get(station["uid"]) if station else None
 
-        if data.get("status") != "ok":
-            return jsonify({"error": "Failed to fetch AQI", "details": data}), 502
+        record_cache("aqi_reading", hit=cached is not None)
+        demand_tracker.record(lat_f, lon_f, hit=cached is not None)
 
-        # Standard payload (flattened WAQI response)
-        payload = {
-            "city": data["data"]["city"]["name"],
-            "aqius": data["data"]["aqi"],
-            "mainus": data["data"].get("dominentpol", "unknown"),
-            "ts": data["data"]["time"]["s"],
-            "iaqi": data["data"].get("iaqi", {})  # 🔹 include pollutant details
-        }
+        if cached is None:
+            cached = fetch_reading(lat, lon)
 
-        clinical = clinical_service.aggregate_advice(payload)
+        payload = cached["payload"]
 
         # 🔹 Reformatted response to match frontend
         return jsonify({
@@ -47,16 +170,83 @@ def get_aqi():
                 "ts": payload["ts"]
             },
             "trend": [],
-            "nearby": [],
+            "nearby": build_nearby(lat_f, lon_f, exclude_uid=cached["station_uid"]),
             "sources": [],
-            "clinical": clinical
+            "clinical": cached["clinical"]
         }), 200
 
+    except WAQIError as e:
+        return jsonify({"error": "Failed to fetch AQI", "details": e.details}), 502
     except requests.exceptions.Timeout:
         return jsonify({"error": "WAQI API request timed out"}), 504
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+
+# 📈 Cache hit-rate / prefetch report
+@aqi_bp.route("/prefetch/report", methods=["GET"])
+def prefetch_report():
+    return jsonify(prefetch_scheduler.report()), 200
+
+# 🔔 Threshold alert subscriptions
+@aqi_bp.route("/alerts", methods=["POST"])
+@jwt_required()
+def create_alert():
+    data = request.get_json(silent=True) or {}
+    try:
+        lat, lng = float(data["lat"]), float(data["lng"])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "lat and lng are required numbers"}), 400
+    try:
+        subscription = subscribe(get_jwt_identity(), lat, lng, data.get("category"), clinical_service)
+    except AlertError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(serialize_subscription(subscription)), 201
+
+
+@aqi_bp.route("/alerts", methods=["GET"])
+@jwt_required()
+def list_alerts():
+    subscriptions = db.session.execute(
+        select(AlertSubscription)
+        .where(AlertSubscription.user_id == get_jwt_identity(), AlertSubscription.active.is_(True))
+        .order_by(AlertSubscription.id)
+    ).scalars()
+    return jsonify([serialize_subscription(s) for s in subscriptions]), 200
+
+
+@aqi_bp.route("/alerts/<int:subscription_id>", methods=["DELETE"])
+@jwt_required()
+def delete_alert(subscription_id):
+    if not unsubscribe(get_jwt_identity(), subscription_id):
+        return jsonify({"error": "Subscription not found"}), 404
+    return jsonify({"deleted": subscription_id}), 200
+
+
+@aqi_bp.route("/alerts/outbox", methods=["GET"])
+@jwt_required()
+def alert_outbox():
+    """The user's alerts with id > `after`, oldest first; returned entries are marked delivered."""
+    after = request.args.get("after", 0, type=int)
+    limit = min(max(request.args.get("limit", 100, type=int), 1), OUTBOX_PAGE_LIMIT)
+    entries = db.session.execute(
+        select(AlertOutbox)
+        .where(AlertOutbox.user_id == get_jwt_identity(), AlertOutbox.id > after)
+        .order_by(AlertOutbox.id).limit(limit)
+    ).scalars().all()
+    body = {
+        "entries": [serialize_outbox(e) for e in entries],
+        "next_after": entries[-1].id if entries else after,
+    }
+    undelivered = [e.id for e in entries if e.delivered_at is None]
+    if undelivered:
+        db.session.execute(
+            update(AlertOutbox).where(AlertOutbox.id.in_(undelivered)).values(delivered_at=datetime.utcnow())
+        )
+        db.session.commit()
+    return jsonify(body), 200
+
+
 # 📄 Generate PDF Fact Sheet
 @aqi_bp.route("/pdf", methods=["POST"])
 def get_pdf():
@@ -106,7 +296,8 @@ def get_pdf():
         ))
 
         # Build PDF
-        doc.build(elements)
+        with pdf_build_seconds.time():
+            doc.build(elements)
         buffer.seek(0)
 
         return send_file(
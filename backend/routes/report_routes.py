@@ -1,16 +1,32 @@
 # backend/routes/report_routes.py
 import os
 import json
-import uuid
 import hashlib
+import io
 import tempfile
+import threading
+import time
 from datetime import datetime
-from flask import Blueprint, request, jsonify, current_app, url_for, send_from_directory
+from flask import Blueprint, Response, request, jsonify, current_app, url_for, send_file, send_from_directory, stream_with_context
 from extensions import db
 from models import Report
-from services.ML.ml_service import verify_image
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from werkzeug.utils import secure_filename
+from services.ML.ml_service import encode_texts, verify_image, verify_images
+from services.ML.embedding_store import description_store, embedding_store
+from services.abuse_detector import ABUSE_DETECTION, abuse_detector
+from services.admission import AdmissionController, Overloaded
+from services.blob_store import KEY_RE, BlobNotFound, blob_ref, blob_store, parse_ref
+from services.change_log import change_log
+from services.collection_version import collection_versions
+from services.metrics import abuse_flags, ml_admission_gauges, ml_rejections, record_cache, upload_stage
+from services.media_service import MediaError, store_proofs
+from services.group_commit import CommitPending
+from services.export_service import EXPORT_FORMATS, ExportError, export_stream, parse_batch_size, parse_filters
+from services.rollups import StatsError, parse_stats_args, stats as rollup_stats
+from services.storage_maintenance import read_archived
+from services.search_service import SearchError, parse_search_args, search_reports
+from services.user_service import USERS_FILE, load_users
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from sqlalchemy.exc import IntegrityError
 
 report_bp = Blueprint("report", __name__)
 
@@ -19,7 +35,36 @@ POLLUTION_THRESHOLD_PERCENT = 45.0
 DESCRIPTION_THRESHOLD_FRACTION = 0.60
 
 
-# --- Serve uploaded images (safe) ---
+# --- Serve stored images (content-addressed: immutable, cacheable forever, Range-capable) ---
+@report_bp.route("/blobs/<key>")
+def blob(key):
+    if not KEY_RE.match(key):
+        return jsonify({"error": "Not found"}), 404
+    headers = {"ETag": f'"{key}"', "Cache-Control": "public, max-age=31536000, immutable", "Accept-Ranges": "bytes"}
+    if request.if_none_match.contains(key):
+        return Response(status=304, headers=headers)
+
+    store = blob_store()
+    try:
+        info = store.stat(key)
+    except BlobNotFound:
+        return jsonify({"error": "Not found"}), 404
+
+    status, start, length = 200, 0, info.size
+    byte_range = request.range
+    if byte_range is not None and len(byte_range.ranges) == 1:  # multi-range requests get the whole blob
+        span = byte_range.range_for_length(info.size)
+        if span is None:
+            return Response(status=416, headers={**headers, "Content-Range": f"bytes */{info.size}"})
+        status, (start, stop) = 206, span
+        length = stop - start
+        headers["Content-Range"] = byte_range.to_content_range_header(info.size)
+    headers["Content-Length"] = str(length)
+    return Response(store.read(key, start, length), status=status, headers=headers,
+                    mimetype=info.content_type or "application/octet-stream", direct_passthrough=True)
+
+
+# --- Serve uploaded images (safe; rows written before blob storage) ---
 @report_bp.route("/uploads/<status>/<path:filename>")
 def uploaded_file(status, filename):
     """
@@ -47,6 +92,11 @@ def uploaded_file(status, filename):
 
     # send_from_directory expects a filename relative to folder
     rel_path = os.path.relpath(requested_path, folder)
+    if status == "rejected" and not os.path.exists(requested_path):
+        # old rejected images live in monthly archives (flask storage-maintenance)
+        data = read_archived(current_app, rel_path)
+        if data is not None:
+            return send_file(io.BytesIO(data), download_name=rel_path, max_age=86400)
     return send_from_directory(folder, rel_path)
 
 
@@ -58,16 +108,18 @@ def sha256_bytes(b: bytes) -> str:
 
 
 def get_user_from_json(email: str):
-    users_path = os.path.join(current_app.root_path, "data", "users.json")
-    users_path = os.path.abspath(users_path)
+    if not os.path.exists(USERS_FILE):
+        raise FileNotFoundError(f"users.json not found at {USERS_FILE}")
 
-    if not os.path.exists(users_path):
-        raise FileNotFoundError(f"users.json not found at {users_path}")
+    return next((u for u in load_users() if u["email"] == email), None)
 
-    with open(users_path) as f:
-        users = json.load(f)
 
-    return next((u for u in users if u["email"] == email), None)
+def stored_url(ref, status):
+    """Public URL of a stored image: a blob reference, or a legacy filename under verified/ or rejected/."""
+    key = parse_ref(ref)
+    if key:
+        return url_for("report.blob", key=key, _external=True)
+    return url_for("report.uploaded_file", status=status, filename=ref, _external=True)
 
 
 def serialize_report(r: Report):
@@ -78,13 +130,13 @@ def serialize_report(r: Report):
     precautions = r.precautions or details.get("precautions") or ""
     action_taken = r.govt_action or details.get("govt_action") or details.get("action_taken") or ""
 
-    # govt proof filenames stored inside details["govt_proofs"] (list of filenames relative to VERIFIED_FOLDER)
+    # govt proofs stored inside details["govt_proofs"]: blob references, or (older rows) filenames relative to VERIFIED_FOLDER
     govt_proofs_filenames = details.get("govt_proofs", []) or []
     govt_proofs_urls = []
     for fn in govt_proofs_filenames:
         try:
             # fn may include a subpath like "govt_actions/govt_xxx.jpg"
-            url = url_for("report.uploaded_file", status="approved", filename=fn, _external=True)
+            url = stored_url(fn, "approved")
             govt_proofs_urls.append(url)
         except Exception:
             # ignore building URL errors (still skip bad entries)
@@ -97,7 +149,7 @@ def serialize_report(r: Report):
         "id": r.id,
         "username": r.user_name,
         "description": r.description,
-        "image_url": url_for("report.uploaded_file", status=r.status, filename=r.image_filename, _external=True) if r.image_filename else None,
+        "image_url": stored_url(r.image_filename, r.status) if r.image_filename else None,
         "aqi": r.aqi,
         "points": r.points,
         "status": r.status,
@@ -115,6 +167,56 @@ def serialize_report(r: Report):
     }
 
 
+# --- Persistence (per-request commit, or group commit when enabled in create_app) ---
+# Each write stages its change-log event in its own transaction (record_changes), so the two cannot diverge.
+GROUP_COMMIT_ACK_TIMEOUT = 30  # seconds a request waits for its batch to be durable
+
+
+def insert_report(report: Report) -> Report:
+    committer = current_app.extensions.get("group_commit")
+    if committer is None:
+        db.session.add(report)
+        db.session.flush()
+        record_changes([(report, "created")])
+        db.session.commit()
+        change_log.committed()
+        return report
+
+    payload = serialize_report(report)  # built here: the committer thread has no request to build URLs from
+
+    def follow(session, saved):
+        change_log.stage([(saved.id, "created", {**payload, "id": saved.id})], session)
+
+    saved = committer.wait(committer.insert(report, follow=follow), GROUP_COMMIT_ACK_TIMEOUT)
+    change_log.committed()
+    return saved
+
+
+def update_report(report: Report, changes: dict) -> Report:
+    committer = current_app.extensions.get("group_commit")
+    if committer is None:
+        for key, value in changes.items():
+            setattr(report, key, value)
+        db.session.flush()
+        record_changes([(report, "updated")])
+        db.session.commit()
+        change_log.committed()
+        return report
+
+    # detach so the request session never flushes its own copy of these changes
+    db.session.expunge(report)
+    for key, value in changes.items():
+        setattr(report, key, value)
+    payload = serialize_report(report)
+
+    def follow(session, pk):
+        change_log.stage([(pk, "updated", payload)], session)
+
+    committer.wait(committer.update(Report, report.id, changes, follow=follow), GROUP_COMMIT_ACK_TIMEOUT)
+    change_log.committed()
+    return report
+
+
 def _normalize_pollution_conf(val) -> float:
     if val is None:
         return 0.0
@@ -139,28 +241,222 @@ def _normalize_description_conf(val) -> float:
     return v
 
 
-# --- Upload Report (unchanged logic) ---
+# --- Admission control for the ML stage (per process; multiply by worker count for the host) ---
+ML_MAX_CONCURRENT = int(os.getenv("ML_MAX_CONCURRENT", 2))
+ML_MAX_QUEUE = int(os.getenv("ML_MAX_QUEUE", 8))
+ML_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ML_QUEUE_TIMEOUT_SECONDS", 10))
+ML_USER_RATE_PER_MINUTE = float(os.getenv("ML_USER_RATE_PER_MINUTE", 6))
+ML_USER_BURST = int(os.getenv("ML_USER_BURST", 3))
+# bulk items are scored in chunks, each admitted on its own: one slot per chunk, one token per image
+ML_BULK_CHUNK = max(1, min(int(os.getenv("ML_BULK_CHUNK", 4)), ML_USER_BURST if ML_USER_RATE_PER_MINUTE > 0 else 1 << 30))
+
+ml_admission = AdmissionController(
+    max_concurrent=ML_MAX_CONCURRENT,
+    max_queue=ML_MAX_QUEUE,
+    queue_timeout=ML_QUEUE_TIMEOUT_SECONDS,
+    user_rate=ML_USER_RATE_PER_MINUTE / 60.0,
+    user_burst=ML_USER_BURST,
+    gauges=ml_admission_gauges,
+)
+
+
+def screen_uploads(user, points):
+    """
+    Abuse verdicts for one upload event (services/abuse_detector.py), one per
+    (lat, lng), None to go on to ML. Nothing is recorded until record_uploads().
+    """
+    if not ABUSE_DETECTION:
+        return [None] * len(points)
+    change_log.start()  # the detector hears other workers' uploads from the tail
+    verdicts = abuse_detector.check_batch(user["name"], points)
+    for verdict in verdicts:
+        if verdict:
+            abuse_flags.labels(rule=verdict["rule"]).inc()
+    return verdicts
+
+
+def screen_upload(user, lat, lng):
+    """Abuse verdict for a single upload, or None to go on to ML."""
+    return screen_uploads(user, [(lat, lng)])[0]
+
+
+def record_uploads(user, reports):
+    """Count stored reports towards the abuse limits on this worker (the others hear it from the change log)."""
+    if ABUSE_DETECTION:
+        abuse_detector.record(user["name"], [(r.id, r.created_at, r.lat, r.lng, r.details) for r in reports])
+
+
+if ABUSE_DETECTION:
+    change_log.listen(abuse_detector.observe)
+
+
+def flagged_decision(verdict):
+    """Stand-in for decide() when ML is skipped: rejected, no credits, the reason in details."""
+    return {"poll_conf_pct": None, "desc_conf_frac": None, "verified": False, "awarded": 0,
+            "details": {"abuse": verdict}}
+
+
+def commit_pending_response(e: CommitPending):
+    """
+    503, not 500: the write is queued and may still land. A retry of the same image
+    cannot create a second report: image_hash is unique (migration 0010), so if the
+    first insert lands the retry's insert fails and is answered as a duplicate.
+    """
+    return jsonify({"error": "Your upload was received but is not confirmed yet; it may still be saved, so check your reports before retrying",
+                    "retry_after": e.retry_after}), 503, {"Retry-After": str(e.retry_after)}
+
+
+def overloaded_response(e: Overloaded):
+    ml_rejections.labels(reason=e.reason).inc()
+    message = "Too many uploads, please slow down" if e.status == 429 else "Verification is busy, please retry"
+    return jsonify({"error": message, "reason": e.reason, "retry_after": e.retry_after}), e.status, {
+        "Retry-After": str(e.retry_after)
+    }
+
+
+# --- Upload helpers (shared by single and bulk upload) ---
+BULK_UPLOAD_MAX_IMAGES = int(os.getenv("BULK_UPLOAD_MAX_IMAGES", 50))
+
+
+def resolve_upload_user(identity):
+    """JWT identity is the email; very old tokens carried the display name instead."""
+    user = get_user_from_json(identity)
+
+    if not user:
+        user = next((u for u in load_users() if u["name"] == identity), None)
+    return user
+
+
+def run_ml_on_bytes(b: bytes, description_str: str):
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
+    try:
+        with upload_stage("temp_write"):
+            tmp.write(b)
+            tmp.flush()
+            tmp.close()
+        return verify_image(tmp.name, description_str)
+    finally:
+        try:
+            os.remove(tmp.name)
+        except Exception:
+            pass
+
+
+def run_ml_on_batch(items):
+    """items: [(bytes, description), ...] -> ML results in the same order (batched CLIP)."""
+    tmp_paths = []
+    try:
+        for b, _ in items:
+            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
+            tmp.write(b)
+            tmp.close()
+            tmp_paths.append(tmp.name)
+        return verify_images(tmp_paths, [d for _, d in items])
+    finally:
+        for path in tmp_paths:
+            try:
+                os.remove(path)
+            except Exception:
+                pass
+
+
+def decide(ml_result, pollution_threshold=None, description_threshold=None):
+    """Apply route-level thresholds (module defaults unless overridden) to an ML result."""
+    pollution_threshold = POLLUTION_THRESHOLD_PERCENT if pollution_threshold is None else pollution_threshold
+    description_threshold = DESCRIPTION_THRESHOLD_FRACTION if description_threshold is None else description_threshold
+    poll_conf_pct = _normalize_pollution_conf(ml_result.get("pollution_confidence"))
+    desc_conf_frac = _normalize_description_conf(ml_result.get("description_match_confidence"))
+
+    verified = (poll_conf_pct >= pollution_threshold) and (desc_conf_frac >= description_threshold)
+    awarded = ml_result.get("awarded_credits", 0) if verified else 0
+
+    details = ml_result.get("details", {}) or {}
+    details["_decision"] = {
+        "pollution_conf_pct": poll_conf_pct,
+        "desc_conf_frac": desc_conf_frac,
+        "pollution_threshold": pollution_threshold,
+        "description_threshold": description_threshold,
+        "verified": verified
+    }
+    return {
+        "poll_conf_pct": poll_conf_pct,
+        "desc_conf_frac": desc_conf_frac,
+        "verified": verified,
+        "awarded": awarded,
+        "details": details,
+    }
+
+
+def find_near_duplicates(ml_result, exclude=()):
+    """Earlier reports whose stored CLIP embedding is within NEAR_DUPLICATE_SIMILARITY of this image."""
+    embedding = ml_result.get("image_embedding")
+    if embedding is None:
+        return []
+    return [
+        {"report_id": report_id, "similarity": round(similarity, 4)}
+        for report_id, similarity in embedding_store.near_duplicates(embedding, exclude=exclude)
+    ]
+
+
+def store_embeddings(results):
+    """results: [(report_id, ml_result), ...]; a failed write only costs similarity/search quality, never the upload."""
+    for store, key in ((embedding_store, "image_embedding"), (description_store, "description_embedding")):
+        pairs = [(rid, r[key]) for rid, r in results if r.get(key) is not None]
+        if not pairs:
+            continue
+        try:
+            store.add_many([rid for rid, _ in pairs], [e for _, e in pairs])
+        except Exception as e:
+            current_app.logger.warning(f"Could not store {key}s: {e}")
+
+
+def record_changes(changes, session=None):
+    """changes: [(report, "created" | "updated"), ...] of flushed rows; stages their events in the caller's transaction."""
+    return change_log.stage([(report.id, kind, serialize_report(report)) for report, kind in changes], session)
+
+
+def save_upload(file_bytes: bytes) -> str:
+    """Store the image in the blob store and return its reference (status is metadata: the bytes never move)."""
+    return blob_ref(blob_store().put(file_bytes))
+
+
+def build_report(user, description, lat, lng, img_hash, image_ref, ml_result, decision, now):
+    return Report(
+        user_name=user["name"],
+        description=description,
+        image_filename=image_ref,
+        image_hash=img_hash,
+        aqi=ml_result.get("aqi"),
+        points=ml_result.get("points", 0),
+        status="verified" if decision["verified"] else "rejected",
+        pollution_confidence=decision["poll_conf_pct"],
+        description_match_confidence=decision["desc_conf_frac"],
+        details=decision["details"],
+        awarded_credits=decision["awarded"],
+        created_at=now,
+        last_checked_at=now,
+        lat=lat,
+        lng=lng,
+    )
+
+
+# --- Upload Report ---
 @report_bp.route("/upload", methods=["POST"])
 @jwt_required()
 def upload_report():
     try:
         identity = get_jwt_identity()
-        user = get_user_from_json(identity)
-
-        if not user:
-            users_path = os.path.join(current_app.root_path, "data", "users.json")
-            if os.path.exists(users_path):
-                with open(users_path) as f:
-                    users = json.load(f)
-                user = next((u for u in users if u["name"] == identity), None)
+        user = resolve_upload_user(identity)
 
         if not user:
             return jsonify({"error": f"User not found in users.json for identity={identity}"}), 404
 
-        if "image" not in request.files:
+        with upload_stage("parse"):  # first access to request.files parses the multipart body
+            file = request.files.get("image")
+            file_bytes = file.read() if file else None
+        if file is None:
             return jsonify({"error": "No image file uploaded"}), 400
 
-        file = request.files["image"]
         description = request.form.get("description", "").strip()
         lat = request.form.get("lat", type=float)
         lng = request.form.get("lng", type=float)
@@ -171,135 +467,338 @@ def upload_report():
         if lat is None or lng is None:
             return jsonify({"error": "Latitude and longitude are required"}), 400
 
-        file_bytes = file.read()
         if not file_bytes:
             return jsonify({"error": "Uploaded file is empty"}), 400
 
-        img_hash = sha256_bytes(file_bytes)
-        existing = Report.query.filter_by(image_hash=img_hash).first()
-
-        def run_ml_on_bytes(b: bytes, description_str: str):
-            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
-            try:
-                tmp.write(b)
-                tmp.flush()
-                tmp.close()
-                return verify_image(tmp.name, description_str)
-            finally:
-                try:
-                    os.remove(tmp.name)
-                except Exception:
-                    pass
+        with upload_stage("sha256"):
+            img_hash = sha256_bytes(file_bytes)
+        with upload_stage("duplicate_query"):
+            existing = Report.query.filter_by(image_hash=img_hash).first()
 
         now = datetime.utcnow()
 
         # --- If duplicate exists ---
         if existing:
             if existing.user_name == user["name"]:
-                ml_result = run_ml_on_bytes(file_bytes, description)
-                poll_conf_pct = _normalize_pollution_conf(ml_result.get("pollution_confidence"))
-                desc_conf_frac = _normalize_description_conf(ml_result.get("description_match_confidence"))
-
-                verified = (poll_conf_pct >= POLLUTION_THRESHOLD_PERCENT) and (desc_conf_frac >= DESCRIPTION_THRESHOLD_FRACTION)
-                awarded = ml_result.get("awarded_credits", 0) if verified else 0
-
-                existing.last_checked_at = now
-                existing.description = description or existing.description
-                existing.pollution_confidence = poll_conf_pct
-                existing.description_match_confidence = desc_conf_frac
-                details = ml_result.get("details", {}) or {}
-                details["_decision"] = {
-                    "pollution_conf_pct": poll_conf_pct,
-                    "desc_conf_frac": desc_conf_frac,
-                    "pollution_threshold": POLLUTION_THRESHOLD_PERCENT,
-                    "description_threshold": DESCRIPTION_THRESHOLD_FRACTION,
-                    "verified": verified
-                }
-                existing.details = details
-                existing.aqi = ml_result.get("aqi")
-                existing.points = ml_result.get("points", 0)
-                existing.status = "verified" if verified else "rejected"
-                existing.awarded_credits = awarded
-
-                target_folder = current_app.config["VERIFIED_FOLDER"] if verified else current_app.config["REJECTED_FOLDER"]
-                os.makedirs(target_folder, exist_ok=True)
-                safe_basename = secure_filename(file.filename)
-                safe_name = f"{uuid.uuid4().hex}_{safe_basename}"
-                save_path = os.path.join(target_folder, safe_name)
-                file.seek(0)
-                file.save(save_path)
-                existing.image_filename = safe_name
-
-                db.session.commit()
+                # not a new upload: no abuse check (its lat/lng are never stored), and a flagged report stays flagged
+                verdict = (existing.details or {}).get("abuse")
+                if verdict:
+                    ml_result, decision = {}, flagged_decision(verdict)
+                else:
+                    with ml_admission.admit(user["name"]):
+                        ml_result = run_ml_on_bytes(file_bytes, description)
+                    decision = decide(ml_result)
+                    near_duplicates = find_near_duplicates(ml_result, exclude=[existing.id])
+                    if near_duplicates:
+                        decision["details"]["near_duplicates"] = near_duplicates
+                with upload_stage("file_save"):
+                    image_ref = save_upload(file_bytes)
+
+                with upload_stage("db_commit"):
+                    update_report(existing, {
+                        "last_checked_at": now,
+                        "description": description or existing.description,
+                        "pollution_confidence": decision["poll_conf_pct"],
+                        "description_match_confidence": decision["desc_conf_frac"],
+                        "details": decision["details"],
+                        "aqi": ml_result.get("aqi"),
+                        "points": ml_result.get("points", 0),
+                        "status": "verified" if decision["verified"] else "rejected",
+                        "awarded_credits": decision["awarded"],
+                        "image_filename": image_ref,
+                    })
+                store_embeddings([(existing.id, ml_result)])
                 return jsonify(serialize_report(existing)), 200
             else:
                 return jsonify({"error": "Duplicate image uploaded by another user"}), 409
 
-        # --- New report ---
-        ml_result = run_ml_on_bytes(file_bytes, description)
-        poll_conf_pct = _normalize_pollution_conf(ml_result.get("pollution_confidence"))
-        desc_conf_frac = _normalize_description_conf(ml_result.get("description_match_confidence"))
-
-        verified = (poll_conf_pct >= POLLUTION_THRESHOLD_PERCENT) and (desc_conf_frac >= DESCRIPTION_THRESHOLD_FRACTION)
-        awarded = ml_result.get("awarded_credits", 0) if verified else 0
-
-        target_folder = current_app.config["VERIFIED_FOLDER"] if verified else current_app.config["REJECTED_FOLDER"]
-        os.makedirs(target_folder, exist_ok=True)
-
-        safe_basename = secure_filename(file.filename)
-        safe_name = f"{uuid.uuid4().hex}_{safe_basename}"
-        save_path = os.path.join(target_folder, safe_name)
-
-        file.seek(0)
-        file.save(save_path)
-
-        details = ml_result.get("details", {}) or {}
-        details["_decision"] = {
-            "pollution_conf_pct": poll_conf_pct,
-            "desc_conf_frac": desc_conf_frac,
-            "pollution_threshold": POLLUTION_THRESHOLD_PERCENT,
-            "description_threshold": DESCRIPTION_THRESHOLD_FRACTION,
-            "verified": verified
-        }
-
-        new_report = Report(
-            user_name=user["name"],
-            description=description,
-            image_filename=safe_name,
-            image_hash=img_hash,
-            aqi=ml_result.get("aqi"),
-            points=ml_result.get("points", 0),
-            status="verified" if verified else "rejected",
-            pollution_confidence=poll_conf_pct,
-            description_match_confidence=desc_conf_frac,
-            details=details,
-            awarded_credits=awarded,
-            created_at=now,
-            last_checked_at=now,
-            lat=lat,
-            lng=lng,
-        )
-
-        db.session.add(new_report)
-        db.session.commit()
+        # --- New report (flagged uploads are stored rejected without running ML) ---
+        verdict = screen_upload(user, lat, lng)
+        if verdict:
+            ml_result, decision = {}, flagged_decision(verdict)
+        else:
+            with ml_admission.admit(user["name"]):
+                ml_result = run_ml_on_bytes(file_bytes, description)
+            decision = decide(ml_result)
+            near_duplicates = find_near_duplicates(ml_result)
+            if near_duplicates:
+                decision["details"]["near_duplicates"] = near_duplicates
+        with upload_stage("file_save"):
+            image_ref = save_upload(file_bytes)
+
+        new_report = build_report(user, description, lat, lng, img_hash, image_ref, ml_result, decision, now)
+        try:
+            with upload_stage("db_commit"):
+                new_report = insert_report(new_report)
+        except IntegrityError:
+            # stored since the duplicate query: a concurrent upload, or a retry racing its own queued insert
+            db.session.rollback()
+            existing = Report.query.filter_by(image_hash=img_hash).first()
+            if existing is None:
+                raise
+            if existing.user_name != user["name"]:
+                return jsonify({"error": "Duplicate image uploaded by another user"}), 409
+            return jsonify(serialize_report(existing)), 200
+        record_uploads(user, [new_report])
+        store_embeddings([(new_report.id, ml_result)])
 
         return jsonify(serialize_report(new_report)), 201
 
+    except Overloaded as e:
+        return overloaded_response(e)
+    except CommitPending as e:
+        return commit_pending_response(e)
     except Exception as e:
         current_app.logger.error(f"Upload failed: {str(e)}", exc_info=True)
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
 
+# --- Bulk upload (many images, one ML batch, one transaction) ---
+def _bulk_item_meta(count):
+    """
+    Per-image metadata, either as a JSON `items` field
+    ([{"description": "...", "lat": 1.0, "lng": 2.0}, ...]) or as parallel
+    form lists `description`, `lat`, `lng` (one entry per image, in order).
+    """
+    if request.form.get("items"):
+        items = json.loads(request.form["items"])
+        if not isinstance(items, list):
+            raise ValueError("'items' must be a JSON list")
+    else:
+        descriptions = request.form.getlist("description")
+        lats = request.form.getlist("lat")
+        lngs = request.form.getlist("lng")
+        items = [
+            {
+                "description": descriptions[i] if i < len(descriptions) else "",
+                "lat": lats[i] if i < len(lats) else None,
+                "lng": lngs[i] if i < len(lngs) else None,
+            }
+            for i in range(count)
+        ]
+    if len(items) != count:
+        raise ValueError(f"Got {count} images but metadata for {len(items)}")
+    return items
+
+
+def score_bulk(user, items, allow_partial=False):
+    """
+    ML results for bulk items, scored ML_BULK_CHUNK at a time, each chunk admitted
+    separately with one token per image. Returns (results, refusal): when a chunk is
+    refused, results cover the items before it and refusal is the Overloaded. The
+    refusal is raised instead when nothing would be stored (first chunk, no
+    allow_partial), so the whole request gets the 429/503 with Retry-After.
+    """
+    scored = []
+    for start in range(0, len(items), ML_BULK_CHUNK):
+        chunk = items[start:start + ML_BULK_CHUNK]
+        try:
+            with ml_admission.admit(user["name"], cost=len(chunk)):
+                scored.extend(run_ml_on_batch([(p[2], p[4]) for p in chunk]))
+        except Overloaded as e:
+            if not scored and not allow_partial:
+                raise
+            ml_rejections.labels(reason=e.reason).inc()
+            return scored, e
+    return scored, None
+
+
+def _drop_raced_duplicates(user, created, results):
+    """Items whose image another upload stored since the duplicate query become duplicates; returns the rest."""
+    hashes = [report.image_hash for _, report, _ in created]
+    taken = {r.image_hash: r for r in Report.query.filter(Report.image_hash.in_(hashes)).all()}
+    kept = []
+    for i, report, ml_result in created:
+        match = taken.get(report.image_hash)
+        if match is None:
+            kept.append((i, report, ml_result))
+        elif match.user_name == user["name"]:
+            results[i].update(status="duplicate", report_id=match.id)
+        else:
+            results[i].update(status="rejected_duplicate", error="Duplicate image uploaded by another user")
+    return kept
+
+
+@report_bp.route("/bulk", methods=["POST"])
+@jwt_required()
+def bulk_upload_reports():
+    """
+    multipart/form-data: `images` (repeated) + per-image metadata (see _bulk_item_meta).
+    Returns one result per image, in upload order:
+      created | duplicate (already yours) | rejected_duplicate (another user's) | error
+      | overloaded (not scored this time: admission refused its chunk; has retry_after)
+
+    The batch is written in one transaction on the request's session, not through
+    group commit (REPORT_GROUP_COMMIT): it is already one commit for many rows.
+    """
+    try:
+        identity = get_jwt_identity()
+        user = resolve_upload_user(identity)
+        if not user:
+            return jsonify({"error": f"User not found in users.json for identity={identity}"}), 404
+
+        files = request.files.getlist("images")
+        if not files:
+            return jsonify({"error": "No images uploaded"}), 400
+        if len(files) > BULK_UPLOAD_MAX_IMAGES:
+            return jsonify({"error": f"At most {BULK_UPLOAD_MAX_IMAGES} images per request"}), 413
+
+        try:
+            metas = _bulk_item_meta(len(files))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        results = [None] * len(files)
+        pending = []  # (index, file, bytes, hash, description, lat, lng)
+        seen = {}
+
+        for i, (file, meta) in enumerate(zip(files, metas)):
+            result = {"index": i, "filename": file.filename}
+            results[i] = result
+            try:
+                lat = float(meta.get("lat"))
+                lng = float(meta.get("lng"))
+            except (TypeError, ValueError):
+                result.update(status="error", error="Latitude and longitude are required")
+                continue
+
+            file_bytes = file.read()
+            if not file.filename or not file_bytes:
+                result.update(status="error", error="Empty file")
+                continue
+
+            img_hash = sha256_bytes(file_bytes)
+            if img_hash in seen:
+                result.update(status="duplicate", duplicate_of_index=seen[img_hash])
+                continue
+            seen[img_hash] = i
+            pending.append((i, file, file_bytes, img_hash, (meta.get("description") or "").strip(), lat, lng))
+
+        # --- one query for cross-batch duplicates ---
+        if pending:
+            hashes = [p[3] for p in pending]
+            existing = {
+                r.image_hash: r
+                for r in Report.query.filter(Report.image_hash.in_(hashes)).all()
+            }
+            fresh = []
+            for item in pending:
+                match = existing.get(item[3])
+                if match is None:
+                    fresh.append(item)
+                elif match.user_name == user["name"]:
+                    results[item[0]].update(status="duplicate", report_id=match.id)
+                else:
+                    results[item[0]].update(status="rejected_duplicate", error="Duplicate image uploaded by another user")
+            pending = fresh
+
+        # --- batched ML (flagged items skip it) + single transaction ---
+        created = []
+        if pending:
+            verdicts = screen_uploads(user, [(p[5], p[6]) for p in pending])  # the batch is one upload event
+            to_score = [p for p, verdict in zip(pending, verdicts) if not verdict]
+            scored, refused = score_bulk(user, to_score, allow_partial=len(to_score) < len(pending))
+            for p in to_score[len(scored):]:
+                results[p[0]].update(status="overloaded", error=f"Not scored: {refused.reason}",
+                                     retry_after=refused.retry_after)
+            scored = iter(scored)
+            ml_results = [{} if verdict else next(scored, None) for verdict in verdicts]
+            now = datetime.utcnow()
+            for (i, file, file_bytes, img_hash, description, lat, lng), ml_result, verdict in zip(pending, ml_results, verdicts):
+                if ml_result is None:
+                    continue
+                if verdict:
+                    decision = flagged_decision(verdict)
+                else:
+                    decision = decide(ml_result)
+                    near_duplicates = find_near_duplicates(ml_result)
+                    if near_duplicates:
+                        decision["details"]["near_duplicates"] = near_duplicates
+                image_ref = save_upload(file_bytes)
+                report = build_report(user, description, lat, lng, img_hash, image_ref, ml_result, decision, now)
+                created.append((i, report, ml_result))
+
+            db.session.add_all([r for _, r, _ in created])
+            try:
+                db.session.flush()
+            except IntegrityError:
+                db.session.rollback()
+                created = _drop_raced_duplicates(user, created, results)
+                db.session.add_all([r for _, r, _ in created])
+                db.session.flush()
+            record_changes([(report, "created") for _, report, _ in created])
+            db.session.commit()
+            store_embeddings([(report.id, ml_result) for _, report, ml_result in created])
+            change_log.committed()
+            record_uploads(user, [report for _, report, _ in created])
+
+            for i, report, _ in created:
+                results[i].update(status="created", report=serialize_report(report))
+
+        return jsonify({"created": len(created), "results": results}), 200
+
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Bulk upload failed: {str(e)}", exc_info=True)
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
+
+
+# --- Conditional GET for the polled lists (ETag = shared collection version) ---
+_list_bodies = {}  # (collection, host_url) -> (etag, body bytes, headers); this worker's latest build
+
+
+def versioned_list(collection, build):
+    """
+    JSON list response tagged with the collection's version. A matching
+    If-None-Match gets a 304 from the version query alone; otherwise the body
+    serialised for this version is reused, and build() -> (payload, headers)
+    only runs after a write. Keyed by host too: serialize_report emits absolute URLs.
+    """
+    etag = collection_versions.etag(collection)
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        key = (collection, request.host_url)
+        cached = _list_bodies.get(key)
+        record_cache("report_lists", hit=cached is not None and cached[0] == etag)
+        if cached is None or cached[0] != etag:
+            payload, headers = build()
+            cached = (etag, current_app.json.response(payload).get_data(), headers)
+            _list_bodies[key] = cached
+        response = current_app.response_class(cached[1], mimetype="application/json", headers=cached[2])
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"  # browsers revalidate every poll with If-None-Match
+    return response
+
+
 # --- Get reports for Validator Portal (pending completion) ---
 @report_bp.route("/", methods=["GET"])
 def get_reports():
-    reports = Report.query.filter(Report.status.in_(["approved", "verified"])).all()
-    # only show reports where either precautions OR govt_action missing
-    visible = [r for r in reports if not (r.precautions and r.govt_action)]
-    return jsonify([serialize_report(r) for r in visible]), 200
+    def build():
+        last_event_id = change_log.latest_id()  # read before the list: later changes replay on the stream
+        reports = Report.query.filter(Report.status.in_(["approved", "verified"])).all()
+        # only show reports where either precautions OR govt_action missing
+        visible = [r for r in reports if not (r.precautions and r.govt_action)]
+        return [serialize_report(r) for r in visible], {"X-Last-Event-Id": str(last_event_id)}
+
+    return versioned_list("reports", build)
 
 
 # --- Validator/Govt updates report ---
+def _store_validation_notes(report, data):
+    if "precautions" in data:
+        prec = data.get("precautions") or ""
+        report.precautions = prec
+        report.details["precautions"] = prec
+
+    action = data.get("action_taken") or data.get("govt_action")
+    if action is not None:
+        report.govt_action = action
+        report.details["govt_action"] = action
+
+
 @report_bp.route("/<int:report_id>/validate", methods=["PUT"])
 def validate_report(report_id):
     """
@@ -312,7 +811,7 @@ def validate_report(report_id):
       - multipart/form-data: status, action_taken (or govt_action), proof_images (one or more files).
     """
     report = Report.query.get_or_404(report_id)
-    report.details = report.details or {}
+    report.details = dict(report.details or {})  # a new object: in-place edits of a JSON column aren't tracked
 
     # determine JSON vs multipart
     content_type = (request.content_type or "").lower()
@@ -330,85 +829,253 @@ def validate_report(report_id):
     if status not in ["approved", "rejected", "finalized"]:
         return jsonify({"error": "Invalid status"}), 400
 
+    # ---- govt proof images: validated, then compressed in parallel (services/media_service.py) ----
+    proofs = []
+    if status == "approved" and files:
+        try:
+            proofs = [blob_ref(key) for key in store_proofs(files, blob_store())]
+        except MediaError as e:
+            return jsonify({"error": str(e)}), 400
+
     # set base status (may be overridden below)
     report.status = status
 
     if status == "approved":
-        # ---- STEP 1: store precautions if provided ----
-        if "precautions" in data:
-            prec = data.get("precautions") or ""
-            report.precautions = prec
-            report.details["precautions"] = prec
-
-        # ---- STEP 2: store govt action if provided ----
-        action = data.get("action_taken") or data.get("govt_action")
-        if action is not None:
-            report.govt_action = action
-            report.details["govt_action"] = action
+        # ---- STEP 1 / STEP 2: precautions and govt action, if provided ----
+        _store_validation_notes(report, data)
 
         # ---- handle uploaded proof images (if any) ----
-        if files:
-            # Save govt proof images into a subfolder 'govt_actions' inside VERIFIED_FOLDER (or UPLOAD_FOLDER)
-            saved = report.details.get("govt_proofs", []) or []
-            base_folder = current_app.config.get("VERIFIED_FOLDER") or current_app.config.get("UPLOAD_FOLDER")
-            if not base_folder:
-                current_app.logger.error("No base upload folder configured.")
-                return jsonify({"error": "Server misconfigured: upload folder not set"}), 500
-
-            govt_subfolder = os.path.join(base_folder, "govt_actions")
-            os.makedirs(govt_subfolder, exist_ok=True)
-
-            for f in files:
-                if not f or f.filename == "":
-                    continue
-                safe_basename = secure_filename(f.filename)
-                safe_name = f"govt_{uuid.uuid4().hex}_{safe_basename}"
-                save_path = os.path.join(govt_subfolder, safe_name)
-                try:
-                    f.save(save_path)
-                    # store path relative to base_folder using forward slash for URLs
-                    saved.append(f"govt_actions/{safe_name}")
-                except Exception as e:
-                    current_app.logger.error(f"Failed saving govt proof image: {str(e)}", exc_info=True)
-
-            report.details["govt_proofs"] = saved
+        if proofs:
+            report.details["govt_proofs"] = (report.details.get("govt_proofs", []) or []) + proofs
 
         # ---- Finalize when both precautions AND govt_action exist ----
         if report.precautions and report.govt_action:
             report.status = "finalized"
 
-    else:  # rejected
+    elif status == "finalized":
+        # closed directly: keep any notes sent along; finalized rows are never re-scored
+        _store_validation_notes(report, data)
+        report.details.pop("rejected_by", None)
+        report.details.pop("rejection_reason", None)
+
+    elif status == "rejected":
+        report.details["rejected_by"] = "validator"  # reverify-reports never re-scores these
         reason = data.get("reason")
         if reason:
             report.details["rejection_reason"] = reason
 
+    db.session.flush()
+    record_changes([(report, "updated")])
     db.session.commit()
+    change_log.committed()
     return jsonify({"message": f"Report {report.status}", "report": serialize_report(report)}), 200
 
 
 # --- Govt Portal (finalized reports only) ---
 @report_bp.route("/approved", methods=["GET"])
 def get_approved_reports():
-    reports = Report.query.filter_by(status="finalized").all()
-    return jsonify([serialize_report(r) for r in reports]), 200
+    def build():
+        last_event_id = change_log.latest_id()
+        reports = Report.query.filter_by(status="finalized").all()
+        return [serialize_report(r) for r in reports], {"X-Last-Event-Id": str(last_event_id)}
+
+    return versioned_list("approved", build)
+
+
+# --- Live report changes (Server-Sent Events) ---
+SSE_MAX_STREAMS = int(os.getenv("SSE_MAX_STREAMS", 2))  # per worker; each open stream holds a worker thread
+SSE_STREAM_SECONDS = float(os.getenv("SSE_STREAM_SECONDS", 55))  # then the browser reconnects with Last-Event-ID
+SSE_KEEPALIVE_SECONDS = 15
+SSE_RETRY_MS = 2000
+
+_open_streams = threading.BoundedSemaphore(max(SSE_MAX_STREAMS, 1))
+
+
+def _sse(event, data, event_id=None):
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@report_bp.route("/events", methods=["GET"])
+def report_events():
+    """
+    text/event-stream of report changes after `Last-Event-ID` (header, sent by
+    EventSource on reconnect) or `?last_event_id=` (the X-Last-Event-Id of the
+    list the client just loaded). Events:
+      report  {"id", "report_id", "kind": created|updated, "report": serialize_report()}
+      reset   the log no longer reaches back that far: reload the list
+    """
+    try:
+        after_id = int(request.headers.get("Last-Event-ID") or request.args.get("last_event_id") or -1)
+    except ValueError:
+        return jsonify({"error": "Last-Event-ID must be an integer"}), 400
+    if SSE_MAX_STREAMS <= 0 or not _open_streams.acquire(blocking=False):
+        return jsonify({"error": "Too many live streams, poll instead"}), 503, {"Retry-After": "30"}
+    if after_id < 0:
+        after_id = change_log.latest_id()
+
+    def stream(after_id):
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        deadline = time.monotonic() + SSE_STREAM_SECONDS
+        while (remaining := deadline - time.monotonic()) > 0:
+            events = change_log.since(after_id, timeout=min(SSE_KEEPALIVE_SECONDS, remaining))
+            if events is None:
+                yield _sse("reset", {"reason": "log_truncated"})
+                return
+            if not events:
+                yield ": keep-alive\n\n"
+            for event in events:
+                yield _sse("report", event, event["id"])
+                after_id = event["id"]
+            db.session.remove()  # don't pin a pooled connection between polls
+
+    response = Response(
+        stream_with_context(stream(after_id)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    response.call_on_close(_open_streams.release)  # runs on disconnect too
+    return response
+
+
+# --- Similar incidents (stored CLIP image embeddings; no re-encoding) ---
+@report_bp.route("/<int:report_id>/similar", methods=["GET"])
+def similar_reports(report_id):
+    """GET /api/reports/<id>/similar?k=10&min_similarity=0.8"""
+    Report.query.get_or_404(report_id)
+    embedding = embedding_store.get(report_id)
+    if embedding is None:
+        return jsonify({"error": "No image embedding stored for this report"}), 404
+
+    k = max(1, min(request.args.get("k", 10, type=int), 100))
+    matches = embedding_store.search(
+        embedding, k=k, exclude=[report_id], min_similarity=request.args.get("min_similarity", type=float)
+    )
+    reports = {r.id: r for r in Report.query.filter(Report.id.in_([rid for rid, _ in matches])).all()}
+    return jsonify([
+        {"similarity": round(similarity, 4), "report": serialize_report(reports[rid])}
+        for rid, similarity in matches if rid in reports
+    ]), 200
+
+
+# --- Admission-control metrics (this worker) ---
+@report_bp.route("/admission", methods=["GET"])
+def admission_metrics():
+    return jsonify({**ml_admission.metrics(), "abuse": abuse_detector.metrics()}), 200
+
+
+# --- Search for validators (CLIP semantic + keyword) ---
+def _encode_query(text):
+    try:
+        return encode_texts([text])[0]
+    except Exception as e:
+        current_app.logger.warning(f"CLIP query encoding failed, keyword-only search: {e}")
+        return None
+
+
+@report_bp.route("/search", methods=["GET"])
+def search():
+    """GET /api/reports/search?q=burning+garbage&k=20&status=verified,approved&bbox=minLng,minLat,maxLng,maxLat"""
+    try:
+        args = parse_search_args(request.args)
+    except SearchError as e:
+        return jsonify({"error": str(e)}), 400
+
+    started = datetime.utcnow()
+    hits = search_reports(args["query"], k=args["k"], statuses=args["statuses"], bbox=args["bbox"],
+                          encode_query=_encode_query)
+    reports = {r.id: r for r in Report.query.filter(Report.id.in_([rid for rid, _, _ in hits])).all()}
+    took_ms = (datetime.utcnow() - started).total_seconds() * 1000
+    return jsonify({
+        "query": args["query"],
+        "took_ms": round(took_ms, 1),
+        "results": [
+            {"score": round(score, 5), "matched": matched, "report": serialize_report(reports[rid])}
+            for rid, score, matched in hits if rid in reports
+        ],
+    }), 200
+
+
+# --- Dashboard stats (from the report_rollup aggregates, never the report table) ---
+@report_bp.route("/stats", methods=["GET"])
+def report_stats():
+    """
+    GET /api/reports/stats?group_by=day,cell,status &precision=4
+        &since=2025-01-01 &until=2025-02-01 &status=verified,approved &cell=tdr1
+    """
+    try:
+        query = parse_stats_args(request.args)
+    except StatsError as e:
+        return jsonify({"error": str(e)}), 400
+
+    started = datetime.utcnow()
+    body = rollup_stats(**query)
+    body["took_ms"] = round((datetime.utcnow() - started).total_seconds() * 1000, 1)
+    return jsonify(body), 200
+
+
+# --- Bulk export for analysts (streamed; constant memory) ---
+EXPORT_ROLES = {r.strip() for r in os.getenv("EXPORT_ROLES", "analyst,validator,government").split(",") if r.strip()}
+
+
+def current_role():
+    """Role of the JWT's user: government tokens carry it in the identity; otherwise users.json, then the claim."""
+    identity = get_jwt_identity()
+    if isinstance(identity, dict):
+        return identity.get("role")
+    user = resolve_upload_user(identity)
+    return (user or {}).get("role") or get_jwt().get("role")
+
+
+@report_bp.route("/export", methods=["GET"])
+@jwt_required()
+def export_reports():
+    """
+    GET /api/reports/export?format=ndjson|csv|parquet|arrow
+        &status=finalized,verified &since=2025-01-01 &until=2025-02-01
+        &bbox=minLng,minLat,maxLng,maxLat &batch_size=1000
+
+    Every column of every report, so only EXPORT_ROLES may call it (403 otherwise).
+    parquet/arrow need pyarrow (requirements-optional.txt); without it they are a 400.
+    """
+    if current_role() not in EXPORT_ROLES:
+        return jsonify({"error": f"Export requires one of the roles: {', '.join(sorted(EXPORT_ROLES))}"}), 403
+
+    fmt = (request.args.get("format") or "ndjson").lower()
+    try:
+        filters = parse_filters(request.args)
+        body = export_stream(fmt, filters, batch_size=parse_batch_size(request.args))
+    except ExportError as e:
+        return jsonify({"error": str(e)}), 400
+
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    filename = f"reports_{datetime.utcnow():%Y%m%dT%H%M%S}.{extension}"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
 
 
 # --- Leaderboard ---
 @report_bp.route("/leaderboard", methods=["GET"])
 def leaderboard():
-    # Only count valid reports
-    reports = Report.query.filter(Report.status.in_(["verified", "approved", "finalized"])).all()
-    leaderboard = {}
+    def build():
+        # Only count valid reports
+        reports = Report.query.filter(Report.status.in_(["verified", "approved", "finalized"])).all()
+        leaderboard = {}
 
-    for r in reports:
-        if not r.user_name:
-            continue
-        leaderboard.setdefault(r.user_name, 0)
-        leaderboard[r.user_name] += r.awarded_credits or 0
+        for r in reports:
+            if not r.user_name:
+                continue
+            leaderboard.setdefault(r.user_name, 0)
+            leaderboard[r.user_name] += r.awarded_credits or 0
 
-    top = sorted(leaderboard.items(), key=lambda x: x[1], reverse=True)[:10]
+        top = sorted(leaderboard.items(), key=lambda x: x[1], reverse=True)[:10]
 
-    return jsonify([
-        {"username": name, "green_credits": credits}
-        for name, credits in top
-    ]), 200
+        return [
+            {"username": name, "green_credits": credits}
+            for name, credits in top
+        ], {}
+
+    return versioned_list("leaderboard", build)
@@ -0,0 +1,288 @@
+# services/AQI/alerts.py
+"""
+AQI threshold alerts for subscribed citizens.
+
+A subscription is (user, location, category): alert me once the AQI at
+this location reaches `category`. Subscriptions are bucketed by the
+geohash cell of their location, and each cell is served by one reading
+(the station nearest the cell centre), so a cycle does one reading
+lookup per cell, however many people subscribe there.
+
+`AlertBook` mirrors the active subscriptions in memory as numpy arrays:
+the AQI floor of each threshold, an `alerting` flag, and the index of its
+cell. It syncs incrementally: only rows whose `updated_at` (set on user edits)
+is newer than the previous sync, less a safety overlap, are re-read.
+`AlertEvaluator.run_cycle()` gathers one AQI per cell, spreads it over
+the subscribers with a single index, and compares every subscription at
+once:
+
+    fire  = ~alerting & (aqi > floor)
+    clear =  alerting & (aqi <= floor - ALERT_HYSTERESIS_AQI)
+
+A subscription alerts once, and only clears (and becomes able to alert
+again) after the AQI has dropped a margin below its threshold, so a
+reading hovering around a breakpoint does not flap. Alerts and clears go
+to the `alert_outbox` table in the same transaction as the flag change;
+the app polls GET /api/aqi/alerts/outbox. Cells without a fresh reading
+are left as they are.
+
+Run exactly one evaluator (`flask prefetch-aqi` or `flask evaluate-alerts`):
+the hysteresis state lives in the table, but two evaluators could both
+send the same alert.
+"""
+import math
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func, insert, select, update
+
+from extensions import db
+from models import AlertOutbox, AlertSubscription
+from services.AQI import geohash
+from services.metrics import aqi_alerts
+
+ALERT_GEOHASH_PRECISION = int(os.getenv("ALERT_GEOHASH_PRECISION", 5))  # 5 ≈ 4.9 km cells
+ALERT_HYSTERESIS_AQI = float(os.getenv("ALERT_HYSTERESIS_AQI", 15))
+ALERT_MAX_PER_USER = int(os.getenv("ALERT_MAX_PER_USER", 5))
+ALERT_SYNC_OVERLAP_SECONDS = 60  # edits may commit after a sync with an earlier updated_at (slow txn, clock skew)
+BATCH = 5000
+
+_subscription = AlertSubscription.__table__
+
+
+class AlertError(ValueError):
+    pass
+
+
+class AlertBook:
+    """Active subscriptions, as arrays grouped by cell."""
+
+    def __init__(self, clinical_service):
+        self.clinical = clinical_service
+        self._subs = {}  # id -> [user_id, cell, category, floor, alerting]
+        self._since = None  # next sync reads rows with updated_at >= this (None: full load)
+        self._dirty = True
+        self.cells = []  # distinct cells, sorted
+        self.ids = np.empty(0, dtype=np.int64)
+        self.floors = np.empty(0, dtype=np.float32)
+        self.alerting = np.empty(0, dtype=bool)
+        self.cell_of = np.empty(0, dtype=np.int32)  # index into self.cells
+
+    def __len__(self):
+        return len(self._subs)
+
+    # ✅ Incremental sync
+    def sync(self):
+        """Apply subscription edits since the last sync; returns how many rows changed."""
+        started = datetime.utcnow()
+        c = _subscription.c  # Core rows: no ORM loading overhead on a full load
+        stmt = select(c.id, c.user_id, c.cell, c.category, c.active, c.alerting).order_by(c.id)
+        if self._since is not None:
+            stmt = stmt.where(c.updated_at >= self._since)
+        changed = 0
+        for row in db.session.execute(stmt.execution_options(yield_per=BATCH)):
+            current = self._subs.get(row.id)
+            if not row.active:
+                if current is not None:
+                    del self._subs[row.id]
+                    changed += 1
+                continue
+            if current is None or current[1] != row.cell or current[2] != row.category:
+                floor = self.clinical.category_floor(row.category)
+                self._subs[row.id] = [row.user_id, row.cell, row.category, floor, bool(row.alerting)]
+                changed += 1
+        db.session.rollback()  # end the read transaction: the next sync must see new commits
+        self._since = started - timedelta(seconds=ALERT_SYNC_OVERLAP_SECONDS)
+        if changed:
+            self._dirty = True
+        if self._dirty:
+            self._rebuild()
+        return changed
+
+    def _rebuild(self):
+        ids = np.fromiter(self._subs, dtype=np.int64, count=len(self._subs))
+        cells = [self._subs[i][1] for i in ids.tolist()]
+        order = np.argsort(np.array(cells, dtype=object), kind="stable")  # subscribers of a cell sit together
+        ids = ids[order]
+        subs = [self._subs[i] for i in ids.tolist()]
+        self.cells, cell_of = np.unique(np.array([s[1] for s in subs], dtype=object), return_inverse=True)
+        self.cells = self.cells.tolist()
+        self.ids = ids
+        self.cell_of = cell_of.astype(np.int32)
+        self.floors = np.fromiter((s[3] for s in subs), dtype=np.float32, count=len(subs))
+        self.alerting = np.fromiter((s[4] for s in subs), dtype=bool, count=len(subs))
+        self._dirty = False
+
+    def set_alerting(self, positions, value):
+        """Flip the flag for the given array positions (the evaluator has committed it)."""
+        self.alerting[positions] = value
+        for i in self.ids[positions].tolist():
+            self._subs[i][4] = value
+
+    def subscription(self, position):
+        user_id, cell, category, _, _ = self._subs[int(self.ids[position])]
+        return user_id, cell, category
+
+    def cell_centres(self):
+        """[(cell, subscribers, lat, lng), ...], most subscribed first: cells prefetch keeps fresh."""
+        if not len(self.cell_of):
+            return []
+        counts = np.bincount(self.cell_of, minlength=len(self.cells))
+        return [
+            (self.cells[i], int(counts[i]), *geohash.decode(self.cells[i]))
+            for i in np.argsort(-counts, kind="stable").tolist()
+        ]
+
+
+class AlertEvaluator:
+    """One cycle = sync the book, one reading per cell, compare everything at once, write the outbox."""
+
+    def __init__(self, book, station_registry, reading_cache, snap_km, hysteresis=ALERT_HYSTERESIS_AQI):
+        self.book = book
+        self.stations = station_registry
+        self.readings = reading_cache
+        self.snap_km = snap_km
+        self.hysteresis = hysteresis
+        self._station_of = {}  # cell -> station uid or None, valid while the registry size is unchanged
+        self._stations_seen = -1
+        self.stats = {"cycles": 0, "alerts": 0, "clears": 0, "last_cycle_at": None, "last_cycle_ms": None}
+
+    def _station(self, cell):
+        if len(self.stations) != self._stations_seen:
+            self._station_of = {}
+            self._stations_seen = len(self.stations)
+        if cell not in self._station_of:
+            station = self.stations.snap(*geohash.decode(cell), self.snap_km)
+            self._station_of[cell] = station["uid"] if station else None
+        return self._station_of[cell]
+
+    def _readings(self):
+        """AQI per cell (NaN without a fresh reading) and the reading behind each cell."""
+        aqi = np.full(len(self.book.cells), np.nan, dtype=np.float32)
+        sources = [None] * len(self.book.cells)
+        for i, cell in enumerate(self.book.cells):
+            uid = self._station(cell)
+            cached = self.readings.get(uid) if uid is not None else None
+            if cached is None:
+                continue
+            try:
+                aqi[i] = float(cached["payload"]["aqius"])
+            except (TypeError, ValueError, KeyError):
+                continue  # WAQI reports "-" for a station that is down
+            sources[i] = (uid, cached["payload"].get("ts"))
+        return aqi, sources
+
+    def run_cycle(self):
+        start = time.perf_counter()
+        self.book.sync()
+        aqi, sources = self._readings()
+
+        observed = aqi[self.book.cell_of]
+        fire = np.flatnonzero(~self.book.alerting & (observed > self.book.floors))
+        clear = np.flatnonzero(self.book.alerting & (observed <= self.book.floors - self.hysteresis))
+
+        if len(fire) or len(clear):
+            self._write(fire, clear, aqi, sources)
+            self.book.set_alerting(fire, True)
+            self.book.set_alerting(clear, False)
+
+        self.stats["cycles"] += 1
+        self.stats["alerts"] += len(fire)
+        self.stats["clears"] += len(clear)
+        self.stats["last_cycle_at"] = time.time()
+        self.stats["last_cycle_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        aqi_alerts.labels(kind="alert").inc(len(fire))
+        aqi_alerts.labels(kind="clear").inc(len(clear))
+        return {
+            "subscriptions": len(self.book),
+            "cells": len(self.book.cells),
+            "cells_with_reading": int(np.count_nonzero(~np.isnan(aqi))),
+            "alerts": len(fire),
+            "clears": len(clear),
+            "took_ms": self.stats["last_cycle_ms"],
+        }
+
+    def _write(self, fire, clear, aqi, sources):
+        now = datetime.utcnow()
+        outbox = []
+        for kind, positions in (("alert", fire), ("clear", clear)):
+            for position in positions.tolist():
+                user_id, cell, category = self.book.subscription(position)
+                cell_index = int(self.book.cell_of[position])
+                value = float(aqi[cell_index])
+                uid, ts = sources[cell_index]
+                outbox.append({
+                    "subscription_id": int(self.book.ids[position]), "user_id": user_id, "kind": kind,
+                    "category": category, "aqi": value, "observed_category": self.book.clinical.get_category(value),
+                    "cell": cell, "station_uid": uid, "reading_ts": ts, "created_at": now,
+                })
+        flags = (
+            [{"id": i, "alerting": True, "last_alert_at": now} for i in self.book.ids[fire].tolist()],
+            [{"id": i, "alerting": False} for i in self.book.ids[clear].tolist()],
+        )
+        try:
+            for i in range(0, len(outbox), BATCH):
+                db.session.execute(insert(AlertOutbox), outbox[i:i + BATCH])
+            # updated_at is left alone: it marks user edits, which the book syncs from
+            for rows in flags:
+                if rows:
+                    db.session.execute(update(AlertSubscription), rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def report(self):
+        return dict(self.stats, subscriptions=len(self.book), cells=len(self.book.cells),
+                    hysteresis_aqi=self.hysteresis)
+
+
+# --- Subscription edits (API) ---
+def subscribe(user_id, lat, lng, category, clinical_service):
+    if category not in clinical_service.severity_order[1:]:
+        raise AlertError(f"'category' must be one of: {', '.join(clinical_service.severity_order[1:])}")
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0) or math.isnan(lat) or math.isnan(lng):
+        raise AlertError("lat/lng out of range")
+    active = db.session.execute(
+        select(func.count()).select_from(AlertSubscription)
+        .where(AlertSubscription.user_id == user_id, AlertSubscription.active.is_(True))
+    ).scalar()
+    if active >= ALERT_MAX_PER_USER:
+        raise AlertError(f"At most {ALERT_MAX_PER_USER} alert subscriptions per user")
+    now = datetime.utcnow()
+    subscription = AlertSubscription(
+        user_id=user_id, lat=lat, lng=lng, cell=geohash.encode(lat, lng, ALERT_GEOHASH_PRECISION),
+        category=category, created_at=now, updated_at=now,
+    )
+    db.session.add(subscription)
+    db.session.commit()
+    return subscription
+
+
+def unsubscribe(user_id, subscription_id):
+    """Soft delete (the evaluator syncs on updated_at). Returns False if there is no such subscription."""
+    subscription = db.session.get(AlertSubscription, subscription_id)
+    if subscription is None or subscription.user_id != user_id or not subscription.active:
+        return False
+    subscription.active = False
+    subscription.updated_at = datetime.utcnow()
+    db.session.commit()
+    return True
+
+
+def serialize_subscription(s):
+    return {
+        "id": s.id, "lat": s.lat, "lng": s.lng, "cell": s.cell, "category": s.category,
+        "alerting": s.alerting, "created_at": s.created_at.isoformat(),
+        "last_alert_at": s.last_alert_at.isoformat() if s.last_alert_at else None,
+    }
+
+
+def serialize_outbox(o):
+    return {
+        "id": o.id, "subscription_id": o.subscription_id, "kind": o.kind, "category": o.category,
+        "aqi": o.aqi, "observed_category": o.observed_category, "cell": o.cell,
+        "station_uid": o.station_uid, "reading_ts": o.reading_ts, "created_at": o.created_at.isoformat(),
+    }
@@ -11,23 +11,23 @@ class AQIClinicalService:
             "Very Unhealthy",
             "Hazardous",
         ]
+        # highest AQI of each category but the last (US EPA breakpoints)
+        self.upper_bounds = [50, 100, 150, 200, 300]
 
     # ✅ Convert raw AQI value into category
     def get_category(self, value):
         if value is None:
             return "Unknown"
-        if value <= 50:
-            return "Good"
-        if value <= 100:
-            return "Moderate"
-        if value <= 150:
-            return "Unhealthy for Sensitive Groups"
-        if value <= 200:
-            return "Unhealthy"
-        if value <= 300:
-            return "Very Unhealthy"
+        for category, bound in zip(self.severity_order, self.upper_bounds):
+            if value <= bound:
+                return category
         return "Hazardous"
 
+    # ✅ AQI above which a category applies (alert thresholds)
+    def category_floor(self, category):
+        index = self.severity_order.index(category)
+        return self.upper_bounds[index - 1] if index > 0 else float("-inf")
+
     # ✅ Mask recommendation
     def get_mask_recommendation(self, category):
         if category in ["Good", "Moderate"]:
@@ -0,0 +1,265 @@
+# services/AQI/prefetch.py
+import glob
+import json
+import os
+import threading
+import time
+
+from services import file_lock
+from services.AQI import geohash
+from services.rate_limit import TokenBucket
+
+
+class DemandTracker:
+    """
+    Exponentially decayed request counts per geohash cell, plus cache hit/miss counters.
+    Each process keeps its own table; with `snapshot_dir` set the table is flushed to
+    disk periodically so a separate `prefetch-aqi` process can merge every worker's view.
+    """
+
+    def __init__(self, precision=5, half_life_seconds=3600, snapshot_dir=None, flush_interval=30):
+        self.precision = precision
+        self.half_life_seconds = half_life_seconds
+        self.snapshot_dir = snapshot_dir
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._cells = {}  # cell -> {"score", "updated", "lat", "lng", "hits", "misses"}
+        self._last_flush = time.time()
+        if snapshot_dir:
+            os.makedirs(snapshot_dir, exist_ok=True)
+
+    def _decayed(self, score, updated, now):
+        return score * 0.5 ** ((now - updated) / self.half_life_seconds)
+
+    def record(self, lat, lng, hit):
+        now = time.time()
+        cell = geohash.encode(lat, lng, self.precision)
+        with self._lock:
+            entry = self._cells.get(cell)
+            if entry is None:
+                entry = self._cells[cell] = {"score": 0.0, "updated": now, "hits": 0, "misses": 0}
+            entry["score"] = self._decayed(entry["score"], entry["updated"], now) + 1.0
+            entry["updated"] = now
+            # last requested coordinate snaps to the same station the users actually hit
+            entry["lat"], entry["lng"] = lat, lng
+            entry["hits" if hit else "misses"] += 1
+
+        if self.snapshot_dir and now - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write this process's table to `snapshot_dir/demand_<pid>.json`."""
+        self._last_flush = time.time()
+        with self._lock:
+            data = {cell: dict(entry) for cell, entry in self._cells.items()}
+        path = os.path.join(self.snapshot_dir, f"demand_{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def load_snapshots(self):
+        """Replace this table with the merge of every worker snapshot found in `snapshot_dir`."""
+        now = time.time()
+        with self._lock:
+            self._cells = {}
+        for path in glob.glob(os.path.join(self.snapshot_dir, "demand_*.json")):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            with self._lock:
+                for cell, other in data.items():
+                    entry = self._cells.setdefault(cell, {"score": 0.0, "updated": now, "hits": 0, "misses": 0})
+                    entry["score"] = (self._decayed(entry["score"], entry["updated"], now)
+                                      + self._decayed(other["score"], other["updated"], now))
+                    entry["updated"] = now
+                    entry.setdefault("lat", other["lat"])
+                    entry.setdefault("lng", other["lng"])
+                    entry["hits"] += other.get("hits", 0)
+                    entry["misses"] += other.get("misses", 0)
+
+    def hot_cells(self, n):
+        """Top-n cells by decayed demand: [(cell, score, lat, lng), ...]."""
+        now = time.time()
+        with self._lock:
+            ranked = [
+                (cell, self._decayed(e["score"], e["updated"], now), e["lat"], e["lng"])
+                for cell, e in self._cells.items()
+            ]
+        ranked.sort(key=lambda c: c[1], reverse=True)
+        return ranked[:n]
+
+    def merged_hot_cells(self, n):
+        """hot_cells() over this process's live table plus every other worker's snapshot."""
+        now = time.time()
+        with self._lock:
+            merged = {
+                cell: [self._decayed(e["score"], e["updated"], now), e["lat"], e["lng"]]
+                for cell, e in self._cells.items()
+            }
+        own = f"demand_{os.getpid()}.json"
+        for path in glob.glob(os.path.join(self.snapshot_dir, "demand_*.json")):
+            if os.path.basename(path) == own:
+                continue
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for cell, other in data.items():
+                entry = merged.setdefault(cell, [0.0, other["lat"], other["lng"]])
+                entry[0] += self._decayed(other["score"], other["updated"], now)
+        ranked = [(cell, score, lat, lng) for cell, (score, lat, lng) in merged.items()]
+        ranked.sort(key=lambda c: c[1], reverse=True)
+        return ranked[:n]
+
+    def report(self, top_n=10):
+        with self._lock:
+            hits = sum(e["hits"] for e in self._cells.values())
+            misses = sum(e["misses"] for e in self._cells.values())
+            cells = {cell: (e["hits"], e["misses"]) for cell, e in self._cells.items()}
+
+        total = hits + misses
+        return {
+            "requests": total,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else None,
+            "tracked_cells": len(cells),
+            "hot_cells": [
+                {
+                    "cell": cell,
+                    "score": round(score, 2),
+                    "hits": cells[cell][0],
+                    "misses": cells[cell][1],
+                    "hit_rate": round(cells[cell][0] / max(1, sum(cells[cell])), 4),
+                }
+                for cell, score, _, _ in self.hot_cells(top_n)
+            ],
+        }
+
+
+class PrefetchScheduler:
+    """
+    Keeps the top-N hot cells refreshed ahead of expiry.
+
+    `refresh(lat, lng)` fetches and caches a reading; `reading_age(lat, lng)` returns
+    the age in seconds of the cached reading serving that coordinate (None if absent).
+    Upstream calls are capped by a token bucket of `budget_per_minute`.
+    `pinned_cells()`, if given, returns further cells in the same
+    `(cell, score, lat, lng)` shape (e.g. those with alert subscribers); they
+    are refreshed after the hot cells, under the same budget.
+
+    In-app mode (`start()`) runs a thread in every gunicorn worker, but with
+    `leader_lock` set only the worker holding that file lock runs passes, so
+    the upstream budget is spent once per host rather than once per worker.
+    Another worker takes over within one interval if the leader exits.
+    """
+
+    def __init__(self, tracker, refresh, reading_age, ttl_seconds,
+                 top_n=50, lead_seconds=120, budget_per_minute=30, interval_seconds=30, pinned_cells=None,
+                 leader_lock=None):
+        self.tracker = tracker
+        self.pinned_cells = pinned_cells
+        self.leader_lock = leader_lock
+        self._lock_file = None
+        self.refresh = refresh
+        self.reading_age = reading_age
+        self.ttl_seconds = ttl_seconds
+        self.top_n = top_n
+        self.lead_seconds = lead_seconds
+        self.interval_seconds = interval_seconds
+        self.budget_per_minute = budget_per_minute
+        self.budget = TokenBucket(budget_per_minute / 60.0, max(1, budget_per_minute))
+        self.stats = {"cycles": 0, "refreshed": 0, "skipped_budget": 0, "errors": 0, "last_cycle_at": None}
+        self._thread = None
+        self._stop = threading.Event()
+
+    def run_once(self):
+        """One scheduling pass; returns the number of cells refreshed."""
+        refreshed = 0
+        seen = set()
+        for cell, _, lat, lng in self._cells():
+            if cell in seen:
+                continue
+            seen.add(cell)
+            age = self.reading_age(lat, lng)
+            if age is not None and age < self.ttl_seconds - self.lead_seconds:
+                continue
+            if not self.budget.try_take():
+                self.stats["skipped_budget"] += 1
+                break
+            try:
+                self.refresh(lat, lng)
+                refreshed += 1
+            except Exception:
+                self.stats["errors"] += 1
+
+        self.stats["cycles"] += 1
+        self.stats["refreshed"] += refreshed
+        self.stats["last_cycle_at"] = time.time()
+        return refreshed
+
+    def _cells(self):
+        if self.tracker.snapshot_dir:
+            yield from self.tracker.merged_hot_cells(self.top_n)  # demand seen by every worker
+        else:
+            yield from self.tracker.hot_cells(self.top_n)
+        if self.pinned_cells is not None:
+            yield from self.pinned_cells()
+
+    # ✅ Leader election (one scheduler per host in in-app mode)
+    def _is_leader(self):
+        if self.leader_lock is None:
+            return True
+        if self._lock_file is None:
+            lock_file = open(self.leader_lock, "a")
+            if not file_lock.lock(lock_file, blocking=False):
+                lock_file.close()
+                return False
+            self._lock_file = lock_file  # held until this process exits or stops the scheduler
+        return True
+
+    def _release(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_seconds):
+            if self._is_leader():
+                self.run_once()
+        self._release()
+
+    def start(self):
+        """Run in a daemon thread (in-app mode)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="aqi-prefetch", daemon=True)
+            self._thread.start()
+
+    def restart_after_fork(self):
+        """
+        gunicorn `post_fork` hook (--preload): the master's thread is not copied
+        into the worker, so start a fresh one. Other forks (multiprocessing pools)
+        deliberately get no scheduler.
+        """
+        if self._thread is None:
+            return
+        if self._lock_file is not None:
+            self._lock_file.close()  # the master's copy; it releases its own in stop()
+            self._lock_file = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def report(self):
+        return {
+            "demand": self.tracker.report(),
+            "scheduler": dict(self.stats, top_n=self.top_n, lead_seconds=self.lead_seconds,
+                              budget_per_minute=self.budget_per_minute, leader=self.leader_lock is None or self._lock_file is not None),
+        }
@@ -0,0 +1,303 @@
+# services/AQI/stations.py
+import csv
+import json
+import math
+import os
+import threading
+import time
+from heapq import heappush, heapreplace
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+LEAF_SIZE = 16
+
+# ✅ Default on-disk registry (grows as WAQI responses are observed)
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+STATIONS_FILE = os.getenv("AQI_STATIONS_FILE", os.path.join(BASE_DIR, "data", "aqi_stations.json"))
+
+
+def to_unit_vector(lat, lng):
+    """Project a lat/lng pair onto the unit sphere (x, y, z)."""
+    phi = math.radians(lat)
+    lam = math.radians(lng)
+    cos_phi = math.cos(phi)
+    return (cos_phi * math.cos(lam), cos_phi * math.sin(lam), math.sin(phi))
+
+
+def chord_to_km(chord):
+    """Straight-line distance between unit vectors -> great-circle (haversine) km."""
+    return EARTH_RADIUS_KM * 2.0 * math.asin(min(1.0, chord / 2.0))
+
+
+def km_to_chord(km):
+    return 2.0 * math.sin(min(math.pi, km / EARTH_RADIUS_KM) / 2.0)
+
+
+class _KDTree:
+    """
+    Static 3-d tree over unit vectors.
+    Euclidean (chord) distance on the sphere is monotonic in haversine distance,
+    so k-nearest by chord == k-nearest by great-circle distance.
+    """
+
+    def __init__(self, points):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        self.order = np.arange(len(self.points))
+        self.nodes = []  # (lo, hi, axis, split, left, right); axis == -1 marks a leaf
+        if len(self.points):
+            self._build(0, len(self.points))
+        self.sorted_points = self.points[self.order]
+
+    def _build(self, lo, hi):
+        node = len(self.nodes)
+        self.nodes.append(None)
+        if hi - lo <= LEAF_SIZE:
+            self.nodes[node] = (lo, hi, -1, 0.0, -1, -1)
+            return node
+
+        pts = self.points[self.order[lo:hi]]
+        axis = int(np.argmax(pts.max(axis=0) - pts.min(axis=0)))
+        mid = (hi - lo) // 2
+        part = np.argpartition(pts[:, axis], mid)
+        self.order[lo:hi] = self.order[lo:hi][part]
+        split = float(self.points[self.order[lo + mid], axis])
+
+        left = self._build(lo, lo + mid)
+        right = self._build(lo + mid, hi)
+        self.nodes[node] = (lo, hi, axis, split, left, right)
+        return node
+
+    def query(self, q, k):
+        """Return [(chord_distance, point_index), ...] for the k nearest points."""
+        if not self.nodes or k <= 0:
+            return []
+
+        heap = []  # max-heap on squared distance: (-d2, sorted_position)
+        stack = [(0, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if len(heap) == k and bound >= -heap[0][0]:
+                continue
+
+            lo, hi, axis, split, left, right = self.nodes[node]
+            if axis < 0:
+                d2 = ((self.sorted_points[lo:hi] - q) ** 2).sum(axis=1)
+                for off, dist in enumerate(d2.tolist()):
+                    if len(heap) < k:
+                        heappush(heap, (-dist, lo + off))
+                    elif dist < -heap[0][0]:
+                        heapreplace(heap, (-dist, lo + off))
+                continue
+
+            diff = q[axis] - split
+            near, far = (left, right) if diff < 0 else (right, left)
+            # push far side first so the near side is explored first
+            stack.append((far, max(bound, diff * diff)))
+            stack.append((near, bound))
+
+        return sorted((math.sqrt(-d2), int(self.order[pos])) for d2, pos in heap)
+
+
+class StationRegistry:
+    """
+    Known WAQI monitoring stations with a k-nearest index.
+    Populated from observed feed responses and/or a bulk import file.
+    """
+
+    def __init__(self, path=STATIONS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stations = {}  # uid -> {"uid", "name", "lat", "lng"}
+        self._tree = None
+        self._tree_uids = []
+        if path and os.path.exists(path):
+            self.load_file(path, persist=False)
+
+    def __len__(self):
+        return len(self._stations)
+
+    def get(self, uid):
+        return self._stations.get(uid)
+
+    # ✅ Registry mutation
+    def add(self, uid, name, lat, lng):
+        """Add or update a station. Returns True when the station is new or moved."""
+        try:
+            uid = int(uid)
+            lat = float(lat)
+            lng = float(lng)
+        except (TypeError, ValueError):
+            return False
+        if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+            return False
+
+        with self._lock:
+            current = self._stations.get(uid)
+            changed = current is None or current["lat"] != lat or current["lng"] != lng
+            self._stations[uid] = {"uid": uid, "name": name or (current or {}).get("name") or "", "lat": lat, "lng": lng}
+            if changed:
+                self._tree = None
+        return changed
+
+    def observe(self, feed_data):
+        """
+        Record the station behind a WAQI `/feed/` response body (the `data` object).
+        Returns the station uid, or None if the response carries no usable location.
+        """
+        uid = feed_data.get("idx")
+        city = feed_data.get("city") or {}
+        geo = city.get("geo") or []
+        if uid is None or len(geo) < 2:
+            return None
+
+        if self.add(uid, city.get("name"), geo[0], geo[1]) and self.path:
+            self.save()
+        return int(uid)
+
+    def load_file(self, path, persist=True):
+        """
+        Bulk import stations. Accepts:
+          - JSON list of {"uid", "name", "lat", "lng"} (our own format)
+          - WAQI /map/bounds output: {"data": [{"uid", "lat", "lon", "station": {"name"}}]}
+          - CSV with columns uid, name, lat, lng (or lon)
+        Returns the number of stations added or moved.
+        """
+        if path.lower().endswith(".csv"):
+            with open(path, newline="") as f:
+                rows = list(csv.DictReader(f))
+        else:
+            with open(path) as f:
+                rows = json.load(f)
+            if isinstance(rows, dict):
+                rows = rows.get("data", [])
+
+        added = 0
+        for row in rows:
+            station = row.get("station")
+            name = row.get("name") or (station.get("name") if isinstance(station, dict) else None)
+            lng = row.get("lng", row.get("lon"))
+            if self.add(row.get("uid"), name, row.get("lat"), lng):
+                added += 1
+
+        if added and persist and self.path:
+            self.save()
+        return added
+
+    def save(self):
+        """Merge with whatever is on disk (other workers may have written) and replace atomically."""
+        with self._lock:
+            merged = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path) as f:
+                        merged = {int(s["uid"]): s for s in json.load(f)}
+                except (ValueError, KeyError, TypeError):
+                    merged = {}
+            merged.update(self._stations)
+
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(sorted(merged.values(), key=lambda s: s["uid"]), f)
+            os.replace(tmp_path, self.path)
+
+    # ✅ Queries
+    def _index(self):
+        """(tree, uids) from the same rebuild; both are read under the lock."""
+        with self._lock:
+            if self._tree is None:
+                uids = list(self._stations)
+                points = [to_unit_vector(self._stations[u]["lat"], self._stations[u]["lng"]) for u in uids]
+                self._tree_uids = uids
+                self._tree = _KDTree(points)
+            return self._tree, self._tree_uids
+
+    def nearest(self, lat, lng, k=5, max_km=None):
+        """k nearest stations as [(station, distance_km), ...], closest first."""
+        tree, uids = self._index()
+        q = np.array(to_unit_vector(lat, lng))
+        results = []
+        for chord, i in tree.query(q, k):
+            km = chord_to_km(chord)
+            if max_km is not None and km > max_km:
+                break
+            results.append((self._stations[uids[i]], km))
+        return results
+
+    def snap(self, lat, lng, max_km):
+        """Nearest known station within max_km, or None."""
+        hits = self.nearest(lat, lng, k=1, max_km=max_km)
+        return hits[0][0] if hits else None
+
+
+class ReadingCache:
+    """
+    Thread-safe TTL cache of AQI readings keyed by station uid.
+    With `shared_dir` set, entries are also written as JSON files so gunicorn
+    workers and the `prefetch-aqi` command see each other's readings.
+    """
+
+    def __init__(self, ttl_seconds, shared_dir=None):
+        self.ttl_seconds = ttl_seconds
+        self.shared_dir = shared_dir
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (stored_at, value)
+        if shared_dir:
+            os.makedirs(shared_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.shared_dir, f"reading_{key}.json")
+
+    def _entry(self, key):
+        entry = self._entries.get(key)
+        if self.shared_dir:
+            path = self._path(key)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                return entry
+            if entry is None or mtime > entry[0] + 1e-3:
+                try:
+                    with open(path) as f:
+                        entry = (mtime, json.load(f))
+                except (OSError, ValueError):
+                    return self._entries.get(key)
+                with self._lock:
+                    self._entries[key] = entry
+        return entry
+
+    def get(self, key, max_age=None):
+        entry = self._entry(key)
+        if entry is None:
+            return None
+        max_age = self.ttl_seconds if max_age is None else max_age
+        if time.time() - entry[0] > max_age:
+            return None
+        return entry[1]
+
+    def age(self, key):
+        """Seconds since the entry was stored, or None if absent."""
+        entry = self._entry(key)
+        return None if entry is None else time.time() - entry[0]
+
+    def put(self, key, value):
+        stored_at = time.time()
+        if self.shared_dir:
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+            stored_at = os.path.getmtime(path)
+        with self._lock:
+            self._entries[key] = (stored_at, value)
+
+    def prune(self):
+        """Drop expired in-memory entries; returns how many were removed."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            stale = [k for k, (ts, _) in self._entries.items() if ts < cutoff]
+            for k in stale:
+                del self._entries[k]
+        return len(stale)
@@ -0,0 +1,191 @@
+# services/ML/analyzer.py
+"""
+Legacy four-feature pollution analyzer (smoke colour, low contrast, edge density,
+dark channel) as an importable engine with a parallel batch mode.
+
+Batch usage (from backend/):
+    python -m services.ML.analyzer uploads/verified -o scores.csv
+    python -m services.ML.analyzer labels.csv -o scores.parquet --workers 8
+    python -m services.ML.analyzer imgs/ -o scores.csv --weights '{"edge_density": 0.7, "low_contrast": 0.3}'
+
+A manifest is a CSV with a `path` column (relative paths resolve against the
+manifest's folder) and optionally `label`; labels are copied to the output so
+WEIGHTS can be fitted against them.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from multiprocessing import Pool
+
+import cv2
+import numpy as np
+
+WEIGHTS = {
+    'smoke_color': 0.05,
+    'low_contrast': 0.10,
+    'edge_density': 0.85,
+    'dark_channel': 0.05
+}
+VERIFICATION_THRESHOLD = 45
+FEATURES = ("smoke_color", "low_contrast", "edge_density", "dark_channel")
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff"}
+
+
+def compute_features(img):
+    """
+    All four feature scores (0-100) for a BGR uint8 image.
+    Channel access uses strided views (no cv2.split copies); the only
+    full-size intermediates are HSV, gray and the Canny edge map.
+    """
+    pixels = img.shape[0] * img.shape[1]
+
+    # 1. Smoke/Haze colour: low saturation, not dark (any hue)
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    smoke_mask = cv2.inRange(hsv, (0, 0, 50), (179, 50, 255))
+    smoke_color = cv2.countNonZero(smoke_mask) * 100 / pixels
+
+    # 2. Low contrast
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    low_contrast = max(0, 100 - (gray.std() / 60 * 100))
+
+    # 3. Edge density
+    edges = cv2.Canny(gray, 100, 200)
+    edge_density = min(100.0, cv2.countNonZero(edges) * 1000 / pixels)
+
+    # 4. Dark channel prior: per-pixel min over B, G, R views
+    dark = np.minimum(np.minimum(img[:, :, 0], img[:, :, 1]), img[:, :, 2])
+    dark_channel = float(dark.mean()) / 255 * 100
+
+    return {
+        "smoke_color": float(smoke_color),
+        "low_contrast": float(low_contrast),
+        "edge_density": float(edge_density),
+        "dark_channel": float(dark_channel),
+    }
+
+
+def combine(features, weights=WEIGHTS):
+    return min(100.0, sum(features[name] * weights.get(name, 0.0) for name in FEATURES))
+
+
+def analyze_array(img, weights=WEIGHTS):
+    """(score, details) for a decoded BGR image, same output as the legacy route."""
+    if img is None:
+        return 0.0, {}
+    features = compute_features(img)
+    details = {f"{name}_score": f"{features[name]:.2f}%" for name in FEATURES}
+    return combine(features, weights), details
+
+
+def analyze_image(image_path, weights=WEIGHTS):
+    try:
+        return analyze_array(cv2.imread(image_path), weights)
+    except Exception as e:
+        print(f"Error in image analysis: {e}")
+        return 0.0, {}
+
+
+# --- Batch mode ---
+def iter_directory(folder):
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                yield {"path": os.path.join(root, name)}
+
+
+def iter_manifest(manifest_path):
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, newline="") as f:
+        for row in csv.DictReader(f):
+            path = row["path"]
+            row["path"] = path if os.path.isabs(path) else os.path.join(base, path)
+            yield row
+
+
+def _init_worker():
+    cv2.setNumThreads(1)  # parallelism comes from the process pool
+
+
+def _score_item(item):
+    row = {"path": item["path"]}
+    if "label" in item:
+        row["label"] = item["label"]
+    img = cv2.imread(item["path"])
+    if img is None:
+        row["error"] = "unreadable"
+        return row
+    row["height"], row["width"] = img.shape[:2]
+    row.update(compute_features(img))
+    return row
+
+
+def score_items(items, weights=WEIGHTS, workers=None, chunksize=8):
+    """Yield one row per image (features + weighted score), fanned out over CPU cores."""
+    with Pool(processes=workers or os.cpu_count(), initializer=_init_worker) as pool:
+        for row in pool.imap(_score_item, items, chunksize=chunksize):
+            if "error" not in row:
+                row["score"] = combine(row, weights)
+                row["verified"] = row["score"] > VERIFICATION_THRESHOLD
+            yield row
+
+
+OUTPUT_COLUMNS = ["path", "label", "width", "height", *FEATURES, "score", "verified", "error"]
+
+
+def write_csv(rows, out_path):
+    count = 0
+    with open(out_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=OUTPUT_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_parquet(rows, out_path, batch_rows=4096):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("path", pa.string()), ("label", pa.string()), ("width", pa.int32()), ("height", pa.int32()),
+        *[(name, pa.float64()) for name in FEATURES],
+        ("score", pa.float64()), ("verified", pa.bool_()), ("error", pa.string()),
+    ])
+    count = 0
+    with pq.ParquetWriter(out_path, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            count += 1
+            if len(batch) >= batch_rows:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score images with the four-feature analyzer.")
+    parser.add_argument("source", help="Image directory or CSV manifest (path[,label])")
+    parser.add_argument("-o", "--output", required=True, help="Output .csv or .parquet")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--weights", default=None, help="JSON overrides for WEIGHTS")
+    args = parser.parse_args(argv)
+
+    weights = dict(WEIGHTS, **json.loads(args.weights)) if args.weights else WEIGHTS
+    items = iter_directory(args.source) if os.path.isdir(args.source) else iter_manifest(args.source)
+    rows = score_items(items, weights=weights, workers=args.workers)
+
+    if args.output.lower().endswith(".parquet"):
+        count = write_parquet(rows, args.output)
+    else:
+        count = write_csv(rows, args.output)
+    print(f"Scored {count} image(s) -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
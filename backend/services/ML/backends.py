@@ -0,0 +1,256 @@
+# services/ML/backends.py
+"""
+CLIP inference backends, selected with CLIP_BACKEND:
+
+  torch       fp32 PyTorch (reference; what ml_service always used)
+  torch-int8  PyTorch with dynamic int8 quantization of every nn.Linear
+  onnx        ONNX Runtime graph exported from the reference model
+  onnx-int8   the ONNX graph with dynamically quantized (int8) weights
+  stub        no model: deterministic pseudo-embeddings after CLIP_STUB_LATENCY_MS
+              (load tests and CI only; its decisions are meaningless)
+
+Every backend exposes L2-normalised image/text embeddings and the model's
+logit scale, so the description-match probability is computed the same way
+for all of them (see match_scores). ONNX graphs are exported on first use into
+CLIP_ONNX_DIR, or ahead of time with:
+
+    python -m services.ML.backends export-onnx
+"""
+import hashlib
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+CLIP_BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+STUB_BACKEND = "stub"
+CLIP_STUB_LATENCY_MS = float(os.getenv("CLIP_STUB_LATENCY_MS", 150))  # per encoder call, like a CPU forward pass
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+CLIP_ONNX_DIR = os.getenv("CLIP_ONNX_DIR", os.path.join(BASE_DIR, "models", "clip-onnx"))
+CLIP_NUM_THREADS = int(os.getenv("CLIP_NUM_THREADS", 0))  # 0 = library default
+NEGATIVE_PROMPT = "a clear, normal photo with no pollution"
+
+
+def _normalize(x):
+    x = np.asarray(x, dtype=np.float32)
+    return x / np.linalg.norm(x, axis=-1, keepdims=True).clip(min=1e-12)
+
+
+def _features(out):
+    # transformers 4.x returns a tensor; 5.x wraps it in BaseModelOutputWithPooling
+    return out if hasattr(out, "detach") else out.pooler_output
+
+
+def match_scores(backend, images, descriptions, negative_prompt=NEGATIVE_PROMPT, return_embeddings=False):
+    """
+    P(description_i | image_i) against [description_i, negative_prompt] — the same
+    softmax as CLIPModel(...).logits_per_image for a (description, negative) pair.
+    With return_embeddings=True, returns (probs, image embeddings, description
+    embeddings), both L2-normalised with one row per image.
+    """
+    if not images:
+        empty = np.empty((0, 0), dtype=np.float32)
+        return ([], empty, empty) if return_embeddings else []
+    image_embeds = backend.encode_images(images)
+    text_embeds = backend.encode_texts(list(descriptions) + [negative_prompt])
+    positive = np.einsum("ij,ij->i", image_embeds, text_embeds[:-1])
+    negative = image_embeds @ text_embeds[-1]
+    logits = backend.logit_scale * np.stack([positive, negative], axis=1)
+    logits -= logits.max(axis=1, keepdims=True)
+    probs = np.exp(logits)
+    scores = (probs[:, 0] / probs.sum(axis=1)).tolist()
+    return (scores, image_embeds, text_embeds[:-1]) if return_embeddings else scores
+
+
+class TorchClipBackend:
+    def __init__(self, model_name, quantize=False):
+        import torch
+        from transformers import CLIPModel, CLIPProcessor
+
+        self.torch = torch
+        self.name = "torch-int8" if quantize else "torch"
+        self.device = "cuda" if torch.cuda.is_available() and not quantize else "cpu"
+        if CLIP_NUM_THREADS:
+            torch.set_num_threads(CLIP_NUM_THREADS)
+
+        model = CLIPModel.from_pretrained(model_name).eval()
+        if quantize:
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model.to(self.device)
+        self.processor = CLIPProcessor.from_pretrained(model_name)
+        self.logit_scale = float(model.logit_scale.exp().item())
+
+    def encode_images(self, images):
+        inputs = self.processor(images=images, return_tensors="pt").to(self.device)
+        with self.torch.no_grad():
+            out = self.model.get_image_features(pixel_values=inputs["pixel_values"])
+        return _normalize(_features(out).float().cpu().numpy())
+
+    def encode_texts(self, texts):
+        inputs = self.processor(text=texts, return_tensors="pt", padding=True).to(self.device)
+        with self.torch.no_grad():
+            out = self.model.get_text_features(input_ids=inputs["input_ids"], attention_mask=inputs["attention_mask"])
+        return _normalize(_features(out).float().cpu().numpy())
+
+
+# --- ONNX ---
+def onnx_paths(model_name, quantized=False):
+    folder = os.path.join(CLIP_ONNX_DIR, re.sub(r"[^\w.-]+", "_", model_name))
+    suffix = ".int8.onnx" if quantized else ".onnx"
+    return {
+        "dir": folder,
+        "vision": os.path.join(folder, f"vision{suffix}"),
+        "text": os.path.join(folder, f"text{suffix}"),
+        "logit_scale": os.path.join(folder, "logit_scale.txt"),
+    }
+
+
+def export_onnx(model_name, quantize=True, force=False, log=print):
+    """
+    Export the vision and text towers (fp32, plus int8 copies when quantize=True).
+    Existing files are kept unless force=True.
+    """
+    paths = onnx_paths(model_name)
+    if force or not all(os.path.exists(paths[k]) for k in ("vision", "text", "logit_scale")):
+        _export_fp32(model_name, paths, log)
+
+    q = onnx_paths(model_name, quantized=True)
+    if quantize and (force or not all(os.path.exists(q[k]) for k in ("vision", "text"))):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        for tower in ("vision", "text"):
+            quantize_dynamic(paths[tower], q[tower], weight_type=QuantType.QInt8)
+        log(f"Quantized {q['vision']} and {q['text']}")
+    return paths
+
+
+def _export_fp32(model_name, paths, log):
+    import torch
+    from transformers import CLIPModel
+
+    os.makedirs(paths["dir"], exist_ok=True)
+    model = CLIPModel.from_pretrained(model_name).eval()
+
+    class Vision(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, pixel_values):
+            return _features(self.model.get_image_features(pixel_values=pixel_values))
+
+    class Text(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return _features(self.model.get_text_features(input_ids=input_ids, attention_mask=attention_mask))
+
+    size = model.config.vision_config.image_size
+    with torch.no_grad():
+        torch.onnx.export(
+            Vision(), (torch.zeros(1, 3, size, size),), paths["vision"],
+            input_names=["pixel_values"], output_names=["image_embeds"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+            opset_version=17, dynamo=False,
+        )
+        ids = torch.ones(2, 8, dtype=torch.long)
+        torch.onnx.export(
+            Text(), (ids, torch.ones_like(ids)), paths["text"],
+            input_names=["input_ids", "attention_mask"], output_names=["text_embeds"],
+            dynamic_axes={"input_ids": {0: "batch", 1: "seq"}, "attention_mask": {0: "batch", 1: "seq"},
+                          "text_embeds": {0: "batch"}},
+            opset_version=17, dynamo=False,
+        )
+    with open(paths["logit_scale"], "w") as f:
+        f.write(repr(float(model.logit_scale.exp().item())))
+    log(f"Exported {paths['vision']} and {paths['text']}")
+
+
+class OnnxClipBackend:
+    def __init__(self, model_name, quantize=False):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("CLIP_BACKEND=onnx requires onnxruntime (pip install onnxruntime)")
+        from transformers import CLIPProcessor
+
+        self.name = "onnx-int8" if quantize else "onnx"
+        paths = onnx_paths(model_name, quantized=quantize)
+        export_onnx(model_name, quantize=quantize)  # no-op once the files exist
+
+        options = ort.SessionOptions()
+        if CLIP_NUM_THREADS:
+            options.intra_op_num_threads = CLIP_NUM_THREADS
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        providers = ["CPUExecutionProvider"]
+        self.vision = ort.InferenceSession(paths["vision"], options, providers=providers)
+        self.text = ort.InferenceSession(paths["text"], options, providers=providers)
+        self.processor = CLIPProcessor.from_pretrained(model_name)
+        with open(paths["logit_scale"]) as f:
+            self.logit_scale = float(f.read())
+
+    def encode_images(self, images):
+        pixels = np.asarray(self.processor(images=images, return_tensors="np")["pixel_values"], dtype=np.float32)
+        return _normalize(self.vision.run(None, {"pixel_values": pixels})[0])
+
+    def encode_texts(self, texts):
+        inputs = self.processor(text=texts, return_tensors="np", padding=True)
+        feeds = {
+            "input_ids": np.asarray(inputs["input_ids"], dtype=np.int64),
+            "attention_mask": np.asarray(inputs["attention_mask"], dtype=np.int64),
+        }
+        return _normalize(self.text.run(None, feeds)[0])
+
+
+# --- Stub (no model) ---
+class StubClipBackend:
+    """
+    Stands in for CLIP where the model cannot or should not be loaded. Each
+    encoder call sleeps `latency_ms` (the GIL is released, as in a real forward
+    pass) and returns unit vectors seeded from the input, so the same image or
+    text always gets the same embedding.
+    """
+
+    dim = 512
+
+    def __init__(self, latency_ms=CLIP_STUB_LATENCY_MS):
+        self.name = STUB_BACKEND
+        self.latency_ms = latency_ms
+        self.logit_scale = 100.0
+
+    def _embed(self, keys):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        rows = [
+            np.random.default_rng(int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little"))
+            .standard_normal(self.dim)
+            for key in keys
+        ]
+        return _normalize(np.stack(rows)) if rows else np.empty((0, self.dim), dtype=np.float32)
+
+    def encode_images(self, images):
+        return self._embed([image.resize((16, 16)).tobytes() for image in images])
+
+    def encode_texts(self, texts):
+        return self._embed([text.encode("utf-8") for text in texts])
+
+
+def create_backend(name, model_name):
+    if name == STUB_BACKEND:
+        return StubClipBackend()
+    if name not in CLIP_BACKENDS:
+        raise ValueError(f"Unknown CLIP_BACKEND '{name}' (use one of: {', '.join(CLIP_BACKENDS)})")
+    if name.startswith("onnx"):
+        return OnnxClipBackend(model_name, quantize=name == "onnx-int8")
+    return TorchClipBackend(model_name, quantize=name == "torch-int8")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] != ["export-onnx"]:
+        print("usage: python -m services.ML.backends export-onnx [model-name]")
+        sys.exit(1)
+    export_onnx(sys.argv[2] if len(sys.argv) > 2 else os.getenv("CLIP_MODEL_NAME", "openai/clip-vit-base-patch32"), force=True)
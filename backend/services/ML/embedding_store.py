@@ -0,0 +1,288 @@
+# services/ML/embedding_store.py
+"""
+Persistent CLIP embeddings, one row per Report: image embeddings in
+EMBEDDING_STORE_DIR and description embeddings in its descriptions/ subfolder.
+
+Append-only files per store:
+
+  vectors.f16    row i = L2-normalised embedding, float16 (dim * 2 bytes)
+  ids.i64        row i = report id, int64
+  centroids.f32  IVF coarse centroids (written once the store is big enough)
+
+vectors/ids are memory-mapped read-only; appends go through a file lock so
+every gunicorn worker (and manage.py commands) can write, and readers pick up
+new rows by checking the file sizes before a query. Re-adding a report id
+supersedes its earlier row.
+
+Search is exact (brute-force dot product in float32 blocks) below
+IVF_MIN_ROWS. Above it, rows are bucketed by their nearest centroid and a
+query scans only the IVF_NPROBE closest buckets, so its cost stays at a few
+thousand rows rather than the whole store.
+
+Centroids are trained offline only (`flask build-embedding-index`, also run
+by `flask embed-reports`), never on a request path. Once the store has grown
+IVF_RETRAIN_GROWTH-fold past them the index is stale and searches fall back
+to the exact scan until it is re-trained.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+
+from services.file_lock import locked
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", os.path.join(BASE_DIR, "data", "embeddings"))
+NEAR_DUPLICATE_SIMILARITY = float(os.getenv("NEAR_DUPLICATE_SIMILARITY", 0.95))
+IVF_MIN_ROWS = int(os.getenv("EMBEDDING_IVF_MIN_ROWS", 8192))
+IVF_NPROBE = int(os.getenv("EMBEDDING_IVF_NPROBE", 8))
+IVF_RETRAIN_GROWTH = 4
+IVF_TRAIN_SAMPLE = 20000
+IVF_TRAIN_ITERATIONS = 8
+SEARCH_BLOCK_ROWS = 32768  # float32 scratch per block: 32768 x 512 x 4 B = 64 MiB
+
+
+def train_centroids(vectors, nlist, iterations=IVF_TRAIN_ITERATIONS, seed=0):
+    """Spherical k-means on normalised float32 rows -> (nlist, dim) unit centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)]
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=nlist)
+        sums = np.add.reduceat(vectors[order], np.r_[0, np.cumsum(counts)[:-1]], axis=0)
+        empty = counts == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]  # re-seed empty buckets
+        centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True).clip(min=1e-12)
+    return centroids.astype(np.float32)
+
+
+class EmbeddingStore:
+    def __init__(self, folder=EMBEDDING_STORE_DIR):
+        self.folder = folder
+        self.vectors_path = os.path.join(folder, "vectors.f16")
+        self.ids_path = os.path.join(folder, "ids.i64")
+        self.centroids_path = os.path.join(folder, "centroids.f32")
+        self.meta_path = os.path.join(folder, "meta.json")
+        self._lock = threading.Lock()
+        self.dim = None
+        self._vectors = np.empty((0, 0), dtype=np.float16)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._row_of = {}  # report id -> latest row
+        self._live = np.empty(0, dtype=bool)  # False for superseded rows
+        # IVF state: centroids, bucket of every row, and rows grouped by bucket (rebuilt lazily)
+        self._centroids = None
+        self._trained_rows = 0
+        self._bucket = np.empty(0, dtype=np.int32)
+        self._lists = None
+        self._refresh()
+
+    # ✅ Files
+    def _read_meta(self):
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                return json.load(f)
+        return {}
+
+    def _write_meta(self, **changes):
+        meta = dict(self._read_meta(), **changes)
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _rows_on_disk(self):
+        if self.dim is None:
+            self.dim = self._read_meta().get("dim")
+        if self.dim is None or not os.path.exists(self.ids_path):
+            return 0
+        return min(os.path.getsize(self.ids_path) // 8, os.path.getsize(self.vectors_path) // (self.dim * 2))
+
+    def _refresh(self):
+        """Map any rows appended (by this or another process) since the last call."""
+        rows = self._rows_on_disk()
+        self._load_centroids()
+        with self._lock:
+            seen = len(self._ids)
+            if rows <= seen:
+                return
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float16, mode="r", shape=(rows, self.dim))
+            self._ids = np.memmap(self.ids_path, dtype=np.int64, mode="r", shape=(rows,))
+            live = np.ones(rows, dtype=bool)
+            live[:seen] = self._live
+            for row in range(seen, rows):
+                report_id = int(self._ids[row])
+                previous = self._row_of.get(report_id)
+                if previous is not None:
+                    live[previous] = False
+                self._row_of[report_id] = row
+            self._live = live
+            if self._centroids is not None:
+                self._bucket = np.concatenate([self._bucket, self._assign(seen, rows)])
+                self._lists = None
+
+    # ✅ IVF
+    def _assign(self, start, stop):
+        buckets = []
+        for s in range(start, stop, SEARCH_BLOCK_ROWS):
+            block = np.asarray(self._vectors[s:min(stop, s + SEARCH_BLOCK_ROWS)], dtype=np.float32)
+            buckets.append(np.argmax(block @ self._centroids.T, axis=1).astype(np.int32))
+        return np.concatenate(buckets) if buckets else np.empty(0, dtype=np.int32)
+
+    def _load_centroids(self):
+        trained_rows = self._read_meta().get("trained_rows", 0) if os.path.exists(self.centroids_path) else 0
+        if not trained_rows or trained_rows == self._trained_rows:
+            return
+        centroids = np.fromfile(self.centroids_path, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            self._centroids, self._trained_rows = centroids, trained_rows
+            self._bucket = self._assign(0, len(self._ids))
+            self._lists = None
+
+    def index_stale(self):
+        """True when the store is big enough for IVF but has no centroids, or has outgrown them."""
+        rows = len(self._ids)
+        if rows < IVF_MIN_ROWS:
+            return False
+        return self._centroids is None or rows >= self._trained_rows * IVF_RETRAIN_GROWTH
+
+    def build_index(self, force=False):
+        """
+        (Re)train IVF centroids if the store is big enough and has outgrown the current ones.
+        Offline only (CLI): k-means over the training sample takes seconds.
+        """
+        rows = self._rows_on_disk()
+        if rows < IVF_MIN_ROWS:
+            return False
+        if not force and self._trained_rows and rows < self._trained_rows * IVF_RETRAIN_GROWTH:
+            return False
+
+        sample_rows = np.random.default_rng(rows).choice(rows, min(rows, IVF_TRAIN_SAMPLE), replace=False)
+        vectors = np.memmap(self.vectors_path, dtype=np.float16, mode="r", shape=(rows, self.dim))
+        sample = np.asarray(vectors[np.sort(sample_rows)], dtype=np.float32)
+        nlist = int(np.clip(np.sqrt(rows), 16, 1024))
+        centroids = train_centroids(sample, nlist)
+
+        with locked(os.path.join(self.folder, ".lock")):
+            tmp_path = f"{self.centroids_path}.tmp"
+            centroids.tofile(tmp_path)
+            os.replace(tmp_path, self.centroids_path)
+            self._write_meta(trained_rows=rows, nlist=nlist)
+        self._refresh()
+        return True
+
+    def _ivf_rows(self, query, nprobe):
+        with self._lock:
+            if self._lists is None:
+                order = np.argsort(self._bucket, kind="stable")
+                bounds = np.searchsorted(self._bucket[order], np.arange(len(self._centroids) + 1))
+                self._lists = (order, bounds)
+            order, bounds = self._lists
+            centroids = self._centroids
+        probe = np.argpartition(-(centroids @ query), min(nprobe, len(centroids)) - 1)[:nprobe]
+        return np.sort(np.concatenate([order[bounds[b]:bounds[b + 1]] for b in probe]))
+
+    # ✅ Writes
+    def add_many(self, report_ids, vectors):
+        """Append embeddings (any float dtype, normalised here) for the given report ids."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(report_ids), -1)
+        if not len(report_ids):
+            return
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+
+        os.makedirs(self.folder, exist_ok=True)
+        with locked(os.path.join(self.folder, ".lock")):
+            rows = self._rows_on_disk()
+            if self.dim is None:
+                self._write_meta(dim=vectors.shape[1], dtype="float16")
+                self.dim = vectors.shape[1]
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding has {vectors.shape[1]} dims, store holds {self.dim}")
+
+            # a writer that died mid-append can leave the two files out of step: cut both back first
+            with open(self.vectors_path, "ab") as vf, open(self.ids_path, "ab") as idf:
+                vf.truncate(rows * self.dim * 2)
+                idf.truncate(rows * 8)
+                vf.write(vectors.astype(np.float16).tobytes())
+                vf.flush()
+                idf.write(np.asarray(report_ids, dtype=np.int64).tobytes())
+        self._refresh()
+
+    def add(self, report_id, vector):
+        self.add_many([report_id], [vector])
+
+    # ✅ Reads
+    def __len__(self):
+        self._refresh()
+        return len(self._row_of)
+
+    def get(self, report_id):
+        self._refresh()
+        row = self._row_of.get(report_id)
+        return None if row is None else np.asarray(self._vectors[row], dtype=np.float32)
+
+    def search(self, vector, k=10, report_ids=None, exclude=(), min_similarity=None, exact=False):
+        """
+        Top-k (report_id, cosine similarity) for a query embedding, best first.
+        `report_ids` restricts the search to those reports (filters apply before
+        ranking). IVF is used once an index is trained and not stale, unless exact=True.
+        """
+        self._refresh()
+        if not len(self._ids) or k <= 0:
+            return []
+
+        query = np.asarray(vector, dtype=np.float32).ravel()
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        use_ivf = self._centroids is not None and not exact and not self.index_stale()
+        if report_ids is not None:
+            rows = np.sort(np.fromiter((self._row_of[i] for i in report_ids if i in self._row_of), dtype=np.int64))
+            if use_ivf and len(rows) > IVF_MIN_ROWS:
+                # large filtered set: probe buckets, widening until enough allowed rows are in range
+                allowed, nprobe = rows, IVF_NPROBE
+                while True:
+                    rows = np.intersect1d(self._ivf_rows(query, nprobe), allowed, assume_unique=True)
+                    if len(rows) >= k * 4 or nprobe >= len(self._centroids):
+                        break
+                    nprobe *= 2
+        elif use_ivf:
+            rows = self._ivf_rows(query, IVF_NPROBE)
+        else:
+            rows = None
+
+        vectors, ids, live = self._vectors, self._ids, self._live
+        if rows is None:
+            scores = np.empty(len(ids), dtype=np.float32)
+            for start in range(0, len(ids), SEARCH_BLOCK_ROWS):
+                block = np.asarray(vectors[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+                scores[start:start + len(block)] = block @ query
+            rows = np.arange(len(ids))
+        else:
+            scores = np.asarray(vectors[rows], dtype=np.float32) @ query
+
+        dropped = ~live[rows]
+        for report_id in exclude:
+            if report_id in self._row_of:
+                dropped |= rows == self._row_of[report_id]
+        scores[dropped] = -np.inf
+
+        k = min(k, len(scores))
+        if not k:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        out = []
+        for i in top:
+            score = float(scores[i])
+            if score == -np.inf or (min_similarity is not None and score < min_similarity):
+                break
+            out.append((int(ids[rows[i]]), score))
+        return out
+
+    def near_duplicates(self, vector, exclude=(), threshold=NEAR_DUPLICATE_SIMILARITY, k=5):
+        return self.search(vector, k=k, exclude=exclude, min_similarity=threshold)
+
+
+embedding_store = EmbeddingStore()  # CLIP image embeddings
+description_store = EmbeddingStore(os.path.join(EMBEDDING_STORE_DIR, "descriptions"))  # CLIP text embeddings
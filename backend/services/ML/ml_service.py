@@ -1,13 +1,39 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import numpy as np
 from PIL import Image
-import torch
-from transformers import CLIPProcessor, CLIPModel
 
-device = "cuda" if torch.cuda.is_available() else "cpu"
+from services.ML.backends import NEGATIVE_PROMPT, match_scores
+from services.metrics import upload_stage, verify_image_seconds
 
-clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32").to(device)
-clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+CLIP_MODEL_NAME = os.getenv("CLIP_MODEL_NAME", "openai/clip-vit-base-patch32")
+
+# ✅ When set, CLIP runs in one shared `services.ML.model_server` process and
+# this worker never loads torch/transformers (see docs/ml_serving.md)
+CLIP_SERVER_SOCKET = os.getenv("CLIP_SERVER_SOCKET")
+
+# ✅ Inference backend: torch (fp32 reference) | torch-int8 | onnx | onnx-int8 | stub (see services/ML/backends.py)
+CLIP_BACKEND = os.getenv("CLIP_BACKEND", "torch")
+
+clip_backend = None
+
+
+def load_clip():
+    """Load the CLIP backend into this process (idempotent). Called at import unless CLIP_SERVER_SOCKET is set."""
+    global clip_backend
+    if clip_backend is None:
+        from services.ML.backends import create_backend
+        clip_backend = create_backend(CLIP_BACKEND, CLIP_MODEL_NAME)
+    return clip_backend
+
+
+if CLIP_SERVER_SOCKET:
+    from services.ML.model_server import ModelClient
+    model_client = ModelClient(CLIP_SERVER_SOCKET)
+else:
+    model_client = None
+    load_clip()
 
 POLLUTION_THRESHOLD = 45
 DESCRIPTION_MATCH_THRESHOLD = 0.6
@@ -24,23 +50,28 @@ def analyze_image_for_pollution(image_path):
     except Exception:
         return 0.0, {}
 
-def verify_description_match(image_path, description):
-    try:
-        image = Image.open(image_path)
-        texts = [description, "a clear, normal photo with no pollution"]
-        inputs = clip_processor(text=texts, images=image, return_tensors="pt", padding=True).to(device)
-        outputs = clip_model(**inputs)
-        logits_per_image = outputs.logits_per_image
-        probs = logits_per_image.softmax(dim=1)
-        return probs[0][0].item()
-    except Exception:
-        return 0.0
+def verify_description_match(image_path, description, with_embeddings=False):
+    """CLIP match probability; with_embeddings=True returns (probability, embeddings dict or None)."""
+    scores, embeddings = verify_description_matches([image_path], [description], batch_size=1, with_embeddings=True)
+    return (scores[0], embeddings[0]) if with_embeddings else scores[0]
 
-def verify_image(image_path, description):
-    pollution_confidence, details = analyze_image_for_pollution(image_path)
 
+def encode_texts(texts):
+    """Normalised CLIP text embeddings (float32, one row per text) — e.g. for search queries."""
+    if model_client is not None:
+        return model_client.encode_texts(texts)
+    return clip_backend.encode_texts(list(texts))
+
+
+def _result(pollution_confidence, details, desc_conf=None, embeddings=None):
+    result = _decision(pollution_confidence, details, desc_conf)
+    if embeddings:
+        result.update(embeddings)  # persisted by the caller (services/ML/embedding_store.py)
+    return result
+
+
+def _decision(pollution_confidence, details, desc_conf=None):
     if pollution_confidence > POLLUTION_THRESHOLD:
-        desc_conf = verify_description_match(image_path, description)
         if desc_conf > DESCRIPTION_MATCH_THRESHOLD:
             return {
                 "verified": True,
@@ -71,3 +102,79 @@ def verify_image(image_path, description):
             "awarded_credits": 0,
             "points": 0
         }
+
+
+@verify_image_seconds.time()
+def verify_image(image_path, description):
+    with upload_stage("canny"):
+        pollution_confidence, details = analyze_image_for_pollution(image_path)
+
+    desc_conf, embeddings = None, None
+    if pollution_confidence > POLLUTION_THRESHOLD:
+        with upload_stage("clip"):
+            desc_conf, embeddings = verify_description_match(image_path, description, with_embeddings=True)
+    return _result(pollution_confidence, details, desc_conf, embeddings)
+
+
+# --- Batched variants (bulk upload / re-scoring) ---
+def analyze_images_for_pollution(image_paths, max_workers=4):
+    """Canny stage for many images; OpenCV releases the GIL so a thread pool scales across cores."""
+    if len(image_paths) <= 1:
+        return [analyze_image_for_pollution(p) for p in image_paths]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(image_paths))) as pool:
+        return list(pool.map(analyze_image_for_pollution, image_paths))
+
+
+def verify_description_matches(image_paths, descriptions, batch_size=16, with_embeddings=False):
+    """
+    Batched CLIP pass. For every image i this returns the softmax over
+    [description_i, NEGATIVE_PROMPT] of the scaled image/text similarities.
+    With with_embeddings=True returns (scores, embeddings): per image a dict of
+    normalised float16 "image_embedding" / "description_embedding", or None
+    where the image could not be read.
+    """
+    if model_client is not None:
+        if not image_paths:
+            return ([], []) if with_embeddings else []
+        return model_client.match(image_paths, descriptions, with_embeddings=with_embeddings)
+
+    scores = [0.0] * len(image_paths)
+    embeddings = [None] * len(image_paths)
+    for start in range(0, len(image_paths), batch_size):
+        idx = list(range(start, min(start + batch_size, len(image_paths))))
+        images, ok = [], []
+        for i in idx:
+            try:
+                images.append(Image.open(image_paths[i]).convert("RGB"))
+                ok.append(i)
+            except Exception:
+                pass
+        if not images:
+            continue
+        try:
+            probs, image_embeds, text_embeds = match_scores(
+                clip_backend, images, [descriptions[i] for i in ok], NEGATIVE_PROMPT, return_embeddings=True
+            )
+        except Exception:
+            continue
+        for i, prob, image_embed, text_embed in zip(
+            ok, probs, image_embeds.astype(np.float16), text_embeds.astype(np.float16)
+        ):
+            scores[i] = prob
+            embeddings[i] = {"image_embedding": image_embed, "description_embedding": text_embed}
+    return (scores, embeddings) if with_embeddings else scores
+
+
+def verify_images(image_paths, descriptions):
+    """Batched verify_image: one Canny pass per image, one CLIP call per batch of candidates."""
+    analysed = analyze_images_for_pollution(image_paths)
+    candidates = [i for i, (conf, _) in enumerate(analysed) if conf > POLLUTION_THRESHOLD]
+    desc_scores, embeddings = verify_description_matches(
+        [image_paths[i] for i in candidates], [descriptions[i] for i in candidates], with_embeddings=True
+    )
+    desc_by_index = dict(zip(candidates, desc_scores))
+    embedding_by_index = dict(zip(candidates, embeddings))
+    return [
+        _result(conf, details, desc_by_index.get(i), embedding_by_index.get(i))
+        for i, (conf, details) in enumerate(analysed)
+    ]
@@ -0,0 +1,253 @@
+# services/ML/model_server.py
+"""
+Single-process CLIP inference server for gunicorn deployments.
+
+One process owns the model; request workers (with CLIP_SERVER_SOCKET set)
+send (image_path, description) pairs over a Unix socket and get back the
+description-match probabilities and image embeddings. Image paths are passed rather than bytes:
+workers and the server share the host's temp directory. Concurrent requests
+are coalesced into one batched CLIP call (up to --max-batch images or
+--batch-wait-ms after the first arrival).
+
+    cd backend
+    python -m services.ML.model_server --socket /run/breathe_smart/clip.sock
+    CLIP_SERVER_SOCKET=/run/breathe_smart/clip.sock gunicorn -w 8 app:app
+
+Connections unpickle what they receive, so both ends authenticate with a
+shared secret: CLIP_SERVER_AUTHKEY if set, otherwise a random key the server
+writes to `<socket>.key` (0600) at startup and clients read when they connect.
+The socket itself is created 0600: only the server's user can connect.
+"""
+import argparse
+import os
+import queue
+import secrets
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+AUTHKEY = os.getenv("CLIP_SERVER_AUTHKEY")
+_LEGACY_AUTHKEY = "breathe-smart-clip"  # the old built-in default: public, so refused
+DEFAULT_TIMEOUT = float(os.getenv("CLIP_SERVER_TIMEOUT", 60))
+
+
+class ModelServerError(RuntimeError):
+    pass
+
+
+# ✅ Shared secret
+def key_path(socket_path):
+    return f"{socket_path}.key"
+
+
+def server_authkey(socket_path):
+    """CLIP_SERVER_AUTHKEY, else a fresh random key written to <socket>.key, readable by this user only."""
+    if AUTHKEY:
+        return AUTHKEY.encode()
+    path = key_path(socket_path)
+    if os.path.exists(path):
+        os.remove(path)
+    key = secrets.token_hex(32).encode()
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "wb") as f:
+        f.write(key)
+    return key
+
+
+def client_authkey(socket_path):
+    """Read on every (re)connect, so a restarted server's new key is picked up."""
+    if AUTHKEY:
+        return AUTHKEY.encode()
+    try:
+        with open(key_path(socket_path), "rb") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        raise ModelServerError(
+            f"No key at {key_path(socket_path)}: start the model server first or set CLIP_SERVER_AUTHKEY"
+        ) from None
+
+
+class ModelClient:
+    """Thread-safe client: one connection per worker thread, reconnecting on failure."""
+
+    def __init__(self, socket_path, timeout=DEFAULT_TIMEOUT, authkey=None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.authkey = authkey
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            authkey = self.authkey or client_authkey(self.socket_path)
+            try:
+                conn = self._local.conn = Client(self.socket_path, family="AF_UNIX", authkey=authkey)
+            except AuthenticationError:
+                raise ModelServerError(f"CLIP server at {self.socket_path} rejected our key") from None
+        return conn
+
+    def _drop(self):
+        """Close this thread's connection: a reply may still arrive on it and must never be read as
+        the answer to the next request (that would be another image's scores)."""
+        conn, self._local.conn = getattr(self._local, "conn", None), None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _call(self, message):
+        for attempt in (1, 2):
+            try:
+                conn = self._conn()
+                conn.send(message)
+                if not conn.poll(self.timeout):
+                    self._drop()
+                    raise ModelServerError(f"CLIP server did not answer within {self.timeout}s")
+                return conn.recv()
+            except (OSError, EOFError) as e:
+                self._drop()
+                if attempt == 2:
+                    raise ModelServerError(f"CLIP server unavailable at {self.socket_path}: {e}")
+            except BaseException:
+                self._drop()  # interrupted between send and recv: the pipe is out of step
+                raise
+
+    def match(self, image_paths, descriptions, with_embeddings=False):
+        reply = self._call(("match", [os.path.abspath(p) for p in image_paths], list(descriptions)))
+        if reply[0] != "ok":
+            raise ModelServerError(reply[1])
+        return (reply[1], reply[2]) if with_embeddings else reply[1]
+
+    def encode_texts(self, texts):
+        reply = self._call(("encode_texts", list(texts)))
+        if reply[0] != "ok":
+            raise ModelServerError(reply[1])
+        return reply[1]
+
+    def ping(self):
+        return self._call(("ping",))
+
+
+class ModelServer:
+    def __init__(self, socket_path, max_batch=32, batch_wait_ms=5, authkey=None):
+        self.socket_path = socket_path
+        self.authkey = authkey
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait_ms / 1000.0
+        self.requests = queue.Queue()
+        self.model_lock = threading.Lock()  # batched matches and text encodes never run concurrently
+        self.stats = {"requests": 0, "images": 0, "batches": 0}
+
+    # ✅ Inference loop: the only thread that touches the model
+    def _infer_loop(self):
+        from services.ML.ml_service import verify_description_matches
+
+        while True:
+            batch = [self.requests.get()]
+            images = len(batch[0][0])
+            deadline = time.monotonic() + self.batch_wait
+            while images < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                images += len(item[0])
+
+            paths = [p for item in batch for p in item[0]]
+            descriptions = [d for item in batch for d in item[1]]
+            try:
+                with self.model_lock:
+                    scores, embeddings = verify_description_matches(
+                        paths, descriptions, batch_size=self.max_batch, with_embeddings=True
+                    )
+                offset = 0
+                for item_paths, _, reply in batch:
+                    end = offset + len(item_paths)
+                    reply.put(("ok", scores[offset:end], embeddings[offset:end]))
+                    offset = end
+            except Exception as e:
+                for _, _, reply in batch:
+                    reply.put(("error", str(e)))
+
+            self.stats["batches"] += 1
+            self.stats["images"] += len(paths)
+
+    # ✅ One thread per worker connection
+    def _serve_conn(self, conn):
+        reply = queue.Queue(maxsize=1)
+        with conn:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    return
+                if message[0] == "ping":
+                    conn.send(("ok", dict(self.stats)))
+                elif message[0] == "encode_texts":
+                    # small and latency-sensitive (search queries): run inline rather than queue behind image batches
+                    try:
+                        from services.ML.ml_service import encode_texts
+                        with self.model_lock:
+                            conn.send(("ok", encode_texts(message[1])))
+                    except Exception as e:
+                        conn.send(("error", str(e)))
+                elif message[0] == "match":
+                    self.stats["requests"] += 1
+                    self.requests.put((message[1], message[2], reply))
+                    try:
+                        conn.send(reply.get())
+                    except OSError:
+                        return  # the client gave up waiting and closed the connection
+                else:
+                    conn.send(("error", f"unknown op {message[0]!r}"))
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.socket_path)), exist_ok=True)
+
+        authkey = self.authkey or server_authkey(self.socket_path)
+        old_umask = os.umask(0o177)  # the socket is born 0600: no window where others could connect
+        try:
+            listener = Listener(self.socket_path, family="AF_UNIX", authkey=authkey)
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.socket_path, 0o600)
+        threading.Thread(target=self._infer_loop, name="clip-infer", daemon=True).start()
+        print(f"CLIP model server listening on {self.socket_path}")
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:  # bad authkey / client hung up during handshake
+                    print(f"Rejected connection: {e}")
+                    continue
+                threading.Thread(target=self._serve_conn, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve CLIP to local gunicorn workers over a Unix socket.")
+    parser.add_argument("--socket", default=os.getenv("CLIP_SERVER_SOCKET", "/tmp/breathe_smart_clip.sock"))
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--batch-wait-ms", type=float, default=5)
+    args = parser.parse_args(argv)
+    if AUTHKEY == _LEGACY_AUTHKEY:
+        parser.error("CLIP_SERVER_AUTHKEY is the old public default; unset it (a random key is generated) or pick a secret")
+
+    # this process *is* the model owner: make sure ml_service loads CLIP locally
+    os.environ.pop("CLIP_SERVER_SOCKET", None)
+    from services.ML import ml_service
+    ml_service.load_clip()
+
+    ModelServer(args.socket, max_batch=args.max_batch, batch_wait_ms=args.batch_wait_ms).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# services/ML/reverify.py
+"""
+Re-score stored report images with the current ML pipeline and thresholds.
+
+Reports are read in id order with keyset pagination, scored in chunks on a
+process pool (one batched CLIP call per chunk) and written back in batched
+transactions. A JSON checkpoint is written after every committed batch, so an
+interrupted run resumes from the last committed report id.
+
+Rows a validator rejected, or the abuse detector flagged, are skipped: their
+status is not an ML decision. New scores are merged into the stored `details`.
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import select, update
+
+from extensions import db
+from models import Report
+from services.blob_store import BlobNotFound, parse_ref
+from services.ML.embedding_store import description_store, embedding_store
+
+REVERIFIABLE_STATUSES = ("verified", "rejected")
+# a validator's rejection or an abuse verdict is not an ML decision: such rows are never re-scored
+PROTECTED_DETAIL_KEYS = ("rejected_by", "rejection_reason", "abuse")
+
+
+def _init_worker():
+    # one intra-op thread per process: N processes x 1 thread beats N x all-cores contention
+    import torch
+    torch.set_num_threads(1)
+
+
+def _score_chunk(chunk):
+    """Runs in a pool process. chunk: [(report_id, image_path, description), ...]"""
+    from services.ML.ml_service import verify_images
+
+    results = verify_images([c[1] for c in chunk], [c[2] for c in chunk])
+    return [(c[0], r) for c, r in zip(chunk, results)]
+
+
+def _load_checkpoint(path):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return None
+
+
+def _save_checkpoint(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def stored_image_path(app, report, tmpdir):
+    """Path of the report's image, or None if it is missing. Blobs in a remote store are downloaded into tmpdir."""
+    key = parse_ref(report.image_filename)
+    if key:
+        try:
+            return app.extensions["blob_store"].local_path(key, tmpdir)
+        except BlobNotFound:
+            return None
+    folders = [app.config["VERIFIED_FOLDER"], app.config["REJECTED_FOLDER"]]
+    if report.status == "rejected":
+        folders.reverse()
+    for folder in folders:
+        path = os.path.join(folder, report.image_filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def is_protected(details):
+    return any(key in (details or {}) for key in PROTECTED_DETAIL_KEYS)
+
+
+def _iter_pages(statuses, after_id, page_size):
+    columns = (Report.id, Report.status, Report.image_filename, Report.description, Report.details)
+    while True:
+        rows = db.session.execute(
+            select(*columns)
+            .where(Report.id > after_id, Report.status.in_(statuses), Report.image_filename.isnot(None))
+            .order_by(Report.id)
+            .limit(page_size)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1].id
+
+
+def reverify_reports(app, decide, workers=None, chunk_size=16, commit_every=500,
+                     checkpoint_path=None, dry_run=False, restart=False,
+                     statuses=REVERIFIABLE_STATUSES, pollution_threshold=None,
+                     description_threshold=None, log=print, publish=None):
+    """
+    `decide(ml_result, pollution_threshold, description_threshold)` is the route-level
+    decision function, so re-scoring applies exactly the rules uploads use.
+    `publish(report_ids)` runs inside each write transaction, before its commit,
+    so live views get an `updated` event per rewritten row. Returns the final checkpoint state.
+    """
+    state = None if restart else _load_checkpoint(checkpoint_path)
+    if state is None:
+        state = {"last_id": 0, "processed": 0, "missing_files": 0, "skipped_protected": 0,
+                 "flipped_to_verified": 0, "flipped_to_rejected": 0, "unchanged": 0, "dry_run": dry_run}
+    elif state.get("dry_run") != dry_run:
+        raise ValueError("Checkpoint was written by a run with a different --dry-run setting; use --restart")
+
+    started = time.time()
+    pending_updates = []  # dicts for executemany UPDATE
+    pending_moves = []  # (src, dst)
+    pending_embeddings = []  # (report_id, ml_result)
+    last_scored_id = state["last_id"]
+
+    def flush():
+        nonlocal pending_updates, pending_moves, pending_embeddings
+        if not dry_run and pending_updates:
+            moved = []
+            try:
+                for src, dst in pending_moves:
+                    shutil.move(src, dst)
+                    moved.append((src, dst))
+                db.session.execute(update(Report), pending_updates)
+                if publish:
+                    publish([u["id"] for u in pending_updates])
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                for src, dst in reversed(moved):
+                    shutil.move(dst, src)
+                raise
+            for store, key in ((embedding_store, "image_embedding"), (description_store, "description_embedding")):
+                pairs = [(rid, r[key]) for rid, r in pending_embeddings if r.get(key) is not None]
+                if pairs:
+                    store.add_many([rid for rid, _ in pairs], [e for _, e in pairs])
+        pending_updates, pending_moves, pending_embeddings = [], [], []
+        state["last_id"] = last_scored_id
+        if checkpoint_path:
+            _save_checkpoint(checkpoint_path, state)
+        rate = state["processed"] / max(1e-6, time.time() - started)
+        log(f"… last_id={state['last_id']} processed={state['processed']} "
+            f"+verified={state['flipped_to_verified']} +rejected={state['flipped_to_rejected']} ({rate:.1f}/s)")
+
+    def apply(scored, meta):
+        nonlocal last_scored_id
+        for report_id, ml_result in scored:
+            status, description, src, is_blob, details = meta.pop(report_id)
+            if src.startswith(tmpdir):
+                os.remove(src)  # downloaded from a remote blob store for scoring
+            decision = decide(ml_result, pollution_threshold, description_threshold)
+            was_verified = status == "verified"
+            new_status = "verified" if decision["verified"] else "rejected"
+
+            if decision["verified"] != was_verified:
+                state["flipped_to_verified" if decision["verified"] else "flipped_to_rejected"] += 1
+            else:
+                state["unchanged"] += 1
+            state["processed"] += 1
+            last_scored_id = report_id
+
+            decision["details"]["_rescored_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            pending_updates.append({
+                "id": report_id,
+                "status": new_status,
+                "pollution_confidence": decision["poll_conf_pct"],
+                "description_match_confidence": decision["desc_conf_frac"],
+                # new scores over the stored details: near_duplicates, validator notes etc. are kept
+                "details": {**(details or {}), **decision["details"]},
+                "awarded_credits": decision["awarded"],
+                "points": ml_result.get("points", 0),
+            })
+            pending_embeddings.append((report_id, ml_result))
+            if new_status != status and not is_blob:  # blobs: the status column is all that changes
+                folder = app.config["VERIFIED_FOLDER"] if decision["verified"] else app.config["REJECTED_FOLDER"]
+                pending_moves.append((src, os.path.join(folder, os.path.basename(src))))
+
+            if len(pending_updates) >= commit_every:
+                flush()
+
+    workers = workers or os.cpu_count() or 1
+    meta = {}  # report_id -> (status, description, path, is_blob) for in-flight work
+    tmp = tempfile.TemporaryDirectory(prefix="reverify_")
+    tmpdir = tmp.name + os.sep
+    with tmp, ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        in_flight = deque()
+        for rows in _iter_pages(list(statuses), state["last_id"], page_size=chunk_size * workers):
+            chunk = []
+            for row in rows:
+                if is_protected(row.details):
+                    state["skipped_protected"] = state.get("skipped_protected", 0) + 1  # older checkpoints lack it
+                    continue
+                path = stored_image_path(app, row, tmpdir)
+                if path is None:
+                    state["missing_files"] += 1
+                    continue
+                meta[row.id] = (row.status, row.description or "", path, parse_ref(row.image_filename) is not None,
+                                row.details)
+                chunk.append((row.id, path, row.description or ""))
+                if len(chunk) == chunk_size:
+                    in_flight.append(pool.submit(_score_chunk, chunk))
+                    chunk = []
+            if chunk:
+                in_flight.append(pool.submit(_score_chunk, chunk))
+
+            # results are applied in submission (= id) order so the checkpoint is always a safe resume point
+            while len(in_flight) > workers * 2:
+                apply(in_flight.popleft().result(), meta)
+
+        while in_flight:
+            apply(in_flight.popleft().result(), meta)
+
+    flush()
+    return state
@@ -0,0 +1,269 @@
+# services/abuse_detector.py
+"""
+Streaming abuse checks on the upload path, run before the ML stage.
+
+Each user's latest stored uploads are kept as (time, lat, lng, flagged,
+report id) in a ring buffer packed into one array('d'): 40 bytes a slot,
+max(ABUSE_MAX_UPLOADS_PER_WINDOW, ABUSE_MAX_IMAGES_PER_WINDOW) slots a
+user. Users are evicted least recently seen first beyond
+ABUSE_MAX_TRACKED_USERS, which bounds memory. A check reads the buffer
+only: no query on the upload path once a user is tracked.
+
+An upload event is one request: a single upload, or a whole bulk batch,
+whose reports share one `created_at`. Three rules apply:
+
+- rate: the user already has ABUSE_MAX_UPLOADS_PER_WINDOW upload events
+  inside ABUSE_WINDOW_SECONDS, i.e. this would be event N+1.
+- images: the user already stored ABUSE_MAX_IMAGES_PER_WINDOW images
+  inside the window. A bulk batch counts every image, so /bulk is not a
+  way around the rate: the items past the allowance are flagged.
+- geo_velocity: the jump from the latest upload event with an unflagged
+  report implies a speed above ABUSE_MAX_SPEED_KMH (for a batch, its
+  nearest unflagged location counts). Jumps shorter than ABUSE_MIN_JUMP_KM
+  never count, so GPS jitter and nearby places are fine at any pace. Items
+  of the same batch are not compared with each other: they share one
+  upload time, not one capture time.
+
+A flagged upload skips ML. It is stored as rejected, with the verdict in
+`details["abuse"]`. Flagged uploads still count towards the limits, but
+their location is not a reference for the next velocity check, so one
+spoofed location cannot get the next honest upload flagged.
+
+check() records nothing. Uploads are recorded once stored: by the worker
+that stored them (`record`), and by every other worker from the change
+log tail (`observe`, services/change_log.py), deduplicated by report id.
+So an upload refused by admission control, or failing before it is saved,
+never counts, and a user spreading uploads over N workers is still held
+to one limit (each worker sees the others' within about a second). A
+user's buffer is seeded from their latest reports the first time a worker
+sees them, so restarts and evictions lose nothing. Re-uploads of an
+existing report update it and are limited by admission control only.
+"""
+import math
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from extensions import db
+from models import Report
+from services.AQI.stations import chord_to_km, to_unit_vector
+
+ABUSE_DETECTION = os.getenv("ABUSE_DETECTION", "1") == "1"
+ABUSE_WINDOW_SECONDS = float(os.getenv("ABUSE_WINDOW_SECONDS", 3600))
+ABUSE_MAX_UPLOADS_PER_WINDOW = int(os.getenv("ABUSE_MAX_UPLOADS_PER_WINDOW", 20))
+ABUSE_MAX_IMAGES_PER_WINDOW = int(os.getenv("ABUSE_MAX_IMAGES_PER_WINDOW", 60))
+ABUSE_MAX_SPEED_KMH = float(os.getenv("ABUSE_MAX_SPEED_KMH", 900))  # an airliner
+ABUSE_MIN_JUMP_KM = float(os.getenv("ABUSE_MIN_JUMP_KM", 20))
+ABUSE_MAX_TRACKED_USERS = int(os.getenv("ABUSE_MAX_TRACKED_USERS", 10000))
+
+_FIELDS = 5  # time, lat, lng, flagged, report id
+
+
+class UploadHistory:
+    """A user's most recent stored uploads, oldest overwritten first."""
+
+    __slots__ = ("capacity", "size", "head", "data")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.size = 0
+        self.head = 0  # next slot to write
+        self.data = array("d", bytes(8 * _FIELDS * capacity))
+
+    def append(self, at, lat, lng, flagged, report_id):
+        i = self.head * _FIELDS
+        self.data[i:i + _FIELDS] = array("d", (at, lat, lng, 1.0 if flagged else 0.0, report_id))
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def entries(self):
+        """(time, lat, lng, flagged, report id), in no particular order."""
+        for k in range(self.size):
+            i = k * _FIELDS
+            yield self.data[i], self.data[i + 1], self.data[i + 2], self.data[i + 3] != 0.0, int(self.data[i + 4])
+
+    def __contains__(self, report_id):
+        return any(self.data[k * _FIELDS + 4] == report_id for k in range(self.size))
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    return chord_to_km(math.dist(to_unit_vector(lat1, lng1), to_unit_vector(lat2, lng2)))
+
+
+def _epoch(dt):
+    return dt.replace(tzinfo=timezone.utc).timestamp()  # report timestamps are naive UTC
+
+
+class AbuseDetector:
+    def __init__(self, window_seconds=ABUSE_WINDOW_SECONDS, max_uploads=ABUSE_MAX_UPLOADS_PER_WINDOW,
+                 max_images=ABUSE_MAX_IMAGES_PER_WINDOW, max_speed_kmh=ABUSE_MAX_SPEED_KMH,
+                 min_jump_km=ABUSE_MIN_JUMP_KM, max_tracked_users=ABUSE_MAX_TRACKED_USERS):
+        self.window_seconds = window_seconds
+        self.max_uploads = max(1, max_uploads)
+        self.max_images = max(1, max_images)
+        self.max_speed_kmh = max_speed_kmh
+        self.min_jump_km = min_jump_km
+        self.max_tracked_users = max_tracked_users
+        self.capacity = max(self.max_uploads, self.max_images)  # enough to see a whole window of either limit
+        self._users = OrderedDict()  # user -> UploadHistory, least recently seen first
+        self._seeding = {}  # user -> uploads observed while their seed query runs
+        self._lock = threading.Lock()
+        self.stats = {"checked": 0, "flagged_rate": 0, "flagged_images": 0, "flagged_geo_velocity": 0,
+                      "seeded": 0, "observed": 0}
+
+    # ✅ Per-user buffers
+    def _seed(self, user):
+        """The user's latest reports, as record() takes them (this worker has not seen the user yet)."""
+        rows = db.session.execute(
+            select(Report.id, Report.created_at, Report.lat, Report.lng, Report.details)
+            .where(Report.user_name == user).order_by(Report.id.desc()).limit(self.capacity)
+        ).all()
+        return list(reversed(rows))
+
+    def _history(self, user):
+        with self._lock:
+            history = self._users.get(user)
+            if history is not None:
+                self._users.move_to_end(user)
+                return history
+            self._seeding.setdefault(user, [])
+        rows = self._seed(user)  # DB read outside the lock
+        with self._lock:
+            history = self._users.get(user)
+            if history is None:  # else another request seeded it first
+                history = UploadHistory(self.capacity)
+                self._append(history, rows + self._seeding.get(user, []))
+                if len(self._users) >= self.max_tracked_users:
+                    self._users.popitem(last=False)
+                self._users[user] = history
+                self.stats["seeded"] += 1
+            self._seeding.pop(user, None)
+            return history
+
+    @staticmethod
+    def _append(history, rows):
+        for report_id, created_at, lat, lng, details in rows:
+            if created_at is None or lat is None or lng is None or report_id in history:
+                continue
+            history.append(_epoch(created_at), lat, lng, bool((details or {}).get("abuse")), report_id)
+
+    # ✅ Recording (stored uploads only)
+    def record(self, user, rows):
+        """rows: [(report id, created_at, lat, lng, details), ...] of reports this worker just stored."""
+        with self._lock:
+            history = self._users.get(user)
+            if history is not None:
+                self._append(history, rows)
+            elif user in self._seeding:
+                self._seeding[user].extend(rows)
+            # an untracked user is seeded from the table, which already holds these rows
+
+    def observe(self, events):
+        """Change-log listener: `created` events from every worker (this one's are already recorded)."""
+        for event in events:
+            report = event["report"]
+            if event["kind"] != "created" or not report.get("created_at"):
+                continue
+            row = (event["report_id"], datetime.fromisoformat(report["created_at"]),
+                   report["lat"], report["lng"], report["details"])
+            self.record(report["username"], [row])
+            self.stats["observed"] += 1
+
+    # ✅ Check
+    def check(self, user, lat, lng, now=None):
+        """Verdict dict if this upload is flagged, else None."""
+        return self.check_batch(user, [(lat, lng)], now)[0]
+
+    def check_batch(self, user, points, now=None):
+        """
+        Verdicts for one upload event of len(points) reports, in order. The event
+        rate is checked once for the whole batch and the image limit per item; each
+        point is checked against the previous event only, never against another
+        point of the batch.
+        """
+        now = time.time() if now is None else now
+        history = self._history(user)
+        with self._lock:
+            recent = [entry for entry in history.entries() if now - entry[0] < self.window_seconds]
+            rate = self._rate(recent, now)
+            previous = None if rate else self._previous(history)
+            allowance = self.max_images - len(recent)
+            verdicts = []
+            for n, (lat, lng) in enumerate(points):
+                verdicts.append(rate or (self._images(recent, n, now) if n >= allowance else None)
+                                or self._geo_velocity(previous, lat, lng, now))
+            self.stats["checked"] += len(points)
+            for verdict in verdicts:
+                if verdict:
+                    self.stats[f"flagged_{verdict['rule']}"] += 1
+        flagged_at = datetime.utcfromtimestamp(now).isoformat()
+        return [dict(verdict, flagged_at=flagged_at) if verdict else None for verdict in verdicts]
+
+    def _rate(self, recent, now):
+        events = {at for at, *_ in recent}
+        if len(events) < self.max_uploads:
+            return None
+        return {
+            "rule": "rate",
+            "reason": (f"{len(events) + 1} uploads within {_minutes(now - min(events))}; "
+                       f"the limit is {self.max_uploads} per {_minutes(self.window_seconds)}"),
+            "uploads": len(events) + 1,
+            "window_seconds": self.window_seconds,
+        }
+
+    def _images(self, recent, n, now):
+        images = len(recent) + n + 1
+        oldest = min((at for at, *_ in recent), default=now)
+        return {
+            "rule": "images",
+            "reason": (f"{images} images within {_minutes(now - oldest)}; "
+                       f"the limit is {self.max_images} per {_minutes(self.window_seconds)}"),
+            "images": images,
+            "window_seconds": self.window_seconds,
+        }
+
+    @staticmethod
+    def _previous(history):
+        """(time, [(lat, lng), ...]) of the latest upload event with an unflagged report, or None."""
+        unflagged = [(at, lat, lng) for at, lat, lng, flagged, _ in history.entries() if not flagged]
+        if not unflagged:
+            return None
+        latest = max(at for at, _, _ in unflagged)
+        return latest, [(lat, lng) for at, lat, lng in unflagged if at == latest]
+
+    def _geo_velocity(self, previous, lat, lng, now):
+        if previous is None:
+            return None
+        at, places = previous
+        km, prev_lat, prev_lng = min((distance_km(la, ln, lat, lng), la, ln) for la, ln in places)
+        if km < self.min_jump_km:
+            return None
+        seconds = max(now - at, 1.0)
+        speed = km / (seconds / 3600.0)
+        if speed <= self.max_speed_kmh:
+            return None
+        return {
+            "rule": "geo_velocity",
+            "reason": (f"{km:.0f} km from the previous upload in {_minutes(seconds)} "
+                       f"({speed:.0f} km/h; the limit is {self.max_speed_kmh:.0f} km/h)"),
+            "distance_km": round(km, 1),
+            "seconds": round(seconds, 1),
+            "speed_kmh": round(speed, 1),
+            "previous": {"lat": prev_lat, "lng": prev_lng},
+        }
+
+    def metrics(self):
+        with self._lock:
+            return {"tracked_users": len(self._users), **self.stats}
+
+
+def _minutes(seconds):
+    return f"{seconds / 60:.0f} min" if seconds >= 90 else f"{seconds:.0f} s"
+
+
+abuse_detector = AbuseDetector()
@@ -0,0 +1,146 @@
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from services.rate_limit import TokenBucket
+
+
+class Overloaded(Exception):
+    """Request was shed. `status` is the HTTP status to answer with, `retry_after` in seconds."""
+
+    def __init__(self, reason, retry_after, status=503):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.status = status
+
+
+class AdmissionController:
+    """
+    Bounds how much ML work one process runs at once.
+
+    - at most `max_concurrent` callers inside admit() at a time
+    - up to `max_queue` more wait, each for at most `queue_timeout` seconds
+    - anything beyond that is rejected immediately (503 + Retry-After), so
+      admitted requests keep a bounded latency instead of all slowing down
+    - each user gets a token bucket (`user_rate` per second, `user_burst`
+      deep) checked before queueing (429 + Retry-After); a call scoring
+      several images passes `cost` and takes one token per image; the tokens
+      are refunded when the call is then shed for a full queue or a timeout
+
+    `gauges` ({"in_flight", "queue_depth", "wait_p95"} -> prometheus Gauge,
+    see services/metrics.py) are kept current when given.
+    """
+
+    def __init__(self, max_concurrent=2, max_queue=8, queue_timeout=10.0,
+                 user_rate=0.1, user_burst=3, max_tracked_users=10000, gauges=None):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_tracked_users = max_tracked_users
+        self.gauges = gauges
+
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._users = OrderedDict()  # user -> TokenBucket, least recently used first
+        self._in_flight = 0
+        self._waiting = 0
+        self._service_seconds = 1.0  # EWMA of time spent inside admit(), for Retry-After
+        self._recent_waits = deque(maxlen=512)
+        self.stats = {"admitted": 0, "rejected_queue_full": 0, "rejected_queue_timeout": 0, "rejected_user_rate": 0}
+
+    # ✅ Per-user buckets
+    def _bucket(self, user):
+        with self._lock:
+            bucket = self._users.pop(user, None)
+            if bucket is None:
+                bucket = TokenBucket(self.user_rate, self.user_burst)
+                if len(self._users) >= self.max_tracked_users:
+                    # the least recently seen user has most likely refilled anyway
+                    self._users.popitem(last=False)
+            self._users[user] = bucket
+            return bucket
+
+    def _export(self, wait_changed=False):
+        """Mirror the counters into the gauges (call with the lock held)."""
+        if self.gauges is None:
+            return
+        self.gauges["in_flight"].set(self._in_flight)
+        self.gauges["queue_depth"].set(self._waiting)
+        if wait_changed:
+            waits = sorted(self._recent_waits)
+            self.gauges["wait_p95"].set(waits[int(len(waits) * 0.95)])
+
+    def _estimated_wait(self):
+        queued = self._waiting + self._in_flight
+        return self._service_seconds * max(1, queued) / self.max_concurrent
+
+    @contextmanager
+    def admit(self, user=None, cost=1):
+        bucket = None
+        if user is not None and self.user_rate > 0:
+            if cost > self.user_burst:
+                raise ValueError(f"cost {cost} can never fit a bucket of {self.user_burst}; split the work")
+            bucket = self._bucket(user)
+            if not bucket.try_take(cost):
+                with self._lock:
+                    self.stats["rejected_user_rate"] += 1
+                raise Overloaded("user_rate", bucket.wait_time(cost), status=429)
+
+        started = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self._waiting >= self.max_queue:
+                    self.stats["rejected_queue_full"] += 1
+                    if bucket:
+                        bucket.refund(cost)  # the host was busy, not the user: don't charge them
+                    raise Overloaded("queue_full", self._estimated_wait())
+                self._waiting += 1
+                self._export()
+            try:
+                acquired = self._slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+                    self._export()
+            if not acquired:
+                with self._lock:
+                    self.stats["rejected_queue_timeout"] += 1
+                if bucket:
+                    bucket.refund(cost)
+                raise Overloaded("queue_timeout", self._estimated_wait())
+
+        entered = time.monotonic()
+        with self._lock:
+            self._in_flight += 1
+            self.stats["admitted"] += 1
+            self._recent_waits.append(entered - started)
+            self._export(wait_changed=True)
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - entered
+            with self._lock:
+                self._in_flight -= 1
+                self._service_seconds = 0.8 * self._service_seconds + 0.2 * elapsed
+                self._export()
+            self._slots.release()
+
+    def metrics(self):
+        with self._lock:
+            waits = sorted(self._recent_waits)
+            return {
+                "in_flight": self._in_flight,
+                "queue_depth": self._waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "tracked_users": len(self._users),
+                "service_seconds_ewma": round(self._service_seconds, 3),
+                "wait_ms_p50": round(waits[len(waits) // 2] * 1000, 1) if waits else 0.0,
+                "wait_ms_p95": round(waits[int(len(waits) * 0.95)] * 1000, 1) if waits else 0.0,
+                **self.stats,
+            }
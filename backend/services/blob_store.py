@@ -0,0 +1,399 @@
+# services/blob_store.py
+"""
+Content-addressed storage for report images and government proof images.
+
+A blob's key is the sha256 of its bytes. The DB refers to it as
+"blob:<sha256>", in `Report.image_filename` or in `details["govt_proofs"]`.
+Consequences:
+
+- Status changes (verified / rejected / finalized) are metadata-only
+  updates. The bytes never move.
+- Writing the same bytes twice stores them once, so duplicate re-uploads
+  leave nothing behind.
+- Blobs are immutable, so GET /api/reports/blobs/<key> is cached forever
+  by browsers and CDNs.
+
+Backends (BLOB_BACKEND):
+  local  Files under BLOB_ROOT (default <UPLOAD_FOLDER>/blobs), fanned out
+         as ab/cd/<key>. Writes go to a temp file and are renamed into place.
+  s3     Any S3-compatible store: AWS, MinIO, or benchmarks/s3_stub.py in
+         tests. Configured with S3_BUCKET, S3_ENDPOINT_URL (unset for AWS)
+         and S3_PREFIX, plus the usual AWS_* credentials. Needs boto3.
+         Bodies over BLOB_PART_SIZE are sent as multipart uploads. App
+         nodes pointing at the same bucket share every image.
+
+Reads take an optional byte range, so the blob route can answer Range
+requests without loading whole files.
+
+Report rows written before blob storage still hold plain filenames under
+verified/ and rejected/. Those keep working through the old uploads route,
+and `flask import-blobs` moves them over.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+BLOB_BACKEND = os.getenv("BLOB_BACKEND", "local")  # local | s3
+BLOB_ROOT = os.getenv("BLOB_ROOT")  # local backend; default <UPLOAD_FOLDER>/blobs
+S3_BUCKET = os.getenv("S3_BUCKET")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # MinIO / stub; unset for AWS
+S3_PREFIX = os.getenv("S3_PREFIX", "blobs/")
+S3_REGION = os.getenv("S3_REGION", os.getenv("AWS_REGION", "us-east-1"))
+BLOB_PART_SIZE = int(os.getenv("BLOB_PART_SIZE", 8 * 1024 * 1024))  # S3 minimum part size is 5 MiB
+READ_CHUNK = 64 * 1024
+# `flask storage-maintenance` keeps unreferenced blobs this young (an upload is stored before its row commits).
+# Re-storing a blob refreshes its mtime only once it is half that old: one metadata write per blob per half
+# grace period at most, and a new reference still has over half the period to commit.
+ORPHAN_GRACE_HOURS = float(os.getenv("STORAGE_ORPHAN_GRACE_HOURS", 24))
+REFRESH_AFTER_SECONDS = ORPHAN_GRACE_HOURS * 3600 / 2
+
+REF_PREFIX = "blob:"
+KEY_RE = re.compile(r"^[0-9a-f]{64}$")
+
+BlobInfo = namedtuple("BlobInfo", "key size content_type modified")  # modified: unix seconds
+
+
+class BlobError(Exception):
+    pass
+
+
+class BlobNotFound(BlobError):
+    pass
+
+
+# --- References ---
+def blob_ref(key):
+    return f"{REF_PREFIX}{key}"
+
+
+def parse_ref(ref):
+    """The blob key of a "blob:<sha256>" reference, or None for a legacy filename."""
+    if ref and ref.startswith(REF_PREFIX) and KEY_RE.match(ref[len(REF_PREFIX):]):
+        return ref[len(REF_PREFIX):]
+    return None
+
+
+_MAGIC = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF8", "image/gif"),
+)
+
+
+def sniff_content_type(head: bytes):
+    for magic, content_type in _MAGIC:
+        if head.startswith(magic):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"avif", b"avis"):
+        return "image/avif"
+    return "application/octet-stream"
+
+
+# --- Backends ---
+class LocalBlobStore:
+    def __init__(self, root):
+        self.root = root
+        self._tmp = os.path.join(root, ".tmp")
+        os.makedirs(self._tmp, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, data: bytes, content_type=None):
+        """Store `data`; returns its key. Storing bytes that are already there is a no-op."""
+        return self.put_stream([data], content_type)
+
+    def put_stream(self, chunks, content_type=None):
+        """Store an iterable of byte chunks without holding them all; returns the key."""
+        digest = hashlib.sha256()
+        tmp_path = os.path.join(self._tmp, uuid.uuid4().hex)
+        try:
+            with open(tmp_path, "wb") as out:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    out.write(chunk)
+            key = digest.hexdigest()
+            final = self.path(key)
+            try:
+                if time.time() - os.stat(final).st_mtime > REFRESH_AFTER_SECONDS:
+                    os.utime(final)  # already stored: restart the orphan sweep's grace period for the new reference
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(final), exist_ok=True)
+                os.replace(tmp_path, final)
+            return key
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def stat(self, key):
+        try:
+            st = os.stat(self.path(key))
+            with open(self.path(key), "rb") as f:
+                head = f.read(16)
+        except FileNotFoundError:
+            raise BlobNotFound(key) from None
+        return BlobInfo(key, st.st_size, sniff_content_type(head), st.st_mtime)
+
+    def read(self, key, start=0, length=None):
+        """Iterator over the blob's bytes [start, start + length)."""
+        try:
+            f = open(self.path(key), "rb")
+        except FileNotFoundError:
+            raise BlobNotFound(key) from None
+
+        def chunks():
+            with f:
+                f.seek(start)
+                remaining = length
+                while remaining is None or remaining > 0:
+                    chunk = f.read(READ_CHUNK if remaining is None else min(READ_CHUNK, remaining))
+                    if not chunk:
+                        return
+                    if remaining is not None:
+                        remaining -= len(chunk)
+                    yield chunk
+        return chunks()
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def iter_blobs(self):
+        for top in sorted(os.listdir(self.root)):
+            if len(top) != 2:
+                continue  # .tmp and anything foreign
+            for mid in sorted(os.listdir(os.path.join(self.root, top))):
+                with os.scandir(os.path.join(self.root, top, mid)) as entries:
+                    for entry in entries:
+                        if KEY_RE.match(entry.name):
+                            st = entry.stat()
+                            yield BlobInfo(entry.name, st.st_size, None, st.st_mtime)
+
+    def local_path(self, key, tmpdir):
+        """A filesystem path holding the blob, for code that needs one (OpenCV, PIL, the ML pool)."""
+        if not os.path.exists(self.path(key)):
+            raise BlobNotFound(key)
+        return self.path(key)
+
+
+class S3BlobStore:
+    def __init__(self, bucket, endpoint_url=None, prefix="blobs/", region=S3_REGION, part_size=BLOB_PART_SIZE):
+        if not bucket:
+            raise BlobError("BLOB_BACKEND=s3 needs S3_BUCKET")
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.prefix = prefix
+        self.region = region
+        self.part_size = max(part_size, 5 * 1024 * 1024)
+        self._client = None
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._forget)  # connection pools don't survive fork
+
+    def _forget(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    try:
+                        import boto3
+                        from botocore.config import Config
+                    except ImportError:
+                        raise BlobError("BLOB_BACKEND=s3 requires boto3 (pip install boto3)")
+                    config = Config(
+                        region_name=self.region,
+                        s3={"addressing_style": "path" if self.endpoint_url else "auto"},
+                        retries={"max_attempts": 5, "mode": "standard"},
+                        request_checksum_calculation="when_required",
+                        response_checksum_validation="when_required",
+                    )
+                    self._client = boto3.client("s3", endpoint_url=self.endpoint_url, config=config)
+        return self._client
+
+    def _object(self, key):
+        return f"{self.prefix}{key[:2]}/{key}"
+
+    def _missing(self, error):
+        return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def _reuse(self, key):
+        """
+        True if the blob is already stored. A LastModified older than
+        REFRESH_AFTER_SECONDS is then refreshed (a copy onto itself), so the
+        orphan sweep's grace period restarts for the new reference.
+        """
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._object(key))
+        except ClientError as e:
+            if self._missing(e):
+                return False
+            raise
+        if time.time() - head["LastModified"].timestamp() <= REFRESH_AFTER_SECONDS:
+            return True
+        self.client.copy_object(Bucket=self.bucket, Key=self._object(key),
+                                CopySource={"Bucket": self.bucket, "Key": self._object(key)},
+                                MetadataDirective="REPLACE",
+                                ContentType=head.get("ContentType") or "application/octet-stream")
+        return True
+
+    def put(self, data: bytes, content_type=None):
+        key = hashlib.sha256(data).hexdigest()
+        if self._reuse(key):
+            return key
+        content_type = content_type or sniff_content_type(data[:16])
+        if len(data) <= self.part_size:
+            self.client.put_object(Bucket=self.bucket, Key=self._object(key), Body=data, ContentType=content_type)
+        else:
+            parts = (data[i:i + self.part_size] for i in range(0, len(data), self.part_size))
+            self._multipart(self._object(key), parts, content_type)
+        return key
+
+    def put_stream(self, chunks, content_type=None):
+        """
+        Multipart upload to a temporary object while hashing (one part in
+        memory at a time), then a server-side copy to the content key. Bodies
+        that fit in one part skip the temporary object.
+        """
+        digest = hashlib.sha256()
+        buffer = bytearray()
+        upload = None  # (object name, upload id, parts)
+        try:
+            for chunk in chunks:
+                digest.update(chunk)
+                buffer += chunk
+                while len(buffer) >= self.part_size:
+                    if upload is None:
+                        upload = self._start_multipart(
+                            f"{self.prefix}tmp/{uuid.uuid4().hex}", content_type or sniff_content_type(bytes(buffer[:16]))
+                        )
+                    self._upload_part(upload, bytes(buffer[:self.part_size]))
+                    del buffer[:self.part_size]
+            key = digest.hexdigest()
+            if upload is None:
+                data = bytes(buffer)
+                if not self._reuse(key):
+                    self.client.put_object(Bucket=self.bucket, Key=self._object(key), Body=data,
+                                           ContentType=content_type or sniff_content_type(data[:16]))
+                return key
+            if buffer:
+                self._upload_part(upload, bytes(buffer))
+            self._complete_multipart(upload)
+            tmp_object, upload = upload[0], None
+            try:
+                if not self._reuse(key):
+                    self.client.copy_object(Bucket=self.bucket, Key=self._object(key),
+                                            CopySource={"Bucket": self.bucket, "Key": tmp_object})
+            finally:
+                self.client.delete_object(Bucket=self.bucket, Key=tmp_object)
+            return key
+        except Exception:
+            if upload is not None:
+                self.client.abort_multipart_upload(Bucket=self.bucket, Key=upload[0], UploadId=upload[1])
+            raise
+
+    def _start_multipart(self, object_name, content_type):
+        response = self.client.create_multipart_upload(Bucket=self.bucket, Key=object_name, ContentType=content_type)
+        return object_name, response["UploadId"], []
+
+    def _upload_part(self, upload, data):
+        object_name, upload_id, parts = upload
+        number = len(parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=object_name, UploadId=upload_id, PartNumber=number, Body=data
+        )
+        parts.append({"PartNumber": number, "ETag": response["ETag"]})
+
+    def _complete_multipart(self, upload):
+        object_name, upload_id, parts = upload
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=object_name, UploadId=upload_id, MultipartUpload={"Parts": parts}
+        )
+
+    def _multipart(self, object_name, parts, content_type):
+        upload = self._start_multipart(object_name, content_type)
+        try:
+            for part in parts:
+                self._upload_part(upload, part)
+            self._complete_multipart(upload)
+        except Exception:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=object_name, UploadId=upload[1])
+            raise
+
+    def stat(self, key):
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._object(key))
+        except ClientError as e:
+            if self._missing(e):
+                raise BlobNotFound(key) from None
+            raise
+        return BlobInfo(key, head["ContentLength"], head.get("ContentType"), head["LastModified"].timestamp())
+
+    def read(self, key, start=0, length=None):
+        from botocore.exceptions import ClientError
+
+        kwargs = {}
+        if start or length is not None:
+            end = "" if length is None else start + length - 1
+            kwargs["Range"] = f"bytes={start}-{end}"
+        try:
+            body = self.client.get_object(Bucket=self.bucket, Key=self._object(key), **kwargs)["Body"]
+        except ClientError as e:
+            if self._missing(e):
+                raise BlobNotFound(key) from None
+            raise
+
+        def chunks():
+            try:
+                yield from body.iter_chunks(READ_CHUNK)
+            finally:
+                body.close()
+        return chunks()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object(key))
+
+    def iter_blobs(self):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                key = obj["Key"].rsplit("/", 1)[-1]
+                if KEY_RE.match(key) and not obj["Key"].startswith(f"{self.prefix}tmp/"):
+                    yield BlobInfo(key, obj["Size"], None, obj["LastModified"].timestamp())
+
+    def local_path(self, key, tmpdir):
+        """Downloads the blob to tmpdir/<key>; the caller owns (and removes) the copy."""
+        path = os.path.join(tmpdir, key)
+        chunks = self.read(key)
+        with open(path, "wb") as out:
+            for chunk in chunks:
+                out.write(chunk)
+        return path
+
+
+def create_blob_store(app):
+    if BLOB_BACKEND == "s3":
+        return S3BlobStore(S3_BUCKET, endpoint_url=S3_ENDPOINT_URL, prefix=S3_PREFIX)
+    if BLOB_BACKEND != "local":
+        raise BlobError(f"Unknown BLOB_BACKEND {BLOB_BACKEND!r} (use local or s3)")
+    return LocalBlobStore(BLOB_ROOT or os.path.join(app.config["UPLOAD_FOLDER"], "blobs"))
+
+
+def blob_store():
+    """The app's store (create_app puts it in app.extensions)."""
+    from flask import current_app
+    return current_app.extensions["blob_store"]
@@ -0,0 +1,198 @@
+"""
+Report change log behind the live-update stream (GET /api/reports/events).
+
+Writers call `stage()` in the transaction that changes the report, before
+committing it. That adds a row to `report_event` (the id is the SSE event id)
+holding the serialised report, so the change and its event commit or roll
+back together: a crash between the two cannot lose an event. After the
+commit, `committed()` wakes this worker's readers. Readers never scan
+`report`:
+
+- One tail thread per worker polls `report_event` for ids past the last
+  one it saw, and keeps the newest events in memory.
+- Every SSE client of that worker waits on a condition and is served from
+  that buffer. DB load is one indexed query per poll per worker, whatever
+  the number of clients.
+- A client resuming from an id older than the buffer is served from the
+  table.
+- A client resuming from before the retention window gets `None`, meaning
+  "reload the list".
+- `listen(callback)` hands every accepted batch to in-process consumers
+  too (the abuse detector learns other workers' uploads this way); they
+  call `start()` since they may need the tail before any SSE client does.
+
+Ids are assigned at insert but become visible at commit. On databases that
+commit concurrently (PostgreSQL), id 11 can appear before id 10. The tail
+therefore only moves past a gap once it is CHANGE_LOG_GAP_SECONDS old; by
+then the missing id was either committed or rolled back. So every client
+sees events in id order, and resuming from an id never skips one.
+"""
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import delete, func, select
+
+from extensions import db
+from models import ReportEvent
+
+CHANGE_LOG_POLL_SECONDS = float(os.getenv("CHANGE_LOG_POLL_SECONDS", 1.0))
+CHANGE_LOG_GAP_SECONDS = float(os.getenv("CHANGE_LOG_GAP_SECONDS", 2.0))
+CHANGE_LOG_BUFFER = int(os.getenv("CHANGE_LOG_BUFFER", 1000))  # events kept in memory per worker
+CHANGE_LOG_RETAIN = int(os.getenv("CHANGE_LOG_RETAIN", 20000))  # events kept in the table
+PRUNE_EVERY = 500
+
+
+class ChangeLog:
+    def __init__(self, poll_seconds=CHANGE_LOG_POLL_SECONDS, gap_seconds=CHANGE_LOG_GAP_SECONDS,
+                 buffer_size=CHANGE_LOG_BUFFER, retain=CHANGE_LOG_RETAIN):
+        self.poll_seconds = poll_seconds
+        self.gap_seconds = gap_seconds
+        self.retain = retain
+        self._buffer = deque(maxlen=buffer_size)  # (id, event dict), ascending ids
+        self._listeners = []
+        self._app = None
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._thread = None
+        self._tail_id = None  # highest id handed to readers
+        self._gap_since = None
+        self._buffer.clear()
+
+    # ✅ Writers
+    def stage(self, changes, session=None):
+        """
+        changes: [(report_id, kind, payload), ...] -> event ids. Adds the events to
+        `session` (default db.session) and flushes; the caller's commit makes them
+        visible together with the change itself.
+        """
+        session = session or db.session
+        now = datetime.utcnow()
+        events = [ReportEvent(report_id=rid, kind=kind, payload=payload, created_at=now) for rid, kind, payload in changes]
+        session.add_all(events)
+        session.flush()
+        ids = [event.id for event in events]
+        if self.retain and ids and ids[-1] // PRUNE_EVERY != (ids[0] - 1) // PRUNE_EVERY:
+            session.execute(delete(ReportEvent).where(ReportEvent.id <= ids[-1] - self.retain))
+        return ids
+
+    def committed(self):
+        """Call after committing staged events: readers on this worker see them without waiting for the next poll."""
+        self._wake.set()
+
+    def append(self, report_id, kind, payload):
+        """Record a change to one report in a transaction of its own. Returns the event id."""
+        return self.append_many([(report_id, kind, payload)])[-1]
+
+    def append_many(self, changes):
+        """changes: [(report_id, kind, payload), ...] -> event ids, committed in one transaction."""
+        ids = self.stage(changes)
+        db.session.commit()
+        self.committed()
+        return ids
+
+    # ✅ Readers
+    def listen(self, callback):
+        """callback([event, ...]) on the tail thread, for each batch of events it accepts."""
+        self._listeners.append(callback)
+
+    def latest_id(self):
+        """Id a client should resume from after loading a full list now."""
+        if self._tail_id is not None:
+            return self._tail_id
+        return db.session.execute(select(func.coalesce(func.max(ReportEvent.id), 0))).scalar()
+
+    def since(self, after_id, timeout):
+        """
+        Events with id > after_id, waiting up to `timeout` seconds for one.
+        [] on timeout; None when after_id is older than the retained log.
+        """
+        self.start()
+        with self._cond:
+            if self._tail_id is None or after_id >= self._tail_id:
+                self._cond.wait(timeout)
+            tail = self._tail_id or 0
+            if after_id >= tail:
+                return []
+            if self._buffer and after_id >= self._buffer[0][0] - 1:
+                return [event for event_id, event in self._buffer if event_id > after_id]
+        return self._from_table(after_id, tail)
+
+    def _from_table(self, after_id, upto):
+        rows = db.session.execute(
+            select(ReportEvent).where(ReportEvent.id > after_id, ReportEvent.id <= upto)
+            .order_by(ReportEvent.id).limit(CHANGE_LOG_BUFFER)
+        ).scalars().all()
+        oldest = db.session.execute(select(func.min(ReportEvent.id))).scalar()
+        if not rows or oldest is None or oldest > after_id + 1:
+            return None  # pruned past the client's position (or ids rolled back at the very start)
+        return [_as_event(row) for row in rows]
+
+    # ✅ Tail thread
+    def start(self):
+        """Start this worker's tail thread (idempotent; needs an app context the first time)."""
+        if self._thread is not None:
+            return
+        from flask import current_app
+
+        with self._cond:
+            if self._thread is None:
+                self._app = current_app._get_current_object()
+                with self._app.app_context():
+                    self._tail_id = db.session.execute(
+                        select(func.coalesce(func.max(ReportEvent.id), 0))
+                    ).scalar()
+                    db.session.remove()
+                self._thread = threading.Thread(target=self._loop, name="change-log-tail", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+            try:
+                with self._app.app_context():
+                    self._poll()
+                    db.session.remove()
+            except Exception as e:
+                self._app.logger.warning(f"Change log poll failed: {e}")
+
+    def _poll(self):
+        rows = db.session.execute(
+            select(ReportEvent).where(ReportEvent.id > self._tail_id).order_by(ReportEvent.id).limit(CHANGE_LOG_BUFFER)
+        ).scalars().all()
+        accepted = []
+        expected = self._tail_id + 1
+        for row in rows:
+            if row.id != expected:
+                # a lower id may still be in flight: hold everything after it for a moment
+                self._gap_since = self._gap_since or time.monotonic()
+                if time.monotonic() - self._gap_since < self.gap_seconds:
+                    break
+            self._gap_since = None
+            accepted.append((row.id, _as_event(row)))
+            expected = row.id + 1
+        if not accepted:
+            return
+        with self._cond:
+            self._buffer.extend(accepted)
+            self._tail_id = accepted[-1][0]
+            self._cond.notify_all()
+        for callback in self._listeners:
+            try:
+                callback([event for _, event in accepted])
+            except Exception as e:
+                self._app.logger.warning(f"Change log listener failed: {e}")
+
+
+def _as_event(row):
+    return {"id": row.id, "report_id": row.report_id, "kind": row.kind, "report": row.payload}
+
+
+change_log = ChangeLog()
@@ -0,0 +1,55 @@
+# services/collection_version.py
+"""
+Versions of the report list endpoints, read from the database.
+
+Every report write stages a change-log event in its own transaction
+(services/change_log.py), so the newest `report_event` id is a version of
+the report table that all workers, and all hosts sharing the DB, agree on:
+
+- reports, leaderboard: the newest event id
+- approved: the newest `updated` event id (a new report can't be finalized
+  yet, so creates leave the govt list valid)
+
+Readers tag their responses with `etag(collection)`. A poll whose
+If-None-Match still matches gets a 304 after one query of index lookups,
+without loading any report. The tag also carries when the schema was
+created (schema_version row 1): `flask reset-db` recreates it, so tags
+issued before a reset never match, even though event ids start over.
+"""
+from sqlalchemy import func, select
+
+from extensions import db
+from migrations import schema_version
+from models import ReportEvent
+
+COLLECTIONS = ("reports", "approved", "leaderboard")
+
+
+class CollectionVersions:
+    def _read(self):
+        """(epoch, newest event id, newest `updated` event id) in one round trip."""
+        newest = select(func.max(ReportEvent.id)).scalar_subquery()
+        newest_update = select(func.max(ReportEvent.id)).where(ReportEvent.kind == "updated").scalar_subquery()
+        created = select(schema_version.c.applied_at).where(schema_version.c.version == 1).scalar_subquery()
+        return db.session.execute(select(created, newest, newest_update)).one()
+
+    @staticmethod
+    def _pick(collection, newest, newest_update):
+        if collection not in COLLECTIONS:
+            raise KeyError(collection)
+        if collection == "approved" and newest_update is not None:
+            return newest_update
+        return newest or 0  # no update left in the log (none yet, or pruned): the newest event is safe
+
+    def version(self, collection):
+        _, newest, newest_update = self._read()
+        return self._pick(collection, newest, newest_update)
+
+    def etag(self, collection):
+        """Strong ETag value (unquoted) of the collection's current version."""
+        created, newest, newest_update = self._read()
+        epoch = int(created.timestamp() * 1e6) if created else 0
+        return f"{epoch:x}-{collection}-{self._pick(collection, newest, newest_update)}"
+
+
+collection_versions = CollectionVersions()
@@ -0,0 +1,212 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+
+from sqlalchemy import select
+
+from extensions import db
+from models import Report
+
+# ✅ Flat export schema (column order is the CSV/Parquet column order)
+EXPORT_COLUMNS = [
+    "id", "user_name", "description", "status", "lat", "lng", "aqi", "points",
+    "pollution_confidence", "description_match_confidence", "awarded_credits",
+    "precautions", "govt_action", "image_filename", "image_hash",
+    "created_at", "last_checked_at", "details",
+]
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+DEFAULT_BATCH_SIZE = 1000
+MAX_BATCH_SIZE = int(os.getenv("EXPORT_MAX_BATCH_SIZE", 10000))  # rows held in memory at once
+
+
+class ExportError(ValueError):
+    pass
+
+
+def parse_filters(args):
+    """Validate query-string filters: status=a,b  since/until=ISO date(time)  bbox=minLng,minLat,maxLng,maxLat."""
+    filters = {}
+
+    status = args.get("status")
+    if status:
+        filters["status"] = [s.strip() for s in status.split(",") if s.strip()]
+
+    for key in ("since", "until"):
+        value = args.get(key)
+        if value:
+            try:
+                filters[key] = datetime.fromisoformat(value)
+            except ValueError:
+                raise ExportError(f"'{key}' must be an ISO date or datetime")
+
+    bbox = args.get("bbox")
+    if bbox:
+        try:
+            min_lng, min_lat, max_lng, max_lat = (float(v) for v in bbox.split(","))
+        except ValueError:
+            raise ExportError("'bbox' must be minLng,minLat,maxLng,maxLat")
+        filters["bbox"] = (min_lng, min_lat, max_lng, max_lat)
+
+    return filters
+
+
+def parse_batch_size(args):
+    """batch_size=1..MAX_BATCH_SIZE (rows per fetch); checked before the response starts."""
+    value = args.get("batch_size")
+    if value is None or value == "":
+        return DEFAULT_BATCH_SIZE
+    try:
+        batch_size = int(value)
+    except ValueError:
+        raise ExportError("'batch_size' must be an integer")
+    if not 1 <= batch_size <= MAX_BATCH_SIZE:
+        raise ExportError(f"'batch_size' must be between 1 and {MAX_BATCH_SIZE}")
+    return batch_size
+
+
+def build_query(status=None, since=None, until=None, bbox=None):
+    stmt = select(*(getattr(Report, c) for c in EXPORT_COLUMNS)).order_by(Report.id)
+    if status:
+        stmt = stmt.where(Report.status.in_(status))
+    if since:
+        stmt = stmt.where(Report.created_at >= since)
+    if until:
+        stmt = stmt.where(Report.created_at < until)
+    if bbox:
+        min_lng, min_lat, max_lng, max_lat = bbox
+        stmt = stmt.where(Report.lat.between(min_lat, max_lat), Report.lng.between(min_lng, max_lng))
+    return stmt
+
+
+def iter_row_batches(stmt, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Stream result rows in fixed-size partitions. `yield_per` turns on
+    server-side cursors (Postgres/MySQL) / incremental fetch (SQLite),
+    so memory stays bounded by batch_size regardless of table size.
+    """
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    try:
+        for partition in result.partitions():
+            yield partition
+    finally:
+        result.close()
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+# --- Encoders: each consumes row batches and yields bytes ---
+def ndjson_stream(batches):
+    for rows in batches:
+        yield "".join(
+            json.dumps({c: _plain(v) for c, v in zip(EXPORT_COLUMNS, row)}) + "\n" for row in rows
+        ).encode("utf-8")
+
+
+def csv_stream(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in batches:
+        for row in rows:
+            writer.writerow([
+                json.dumps(v) if c == "details" and v is not None else _plain(v)
+                for c, v in zip(EXPORT_COLUMNS, row)
+            ])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object whose contents are drained after every row group."""
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_schema(pa):
+    types = {
+        "id": pa.int64(), "points": pa.int64(), "awarded_credits": pa.int64(),
+        "lat": pa.float64(), "lng": pa.float64(), "aqi": pa.float64(),
+        "pollution_confidence": pa.float64(), "description_match_confidence": pa.float64(),
+        "created_at": pa.timestamp("us"), "last_checked_at": pa.timestamp("us"),
+    }
+    return pa.schema([(c, types.get(c, pa.string())) for c in EXPORT_COLUMNS])
+
+
+def _arrow_batch(pa, schema, rows):
+    columns = list(zip(*rows)) if rows else [[] for _ in EXPORT_COLUMNS]
+    arrays = []
+    for name, values in zip(EXPORT_COLUMNS, columns):
+        if name == "details":
+            values = [json.dumps(v) if v is not None else None for v in values]
+        arrays.append(pa.array(values, type=schema.field(name).type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def columnar_stream(batches, fmt):
+    """Parquet (one row group per batch) or Arrow IPC stream."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError(f"'{fmt}' export requires pyarrow (pip install pyarrow)")
+
+    schema = _arrow_schema(pa)
+
+    def generate():
+        sink = _ChunkSink()
+        if fmt == "parquet":
+            writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        else:
+            writer = pa.ipc.new_stream(sink, schema)
+        for rows in batches:
+            writer.write_batch(_arrow_batch(pa, schema, rows))
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+
+    return generate()
+
+
+def export_stream(fmt, filters, batch_size=DEFAULT_BATCH_SIZE):
+    """Byte generator for the requested format. Raises ExportError before any row is read."""
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f"Unsupported format '{fmt}' (use one of: {', '.join(EXPORT_FORMATS)})")
+
+    batches = iter_row_batches(build_query(**filters), batch_size)
+    if fmt == "ndjson":
+        return ndjson_stream(batches)
+    if fmt == "csv":
+        return csv_stream(batches)
+    return columnar_stream(batches, fmt)
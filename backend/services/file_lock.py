@@ -0,0 +1,40 @@
+"""
+Advisory file locks shared by every process on the host (fcntl.flock).
+
+Windows has no fcntl. There the app runs as a single process (flask run),
+so the locks degrade to no-ops, as migrations/__init__.py already does for
+its boot lock. Threads still need their own threading.Lock.
+"""
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # Windows dev box: single process anyway
+    fcntl = None
+
+
+def lock(file, blocking=True):
+    """Exclusive flock on an open file or fd. With blocking=False, False if another process holds it."""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def unlock(file):
+    if fcntl is not None:
+        fcntl.flock(file, fcntl.LOCK_UN)
+
+
+@contextlib.contextmanager
+def locked(path):
+    """Hold an exclusive lock on `path` (created if missing) for the duration of the block."""
+    with open(path, "a") as file:
+        lock(file)
+        try:
+            yield
+        finally:
+            unlock(file)
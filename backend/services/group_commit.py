@@ -0,0 +1,141 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from extensions import db
+
+
+class CommitPending(Exception):
+    """
+    The batch holding a write did not commit within the ack timeout. The write
+    is still queued and may commit later, so callers must not report failure.
+    """
+
+    def __init__(self, timeout):
+        super().__init__(f"Write not acknowledged within {timeout:.0f}s; it may still be saved")
+        self.retry_after = max(1, int(timeout))
+
+
+class GroupCommitter:
+    """
+    Write-behind queue that coalesces inserts/updates from many request threads
+    into one transaction (one fsync) per batch.
+
+    A batch is closed after `window_ms` from its first write or at `max_batch`
+    writes. Each caller gets a Future that resolves only after the batch
+    committed — that is the durability acknowledgement. If the batch commit
+    fails, its writes are retried one by one so a single bad row cannot fail
+    the rest of the batch.
+
+    A caller that stops waiting (`wait()` raises CommitPending) has not lost
+    its write: it stays queued and may still commit. The upload route answers
+    503 with Retry-After. A retried image cannot become a second report while
+    the first is queued: report.image_hash is unique, so whichever insert lands
+    second fails alone (IntegrityError) and the route answers it as a duplicate.
+
+    A write may carry a `follow(session, result)` callback. It runs after the
+    batch is flushed (ids assigned) and before the commit, so rows it adds
+    (the report's change-log event) commit or roll back with the write.
+
+    Only single uploads go through here; /bulk commits its batch directly.
+    """
+
+    def __init__(self, app, window_ms=5, max_batch=256):
+        self.app = app
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.stats = {"batches": 0, "writes": 0, "failures": 0}
+        self._start()
+        # gunicorn --preload forks after create_app: threads do not survive fork, so restart in the child
+        os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+        self._thread.start()
+
+    # ✅ Public API
+    def insert(self, obj, follow=None):
+        """Queue a new (transient) ORM object. Future resolves to the detached, committed object."""
+        return self._submit(("insert", obj), follow)
+
+    def update(self, model, pk, values, follow=None):
+        """Queue `UPDATE model SET values WHERE id = pk`. Future resolves to pk."""
+        return self._submit(("update", model, pk, values), follow)
+
+    @staticmethod
+    def wait(future, timeout):
+        """The future's result; raises CommitPending (not a plain timeout) if the batch is still running."""
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            raise CommitPending(timeout) from None
+
+    # ✅ Worker
+    def _submit(self, op, follow):
+        future = Future()
+        self._queue.put((op, follow, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    @staticmethod
+    def _apply(session, op):
+        if op[0] == "insert":
+            session.add(op[1])
+            return op[1]
+        _, model, pk, values = op
+        # bulk UPDATE by primary key: the form services/rollups.py tracks
+        session.execute(update(model), [{"id": pk, **values}])
+        return pk
+
+    def _commit(self, batch):
+        with Session(db.engine, expire_on_commit=False) as session:
+            results = [self._apply(session, op) for op, _, _ in batch]
+            session.flush()
+            for (_, follow, _), result in zip(batch, results):
+                if follow is not None:
+                    follow(session, result)
+            session.commit()
+            session.expunge_all()
+        return results
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            with self.app.app_context():
+                try:
+                    results = self._commit(batch)
+                except Exception:
+                    # fall back to one transaction per write to isolate the failure
+                    results = []
+                    for item in batch:
+                        try:
+                            results.extend(self._commit([item]))
+                        except Exception as e:
+                            self.stats["failures"] += 1
+                            results.append(e)
+
+            self.stats["batches"] += 1
+            self.stats["writes"] += len(batch)
+            for (_, _, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
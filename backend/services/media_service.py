@@ -0,0 +1,132 @@
+# services/media_service.py
+"""
+Processing for government proof images (PUT /api/reports/<id>/validate).
+
+Every file's header is checked before anything is decoded: format, pixel
+count and readable dimensions. If any file fails, the request is rejected
+and nothing is written. The files are then transcoded in parallel on a
+shared thread pool (Pillow releases the GIL while it decodes and encodes).
+Each one is:
+
+- rotated per its EXIF orientation,
+- downscaled to PROOF_MAX_DIMENSION on the long edge (JPEGs are decoded
+  straight at the reduced size),
+- re-encoded as PROOF_FORMAT without EXIF, GPS or other metadata.
+
+Only the compressed copy is stored, in the blob store (services/blob_store.py).
+"""
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from services.metrics import proof_bytes, proof_transcode_seconds
+
+PROOF_FORMAT = os.getenv("PROOF_FORMAT", "webp").lower()  # webp | avif (needs a Pillow build with AVIF)
+PROOF_QUALITY = int(os.getenv("PROOF_QUALITY", 80))
+PROOF_MAX_DIMENSION = int(os.getenv("PROOF_MAX_DIMENSION", 1600))  # long edge, px
+PROOF_MAX_PIXELS = int(os.getenv("PROOF_MAX_PIXELS", 50_000_000))  # refuse decompression bombs before decoding
+PROOF_MAX_FILES = int(os.getenv("PROOF_MAX_FILES", 10))
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", min(4, os.cpu_count() or 1)))
+
+ACCEPTED_FORMATS = {"JPEG", "PNG", "WEBP", "MPO"}  # MPO: multi-picture JPEGs from phone cameras
+_ENCODERS = {
+    "webp": ("WEBP", {"method": 4}),
+    "avif": ("AVIF", {"speed": 6}),
+}
+MIME_TYPES = {"WEBP": "image/webp", "AVIF": "image/avif"}
+
+
+class MediaError(ValueError):
+    pass
+
+
+def output_format():
+    fmt = PROOF_FORMAT if PROOF_FORMAT in _ENCODERS else "webp"
+    if fmt == "avif" and not features.check("avif"):
+        fmt = "webp"  # Pillow without AVIF support: still compress, just less
+    return _ENCODERS[fmt]
+
+
+# --- Validation (header only) ---
+def probe(data: bytes, filename: str):
+    """Raise MediaError unless `data` looks like an image we accept; only the header is parsed."""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            fmt, (width, height) = img.format, img.size
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise MediaError(f"{filename}: not a readable image") from e
+    if fmt not in ACCEPTED_FORMATS:
+        raise MediaError(f"{filename}: {fmt} images are not accepted (use JPEG, PNG or WebP)")
+    if width < 1 or height < 1 or width * height > PROOF_MAX_PIXELS:
+        raise MediaError(f"{filename}: {width}x{height} is outside the accepted image size")
+
+
+# --- Transcoding ---
+def transcode(data: bytes) -> bytes:
+    """Oriented, size-capped, metadata-free copy of the image in the configured format."""
+    pil_format, options = output_format()
+    with proof_transcode_seconds.time(), Image.open(io.BytesIO(data)) as img:
+        if img.format in ("JPEG", "MPO"):
+            img.draft("RGB", (PROOF_MAX_DIMENSION, PROOF_MAX_DIMENSION))  # DCT scaling: decode at 1/2, 1/4, 1/8
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info else "RGB")
+        img.thumbnail((PROOF_MAX_DIMENSION, PROOF_MAX_DIMENSION), Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, pil_format, quality=PROOF_QUALITY, **options)  # no exif= -> metadata dropped
+    return out.getvalue()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=max(1, MEDIA_WORKERS), thread_name_prefix="media")
+    return _pool
+
+
+def _forget_pool():
+    global _pool, _pool_lock
+    _pool, _pool_lock = None, threading.Lock()  # pool threads don't survive fork
+
+
+os.register_at_fork(after_in_child=_forget_pool)
+
+
+def store_proofs(files, store):
+    """
+    files: werkzeug FileStorage list (empty entries are skipped).
+    Validates all, transcodes in parallel, puts the results in the blob store
+    and returns their keys in upload order. Raises MediaError before storing
+    anything if a file is rejected. Blobs stored before a later encode fails
+    are left for storage-maintenance to collect (another report may share them).
+    """
+    uploads = [(f.filename, f.read()) for f in files if f and f.filename]
+    if len(uploads) > PROOF_MAX_FILES:
+        raise MediaError(f"At most {PROOF_MAX_FILES} proof images per request")
+    for filename, data in uploads:
+        probe(data, filename)
+
+    futures = [_executor().submit(transcode, data) for _, data in uploads]
+    keys = []
+    try:
+        for (filename, data), future in zip(uploads, futures):
+            try:
+                encoded = future.result()
+            except (OSError, ValueError, Image.DecompressionBombError) as e:
+                raise MediaError(f"{filename}: image data is corrupt") from e
+            keys.append(store.put(encoded, MIME_TYPES[output_format()[0]]))
+            proof_bytes.labels(stage="received").inc(len(data))
+            proof_bytes.labels(stage="stored").inc(len(encoded))
+    except Exception:
+        for future in futures:
+            future.cancel()
+        raise
+    return keys
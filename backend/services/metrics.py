@@ -0,0 +1,122 @@
+"""
+Prometheus metrics for the upload pipeline, verify_image and the AQI routes.
+
+Under gunicorn every worker writes its samples to PROMETHEUS_MULTIPROC_DIR
+(set up in gunicorn.conf.py) and GET /metrics merges the files of all
+workers, so counters and histograms add up across the host no matter which
+worker serves the scrape. Without that variable (flask run, scripts) the
+metrics live in this process only.
+"""
+import os
+
+from flask import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # optional bearer token required by /metrics
+
+if PROMETHEUS_MULTIPROC_DIR:
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+# sub-millisecond stages (sha256, temp write) up to a slow CLIP call on a busy CPU
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# --- Upload pipeline ---
+UPLOAD_STAGES = (
+    "parse", "sha256", "duplicate_query", "temp_write", "canny", "clip", "file_save", "db_commit",
+)
+upload_stage_seconds = Histogram(
+    "breathesmart_upload_stage_seconds",
+    "Time spent in each stage of a single-image upload",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+verify_image_seconds = Histogram(
+    "breathesmart_verify_image_seconds",
+    "verify_image end to end (Canny + CLIP when the image passes the pollution gate)",
+    buckets=STAGE_BUCKETS,
+)
+ml_rejections = Counter(
+    "breathesmart_ml_admission_rejected",
+    "Uploads turned away by admission control",
+    ["reason"],
+)
+# gauges: livesum adds up the live workers' queues, livemax reports the worst worker's wait
+ml_admission_gauges = {
+    "in_flight": Gauge(
+        "breathesmart_ml_admission_in_flight", "ML calls holding an admission slot", multiprocess_mode="livesum",
+    ),
+    "queue_depth": Gauge(
+        "breathesmart_ml_admission_queue_depth", "ML calls waiting for an admission slot", multiprocess_mode="livesum",
+    ),
+    "wait_p95": Gauge(
+        "breathesmart_ml_admission_wait_p95_seconds",
+        "p95 wait for an admission slot over a worker's last 512 admissions",
+        multiprocess_mode="livemax",
+    ),
+}
+abuse_flags = Counter(
+    "breathesmart_upload_flagged",
+    "Uploads flagged by the abuse detector (stored rejected, ML skipped)",
+    ["rule"],  # rate | geo_velocity
+)
+aqi_alerts = Counter(
+    "breathesmart_aqi_alerts",
+    "AQI threshold alerts written to the outbox",
+    ["kind"],  # alert | clear
+)
+
+# --- Govt proof images ---
+proof_transcode_seconds = Histogram(
+    "breathesmart_proof_transcode_seconds",
+    "Time to decode, resize and re-encode one proof image",
+    buckets=STAGE_BUCKETS,
+)
+proof_bytes = Counter(
+    "breathesmart_proof_bytes",
+    "Proof image bytes received vs written to disk",
+    ["stage"],  # received | stored
+)
+
+# --- AQI ---
+waqi_request_seconds = Histogram(
+    "breathesmart_waqi_request_seconds",
+    "WAQI feed request latency",
+    ["outcome"],  # ok | error | timeout
+    buckets=STAGE_BUCKETS,
+)
+pdf_build_seconds = Histogram(
+    "breathesmart_pdf_build_seconds",
+    "Time to render the AQI fact sheet PDF",
+    buckets=STAGE_BUCKETS,
+)
+
+# --- Caches ---
+cache_lookups = Counter(
+    "breathesmart_cache_lookups",
+    "Cache lookups by cache and result",
+    ["cache", "result"],  # result: hit | miss
+)
+
+for _stage in UPLOAD_STAGES:
+    upload_stage_seconds.labels(stage=_stage)  # export every stage from the first scrape
+
+
+def upload_stage(stage):
+    """`with upload_stage("sha256"): ...` records the block's duration."""
+    return upload_stage_seconds.labels(stage=stage).time()
+
+
+def record_cache(cache, hit):
+    cache_lookups.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def metrics_response():
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
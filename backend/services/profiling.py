@@ -0,0 +1,83 @@
+"""
+Sampled cProfile of live requests, written per endpoint to a bounded ring of
+.pstats files.
+
+A request is profiled when either
+  - it is picked by the sample rate (optionally only for some endpoints), or
+  - it carries `X-Profile: <token>` and the token matches PROFILE_TOKEN.
+create_app only installs the hooks when one of the two is configured, so a
+disabled profiler costs nothing.
+
+Only one request per process is profiled at a time: cProfile hooks are global
+on newer Pythons, and it keeps the overhead on a busy worker bounded.
+"""
+import cProfile
+import os
+import random
+import threading
+import time
+
+from flask import g, request
+
+PROFILE_HEADER = "X-Profile"
+
+
+class RequestProfiler:
+    def __init__(self, app, output_dir, sample_rate=0.0, token=None, ring_size=50, min_ms=0.0, endpoints=None):
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.token = token
+        self.ring_size = ring_size
+        self.min_ms = min_ms
+        self.endpoints = set(endpoints) if endpoints else None
+        self._busy = threading.Lock()
+        os.makedirs(output_dir, exist_ok=True)
+
+        app.before_request(self._start)
+        app.after_request(self._tag_response)
+        app.teardown_request(self._stop)
+
+    # ✅ Request hooks
+    def _wanted(self):
+        if self.token and request.headers.get(PROFILE_HEADER) == self.token:
+            return True
+        if self.endpoints is not None and request.endpoint not in self.endpoints:
+            return False
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _start(self):
+        if not self._wanted() or not self._busy.acquire(blocking=False):
+            return
+        profiler = cProfile.Profile()
+        g._profile = (profiler, time.perf_counter(), f"{int(time.time() * 1000)}_{os.getpid()}")
+        profiler.enable()
+
+    def _tag_response(self, response):
+        if "_profile" in g:
+            response.headers["X-Profile-Id"] = f"{request.endpoint}/{g._profile[2]}"
+        return response
+
+    def _stop(self, exc=None):
+        profile = g.pop("_profile", None)
+        if profile is None:
+            return
+        profiler, started, name = profile
+        try:
+            profiler.disable()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if elapsed_ms >= self.min_ms:
+                self._write(profiler, request.endpoint or "unmatched", f"{name}_{elapsed_ms:.0f}ms")
+        finally:
+            self._busy.release()
+
+    # ✅ Ring of files per endpoint
+    def _write(self, profiler, endpoint, name):
+        folder = os.path.join(self.output_dir, endpoint)
+        os.makedirs(folder, exist_ok=True)
+        profiler.dump_stats(os.path.join(folder, f"{name}.pstats"))
+        files = sorted(f for f in os.listdir(folder) if f.endswith(".pstats"))  # names start with a ms timestamp
+        for old in files[:-self.ring_size]:
+            try:
+                os.remove(os.path.join(folder, old))
+            except FileNotFoundError:
+                pass  # another worker pruned it first
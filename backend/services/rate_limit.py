@@ -0,0 +1,38 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Simple token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, n=1):
+        with self._lock:
+            self._refill()
+            if self.tokens >= n:
+                self.tokens -= n
+                return True
+            return False
+
+    def refund(self, n=1):
+        """Give back tokens taken for work that was then refused (never above capacity)."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + n)
+
+    def wait_time(self, n=1):
+        """Seconds until `n` tokens will be available."""
+        with self._lock:
+            self._refill()
+            return max(0.0, (n - self.tokens) / self.rate) if self.rate > 0 else float("inf")
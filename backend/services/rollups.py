@@ -0,0 +1,282 @@
+# services/rollups.py
+"""
+Per-day, per-geohash-cell report aggregates for the government dashboards.
+
+`report_rollup` holds one row per (UTC day of created_at, geohash cell,
+status) with the report count and the sum and count of non-null
+`pollution_confidence`, so averages can be rolled up further. The table
+is kept current in the same transaction as the report write:
+
+- ORM inserts, attribute changes and deletes of `Report` are picked up in
+  `before_flush`. Every write path in the app goes through one of these
+  (insert_report, update_report, bulk upload, validate).
+- Bulk UPDATEs by primary key, `session.execute(update(Report), [{"id": ..}])`,
+  are picked up in `do_orm_execute`. The group committer and
+  reverify-reports write this way.
+
+Old values are read from the row inside the transaction, so a change is
+always moved out of the bucket it was counted in. Other UPDATE ... WHERE
+statements that change status, created_at, lat, lng or
+pollution_confidence bypass the rollups; `flask rebuild-rollups` repairs
+them (and fills the table the first time).
+"""
+import os
+import re
+from datetime import date, datetime, time
+
+from sqlalchemy import delete, event, func, select
+from sqlalchemy.orm import Session, attributes
+
+from extensions import db
+from models import Report, ReportRollup
+from services.AQI import geohash
+
+ROLLUP_GEOHASH_PRECISION = int(os.getenv("ROLLUP_GEOHASH_PRECISION", 5))  # 5 ≈ 4.9 km cells
+STATS_MAX_ROWS = int(os.getenv("STATS_MAX_ROWS", 10000))
+STATS_GROUPS = ("day", "cell", "status")
+ROLLUP_COLUMNS = ("status", "created_at", "lat", "lng", "pollution_confidence")
+BACKFILL_BATCH = 1000
+CELL_RE = re.compile(r"^[0-9b-hjkmnp-z]+$")  # geohash base32
+
+_rollup = ReportRollup.__table__
+_report = Report.__table__
+
+
+class StatsError(ValueError):
+    pass
+
+
+# --- Buckets and deltas ---
+def bucket(row):
+    """(day, cell, status) a report is counted in, or None if it has no date or location."""
+    if row["created_at"] is None or row["lat"] is None or row["lng"] is None:
+        return None
+    cell = geohash.encode(row["lat"], row["lng"], ROLLUP_GEOHASH_PRECISION)
+    return row["created_at"].date(), cell, row["status"] or "pending"
+
+
+def _count(deltas, row, sign):
+    key = bucket(row)
+    if key is None:
+        return
+    delta = deltas.setdefault(key, [0, 0.0, 0])
+    delta[0] += sign
+    if row["pollution_confidence"] is not None:
+        delta[1] += sign * row["pollution_confidence"]
+        delta[2] += sign
+
+
+_SUMS = ("report_count", "confidence_sum", "confidence_count")
+
+
+def _upsert(dialect):
+    """INSERT ... adding to the existing row on key conflict (atomic per row)."""
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+
+        stmt = insert(_rollup)
+        return stmt.on_duplicate_key_update({c: _rollup.c[c] + stmt.inserted[c] for c in _SUMS})
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(_rollup)
+    return stmt.on_conflict_do_update(
+        index_elements=["day", "cell", "status"], set_={c: _rollup.c[c] + stmt.excluded[c] for c in _SUMS}
+    )
+
+
+def apply(conn, deltas):
+    """Add {(day, cell, status): [count, confidence_sum, confidence_count]} to the rollup rows."""
+    rows = [
+        {"day": day, "cell": cell, "status": status,
+         "report_count": n, "confidence_sum": total, "confidence_count": scored}
+        for (day, cell, status), (n, total, scored) in sorted(deltas.items())  # fixed lock order
+        if n or total or scored  # a confidence edit in place nets to (0, delta, 0)
+    ]
+    if rows:
+        conn.execute(_upsert(conn.dialect.name), rows)
+
+
+def _stored_rows(conn, ids):
+    """id -> {column: value} as currently stored (pre-change, since we run before the write)."""
+    stmt = select(_report.c.id, *(_report.c[c] for c in ROLLUP_COLUMNS)).where(_report.c.id.in_(ids))
+    return {row.id: row._mapping for row in conn.execute(stmt)}
+
+
+# --- Change capture ---
+def _snapshot(report):
+    return {c: getattr(report, c) for c in ROLLUP_COLUMNS}
+
+
+def _before_flush(session, flush_context, instances):
+    deltas = {}
+    for report in session.new:
+        if isinstance(report, Report):
+            if report.created_at is None:
+                report.created_at = datetime.utcnow()  # the column default, applied early so the day is known
+            _count(deltas, _snapshot(report), +1)
+
+    changed = [
+        r for r in session.dirty
+        if isinstance(r, Report) and r.id is not None
+        and any(attributes.get_history(r, c).has_changes() for c in ROLLUP_COLUMNS)
+    ]
+    deleted = [r for r in session.deleted if isinstance(r, Report) and r.id is not None]
+    if changed or deleted:
+        stored = _stored_rows(session.connection(), [r.id for r in changed + deleted])
+        for report in changed:
+            if report.id in stored:
+                _count(deltas, stored[report.id], -1)
+                _count(deltas, _snapshot(report), +1)
+        for report in deleted:
+            if report.id in stored:
+                _count(deltas, stored[report.id], -1)
+    apply(session.connection(), deltas)
+
+
+def _do_orm_execute(state):
+    if not state.is_update or state.bind_mapper is None or state.bind_mapper.class_ is not Report:
+        return
+    params = state.parameters
+    if isinstance(params, dict):
+        params = [params]
+    if state.statement.whereclause is not None or not params or "id" not in params[0]:
+        return  # not a bulk update by primary key; see the module docstring
+    params = [p for p in params if any(c in p for c in ROLLUP_COLUMNS)]
+    if not params:
+        return
+    conn = state.session.connection()
+    stored = _stored_rows(conn, [p["id"] for p in params])
+    deltas = {}
+    for p in params:
+        old = stored.get(p["id"])
+        if old is not None:
+            _count(deltas, old, -1)
+            _count(deltas, {**old, **{c: p[c] for c in ROLLUP_COLUMNS if c in p}}, +1)
+    apply(conn, deltas)
+
+
+def install():
+    """Keep report_rollup current from every session (request sessions, group commit, CLI)."""
+    if not event.contains(Session, "before_flush", _before_flush):
+        event.listen(Session, "before_flush", _before_flush)
+        event.listen(Session, "do_orm_execute", _do_orm_execute)
+
+
+# --- Backfill ---
+def rebuild(since=None):
+    """
+    Recompute the rollups from `report` (all days, or days from the date
+    `since` on) in one transaction. Returns (reports counted, rollup rows written).
+    Writes that commit while it runs may be counted twice or not at all,
+    so run it when uploads are quiet.
+    """
+    stmt = select(*(Report.__table__.c[c] for c in ROLLUP_COLUMNS))
+    clear = delete(ReportRollup)
+    if since is not None:
+        stmt = stmt.where(Report.created_at >= datetime.combine(since, time()))
+        clear = clear.where(ReportRollup.day >= since)
+    deltas = {}
+    counted = 0
+    for row in db.session.execute(stmt.execution_options(yield_per=BACKFILL_BATCH)):
+        _count(deltas, row._mapping, +1)
+        counted += 1
+    try:
+        db.session.execute(clear)
+        apply(db.session.connection(), deltas)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return counted, len(deltas)
+
+
+# --- Queries ---
+def parse_stats_args(args):
+    """group_by=day,cell,status  precision=1..N  since/until=ISO date  status=a,b  cell=<geohash prefix>."""
+    query = {}
+    group_by = [g.strip() for g in (args.get("group_by") or "day,status").split(",") if g.strip()]
+    unknown = set(group_by) - set(STATS_GROUPS)
+    if unknown:
+        raise StatsError(f"'group_by' accepts {', '.join(STATS_GROUPS)}")
+    query["group_by"] = [g for g in STATS_GROUPS if g in group_by]
+
+    try:
+        query["precision"] = int(args.get("precision", ROLLUP_GEOHASH_PRECISION))
+    except ValueError:
+        raise StatsError("'precision' must be an integer")
+    if not 1 <= query["precision"] <= ROLLUP_GEOHASH_PRECISION:
+        raise StatsError(f"'precision' must be between 1 and {ROLLUP_GEOHASH_PRECISION}")
+
+    for key in ("since", "until"):
+        value = args.get(key)
+        if value:
+            try:
+                query[key] = date.fromisoformat(value[:10])
+            except ValueError:
+                raise StatsError(f"'{key}' must be an ISO date")
+
+    status = args.get("status")
+    if status:
+        query["status"] = [s.strip() for s in status.split(",") if s.strip()]
+
+    cell = (args.get("cell") or "").lower()
+    if cell:
+        if len(cell) > ROLLUP_GEOHASH_PRECISION or not CELL_RE.match(cell):
+            raise StatsError(f"'cell' must be a geohash prefix of at most {ROLLUP_GEOHASH_PRECISION} characters")
+        query["cell"] = cell
+    return query
+
+
+def _average(total, scored):
+    return round(total / scored, 2) if scored else None
+
+
+def stats(group_by=("day", "status"), precision=ROLLUP_GEOHASH_PRECISION, since=None, until=None,
+          status=None, cell=None):
+    """Aggregated counts and average pollution_confidence, read from the rollups only."""
+    columns = {
+        "day": ReportRollup.day,
+        "cell": func.substr(ReportRollup.cell, 1, precision) if precision < ROLLUP_GEOHASH_PRECISION else ReportRollup.cell,
+        "status": ReportRollup.status,
+    }
+    keys = [columns[g].label(g) for g in group_by]
+    sums = (
+        func.sum(ReportRollup.report_count).label("count"),
+        func.sum(ReportRollup.confidence_sum).label("confidence_sum"),
+        func.sum(ReportRollup.confidence_count).label("confidence_count"),
+    )
+    filters = []
+    if since:
+        filters.append(ReportRollup.day >= since)
+    if until:
+        filters.append(ReportRollup.day < until)
+    if status:
+        filters.append(ReportRollup.status.in_(status))
+    if cell:
+        filters.append(ReportRollup.cell.like(f"{cell}%"))
+
+    grouped = (
+        select(*keys, *sums).where(*filters).group_by(*keys)
+        .having(func.sum(ReportRollup.report_count) > 0).order_by(*keys).limit(STATS_MAX_ROWS + 1)
+    )
+    rows = db.session.execute(grouped).all()
+    total = db.session.execute(select(*sums).where(*filters)).one()
+    return {
+        "group_by": list(group_by),
+        "precision": precision,
+        "rows": [
+            {
+                **{g: (getattr(row, g).isoformat() if g == "day" else getattr(row, g)) for g in group_by},
+                "count": row.count,
+                "avg_pollution_confidence": _average(row.confidence_sum, row.confidence_count),
+            }
+            for row in rows[:STATS_MAX_ROWS]
+        ],
+        "truncated": len(rows) > STATS_MAX_ROWS,
+        "total": {
+            "count": total.count or 0,
+            "avg_pollution_confidence": _average(total.confidence_sum or 0.0, total.confidence_count or 0),
+        },
+    }
@@ -0,0 +1,240 @@
+"""
+Report search for validators: CLIP semantic ranking + a keyword inverted index.
+
+Three ranked lists are fused with reciprocal-rank fusion (RRF):
+  image        query text embedding vs stored CLIP image embeddings
+  description  query text embedding vs stored CLIP description embeddings
+  keywords     BM25 over description + precautions + govt_action
+
+Status / bbox filters are evaluated on in-memory columns before any ranking.
+The keyword index lives in each worker's memory; it is built from the DB on
+first use and then refreshed incrementally from `report.updated_at`. Each
+refresh re-reads rows updated since the previous refresh started, less
+SEARCH_REFRESH_OVERLAP_SECONDS: a transaction (group commit, reverify) can
+commit after a row with a later timestamp was read, and a watermark on the
+newest timestamp seen would skip it for good. Re-reading an unchanged row
+is cheap (its text hash matches).
+"""
+import math
+import re
+import threading
+import os
+import time
+from array import array
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import select
+
+from extensions import db
+from models import Report
+
+SEARCH_REFRESH_SECONDS = 2.0  # how stale the keyword index / filter columns may get
+SEARCH_REFRESH_OVERLAP_SECONDS = float(os.getenv("SEARCH_REFRESH_OVERLAP_SECONDS", 30))  # commit lag + clock skew
+RRF_K = 60
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_RESULTS = 100
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the this to was were with near".split()
+)
+
+
+class SearchError(ValueError):
+    pass
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+class ReportIndex:
+    """
+    Inverted index + filter columns keyed by a dense slot per report.
+    Postings are compact arrays (slot, term frequency) per token; a report's
+    previous postings are removed when it changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slot_of = {}  # report id -> slot
+        self._report_ids = array("q")
+        self._status = array("b")
+        self._lat = array("d")
+        self._lng = array("d")
+        self._doc_len = array("i")
+        self._doc_hash = array("q")  # detects status-only updates, which skip re-indexing
+        self._doc_tokens = []  # slot -> tuple of distinct tokens (for removal on update)
+        self._postings = {}  # token -> (array of slots, array of tf)
+        self._status_codes = {}
+        self._total_len = 0
+        self._since = None  # next refresh reads rows with updated_at >= this (None: full load)
+        self._checked_at = 0.0
+
+    # ✅ Maintenance
+    def refresh(self, force=False):
+        if not force and time.monotonic() - self._checked_at < SEARCH_REFRESH_SECONDS:
+            return
+        started = datetime.utcnow()
+        stmt = select(
+            Report.id, Report.status, Report.lat, Report.lng,
+            Report.description, Report.precautions, Report.govt_action,
+        ).order_by(Report.id)
+        if self._since is not None:
+            stmt = stmt.where(Report.updated_at >= self._since)
+        rows = db.session.execute(stmt.execution_options(yield_per=5000))
+        with self._lock:
+            for row in rows:
+                self._upsert(row)
+            self._since = started - timedelta(seconds=SEARCH_REFRESH_OVERLAP_SECONDS)
+            self._checked_at = time.monotonic()
+
+    def _status_code(self, status):
+        return self._status_codes.setdefault(status or "", len(self._status_codes))
+
+    def _upsert(self, row):
+        tokens = tokenize(" ".join(filter(None, (row.description, row.precautions, row.govt_action))))
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        doc_hash = hash(tuple(tokens))
+
+        slot = self._slot_of.get(row.id)
+        if slot is None:
+            slot = self._slot_of[row.id] = len(self._report_ids)
+            self._report_ids.append(row.id)
+            self._status.append(self._status_code(row.status))
+            self._lat.append(row.lat if row.lat is not None else math.nan)
+            self._lng.append(row.lng if row.lng is not None else math.nan)
+            self._doc_len.append(0)
+            self._doc_hash.append(0)
+            self._doc_tokens.append(())
+        else:
+            self._status[slot] = self._status_code(row.status)
+            self._lat[slot] = row.lat if row.lat is not None else math.nan
+            self._lng[slot] = row.lng if row.lng is not None else math.nan
+            if self._doc_hash[slot] == doc_hash:
+                return  # text unchanged
+            for token in self._doc_tokens[slot]:
+                slots, tfs = self._postings[token]
+                i = slots.index(slot)
+                del slots[i]
+                del tfs[i]
+
+        for token, tf in counts.items():
+            slots, tfs = self._postings.setdefault(token, (array("i"), array("i")))
+            slots.append(slot)
+            tfs.append(tf)
+        self._total_len += len(tokens) - self._doc_len[slot]
+        self._doc_len[slot] = len(tokens)
+        self._doc_hash[slot] = doc_hash
+        self._doc_tokens[slot] = tuple(counts)
+
+    # ✅ Queries (call with the lock held: the numpy views below pin the arrays)
+    def filter_slots(self, statuses=None, bbox=None):
+        """Boolean mask over slots, or None when there is no filter."""
+        if not statuses and not bbox:
+            return None
+        mask = np.ones(len(self._report_ids), dtype=bool)
+        if statuses:
+            codes = [self._status_codes[s] for s in statuses if s in self._status_codes]
+            mask &= np.isin(np.frombuffer(self._status, dtype=np.int8), codes)
+        if bbox:
+            min_lng, min_lat, max_lng, max_lat = bbox
+            lat = np.frombuffer(self._lat, dtype=np.float64)
+            lng = np.frombuffer(self._lng, dtype=np.float64)
+            mask &= (lat >= min_lat) & (lat <= max_lat) & (lng >= min_lng) & (lng <= max_lng)
+        return mask
+
+    def bm25(self, query_tokens, mask=None, k=MAX_RESULTS):
+        """Top-k (report_id, score) by BM25."""
+        n = len(self._report_ids)
+        if not n or not query_tokens:
+            return []
+        doc_len = np.frombuffer(self._doc_len, dtype=np.int32)
+        avg_len = max(self._total_len / n, 1.0)
+        scores = np.zeros(n, dtype=np.float32)
+        for token in set(query_tokens):
+            posting = self._postings.get(token)
+            if not posting or not len(posting[0]):
+                continue
+            slots = np.frombuffer(posting[0], dtype=np.int32)
+            tf = np.frombuffer(posting[1], dtype=np.int32).astype(np.float32)
+            idf = math.log(1 + (n - len(slots) + 0.5) / (len(slots) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len[slots] / avg_len)
+            scores[slots] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        if mask is not None:
+            scores[~mask] = 0
+        hits = np.flatnonzero(scores)
+        if not len(hits):
+            return []
+        top = hits[np.argsort(-scores[hits], kind="stable")[:k]]
+        ids = np.frombuffer(self._report_ids, dtype=np.int64)
+        return [(int(ids[s]), float(scores[s])) for s in top]
+
+    def report_ids(self, mask):
+        return np.frombuffer(self._report_ids, dtype=np.int64)[mask].tolist()
+
+
+report_index = ReportIndex()
+
+
+def parse_search_args(args):
+    """q (required), k, status=a,b, bbox=minLng,minLat,maxLng,maxLat."""
+    query = (args.get("q") or "").strip()
+    if not query:
+        raise SearchError("'q' is required")
+    try:
+        k = int(args.get("k", 20))
+    except ValueError:
+        raise SearchError("'k' must be an integer")
+    statuses = [s.strip() for s in (args.get("status") or "").split(",") if s.strip()]
+    bbox = None
+    if args.get("bbox"):
+        try:
+            bbox = tuple(float(v) for v in args["bbox"].split(","))
+            if len(bbox) != 4:
+                raise ValueError
+        except ValueError:
+            raise SearchError("'bbox' must be minLng,minLat,maxLng,maxLat")
+    return {"query": query, "k": max(1, min(k, MAX_RESULTS)), "statuses": statuses, "bbox": bbox}
+
+
+def _rrf(rankings):
+    fused = {}
+    for ranking in rankings.values():
+        for rank, (report_id, _) in enumerate(ranking):
+            fused[report_id] = fused.get(report_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return fused
+
+
+def search_reports(query, k=20, statuses=None, bbox=None, encode_query=None):
+    """
+    [(report_id, fused score, {"image": cos, "description": cos, "keywords": bm25}), ...].
+    `encode_query(text)` returns a CLIP text embedding; without it (or if it fails)
+    ranking falls back to keywords only.
+    """
+    from services.ML.embedding_store import description_store, embedding_store
+
+    report_index.refresh()
+    candidates = max(k * 5, 50)
+    with report_index._lock:
+        mask = report_index.filter_slots(statuses, bbox)
+        allowed = report_index.report_ids(mask) if mask is not None else None
+        rankings = {"keywords": report_index.bm25(tokenize(query), mask, k=candidates)}
+
+    if encode_query is not None and (allowed is None or allowed):
+        vector = encode_query(query)
+        if vector is not None:
+            rankings["image"] = embedding_store.search(vector, k=candidates, report_ids=allowed)
+            rankings["description"] = description_store.search(vector, k=candidates, report_ids=allowed)
+
+    fused = _rrf(rankings)
+    components = {name: dict(ranking) for name, ranking in rankings.items()}
+    top = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+    return [
+        (report_id, score, {name: round(c[report_id], 4) for name, c in components.items() if report_id in c})
+        for report_id, score in top
+    ]
@@ -0,0 +1,311 @@
+# services/storage_maintenance.py
+"""
+Housekeeping for the uploads tree (`flask storage-maintenance`).
+
+- orphans: delete files under verified/ and rejected/, and blobs, that no report
+  references, either as `image_filename` or in `details["govt_proofs"]`.
+  These are left behind by duplicate re-uploads, failed requests and
+  deleted rows. Files younger than the grace period are skipped, because
+  an upload is written to disk before its row commits. For the same reason,
+  re-storing an existing blob refreshes its mtime once it is half that old.
+- archive: move legacy (pre-blob) rejected images older than `archive_after_days` into
+  monthly zip archives under uploads/archive/. Their names are recorded in
+  archive/index.sqlite, and GET /api/reports/uploads/rejected/<name>
+  extracts them on demand.
+- retention: delete rejected images older than `retention_days`, whole
+  monthly archives and blobs of rejected reports included. Report rows are
+  kept; only the image goes (blob-backed rows get image_filename = NULL).
+  Blobs are shared by content, so one another report still references
+  (as its image or a proof) is left in place; only the reference is cleared.
+
+Memory stays bounded however large the tree and table are. The directory
+walk and the report table are both streamed into a scratch SQLite file,
+and the join runs there. Archives are written and indexed in batches.
+"""
+import os
+import sqlite3
+import tempfile
+import time
+import zipfile
+from contextlib import closing
+from datetime import datetime
+
+from sqlalchemy import func, select, update
+
+from extensions import db
+from models import Report
+from services import file_lock
+from services.blob_store import ORPHAN_GRACE_HOURS, blob_ref, parse_ref
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("STORAGE_ARCHIVE_AFTER_DAYS", 30))
+REJECTED_RETENTION_DAYS = int(os.getenv("STORAGE_REJECTED_RETENTION_DAYS", 365))  # 0 keeps them forever
+ORPHAN_SAFETY_RATIO = 0.5  # refuse to delete when more than this share of files looks orphaned
+BATCH = 1000
+ARCHIVE_PREFIX = "rejected-"
+BLOBS = "<blobs>"  # scratch-table folder of blob store entries
+
+
+def archive_dir(app):
+    return os.path.join(app.config["UPLOAD_FOLDER"], "archive")
+
+
+def _index(app):
+    path = os.path.join(archive_dir(app), "index.sqlite")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")  # web workers read while a run writes
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS archived ("
+        " name TEXT PRIMARY KEY, archive TEXT NOT NULL, size INTEGER, mtime REAL, archived_at REAL)"
+    )
+    return conn
+
+
+# --- On-demand extraction (used by the uploads route) ---
+def read_archived(app, name):
+    """Bytes of an archived rejected image, or None if it was never archived (or has expired)."""
+    if not os.path.exists(os.path.join(archive_dir(app), "index.sqlite")):
+        return None
+    with closing(_index(app)) as conn:
+        row = conn.execute("SELECT archive FROM archived WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        return None
+    try:
+        with zipfile.ZipFile(os.path.join(archive_dir(app), row[0])) as zf:
+            return zf.read(name)
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return None
+
+
+# --- Streaming helpers ---
+def _walk(folder, relative_to=None):
+    """(relative path, size, mtime) for every file below folder, without listing it all at once."""
+    relative_to = relative_to or folder
+    try:
+        entries = os.scandir(folder)
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue  # in-progress writes (".name.tmp")
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk(entry.path, relative_to)
+            elif entry.is_file(follow_symlinks=False):
+                st = entry.stat(follow_symlinks=False)
+                yield os.path.relpath(entry.path, relative_to).replace(os.sep, "/"), st.st_size, st.st_mtime
+
+
+def _batched(rows, size=BATCH):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _proof_refs():
+    stmt = select(Report.details).where(Report.details.is_not(None)).execution_options(yield_per=BATCH)
+    for details in db.session.execute(stmt).scalars():
+        yield from (details or {}).get("govt_proofs") or []
+
+
+def _still_referenced(refs, expiring_ids, proofs):
+    """The refs another report (not expiring in this batch) points to: their blobs must stay."""
+    images = db.session.execute(
+        select(Report.image_filename).where(Report.image_filename.in_(refs), Report.id.not_in(expiring_ids))
+    ).scalars()
+    return set(images) | (set(refs) & proofs)
+
+
+def _referenced_names():
+    stmt = select(Report.image_filename, Report.details).execution_options(yield_per=BATCH)
+    for image_filename, details in db.session.execute(stmt):
+        if image_filename:
+            yield image_filename
+        for proof in (details or {}).get("govt_proofs") or []:
+            yield proof
+
+
+# --- Steps ---
+def scan(app, scratch):
+    """Load every upload and blob, and every referenced name, into the scratch DB."""
+    scratch.execute("CREATE TABLE files (folder TEXT, name TEXT, size INTEGER, mtime REAL)")
+    scratch.execute("CREATE TABLE refs (name TEXT PRIMARY KEY)")
+    for folder in (app.config["VERIFIED_FOLDER"], app.config["REJECTED_FOLDER"]):
+        for batch in _batched(_walk(folder)):
+            scratch.executemany("INSERT INTO files VALUES (?, ?, ?, ?)", [(folder, *row) for row in batch])
+    for batch in _batched(app.extensions["blob_store"].iter_blobs()):
+        scratch.executemany(
+            "INSERT INTO files VALUES (?, ?, ?, ?)", [(BLOBS, blob_ref(b.key), b.size, b.modified) for b in batch]
+        )
+    for batch in _batched(_referenced_names()):
+        scratch.executemany("INSERT OR IGNORE INTO refs VALUES (?)", [(name,) for name in batch])
+    scratch.commit()
+
+
+ORPHANS_SQL = "FROM files f LEFT JOIN refs r ON r.name = f.name WHERE r.name IS NULL"
+
+
+def delete_orphans(app, grace_hours=ORPHAN_GRACE_HOURS, dry_run=False, force=False):
+    stats = {"files": 0, "bytes": 0}
+    with tempfile.TemporaryDirectory(prefix="storage_") as tmp, \
+            closing(sqlite3.connect(os.path.join(tmp, "scan.db"))) as scratch:
+        scan(app, scratch)
+        total = scratch.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        unreferenced = scratch.execute(f"SELECT COUNT(*) {ORPHANS_SQL}").fetchone()[0]
+        if not dry_run and not force and total >= 100 and unreferenced > total * ORPHAN_SAFETY_RATIO:
+            raise RuntimeError(
+                f"{unreferenced} of {total} files look orphaned; is this the right database? Re-run with --force"
+            )
+        cutoff = time.time() - grace_hours * 3600  # an upload hits the disk before its row commits
+        orphans = scratch.execute(f"SELECT f.folder, f.name, f.size {ORPHANS_SQL} AND f.mtime < ?", (cutoff,))
+        for folder, name, size in orphans:
+            if not dry_run and folder == BLOBS:
+                app.extensions["blob_store"].delete(parse_ref(name))
+            elif not dry_run:
+                try:
+                    os.remove(os.path.join(folder, name))
+                except FileNotFoundError:
+                    continue  # moved by a concurrent reverify, or already gone
+            stats["files"] += 1
+            stats["bytes"] += size
+    return stats
+
+
+def _archive_name(mtime):
+    return f"{ARCHIVE_PREFIX}{datetime.fromtimestamp(mtime):%Y-%m}.zip"
+
+
+def archive_rejected(app, after_days=ARCHIVE_AFTER_DAYS, dry_run=False):
+    folder = app.config["REJECTED_FOLDER"]
+    cutoff = time.time() - after_days * 86400
+    stats = {"files": 0, "bytes": 0, "archived_bytes": 0}
+    # top-level files only: rejected/ has no subfolders of its own
+    candidates = (
+        (name, size, mtime) for name, size, mtime in _walk(folder) if "/" not in name and mtime < cutoff
+    )
+    with closing(_index(app)) as index:
+        for batch in _batched(candidates):
+            stats["files"] += len(batch)
+            stats["bytes"] += sum(size for _, size, _ in batch)
+            if dry_run:
+                continue
+            archives = {}  # archive filename -> open ZipFile (one per month in this batch)
+            rows = []
+            try:
+                for name, size, mtime in batch:
+                    archive = _archive_name(mtime)
+                    if archive not in archives:
+                        archives[archive] = zipfile.ZipFile(
+                            os.path.join(archive_dir(app), archive), "a", compression=zipfile.ZIP_DEFLATED
+                        )
+                    zf = archives[archive]
+                    if name not in zf.NameToInfo:  # already there if a previous run died before indexing
+                        zf.write(os.path.join(folder, name), arcname=name)
+                    stats["archived_bytes"] += zf.NameToInfo[name].compress_size
+                    rows.append((name, archive, size, mtime, time.time()))
+            finally:
+                for zf in archives.values():
+                    zf.close()  # writes the central directory: members are readable from here on
+            index.executemany("INSERT OR REPLACE INTO archived VALUES (?, ?, ?, ?, ?)", rows)
+            index.commit()
+            for name, *_ in rows:
+                try:
+                    os.remove(os.path.join(folder, name))
+                except FileNotFoundError:
+                    pass
+    return stats
+
+
+def enforce_retention(app, retention_days=REJECTED_RETENTION_DAYS, dry_run=False, publish=None):
+    """
+    `publish(report_ids)` runs before each commit that clears image references,
+    inside its transaction. Its events are what change the list ETags.
+    """
+    stats = {"files": 0, "archives": 0, "bytes": 0}
+    if retention_days <= 0:
+        return stats
+    cutoff = time.time() - retention_days * 86400
+
+    # loose rejected files (archiving off, or not yet archived)
+    folder = app.config["REJECTED_FOLDER"]
+    for name, size, mtime in _walk(folder):
+        if "/" in name or mtime >= cutoff:
+            continue
+        if not dry_run:
+            try:
+                os.remove(os.path.join(folder, name))
+            except FileNotFoundError:
+                continue
+        stats["files"] += 1
+        stats["bytes"] += size
+
+    # blob-backed rejected reports: delete the blob, clear the reference (the row stays)
+    store = app.extensions["blob_store"]
+    expired = (
+        select(Report.id, Report.image_filename)
+        .where(Report.status == "rejected", Report.image_filename.like(f"{blob_ref('')}%"),
+               func.coalesce(Report.last_checked_at, Report.created_at) < datetime.utcfromtimestamp(cutoff))
+        .order_by(Report.id)
+        .limit(BATCH)
+    )
+    after_id = 0
+    proofs = None
+    while rows := db.session.execute(expired.where(Report.id > after_id)).all():
+        after_id = rows[-1].id
+        ids, refs = [r.id for r in rows], {r.image_filename for r in rows}  # a set: expiring rows may share a blob
+        if proofs is None:
+            proofs = {ref for ref in _proof_refs() if parse_ref(ref)}  # only validated reports carry proofs
+        for ref in refs - _still_referenced(refs, ids, proofs):
+            if not dry_run:
+                store.delete(parse_ref(ref))
+            stats["files"] += 1
+        if not dry_run:
+            db.session.execute(update(Report).where(Report.id.in_(ids)).values(image_filename=None))
+            if publish:
+                publish(ids)
+            db.session.commit()
+
+    # whole monthly archives once the month has fully aged out
+    cutoff_month = f"{ARCHIVE_PREFIX}{datetime.fromtimestamp(cutoff):%Y-%m}.zip"
+    directory = archive_dir(app)
+    if not os.path.isdir(directory):
+        return stats
+    with closing(_index(app)) as index:
+        for archive in sorted(os.listdir(directory)):
+            if not (archive.startswith(ARCHIVE_PREFIX) and archive.endswith(".zip")) or archive >= cutoff_month:
+                continue
+            path = os.path.join(directory, archive)
+            members, size = index.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM archived WHERE archive = ?", (archive,)
+            ).fetchone()
+            if not dry_run:
+                index.execute("DELETE FROM archived WHERE archive = ?", (archive,))
+                index.commit()  # unindex first: readers never look up a deleted archive
+                os.remove(path)
+            stats["archives"] += 1
+            stats["files"] += members
+            stats["bytes"] += size
+    return stats
+
+
+class MaintenanceLock:
+    """One maintenance run per uploads tree at a time."""
+
+    def __init__(self, app):
+        os.makedirs(archive_dir(app), exist_ok=True)
+        self.path = os.path.join(archive_dir(app), ".maintenance.lock")
+
+    def __enter__(self):
+        self._file = open(self.path, "w")
+        if not file_lock.lock(self._file, blocking=False):
+            self._file.close()
+            raise RuntimeError("Another storage-maintenance run is in progress")
+        return self
+
+    def __exit__(self, *exc):
+        self._file.close()
@@ -1,12 +1,18 @@
 import json
 import os
+import threading
+
+from services.file_lock import locked
 
 # ✅ Always store inside backend/data/users.json
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 
-USERS_FILE = os.path.join(DATA_DIR, "users.json")
+USERS_FILE = os.getenv("USERS_FILE", os.path.join(DATA_DIR, "users.json"))
+
+# signups are read-modify-write: serialise them across threads (lock) and workers (flock)
+_write_lock = threading.Lock()
 
 
 def load_users():
@@ -20,23 +26,27 @@ def load_users():
 
 
 def save_users(users):
-    with open(USERS_FILE, "w") as f:
+    # write-then-rename so concurrent readers never see a half-written file
+    tmp_path = f"{USERS_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
         json.dump(users, f, indent=2)
+    os.replace(tmp_path, USERS_FILE)
 
 
 def add_user(name, email, password):
-    users = load_users()
-    if any(u["email"].lower() == email.lower() for u in users):
-        return False, "Email already registered"
-
-    # 👇 Always set role = citizen
-    users.append({
-        "name": name,
-        "email": email,
-        "password": password,
-        "role": "citizen"
-    })
-    save_users(users)
+    with _write_lock, locked(f"{USERS_FILE}.lock"):
+        users = load_users()
+        if any(u["email"].lower() == email.lower() for u in users):
+            return False, "Email already registered"
+
+        # 👇 Always set role = citizen
+        users.append({
+            "name": name,
+            "email": email,
+            "password": password,
+            "role": "citizen"
+        })
+        save_users(users)
     return True, "User registered successfully"
 
 
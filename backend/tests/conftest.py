@@ -0,0 +1,87 @@
+# backend/tests/conftest.py
+"""
+Shared fixtures. The app runs against a throwaway SQLite file and upload
+tree, with the stub CLIP backend (no model download, no torch).
+Everything is configured through the environment before `app` is imported.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_tmp = tempfile.mkdtemp(prefix="breathesmart_tests_")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(_tmp, 'test.db')}",
+    UPLOAD_FOLDER=os.path.join(_tmp, "uploads"),
+    BLOB_ROOT=os.path.join(_tmp, "blobs"),
+    EMBEDDING_STORE_DIR=os.path.join(_tmp, "embeddings"),
+    AQI_STATIONS_FILE=os.path.join(_tmp, "aqi_stations.json"),
+    USERS_FILE=os.path.join(_tmp, "users.json"),
+    JWT_SECRET_KEY="test-secret-key-of-at-least-32-bytes",
+    CLIP_BACKEND="stub",
+    CLIP_STUB_LATENCY_MS="0",
+    DB_AUTO_MIGRATE="1",
+)
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import app as flask_app
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def db_session(app):
+    """The app's session inside an app context; every table but schema_version is emptied afterwards."""
+    from extensions import db
+
+    with app.app_context():
+        yield db.session
+        db.session.rollback()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+
+
+@pytest.fixture
+def login(app):
+    """login(name, role="citizen") -> Authorization headers for a user written to USERS_FILE."""
+    from flask_jwt_extended import create_access_token
+    from services.user_service import load_users, save_users
+
+    def make(name, role="citizen"):
+        email = f"{name.lower()}@example.com"
+        users = [u for u in load_users() if u["email"] != email]
+        save_users(users + [{"name": name, "email": email, "password": "x", "role": role}])
+        with app.app_context():
+            token = create_access_token(identity=email, additional_claims={"role": role})
+        return {"Authorization": f"Bearer {token}"}
+
+    yield make
+    save_users([])
+
+
+@pytest.fixture
+def jpeg():
+    """jpeg(seed) -> bytes of a small noisy JPEG; the same seed gives the same image."""
+    import io
+
+    import numpy as np
+    from PIL import Image
+
+    def make(seed=0, size=64):
+        pixels = np.random.default_rng(seed).integers(0, 256, (size, size, 3), dtype=np.uint8)
+        out = io.BytesIO()
+        Image.fromarray(pixels).save(out, format="JPEG")
+        return out.getvalue()
+
+    return make
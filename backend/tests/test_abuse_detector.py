@@ -0,0 +1,201 @@
+import io
+import json
+import time
+from datetime import datetime
+
+import pytest
+
+from models import Report
+from routes import report_routes
+from services.abuse_detector import AbuseDetector
+
+DELHI = (28.6139, 77.2090)
+NOIDA = (28.5355, 77.3910)  # ~20 km from Delhi
+MUMBAI = (19.0760, 72.8777)  # ~1150 km from Delhi
+
+
+def _stored(session, user, at, places, details=None):
+    """One upload event: a report per (lat, lng), all created at `at` (unix seconds)."""
+    created_at = datetime.utcfromtimestamp(at)
+    reports = [
+        Report(user_name=user, description="", lat=lat, lng=lng, status="verified", created_at=created_at, details=details)
+        for lat, lng in places
+    ]
+    session.add_all(reports)
+    session.commit()
+    return reports
+
+
+def _rows(reports):
+    return [(r.id, r.created_at, r.lat, r.lng, r.details) for r in reports]
+
+
+def test_rate_counts_upload_events_in_the_window(db_session):
+    detector = AbuseDetector(window_seconds=3600, max_uploads=3)
+    now = time.time()
+    _stored(db_session, "u", now - 7200, [DELHI])  # outside the window
+    _stored(db_session, "u", now - 600, [DELHI])
+    _stored(db_session, "u", now - 300, [DELHI] * 10)  # a bulk batch is one event
+    assert detector.check("u", *DELHI, now=now) is None
+
+    detector.record("u", _rows(_stored(db_session, "u", now - 60, [DELHI])))
+    verdict = detector.check("u", *DELHI, now=now)
+    assert verdict["rule"] == "rate"
+    assert verdict["uploads"] == 4
+    assert detector.check("someone else", *DELHI, now=now) is None
+
+
+def test_check_records_nothing(db_session):
+    detector = AbuseDetector(window_seconds=3600, max_uploads=1)
+    now = time.time()
+    for _ in range(5):  # e.g. refused by admission control: never stored, never counted
+        assert detector.check("u", *DELHI, now=now) is None
+
+
+def test_history_is_read_from_the_table_once(db_session):
+    detector = AbuseDetector(max_uploads=2)
+    now = time.time()
+    _stored(db_session, "u", now - 60, [DELHI])
+    assert detector.check("u", *DELHI, now=now) is None
+    _stored(db_session, "u", now - 30, [DELHI])  # stored behind the detector's back: not seen
+    assert detector.check("u", *DELHI, now=now) is None
+    assert detector.metrics()["seeded"] == 1
+
+
+def test_bulk_images_count_one_by_one(db_session):
+    """A batch is one event for the rate, but each image counts against the image limit."""
+    detector = AbuseDetector(window_seconds=3600, max_uploads=20, max_images=10)
+    now = time.time()
+    detector.record("u", _rows(_stored(db_session, "u", now - 60, [DELHI] * 8)))
+    verdicts = detector.check_batch("u", [DELHI] * 5, now=now)
+    assert verdicts[:2] == [None, None]
+    assert [v["rule"] for v in verdicts[2:]] == ["images"] * 3
+    assert verdicts[2]["images"] == 11
+    assert detector.metrics()["flagged_images"] == 3
+
+
+def test_a_batch_is_checked_once_against_the_rate(db_session):
+    detector = AbuseDetector(window_seconds=3600, max_uploads=2, max_images=100)
+    now = time.time()
+    _stored(db_session, "u", now - 60, [DELHI])
+    assert detector.check_batch("u", [DELHI] * 30, now=now) == [None] * 30
+    detector.record("u", _rows(_stored(db_session, "u", now - 30, [DELHI] * 30)))
+    verdicts = detector.check_batch("u", [DELHI] * 5, now=now)
+    assert all(v["rule"] == "rate" for v in verdicts)
+    assert detector.metrics()["flagged_rate"] == 5
+
+
+def test_geo_velocity_flags_an_impossible_jump(db_session):
+    detector = AbuseDetector(max_speed_kmh=900, min_jump_km=20)
+    now = time.time()
+    _stored(db_session, "u", now - 180, [DELHI])
+    verdict = detector.check("u", *MUMBAI, now=now)
+    assert verdict["rule"] == "geo_velocity"
+    assert 1100 < verdict["distance_km"] < 1200
+    assert verdict["previous"] == {"lat": DELHI[0], "lng": DELHI[1]}
+    assert detector.check("u", *MUMBAI, now=now + 3 * 3600) is None  # a flight later
+
+
+def test_short_jumps_never_count(db_session):
+    detector = AbuseDetector(max_speed_kmh=1, min_jump_km=50)
+    now = time.time()
+    _stored(db_session, "u", now - 1, [DELHI])
+    assert detector.check("u", *NOIDA, now=now) is None
+
+
+def test_flagged_uploads_are_not_a_velocity_reference(db_session):
+    detector = AbuseDetector()
+    now = time.time()
+    _stored(db_session, "u", now - 600, [DELHI])
+    _stored(db_session, "u", now - 60, [MUMBAI], details={"abuse": {"rule": "geo_velocity"}})
+    assert detector.check("u", *DELHI, now=now) is None
+    assert detector.check("u", *MUMBAI, now=now)["rule"] == "geo_velocity"
+
+
+def test_batch_items_are_not_compared_with_each_other(db_session):
+    detector = AbuseDetector(max_uploads=3)
+    now = time.time()
+    _stored(db_session, "u", now - 60, [DELHI])
+    verdicts = detector.check_batch("u", [DELHI, NOIDA, DELHI], now=now)
+    assert verdicts == [None, None, None]
+    verdicts = detector.check_batch("u", [DELHI, MUMBAI], now=now)
+    assert verdicts[0] is None and verdicts[1]["rule"] == "geo_velocity"
+
+
+def test_previous_batch_counts_its_nearest_location(db_session):
+    detector = AbuseDetector()
+    now = time.time()
+    _stored(db_session, "u", now - 60, [MUMBAI, DELHI])
+    assert detector.check("u", *NOIDA, now=now) is None
+
+
+# --- other workers' uploads, memory bound ---
+def _event(report_id, user, at, place, kind="created"):
+    report = {"id": report_id, "username": user, "lat": place[0], "lng": place[1], "details": {},
+              "created_at": datetime.utcfromtimestamp(at).isoformat()}
+    return {"id": report_id, "report_id": report_id, "kind": kind, "report": report}
+
+
+def test_uploads_stored_by_other_workers_count_once(db_session):
+    detector = AbuseDetector(window_seconds=3600, max_uploads=2)
+    now = time.time()
+    assert detector.check("u", *DELHI, now=now) is None  # tracked from here on
+    detector.observe([_event(1, "u", now - 30, DELHI), _event(1, "u", now - 30, DELHI),  # a repeat, e.g. our own
+                      _event(2, "u", now - 20, DELHI, kind="updated"), _event(3, "other", now - 20, DELHI)])
+    assert detector.check("u", *DELHI, now=now) is None
+    detector.observe([_event(4, "u", now - 10, DELHI)])
+    assert detector.check("u", *DELHI, now=now)["rule"] == "rate"
+    assert "other" not in detector._users  # untracked users are seeded from the table when they show up
+
+
+def test_tracked_users_are_bounded(db_session):
+    detector = AbuseDetector(max_tracked_users=2)
+    for user in ("a", "b", "c"):
+        detector.check(user, *DELHI)
+    assert list(detector._users) == ["b", "c"]
+    assert detector.metrics()["tracked_users"] == 2
+
+
+# --- upload routes ---
+@pytest.fixture
+def strict(monkeypatch):
+    detector = AbuseDetector(window_seconds=3600, max_uploads=5, max_images=3)
+    monkeypatch.setattr(report_routes, "abuse_detector", detector)
+    monkeypatch.setattr(report_routes, "ABUSE_DETECTION", True)
+    return detector
+
+
+def _upload(client, headers, data, place):
+    return client.post("/api/reports/upload", headers=headers, data={
+        "image": (io.BytesIO(data), "smog.jpg"), "description": "smoke", "lat": str(place[0]), "lng": str(place[1]),
+    })
+
+
+def test_bulk_cannot_get_past_the_image_limit(client, db_session, login, jpeg, strict):
+    images = [(io.BytesIO(jpeg(60 + i)), f"{i}.jpg") for i in range(5)]
+    items = json.dumps([{"description": "smoke", "lat": DELHI[0], "lng": DELHI[1]}] * 5)
+    body = client.post("/api/reports/bulk", headers=login("Flooder"), data={"images": images, "items": items}).get_json()
+    statuses = [r["status"] for r in body["results"]]
+    assert statuses == ["created"] * 5
+    rules = [(r["report"]["details"].get("abuse") or {}).get("rule") for r in body["results"]]
+    assert rules == [None, None, None, "images", "images"]
+    assert len(list(strict._users["Flooder"].entries())) == 5  # recorded once stored
+
+
+def test_reupload_is_not_rescreened(client, db_session, login, jpeg, strict):
+    headers = login("Traveller")
+    first = _upload(client, headers, jpeg(70), DELHI).get_json()
+    assert first["status"] == "verified"
+    again = _upload(client, headers, jpeg(70), MUMBAI)  # same image, impossible jump: not a new upload
+    assert again.status_code == 200
+    assert "abuse" not in again.get_json()["details"]
+
+
+def test_reupload_of_a_flagged_report_stays_flagged(client, db_session, login, jpeg, strict):
+    headers = login("Spoofer")
+    assert _upload(client, headers, jpeg(71), DELHI).status_code == 201
+    flagged = _upload(client, headers, jpeg(72), MUMBAI).get_json()
+    assert flagged["details"]["abuse"]["rule"] == "geo_velocity"
+    again = _upload(client, headers, jpeg(72), DELHI).get_json()  # from the plausible place this time
+    assert again["status"] == "rejected"
+    assert again["details"]["abuse"] == flagged["details"]["abuse"]
@@ -0,0 +1,170 @@
+import threading
+import time
+
+import pytest
+
+from services.admission import AdmissionController, Overloaded
+from services.rate_limit import TokenBucket
+
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(rate=100.0, capacity=2)
+    assert bucket.try_take() and bucket.try_take()
+    assert not bucket.try_take()
+    assert 0 < bucket.wait_time() <= 0.01
+    time.sleep(0.02)
+    assert bucket.try_take()
+
+
+def test_token_bucket_takes_several_tokens_at_once():
+    bucket = TokenBucket(rate=1.0, capacity=3)
+    assert not bucket.try_take(4)
+    assert bucket.try_take(3)
+    assert bucket.wait_time(2) == pytest.approx(2.0, abs=0.05)
+
+
+def test_user_over_their_rate_gets_429():
+    controller = AdmissionController(user_rate=0.5, user_burst=2)
+    for _ in range(2):
+        with controller.admit("alice"):
+            pass
+    with pytest.raises(Overloaded) as e:
+        with controller.admit("alice"):
+            pass
+    assert e.value.status == 429 and e.value.reason == "user_rate"
+    assert e.value.retry_after == 2
+    with controller.admit("bob"):  # buckets are per user
+        pass
+    assert controller.metrics()["rejected_user_rate"] == 1
+
+
+def test_cost_takes_one_token_per_image():
+    controller = AdmissionController(user_rate=0.1, user_burst=3)
+    with controller.admit("alice", cost=3):
+        pass
+    with pytest.raises(Overloaded):
+        with controller.admit("alice", cost=1):
+            pass
+    with pytest.raises(ValueError):
+        with controller.admit("bob", cost=4):  # could never be admitted
+            pass
+
+
+def _hold_slot(controller, entered, release):
+    with controller.admit():
+        entered.set()
+        release.wait(5)
+
+
+def test_full_queue_is_rejected_with_503():
+    controller = AdmissionController(max_concurrent=1, max_queue=0, user_rate=0)
+    entered, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=_hold_slot, args=(controller, entered, release))
+    holder.start()
+    try:
+        entered.wait(5)
+        with pytest.raises(Overloaded) as e:
+            with controller.admit():
+                pass
+        assert e.value.status == 503 and e.value.reason == "queue_full"
+        assert e.value.retry_after >= 1
+    finally:
+        release.set()
+        holder.join()
+    with controller.admit():  # the slot is free again
+        pass
+
+
+def test_queue_wait_times_out():
+    controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=0.05, user_rate=0)
+    entered, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=_hold_slot, args=(controller, entered, release))
+    holder.start()
+    try:
+        entered.wait(5)
+        with pytest.raises(Overloaded) as e:
+            with controller.admit():
+                pass
+        assert e.value.reason == "queue_timeout"
+        assert controller.metrics()["queue_depth"] == 0
+    finally:
+        release.set()
+        holder.join()
+    assert controller.metrics()["in_flight"] == 0
+
+
+def test_shed_calls_refund_the_users_tokens():
+    controller = AdmissionController(max_concurrent=1, max_queue=0, user_rate=0.001, user_burst=2)
+    entered, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=_hold_slot, args=(controller, entered, release))
+    holder.start()
+    try:
+        entered.wait(5)
+        for _ in range(3):  # more refusals than alice has tokens: none of them cost her anything
+            with pytest.raises(Overloaded) as e:
+                with controller.admit("alice", cost=2):
+                    pass
+            assert e.value.reason == "queue_full"
+    finally:
+        release.set()
+        holder.join()
+    with controller.admit("alice", cost=2):
+        pass
+
+
+def test_timed_out_wait_refunds_too():
+    controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=0.02, user_rate=0.001, user_burst=1)
+    entered, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=_hold_slot, args=(controller, entered, release))
+    holder.start()
+    try:
+        entered.wait(5)
+        with pytest.raises(Overloaded):
+            with controller.admit("alice"):
+                pass
+    finally:
+        release.set()
+        holder.join()
+    with controller.admit("alice"):
+        pass
+
+
+class _Gauge:
+    def __init__(self):
+        self.values = []
+
+    def set(self, value):
+        self.values.append(value)
+
+
+def test_gauges_follow_queue_and_slots():
+    gauges = {name: _Gauge() for name in ("in_flight", "queue_depth", "wait_p95")}
+    controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5, user_rate=0, gauges=gauges)
+    entered, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=_hold_slot, args=(controller, entered, release))
+    holder.start()
+    entered.wait(5)
+    queued = threading.Thread(target=lambda: _admit_once(controller))
+    queued.start()
+    deadline = time.monotonic() + 5
+    while controller.metrics()["queue_depth"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert gauges["queue_depth"].values[-1] == 1
+    assert gauges["in_flight"].values[-1] == 1
+    release.set()
+    holder.join()
+    queued.join()
+    assert gauges["queue_depth"].values[-1] == 0
+    assert gauges["in_flight"].values[-1] == 0
+    assert max(gauges["wait_p95"].values) > 0
+
+
+def _admit_once(controller):
+    with controller.admit():
+        pass
+
+
+def test_ml_admission_gauges_are_exported(client):
+    body = client.get("/metrics").data.decode()
+    for name in ("in_flight", "queue_depth", "wait_p95_seconds"):
+        assert f"breathesmart_ml_admission_{name}" in body
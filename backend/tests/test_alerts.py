@@ -0,0 +1,81 @@
+import pytest
+
+from models import AlertOutbox
+from services.AQI.alerts import AlertBook, AlertError, AlertEvaluator, subscribe
+from services.AQI.main import AQIClinicalService
+from services.AQI.stations import StationRegistry
+
+DELHI = (28.6139, 77.2090)
+
+
+class Readings:
+    """ReadingCache stand-in: the latest AQI per station uid."""
+
+    def __init__(self):
+        self.aqi = {}
+
+    def get(self, uid):
+        if uid not in self.aqi:
+            return None
+        return {"payload": {"aqius": self.aqi[uid], "ts": "2026-01-01T00:00:00Z"}}
+
+
+@pytest.fixture
+def evaluator(db_session):
+    clinical = AQIClinicalService()
+    stations = StationRegistry(path=None)
+    stations.add(1, "Delhi", *DELHI)
+    readings = Readings()
+    evaluator = AlertEvaluator(AlertBook(clinical), stations, readings, snap_km=25, hysteresis=15)
+    subscribe("citizen@example.com", *DELHI, "Unhealthy", clinical)  # floor: AQI above 150
+    return evaluator, readings
+
+
+def _cycle(evaluator, readings, aqi):
+    readings.aqi[1] = aqi
+    result = evaluator.run_cycle()
+    return result["alerts"], result["clears"]
+
+
+def test_alert_fires_once_and_clears_below_the_margin(evaluator, db_session):
+    evaluator, readings = evaluator
+    assert _cycle(evaluator, readings, 140) == (0, 0)
+    assert _cycle(evaluator, readings, 160) == (1, 0)
+    assert _cycle(evaluator, readings, 170) == (0, 0)  # already alerting
+    assert _cycle(evaluator, readings, 149) == (0, 0)  # below the threshold, inside the margin
+    assert _cycle(evaluator, readings, 136) == (0, 0)
+    assert _cycle(evaluator, readings, 135) == (0, 1)
+    assert _cycle(evaluator, readings, 151) == (1, 0)  # can alert again
+
+    kinds = [row.kind for row in db_session.query(AlertOutbox).order_by(AlertOutbox.id)]
+    assert kinds == ["alert", "clear", "alert"]
+
+
+def test_hovering_around_the_threshold_does_not_flap(evaluator):
+    evaluator, readings = evaluator
+    fired = [_cycle(evaluator, readings, aqi) for aqi in (151, 149, 152, 148, 151, 140)]
+    assert sum(alerts for alerts, _ in fired) == 1
+    assert sum(clears for _, clears in fired) == 0
+
+
+def test_cells_without_a_reading_are_left_alone(evaluator):
+    evaluator, readings = evaluator
+    assert _cycle(evaluator, readings, 200) == (1, 0)
+    del readings.aqi[1]
+    assert evaluator.run_cycle()["clears"] == 0
+    assert _cycle(evaluator, readings, 200) == (0, 0)
+
+
+def test_alerting_state_survives_a_new_book(evaluator, db_session):
+    evaluator, readings = evaluator
+    assert _cycle(evaluator, readings, 200) == (1, 0)
+    restarted = AlertEvaluator(AlertBook(AQIClinicalService()), evaluator.stations, readings, snap_km=25)
+    assert restarted.run_cycle()["alerts"] == 0
+
+
+def test_subscribe_rejects_bad_input(db_session):
+    clinical = AQIClinicalService()
+    with pytest.raises(AlertError):
+        subscribe("citizen@example.com", *DELHI, "Good", clinical)  # nothing to alert on
+    with pytest.raises(AlertError):
+        subscribe("citizen@example.com", 91.0, 0.0, "Unhealthy", clinical)
@@ -0,0 +1,82 @@
+import csv
+
+import cv2
+import numpy as np
+import pytest
+
+from services.ML import analyzer
+
+
+@pytest.fixture
+def images(tmp_path):
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"img{i}.png"
+        cv2.imwrite(str(path), rng.integers(0, 256, (40 + i, 50, 3), dtype=np.uint8))
+        paths.append(path)
+    (tmp_path / "broken.jpg").write_bytes(b"not an image")
+    (tmp_path / "notes.txt").write_text("skipped: not an image extension")
+    return tmp_path, paths
+
+
+def test_features_match_the_split_based_reference():
+    img = np.random.default_rng(1).integers(0, 256, (31, 47, 3), dtype=np.uint8)
+    features = analyzer.compute_features(img)
+
+    b, g, r = cv2.split(img)
+    assert features["dark_channel"] == pytest.approx(cv2.min(cv2.min(b, g), r).mean() / 255 * 100)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    assert features["low_contrast"] == pytest.approx(max(0, 100 - gray.std() / 60 * 100))
+    assert all(0 <= v <= 100 for v in features.values())
+
+
+def test_combine_weights_and_cap():
+    features = dict.fromkeys(analyzer.FEATURES, 100.0)
+    assert analyzer.combine(features, {"edge_density": 0.5}) == 50.0
+    assert analyzer.combine(features, dict.fromkeys(analyzer.FEATURES, 1.0)) == 100.0
+
+
+def test_analyze_image_keeps_the_legacy_output(images):
+    _, paths = images
+    score, details = analyzer.analyze_image(str(paths[0]))
+    assert set(details) == {f"{name}_score" for name in analyzer.FEATURES}
+    assert all(v.endswith("%") for v in details.values())
+    assert analyzer.analyze_image("/nonexistent.jpg") == (0.0, {})
+
+
+def test_batch_csv_from_a_directory(images, tmp_path):
+    folder, paths = images
+    out = tmp_path / "scores.csv"
+    analyzer.main([str(folder), "-o", str(out), "--workers", "2"])
+
+    rows = {r["path"].rsplit("/", 1)[-1]: r for r in csv.DictReader(out.open())}
+    assert set(rows) == {"img0.png", "img1.png", "img2.png", "broken.jpg"}
+    assert rows["broken.jpg"]["error"] == "unreadable"
+    assert rows["img1.png"]["height"] == "41"
+    expected, _ = analyzer.analyze_image(str(paths[1]))
+    assert float(rows["img1.png"]["score"]) == pytest.approx(expected)
+
+
+def test_manifest_labels_and_weight_overrides(images, tmp_path):
+    folder, _ = images
+    manifest = folder / "labels.csv"
+    manifest.write_text("path,label\nimg0.png,smog\nimg2.png,clear\n")
+    out = tmp_path / "scores.csv"
+    analyzer.main([str(manifest), "-o", str(out), "--workers", "1", "--weights", '{"edge_density": 0, "dark_channel": 0}'])
+
+    rows = list(csv.DictReader(out.open()))
+    assert [r["label"] for r in rows] == ["smog", "clear"]
+    for row in rows:
+        expected = float(row["smoke_color"]) * 0.05 + float(row["low_contrast"]) * 0.10
+        assert float(row["score"]) == pytest.approx(expected)
+
+
+def test_parquet_output(images, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    folder, _ = images
+    out = tmp_path / "scores.parquet"
+    analyzer.main([str(folder), "-o", str(out), "--workers", "1"])
+    table = pq.read_table(out)
+    assert table.num_rows == 4
+    assert table.column("verified").null_count == 1  # the unreadable file
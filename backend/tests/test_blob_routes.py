@@ -0,0 +1,125 @@
+import hashlib
+import os
+import time
+
+import pytest
+
+from benchmarks.s3_stub import S3Stub
+from services.blob_store import REFRESH_AFTER_SECONDS, LocalBlobStore, S3BlobStore
+
+
+@pytest.fixture
+def blob(app):
+    data = b"\xff\xd8\xff" + os.urandom(200_000)  # JPEG magic, then more than a few read chunks
+    key = app.extensions["blob_store"].put(data)
+    assert key == hashlib.sha256(data).hexdigest()
+    return key, data
+
+
+def test_whole_blob(client, blob):
+    key, data = blob
+    response = client.get(f"/api/reports/blobs/{key}")
+    assert response.status_code == 200
+    assert response.data == data
+    assert response.mimetype == "image/jpeg"
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert response.headers["ETag"] == f'"{key}"'
+    assert "immutable" in response.headers["Cache-Control"]
+
+
+def test_byte_range(client, blob):
+    key, data = blob
+    response = client.get(f"/api/reports/blobs/{key}", headers={"Range": "bytes=100000-100099"})
+    assert response.status_code == 206
+    assert response.data == data[100000:100100]
+    assert response.headers["Content-Range"] == f"bytes 100000-100099/{len(data)}"
+    assert response.headers["Content-Length"] == "100"
+
+
+def test_open_and_suffix_ranges(client, blob):
+    key, data = blob
+    response = client.get(f"/api/reports/blobs/{key}", headers={"Range": "bytes=199990-"})
+    assert response.status_code == 206
+    assert response.data == data[199990:]
+    response = client.get(f"/api/reports/blobs/{key}", headers={"Range": "bytes=-10"})
+    assert response.status_code == 206
+    assert response.data == data[-10:]
+
+
+def test_unsatisfiable_range(client, blob):
+    key, data = blob
+    response = client.get(f"/api/reports/blobs/{key}", headers={"Range": f"bytes={len(data) + 10}-"})
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{len(data)}"
+
+
+def test_multi_range_gets_the_whole_blob(client, blob):
+    key, data = blob
+    response = client.get(f"/api/reports/blobs/{key}", headers={"Range": "bytes=0-9,20-29"})
+    assert response.status_code == 200
+    assert response.data == data
+
+
+def test_conditional_get(client, blob):
+    key, _ = blob
+    response = client.get(f"/api/reports/blobs/{key}", headers={"If-None-Match": f'"{key}"'})
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_unknown_and_malformed_keys(client):
+    assert client.get(f"/api/reports/blobs/{'0' * 64}").status_code == 404
+    assert client.get("/api/reports/blobs/not-a-key").status_code == 404
+
+
+# --- re-storing refreshes the orphan grace period, but only when it is half spent ---
+@pytest.fixture
+def local_store(tmp_path):
+    return LocalBlobStore(str(tmp_path / "blobs"))
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "stub")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "stub")
+    stub = S3Stub()
+    stub.start()
+    yield stub, S3BlobStore("bucket", endpoint_url=stub.url)
+    stub.stop()
+
+
+def _age(seconds):
+    return time.time() - seconds
+
+
+def test_local_put_refreshes_only_an_old_mtime(local_store):
+    key = local_store.put(b"same bytes")
+    path = local_store.path(key)
+    recent = _age(REFRESH_AFTER_SECONDS / 2)
+    os.utime(path, (recent, recent))
+    local_store.put(b"same bytes")
+    assert os.stat(path).st_mtime == pytest.approx(recent)
+
+    old = _age(REFRESH_AFTER_SECONDS + 60)
+    os.utime(path, (old, old))
+    local_store.put(b"same bytes")
+    assert os.stat(path).st_mtime == pytest.approx(time.time(), abs=5)
+
+
+def test_s3_put_copies_only_an_old_object(s3):
+    stub, store = s3
+    key = store.put(b"\xff\xd8\xff same bytes")
+    name = ("bucket", f"blobs/{key[:2]}/{key}")
+    data, content_type, _ = stub.objects[name]
+
+    recent = int(_age(REFRESH_AFTER_SECONDS / 2))
+    stub.objects[name] = (data, content_type, recent)
+    before = stub.requests
+    store.put(b"\xff\xd8\xff same bytes")
+    assert stub.requests == before + 1  # the HEAD only
+    assert stub.objects[name][2] == recent
+
+    stub.objects[name] = (data, content_type, int(_age(REFRESH_AFTER_SECONDS + 60)))
+    store.put(b"\xff\xd8\xff same bytes")
+    assert stub.objects[name][2] == pytest.approx(time.time(), abs=5)
+    assert stub.objects[name][:2] == (data, "image/jpeg")
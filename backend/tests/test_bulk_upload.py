@@ -0,0 +1,89 @@
+import io
+import json
+
+import pytest
+
+from models import Report
+
+
+def _bulk(client, headers, images, items=None):
+    items = items or [{"description": "smoke", "lat": 12.9, "lng": 77.5} for _ in images]
+    return client.post("/api/reports/bulk", headers=headers, data={
+        "images": [(io.BytesIO(data), f"img{i}.jpg") for i, data in enumerate(images)],
+        "items": json.dumps(items),
+    })
+
+
+def _statuses(response):
+    return [r["status"] for r in response.get_json()["results"]]
+
+
+def test_creates_one_report_per_image_in_order(client, db_session, login, jpeg):
+    response = _bulk(client, login("Bulky"), [jpeg(10), jpeg(11)])
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["created"] == 2
+    assert _statuses(response) == ["created", "created"]
+    assert [r["index"] for r in body["results"]] == [0, 1]
+    assert db_session.query(Report).filter_by(user_name="Bulky").count() == 2
+
+
+def test_duplicates_within_and_across_batches(client, db_session, login, jpeg):
+    headers = login("Dupe")
+    first = _bulk(client, headers, [jpeg(20)])
+    report_id = first.get_json()["results"][0]["report"]["id"]
+
+    response = _bulk(client, headers, [jpeg(20), jpeg(21), jpeg(21)])
+    results = response.get_json()["results"]
+    assert _statuses(response) == ["duplicate", "created", "duplicate"]
+    assert results[0]["report_id"] == report_id
+    assert results[2]["duplicate_of_index"] == 1
+
+
+def test_another_users_image_is_rejected_duplicate(client, db_session, login, jpeg):
+    _bulk(client, login("Owner"), [jpeg(30)])
+    response = _bulk(client, login("Copier"), [jpeg(30)])
+    assert _statuses(response) == ["rejected_duplicate"]
+    assert db_session.query(Report).count() == 1
+
+
+def test_item_errors_do_not_fail_the_batch(client, db_session, login, jpeg):
+    items = [{"description": "no location"}, {"description": "ok", "lat": 1.0, "lng": 2.0}]
+    response = _bulk(client, login("Partial"), [jpeg(40), jpeg(41)], items)
+    assert _statuses(response) == ["error", "created"]
+
+
+def test_metadata_count_mismatch_is_400(client, db_session, login, jpeg):
+    response = _bulk(client, login("Mismatch"), [jpeg(50)], [{"lat": 1, "lng": 2}, {"lat": 1, "lng": 2}])
+    assert response.status_code == 400
+
+
+def test_parallel_form_lists(client, db_session, login, jpeg):
+    response = client.post("/api/reports/bulk", headers=login("Lists"), data={
+        "images": [(io.BytesIO(jpeg(60)), "a.jpg"), (io.BytesIO(jpeg(61)), "b.jpg")],
+        "description": ["one", "two"], "lat": ["1.0", "1.0"], "lng": ["2.0", "2.0"],
+    })
+    assert _statuses(response) == ["created", "created"]
+    assert sorted(r.description for r in db_session.query(Report).all()) == ["one", "two"]
+
+
+def test_items_past_the_users_token_budget_are_overloaded(client, db_session, login, jpeg, monkeypatch):
+    from routes import report_routes
+
+    monkeypatch.setattr(report_routes, "ML_BULK_CHUNK", 2)
+    monkeypatch.setattr(report_routes.ml_admission, "user_burst", 2)
+    response = _bulk(client, login("Greedy"), [jpeg(70 + i) for i in range(4)])
+    results = response.get_json()["results"]
+    assert _statuses(response) == ["created", "created", "overloaded", "overloaded"]
+    assert results[2]["retry_after"] >= 1
+    assert db_session.query(Report).count() == 2
+
+
+def test_too_many_images_is_413(client, db_session, login, jpeg, monkeypatch):
+    monkeypatch.setattr("routes.report_routes.BULK_UPLOAD_MAX_IMAGES", 1)
+    assert _bulk(client, login("Many"), [jpeg(80), jpeg(81)]).status_code == 413
+
+
+@pytest.mark.parametrize("data", [{}, {"images": []}])
+def test_no_images_is_400(client, login, data):
+    assert client.post("/api/reports/bulk", headers=login("Empty"), data=data).status_code == 400
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from services.ML import ml_service
+from services.ML.backends import StubClipBackend, create_backend, match_scores
+
+
+def _noisy(path, seed):
+    """Busy texture: high edge density, so verify_image goes on to the CLIP stage."""
+    pixels = np.random.default_rng(seed).integers(0, 256, size=(96, 128, 3), dtype=np.uint8)
+    Image.fromarray(pixels).save(path)
+    return str(path)
+
+
+@pytest.fixture
+def images(tmp_path):
+    return [_noisy(tmp_path / f"{i}.png", i) for i in range(5)]
+
+
+def test_stub_embeddings_are_deterministic_and_normalised():
+    backend = StubClipBackend(latency_ms=0)
+    image = Image.new("RGB", (32, 32), (200, 10, 10))
+    first = backend.encode_images([image, image])
+    assert np.allclose(first[0], first[1])
+    assert np.allclose(np.linalg.norm(first, axis=1), 1.0, atol=1e-5)
+    assert np.allclose(backend.encode_texts(["smog"]), backend.encode_texts(["smog"]))
+
+
+def test_match_scores_is_the_pairwise_softmax():
+    backend = StubClipBackend(latency_ms=0)
+    images = [Image.new("RGB", (32, 32), (i * 40, 0, 0)) for i in range(3)]
+    descriptions = ["smoke", "dust over the road", "burning garbage"]
+    scores, image_embeds, text_embeds = match_scores(backend, images, descriptions, return_embeddings=True)
+
+    negative = backend.encode_texts(["a clear, normal photo with no pollution"])[0]
+    for i, score in enumerate(scores):
+        logits = backend.logit_scale * np.array([image_embeds[i] @ text_embeds[i], image_embeds[i] @ negative])
+        expected = np.exp(logits - logits.max())
+        assert score == pytest.approx(expected[0] / expected.sum(), abs=1e-6)
+
+
+def test_batch_of_one_matches_the_batch():
+    backend = StubClipBackend(latency_ms=0)
+    images = [Image.new("RGB", (32, 32), (0, i * 50, 0)) for i in range(4)]
+    descriptions = [f"report {i}" for i in range(4)]
+    batched = match_scores(backend, images, descriptions)
+    single = [match_scores(backend, [image], [d])[0] for image, d in zip(images, descriptions)]
+    assert batched == pytest.approx(single, abs=1e-6)
+
+
+def test_single_and_batched_verification_agree(images):
+    assert ml_service.clip_backend.name == "stub"
+    descriptions = ["thick smoke from a chimney", "", "dust", "garbage fire", "haze"]
+    batched = ml_service.verify_images(images, descriptions)
+    for path, description, expected in zip(images, descriptions, batched):
+        single = ml_service.verify_image(path, description)
+        assert single["verified"] == expected["verified"]
+        assert single["pollution_confidence"] == pytest.approx(expected["pollution_confidence"])
+        assert single["description_match_confidence"] == pytest.approx(expected["description_match_confidence"], abs=1e-6)
+        assert single["awarded_credits"] == expected["awarded_credits"]
+    assert any(r["pollution_confidence"] > ml_service.POLLUTION_THRESHOLD for r in batched)
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        create_backend("tpu", "openai/clip-vit-base-patch32")
+    assert create_backend("stub", "ignored").name == "stub"
@@ -0,0 +1,80 @@
+"""
+Decision parity of the quantized / ONNX backends against fp32 torch, the same
+rule as benchmarks/clip_parity.py, on the repo's fixture images. The model is a
+tiny random-weight CLIP saved locally (no hub access in CI): it checks that each
+backend computes the same function as the reference, not CLIP's accuracy.
+"""
+import json
+import math
+import string
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from benchmarks.clip_parity import load_fixtures, score  # noqa: E402
+from services.ML import backends  # noqa: E402
+from services.ML.ml_service import DESCRIPTION_MATCH_THRESHOLD  # noqa: E402
+
+MARGIN = 0.02  # clip_parity's default: pairs this close to the threshold may flip
+
+
+@pytest.fixture(scope="module")
+def tiny_clip(tmp_path_factory):
+    """Directory loadable with from_pretrained: a 2-layer CLIP with a character-level tokenizer."""
+    folder = tmp_path_factory.mktemp("tiny_clip")
+    chars = string.ascii_lowercase + string.digits + ",.'-"
+    tokens = ["<|startoftext|>", "<|endoftext|>", *chars, *(c + "</w>" for c in chars)]
+    (folder / "vocab.json").write_text(json.dumps({t: i for i, t in enumerate(tokens)}))
+    (folder / "merges.txt").write_text("#version: 0.2\n")
+
+    tokenizer = transformers.CLIPTokenizer(str(folder / "vocab.json"), str(folder / "merges.txt"),
+                                           unk_token="<|endoftext|>")
+    image_processor = transformers.CLIPImageProcessor(size={"shortest_edge": 32}, crop_size={"height": 32, "width": 32})
+    transformers.CLIPProcessor(image_processor=image_processor, tokenizer=tokenizer).save_pretrained(folder)
+
+    tower = dict(hidden_size=64, intermediate_size=128, num_hidden_layers=2, num_attention_heads=4)
+    config = transformers.CLIPConfig(
+        text_config=dict(tower, vocab_size=len(tokens), max_position_embeddings=77,
+                         bos_token_id=0, eos_token_id=1, pad_token_id=1),
+        vision_config=dict(tower, image_size=32, patch_size=8),
+        projection_dim=32,
+    )
+    torch.manual_seed(0)
+    model = transformers.CLIPModel(config)
+    with torch.no_grad():
+        model.logit_scale.fill_(math.log(100.0))  # CLIP's trained scale: spreads scores away from 0.5
+    model.save_pretrained(folder)
+    return str(folder)
+
+
+@pytest.fixture(scope="module")
+def reference(tiny_clip):
+    images, descriptions = load_fixtures()
+    if not images:
+        pytest.skip("no fixture images in uploads/")
+    probs = score(backends.create_backend("torch", tiny_clip), images, descriptions, backends.NEGATIVE_PROMPT)
+    return images, descriptions, probs
+
+
+@pytest.mark.parametrize("name", ["torch-int8", "onnx", "onnx-int8"])
+def test_decisions_agree_with_fp32(name, tiny_clip, reference, tmp_path, monkeypatch):
+    if name.startswith("onnx"):
+        pytest.importorskip("onnxruntime")
+        pytest.importorskip("onnx")
+    monkeypatch.setattr(backends, "CLIP_ONNX_DIR", str(tmp_path))
+    images, descriptions, expected = reference
+
+    probs = score(backends.create_backend(name, tiny_clip), images, descriptions, backends.NEGATIVE_PROMPT)
+
+    flips = [
+        i for i, (p, r) in enumerate(zip(probs, expected))
+        if (p > DESCRIPTION_MATCH_THRESHOLD) != (r > DESCRIPTION_MATCH_THRESHOLD)
+        and abs(r - DESCRIPTION_MATCH_THRESHOLD) > MARGIN
+    ]
+    assert flips == []
+    assert any(r > DESCRIPTION_MATCH_THRESHOLD for r in expected)  # both decisions are exercised
+    assert any(r <= DESCRIPTION_MATCH_THRESHOLD for r in expected)
+    if name == "onnx":
+        assert max(abs(p - r) for p, r in zip(probs, expected)) < 1e-4  # the same fp32 graph
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from services.ML import embedding_store as module
+from services.ML.embedding_store import EmbeddingStore
+
+
+def _unit(rows, dim=16, seed=0):
+    v = np.random.default_rng(seed).standard_normal((rows, dim)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EmbeddingStore(str(tmp_path / "store"))
+
+
+def test_exact_search_matches_brute_force(store):
+    vectors = _unit(200)
+    store.add_many(list(range(1, 201)), vectors)
+    query = _unit(1, seed=1)[0]
+
+    expected = np.argsort(-(vectors @ query))[:5] + 1
+    assert [rid for rid, _ in store.search(query, k=5)] == expected.tolist()
+    assert store.search(vectors[41], k=1)[0][0] == 42
+    assert store.search(vectors[41], k=1)[0][1] == pytest.approx(1.0, abs=1e-3)  # float16 rows
+
+
+def test_re_adding_supersedes_and_exclude_and_filters(store):
+    vectors = _unit(3)
+    store.add_many([1, 2, 3], vectors)
+    store.add(2, vectors[0])  # report 2 now looks like report 1
+    assert len(store) == 3
+
+    hits = store.search(vectors[1], k=3)
+    assert 2 not in [rid for rid, s in hits if s > 0.99]  # its old row is gone
+    assert store.search(vectors[0], k=1, exclude=[1])[0][0] == 2
+    assert [rid for rid, _ in store.search(vectors[0], k=3, report_ids=[3])] == [3]
+    assert store.near_duplicates(vectors[0], exclude=[1], threshold=0.99) == [(2, pytest.approx(1.0, abs=1e-3))]
+
+
+def test_other_writers_rows_are_picked_up(tmp_path):
+    folder = str(tmp_path / "shared")
+    reader, writer = EmbeddingStore(folder), EmbeddingStore(folder)
+    writer.add_many([7, 8], _unit(2))
+    assert len(reader) == 2
+    assert reader.get(8) == pytest.approx(writer.get(8))
+
+
+def test_torn_append_is_cut_back(store):
+    store.add_many([1, 2], _unit(2))
+    with open(store.vectors_path, "ab") as f:
+        f.write(b"\x00" * 10)  # a writer died halfway through a row
+    store.add(3, _unit(1, seed=5)[0])
+    assert len(store) == 3
+    assert store.search(_unit(1, seed=5)[0], k=1)[0][0] == 3
+
+
+def test_dimension_mismatch_is_refused(store):
+    store.add(1, _unit(1)[0])
+    with pytest.raises(ValueError):
+        store.add(2, _unit(1, dim=8)[0])
+
+
+def test_ivf_index_lifecycle(store, monkeypatch):
+    monkeypatch.setattr(module, "IVF_MIN_ROWS", 256)
+    monkeypatch.setattr(module, "IVF_NPROBE", 16)
+    vectors = _unit(1024, seed=2)
+    store.add_many(list(range(1024)), vectors)
+
+    assert store.index_stale()  # big enough, never trained: searches stay exact
+    assert store.build_index()
+    assert not store.index_stale()
+    assert not store.build_index()  # not outgrown yet
+
+    query = vectors[10] + 0.05 * _unit(1, seed=3)[0]
+    exact = [rid for rid, _ in store.search(query, k=10, exact=True)]
+    approx = [rid for rid, _ in store.search(query, k=10)]
+    assert approx[0] == exact[0] == 10
+    assert len(set(approx) & set(exact)) >= 7
+
+    # another process trained the index: a fresh instance loads the centroids
+    assert not EmbeddingStore(store.folder).index_stale()
+
+    store.add_many(list(range(1024, 4096)), _unit(3072, seed=4))
+    assert store.index_stale()  # outgrown IVF_RETRAIN_GROWTH-fold: back to exact scans
+    assert store.search(vectors[10], k=1)[0][0] == 10
@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+import sys
+from datetime import datetime
+
+import pytest
+
+from models import Report
+
+
+@pytest.fixture
+def reports(db_session):
+    rows = [
+        Report(user_name="alice", description="smoke, thick", image_hash="a" * 64, lat=12.9, lng=77.5,
+               status="finalized", created_at=datetime(2025, 1, 10), details={"note": "x"}),
+        Report(user_name="bob", description="dust", image_hash="b" * 64, lat=28.6, lng=77.2,
+               status="verified", created_at=datetime(2025, 2, 10)),
+        Report(user_name="carol", description="haze", image_hash="c" * 64, lat=19.0, lng=72.8,
+               status="rejected", created_at=datetime(2025, 3, 10)),
+    ]
+    db_session.add_all(rows)
+    db_session.commit()
+    return rows
+
+
+@pytest.fixture
+def analyst(login):
+    return login("Ana", role="analyst")
+
+
+def _ndjson(response):
+    return [json.loads(line) for line in response.data.decode().splitlines()]
+
+
+def test_requires_a_token(client, reports):
+    assert client.get("/api/reports/export").status_code == 401
+
+
+def test_citizens_are_refused(client, reports, login):
+    assert client.get("/api/reports/export", headers=login("Cid")).status_code == 403
+
+
+def test_ndjson_has_every_column_in_id_order(client, reports, analyst):
+    response = client.get("/api/reports/export", headers=analyst)
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert "attachment; filename=reports_" in response.headers["Content-Disposition"]
+    rows = _ndjson(response)
+    assert [r["user_name"] for r in rows] == ["alice", "bob", "carol"]
+    assert rows[0]["created_at"] == "2025-01-10T00:00:00"
+    assert rows[0]["details"] == {"note": "x"}
+
+
+def test_csv_quotes_text_and_encodes_details_as_json(client, reports, analyst):
+    response = client.get("/api/reports/export?format=csv&batch_size=1", headers=analyst)
+    assert response.mimetype == "text/csv"
+    rows = list(csv.DictReader(io.StringIO(response.data.decode())))
+    assert len(rows) == 3
+    assert rows[0]["description"] == "smoke, thick"
+    assert json.loads(rows[0]["details"]) == {"note": "x"}
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("status=finalized,verified", ["alice", "bob"]),
+    ("since=2025-02-01&until=2025-03-01", ["bob"]),
+    ("bbox=77.0,12.0,78.0,29.0", ["alice", "bob"]),
+])
+def test_filters(client, reports, analyst, query, expected):
+    rows = _ndjson(client.get(f"/api/reports/export?{query}", headers=analyst))
+    assert [r["user_name"] for r in rows] == expected
+
+
+@pytest.mark.parametrize("query", ["batch_size=0", "batch_size=abc", "since=yesterday", "bbox=1,2,3", "format=xlsx"])
+def test_bad_arguments_are_400(client, reports, analyst, query):
+    response = client.get(f"/api/reports/export?{query}", headers=analyst)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def test_parquet_round_trip(client, reports, analyst):
+    pq = pytest.importorskip("pyarrow.parquet")
+    response = client.get("/api/reports/export?format=parquet&batch_size=2", headers=analyst)
+    table = pq.read_table(io.BytesIO(response.data))
+    assert table.num_rows == 3
+    assert table.column("user_name").to_pylist() == ["alice", "bob", "carol"]
+
+
+def test_columnar_without_pyarrow_is_400(client, reports, analyst, monkeypatch):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    response = client.get("/api/reports/export?format=arrow", headers=analyst)
+    assert response.status_code == 400
+    assert "pyarrow" in response.get_json()["error"]
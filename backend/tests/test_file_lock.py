@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+
+from services import file_lock
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_non_blocking_lock_is_refused_while_held(tmp_path):
+    path = tmp_path / "x.lock"
+    with open(path, "a") as first, open(path, "a") as second:  # flock is per open file, even in one process
+        assert file_lock.lock(first, blocking=False)
+        assert not file_lock.lock(second, blocking=False)
+        file_lock.unlock(first)
+        assert file_lock.lock(second, blocking=False)
+
+
+def test_locked_releases_on_exit(tmp_path):
+    path = str(tmp_path / "y.lock")
+    with file_lock.locked(path):
+        with open(path, "a") as other:
+            assert not file_lock.lock(other, blocking=False)
+    with open(path, "a") as other:
+        assert file_lock.lock(other, blocking=False)
+
+
+def test_without_fcntl_locks_are_no_ops(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_lock, "fcntl", None)
+    with open(tmp_path / "z.lock", "a") as f:
+        assert file_lock.lock(f, blocking=False)
+        file_lock.unlock(f)
+
+
+def test_modules_import_where_fcntl_is_missing():
+    """Windows has no fcntl: every module that locks files must still import."""
+    code = (
+        "import sys; sys.modules['fcntl'] = None\n"
+        "import services.user_service, services.AQI.prefetch, services.ML.embedding_store\n"
+        "import services.storage_maintenance\n"
+        "from services import file_lock; assert file_lock.fcntl is None\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, check=True)
@@ -0,0 +1,121 @@
+import io
+import threading
+from concurrent.futures import Future
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Report
+from services.group_commit import CommitPending, GroupCommitter
+
+
+def _report(image_hash, user="alice"):
+    return Report(user_name=user, description="smoke", image_hash=image_hash, lat=12.9, lng=77.5, status="verified")
+
+
+@pytest.fixture
+def committer(app, db_session):
+    return GroupCommitter(app, window_ms=50, max_batch=64)
+
+
+def test_concurrent_inserts_share_a_commit(committer, db_session):
+    futures = []
+    threads = [threading.Thread(target=lambda i=i: futures.append(committer.insert(_report(f"{i:064x}"))))
+               for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    saved = [committer.wait(f, 5) for f in futures]
+    assert all(r.id for r in saved)
+    assert db_session.query(Report).count() == 20
+    assert committer.stats["writes"] == 20
+    assert committer.stats["batches"] < 20
+
+
+def test_update_by_primary_key(committer, db_session):
+    report = committer.wait(committer.insert(_report("a" * 64)), 5)
+    committer.wait(committer.update(Report, report.id, {"status": "rejected"}), 5)
+    db_session.expire_all()
+    assert db_session.get(Report, report.id).status == "rejected"
+
+
+def test_wait_timeout_is_commit_pending():
+    with pytest.raises(CommitPending) as e:
+        GroupCommitter.wait(Future(), 0.01)
+    assert e.value.retry_after == 1
+
+
+def test_same_image_twice_in_one_batch_stores_one_report(committer, db_session):
+    first = committer.insert(_report("b" * 64))
+    retry = committer.insert(_report("b" * 64))
+    other = committer.insert(_report("c" * 64))
+
+    assert committer.wait(first, 5).id
+    assert committer.wait(other, 5).id
+    with pytest.raises(IntegrityError):
+        committer.wait(retry, 5)
+    assert db_session.query(Report).filter_by(image_hash="b" * 64).count() == 1
+    assert committer.stats["failures"] == 1
+
+
+# --- upload route ---
+def _upload(client, headers, data):
+    return client.post("/api/reports/upload", headers=headers, data={
+        "image": (io.BytesIO(data), "smog.jpg"), "description": "smoke", "lat": "12.9", "lng": "77.5",
+    })
+
+
+@pytest.fixture
+def group_commit(app, monkeypatch):
+    committer = GroupCommitter(app, window_ms=1)
+    monkeypatch.setitem(app.extensions, "group_commit", committer)
+    return committer
+
+
+def test_unacknowledged_upload_is_503_with_retry_after(client, db_session, login, jpeg, group_commit, monkeypatch):
+    monkeypatch.setattr(group_commit, "insert", lambda obj, follow=None: Future())
+    monkeypatch.setattr("routes.report_routes.GROUP_COMMIT_ACK_TIMEOUT", 0.01)
+    response = _upload(client, login("Pending"), jpeg(1))
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_retry_racing_a_queued_insert_is_a_duplicate(client, db_session, login, jpeg, group_commit, monkeypatch):
+    """The first insert lands after the retry's duplicate query: the retry must not add a second report."""
+    data = jpeg(2)
+    headers = login("Racer")
+    real_insert = group_commit.insert
+
+    def insert_after_first(obj, follow=None):
+        first = Report(user_name="Racer", description="first", image_hash=obj.image_hash, lat=1.0, lng=2.0)
+        group_commit.wait(real_insert(first), 5)
+        return real_insert(obj, follow)
+
+    monkeypatch.setattr(group_commit, "insert", insert_after_first)
+    response = _upload(client, headers, data)
+    assert response.status_code == 200
+    assert response.get_json()["description"] == "first"
+    assert db.session.query(Report).count() == 1
+
+
+def test_race_with_another_user_is_409(client, db_session, login, jpeg, group_commit, monkeypatch):
+    real_insert = group_commit.insert
+
+    def insert_after_other(obj, follow=None):
+        other = Report(user_name="Someone", description="theirs", image_hash=obj.image_hash, lat=1.0, lng=2.0)
+        group_commit.wait(real_insert(other), 5)
+        return real_insert(obj, follow)
+
+    monkeypatch.setattr(group_commit, "insert", insert_after_other)
+    assert _upload(client, login("Late"), jpeg(3)).status_code == 409
+
+
+def test_unique_index_is_in_place(app, db_session):
+    db_session.add(_report("d" * 64))
+    db_session.commit()
+    db_session.add(_report("d" * 64, user="bob"))
+    with pytest.raises(IntegrityError):
+        db_session.commit()
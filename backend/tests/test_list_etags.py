@@ -0,0 +1,85 @@
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+from migrations import schema_version
+from models import Report
+from routes import report_routes
+from services.change_log import change_log
+
+
+@pytest.fixture(autouse=True)
+def fresh_bodies():
+    """Event ids restart in the emptied test table: don't serve a body cached by an earlier test."""
+    report_routes._list_bodies.clear()
+    yield
+    report_routes._list_bodies.clear()
+
+
+def _etag(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    return response.headers["ETag"]
+
+
+def _upload(client, headers, data):
+    return client.post("/api/reports/upload", headers=headers, data={
+        "image": (io.BytesIO(data), "smog.jpg"), "description": "smoke", "lat": "12.9", "lng": "77.5",
+    })
+
+
+def test_matching_if_none_match_is_304(client, db_session):
+    etag = _etag(client, "/api/reports/")
+    response = client.get("/api/reports/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert client.get("/api/reports/", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_an_upload_changes_the_report_lists_but_not_the_govt_list(client, db_session, login, jpeg):
+    headers = login("Tagger")
+    first = _upload(client, headers, jpeg(50)).get_json()["id"]
+    client.put(f"/api/reports/{first}/validate", json={"precautions": "masks"})  # the govt list keys on updates
+    before = {path: _etag(client, path) for path in ("/api/reports/", "/api/reports/leaderboard", "/api/reports/approved")}
+    assert _upload(client, headers, jpeg(52)).status_code == 201
+    assert client.get("/api/reports/", headers={"If-None-Match": before["/api/reports/"]}).status_code == 200
+    assert _etag(client, "/api/reports/leaderboard") != before["/api/reports/leaderboard"]
+    assert client.get("/api/reports/approved", headers={"If-None-Match": before["/api/reports/approved"]}).status_code == 304
+
+
+def test_validation_changes_every_list(client, db_session, login, jpeg):
+    report_id = _upload(client, login("Validated"), jpeg(51)).get_json()["id"]
+    before = _etag(client, "/api/reports/approved")
+    client.put(f"/api/reports/{report_id}/validate", json={"status": "finalized", "precautions": "masks"})
+    response = client.get("/api/reports/approved", headers={"If-None-Match": before})
+    assert response.status_code == 200
+    assert [r["id"] for r in response.get_json()] == [report_id]
+
+
+def test_a_write_from_another_node_changes_the_tag(client, db_session):
+    """The version comes from the shared database, not from anything local to this host."""
+    etag = _etag(client, "/api/reports/")
+    report = Report(user_name="remote", description="haze", lat=1.0, lng=2.0, status="verified")
+    db_session.add(report)
+    db_session.flush()
+    change_log.stage([(report.id, "created", {"id": report.id})])
+    db_session.commit()
+    response = client.get("/api/reports/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [r["id"] for r in response.get_json()] == [report.id]
+
+
+def test_recreated_schema_gets_new_tags(client, db_session):
+    """reset-db recreates schema_version, so tags from before it never match, though event ids start over."""
+    etag = _etag(client, "/api/reports/")
+    created = db_session.execute(schema_version.select().where(schema_version.c.version == 1)).one().applied_at
+    try:
+        db_session.execute(schema_version.update().where(schema_version.c.version == 1)
+                           .values(applied_at=datetime.utcnow() + timedelta(seconds=1)))
+        db_session.commit()
+        assert client.get("/api/reports/", headers={"If-None-Match": etag}).status_code == 200
+    finally:
+        db_session.execute(schema_version.update().where(schema_version.c.version == 1).values(applied_at=created))
+        db_session.commit()
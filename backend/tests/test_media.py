@@ -0,0 +1,117 @@
+import io
+
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from models import Report
+from services import media_service
+from services.blob_store import LocalBlobStore
+from services.media_service import MediaError, probe, store_proofs, transcode
+
+
+def _image(fmt="JPEG", size=(120, 80), mode="RGB", **save):
+    out = io.BytesIO()
+    Image.new(mode, size, (200, 40, 40, 128)[:len(mode)]).save(out, fmt, **save)
+    return out.getvalue()
+
+
+def _rotated_jpeg():
+    """Stored 120x80 with EXIF orientation 6 (rotate 90° clockwise to display), plus a GPS tag."""
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    exif[0x8825] = {2: (12.0, 58.0, 0.0)}
+    return _image(exif=exif.tobytes())
+
+
+def _files(*items):
+    return [FileStorage(io.BytesIO(data), filename=name) for name, data in items]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalBlobStore(str(tmp_path / "blobs"))
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"not an image", "not a readable image"),
+    (_image("GIF", mode="P"), "GIF images are not accepted"),
+])
+def test_probe_rejects(data, message):
+    with pytest.raises(MediaError, match=message):
+        probe(data, "proof")
+
+
+def test_probe_refuses_decompression_bombs_from_the_header(monkeypatch):
+    monkeypatch.setattr(media_service, "PROOF_MAX_PIXELS", 120 * 80 - 1)
+    with pytest.raises(MediaError, match="120x80 is outside"):
+        probe(_image(), "big.jpg")
+
+
+def test_transcode_orients_downscales_and_strips_metadata(monkeypatch):
+    monkeypatch.setattr(media_service, "PROOF_MAX_DIMENSION", 60)
+    with Image.open(io.BytesIO(transcode(_rotated_jpeg()))) as out:
+        assert out.format == "WEBP"
+        assert out.size == (40, 60)  # upright, long edge capped
+        assert not out.getexif()
+        assert "exif" not in out.info
+
+
+def test_transparency_survives():
+    with Image.open(io.BytesIO(transcode(_image("PNG", mode="RGBA")))) as out:
+        assert out.mode == "RGBA"
+
+
+def test_store_proofs_keeps_upload_order(store):
+    small, large = _image(size=(20, 20)), _image(size=(300, 200))
+    keys = store_proofs(_files(("a.jpg", small), ("", b""), ("b.jpg", large)), store)
+    assert len(keys) == 2
+    sizes = [Image.open(io.BytesIO(b"".join(store.read(key)))).size for key in keys]
+    assert sizes == [(20, 20), (300, 200)]
+    assert all(store.stat(key).content_type == "image/webp" for key in keys)
+
+
+def test_one_bad_file_stores_nothing(store):
+    with pytest.raises(MediaError, match="b.txt"):
+        store_proofs(_files(("a.jpg", _image()), ("b.txt", b"hello")), store)
+    assert list(store.iter_blobs()) == []
+
+
+def test_too_many_files(store, monkeypatch):
+    monkeypatch.setattr(media_service, "PROOF_MAX_FILES", 1)
+    with pytest.raises(MediaError, match="At most 1"):
+        store_proofs(_files(("a.jpg", _image()), ("b.jpg", _image())), store)
+
+
+# --- validate route ---
+@pytest.fixture
+def report(db_session):
+    row = Report(user_name="u", description="smoke", lat=1.0, lng=2.0, status="verified", details={})
+    db_session.add(row)
+    db_session.commit()
+    return row
+
+
+def _validate(client, report_id, *proofs):
+    return client.put(f"/api/reports/{report_id}/validate", content_type="multipart/form-data", data={
+        "status": "approved", "action_taken": "sprinklers",
+        "proof_images": [(io.BytesIO(data), name) for name, data in proofs],
+    })
+
+
+def test_route_stores_proofs_as_blob_urls(client, report):
+    response = _validate(client, report.id, ("a.jpg", _rotated_jpeg()))
+    assert response.status_code == 200
+    [url] = response.get_json()["report"]["govt_proofs"]
+    assert "/api/reports/blobs/" in url
+    image = client.get(url[url.index("/api/"):])
+    assert image.status_code == 200 and image.mimetype == "image/webp"
+
+
+def test_route_rejects_a_bad_proof_without_changing_the_report(client, db_session, report):
+    response = _validate(client, report.id, ("a.jpg", _image()), ("b.gif", _image("GIF", mode="P")))
+    assert response.status_code == 400
+    assert "b.gif" in response.get_json()["error"]
+    db_session.expire_all()
+    saved = db_session.get(Report, report.id)
+    assert (saved.status, saved.govt_action) == ("verified", None)
@@ -0,0 +1,57 @@
+import io
+import os
+import re
+import subprocess
+import sys
+
+from services.metrics import UPLOAD_STAGES
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _sample(body, name, **labels):
+    wanted = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    match = re.search(rf"^{name}(?:\{{{wanted}\}})? (\S+)$", body, re.M)
+    return float(match.group(1)) if match else None
+
+
+def test_every_upload_stage_is_exported_before_any_upload(client):
+    body = client.get("/metrics").data.decode()
+    for stage in UPLOAD_STAGES:
+        assert f'breathesmart_upload_stage_seconds_count{{stage="{stage}"}}' in body
+
+
+def test_an_upload_is_timed_per_stage(client, db_session, login, jpeg):
+    before = client.get("/metrics").data.decode()
+    response = client.post("/api/reports/upload", headers=login("Timed"), data={
+        "image": (io.BytesIO(jpeg(99)), "smog.jpg"), "description": "smoke", "lat": "12.9", "lng": "77.5",
+    })
+    assert response.status_code == 201
+    after = client.get("/metrics").data.decode()
+    for stage in ("parse", "sha256", "duplicate_query", "temp_write", "canny", "file_save", "db_commit"):
+        name = "breathesmart_upload_stage_seconds_count"
+        assert _sample(after, name, stage=stage) == _sample(before, name, stage=stage) + 1
+    assert _sample(after, "breathesmart_verify_image_seconds_count") >= 1
+
+
+def test_metrics_token():
+    """METRICS_TOKEN is read when the app is created, so check it in a fresh interpreter."""
+    check = (
+        "from app import app; c = app.test_client(); "
+        "print(c.get('/metrics').status_code, c.get('/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code)"
+    )
+    out = subprocess.run([sys.executable, "-c", check], cwd=BACKEND_DIR, env=dict(os.environ, METRICS_TOKEN="s3cret"),
+                         check=True, capture_output=True, text=True).stdout
+    assert out.split()[-2:] == ["401", "200"]
+
+
+def test_multiprocess_samples_are_summed(tmp_path):
+    """Two processes count, a third serves the scrape: it reports the total."""
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+    count = "from services.metrics import record_cache; record_cache('aqi_reading', hit=True)"
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", count], cwd=BACKEND_DIR, env=env, check=True)
+    scrape = "from services.metrics import metrics_response; print(metrics_response().get_data(as_text=True))"
+    body = subprocess.run([sys.executable, "-c", scrape], cwd=BACKEND_DIR, env=env, check=True,
+                          capture_output=True, text=True).stdout
+    assert _sample(body, "breathesmart_cache_lookups_total", cache="aqi_reading", result="hit") == 2.0
@@ -0,0 +1,68 @@
+from sqlalchemy import create_engine, inspect
+
+import migrations
+
+
+def test_upgrade_from_an_empty_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+    versions = [version for version, _, _ in migrations.discover()]
+
+    assert migrations.upgrade(engine) == versions
+    assert versions[-1] == migrations.head()
+
+    schema = inspect(engine)
+    tables = set(schema.get_table_names())
+    assert {"schema_version", "user", "report", "report_event", "report_rollup",
+            "alert_subscription", "alert_outbox"} <= tables
+    report_indexes = {ix["name"] for ix in schema.get_indexes("report")}
+    assert {"ix_report_status_created_at", "ix_report_user_name_id", "ix_report_user_name_created_at"} <= report_indexes
+    assert "updated_at" in {c["name"] for c in schema.get_columns("report")}
+
+
+def test_upgrade_is_idempotent(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'twice.db'}")
+    migrations.upgrade(engine)
+    assert migrations.upgrade(engine) == []
+    with engine.connect() as conn:
+        assert migrations.applied_versions(conn) == {version for version, _, _ in migrations.discover()}
+
+
+def test_upgrade_stops_at_target(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'target.db'}")
+    assert migrations.upgrade(engine, target=3) == [1, 2, 3]
+    assert "report_event" not in inspect(engine).get_table_names()
+    assert migrations.upgrade(engine)[0] == 4
+
+
+def test_database_tuning(app, db_session):
+    from sqlalchemy import text
+
+    from database import engine_options, normalize_database_url
+
+    assert db_session.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+    assert normalize_database_url("postgres://u:p@h/db") == "postgresql://u:p@h/db"
+    assert engine_options("postgresql://u:p@h/db")["pool_pre_ping"] is True
+    assert "pool_recycle" in engine_options("mysql+pymysql://u:p@h/db")
+
+
+def test_reset_db_wipes_the_database_and_its_wal(tmp_path):
+    import os
+    import subprocess
+    import sys
+
+    path = tmp_path / "reset.db"
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", DB_AUTO_MIGRATE="1")
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    engine = create_engine(f"sqlite:///{path}")
+    migrations.upgrade(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO report (user_name, description, lat, lng) VALUES ('u', '', 1, 2)")
+    engine.dispose()
+
+    result = subprocess.run([sys.executable, "-m", "flask", "--app", "manage", "reset-db"],
+                            cwd=backend, env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT COUNT(*) FROM report").scalar() == 0
+        assert migrations.applied_versions(conn) == {version for version, _, _ in migrations.discover()}
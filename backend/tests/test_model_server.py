@@ -0,0 +1,95 @@
+import os
+import stat
+import tempfile
+import threading
+import time
+
+import pytest
+
+from services.ML import model_server
+from services.ML.model_server import ModelClient, ModelServer, ModelServerError
+
+
+@pytest.fixture
+def socket_path():
+    folder = tempfile.mkdtemp(prefix="clip", dir="/tmp")  # AF_UNIX paths are limited to ~100 bytes
+    path = os.path.join(folder, "clip.sock")
+    yield path
+    # the socket itself is unlinked by the listener's finalizer at exit
+    for name in os.listdir(folder):
+        if name != "clip.sock":
+            os.remove(os.path.join(folder, name))
+
+
+@pytest.fixture
+def server(socket_path, monkeypatch):
+    monkeypatch.setattr(model_server, "AUTHKEY", None)
+    server = ModelServer(socket_path, max_batch=8, batch_wait_ms=20)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    deadline = time.monotonic() + 5
+    while not os.path.exists(socket_path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return server
+
+
+@pytest.fixture
+def images(jpeg, tmp_path):
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"{i}.jpg"
+        path.write_bytes(jpeg(i))
+        paths.append(str(path))
+    return paths
+
+
+def test_socket_and_generated_key_are_private(server, socket_path):
+    assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+    key_file = model_server.key_path(socket_path)
+    assert stat.S_IMODE(os.stat(key_file).st_mode) == 0o600
+    assert len(open(key_file).read()) == 64
+
+
+def test_client_reads_the_key_and_matches_local_scores(server, socket_path, images):
+    from services.ML.ml_service import verify_description_matches
+
+    descriptions = ["smoke", "dust", "haze"]
+    scores, embeddings = ModelClient(socket_path).match(images, descriptions, with_embeddings=True)
+    local_scores, local_embeddings = verify_description_matches(images, descriptions, with_embeddings=True)
+    assert scores == pytest.approx(local_scores)
+    assert (embeddings[1]["image_embedding"] == local_embeddings[1]["image_embedding"]).all()
+
+
+def test_concurrent_requests_share_a_batch(server, socket_path, images):
+    client = ModelClient(socket_path)
+    threads = [threading.Thread(target=client.match, args=([p], ["smoke"])) for p in images]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = client.ping()[1]
+    assert stats["requests"] == 3 and stats["images"] == 3
+    assert stats["batches"] < 3
+
+
+def test_encode_texts(server, socket_path):
+    from services.ML.ml_service import encode_texts
+
+    remote = ModelClient(socket_path).encode_texts(["smog over the city"])
+    assert remote.shape == encode_texts(["smog over the city"]).shape
+
+
+def test_wrong_key_is_refused(server, socket_path):
+    with pytest.raises(ModelServerError, match="rejected"):
+        ModelClient(socket_path, authkey=b"guessed").ping()
+
+
+def test_missing_key_file_is_a_clear_error(socket_path, monkeypatch):
+    monkeypatch.setattr(model_server, "AUTHKEY", None)
+    with pytest.raises(ModelServerError, match="No key"):
+        ModelClient(socket_path).ping()
+
+
+def test_the_old_public_default_is_refused(monkeypatch, socket_path):
+    monkeypatch.setattr(model_server, "AUTHKEY", "breathe-smart-clip")
+    with pytest.raises(SystemExit):
+        model_server.main(["--socket", socket_path])
@@ -0,0 +1,102 @@
+import json
+import os
+import random
+
+import pytest
+
+from services.AQI import geohash
+from services.AQI.prefetch import DemandTracker, PrefetchScheduler
+
+DELHI = (28.6139, 77.2090)
+MUMBAI = (19.0760, 72.8777)
+
+
+def test_geohash_known_value():
+    assert geohash.encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geohash.encode(57.64911, 10.40744) == "u4pru"  # precision 5 is a prefix of the same cell
+
+
+def test_geohash_decode_is_the_cell_centre():
+    rng = random.Random(3)
+    for _ in range(500):
+        lat, lng = rng.uniform(-89, 89), rng.uniform(-179, 179)
+        for precision in (1, 5, 8):
+            cell = geohash.encode(lat, lng, precision)
+            c_lat, c_lng = geohash.decode(cell)
+            lat_bits = (5 * precision) // 2
+            lng_bits = 5 * precision - lat_bits
+            assert abs(c_lat - lat) <= 90.0 / 2 ** lat_bits + 1e-9
+            assert abs(c_lng - lng) <= 180.0 / 2 ** lng_bits + 1e-9
+            assert geohash.encode(c_lat, c_lng, precision) == cell
+
+
+def test_hot_cells_rank_by_demand():
+    tracker = DemandTracker()
+    for _ in range(3):
+        tracker.record(*DELHI, hit=False)
+    tracker.record(*MUMBAI, hit=True)
+    cells = tracker.hot_cells(5)
+    assert [cell for cell, _, _, _ in cells] == [geohash.encode(*DELHI), geohash.encode(*MUMBAI)]
+    assert cells[0][1] == pytest.approx(3.0, rel=1e-3)
+    report = tracker.report()
+    assert (report["requests"], report["hits"], report["misses"]) == (4, 1, 3)
+
+
+def test_merged_hot_cells_include_other_workers(tmp_path):
+    tracker = DemandTracker(snapshot_dir=str(tmp_path))
+    tracker.record(*MUMBAI, hit=False)
+    with open(tmp_path / "demand_999999.json", "w") as f:  # another worker's snapshot
+        json.dump({geohash.encode(*DELHI): {"score": 5.0, "updated": 0.0, "lat": DELHI[0], "lng": DELHI[1],
+                                            "hits": 0, "misses": 5}}, f)
+    tracker.half_life_seconds = float("inf")
+    cells = [cell for cell, _, _, _ in tracker.merged_hot_cells(5)]
+    assert cells == [geohash.encode(*DELHI), geohash.encode(*MUMBAI)]
+    assert len(tracker.hot_cells(5)) == 1  # the live table is left alone
+
+
+def _scheduler(tracker, ages, budget=30, **kwargs):
+    refreshed = []
+    scheduler = PrefetchScheduler(
+        tracker, refresh=lambda lat, lng: refreshed.append((lat, lng)),
+        reading_age=lambda lat, lng: ages.get((lat, lng)), ttl_seconds=600, lead_seconds=120,
+        budget_per_minute=budget, **kwargs,
+    )
+    return scheduler, refreshed
+
+
+def test_run_once_refreshes_only_cells_about_to_expire():
+    tracker = DemandTracker()
+    tracker.record(*DELHI, hit=True)
+    tracker.record(*MUMBAI, hit=True)
+    scheduler, refreshed = _scheduler(tracker, {DELHI: 100.0, MUMBAI: 550.0})
+    assert scheduler.run_once() == 1
+    assert refreshed == [MUMBAI]
+
+
+def test_run_once_respects_the_budget():
+    tracker = DemandTracker()
+    for i in range(5):
+        tracker.record(10.0 + i, 10.0, hit=False)
+    scheduler, refreshed = _scheduler(tracker, {}, budget=2)
+    assert scheduler.run_once() == 2
+    assert scheduler.stats["skipped_budget"] == 1
+
+
+def test_pinned_cells_are_refreshed_too():
+    tracker = DemandTracker()
+    pinned = lambda: [(geohash.encode(*DELHI), 1, *DELHI)]
+    scheduler, refreshed = _scheduler(tracker, {}, pinned_cells=pinned)
+    scheduler.run_once()
+    assert refreshed == [DELHI]
+
+
+def test_only_one_scheduler_per_lock_is_leader(tmp_path):
+    lock = str(tmp_path / "prefetch.lock")
+    first, _ = _scheduler(DemandTracker(), {}, leader_lock=lock)
+    second, _ = _scheduler(DemandTracker(), {}, leader_lock=lock)
+    assert first._is_leader()
+    assert not second._is_leader()
+    first._release()
+    assert second._is_leader()
+    second._release()
+    assert os.path.exists(lock)
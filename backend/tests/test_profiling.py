@@ -0,0 +1,99 @@
+import os
+import pstats
+import threading
+import time
+
+from flask import Flask
+
+from services.profiling import RequestProfiler
+
+
+def _app(tmp_path, **options):
+    app = Flask("profiled")
+    gate = threading.Event()
+
+    @app.route("/fast")
+    def fast():
+        return "ok"
+
+    @app.route("/slow")
+    def slow():
+        sum(i * i for i in range(20000))
+        return "ok"
+
+    @app.route("/blocked")
+    def blocked():
+        gate.wait(5)
+        return "ok"
+
+    profiler = RequestProfiler(app, str(tmp_path), **options)
+    return app, profiler, gate
+
+
+def _files(tmp_path, endpoint):
+    folder = tmp_path / endpoint
+    return sorted(os.listdir(folder)) if folder.exists() else []
+
+
+def test_token_header_profiles_one_request(tmp_path):
+    app, _, _ = _app(tmp_path, token="t0ken")
+    client = app.test_client()
+    assert "X-Profile-Id" not in client.get("/slow").headers
+    assert "X-Profile-Id" not in client.get("/slow", headers={"X-Profile": "wrong"}).headers
+
+    response = client.get("/slow", headers={"X-Profile": "t0ken"})
+    profile_id = response.headers["X-Profile-Id"]
+    assert profile_id.startswith("slow/")
+    [name] = _files(tmp_path, "slow")
+    assert name.startswith(profile_id.split("/")[1]) and name.endswith("ms.pstats")
+    assert pstats.Stats(str(tmp_path / "slow" / name)).total_calls > 0
+
+
+def test_sampling_respects_the_endpoint_list(tmp_path):
+    app, _, _ = _app(tmp_path, sample_rate=1.0, endpoints=["slow"])
+    client = app.test_client()
+    client.get("/fast")
+    client.get("/slow")
+    assert _files(tmp_path, "fast") == []
+    assert len(_files(tmp_path, "slow")) == 1
+
+
+def test_ring_keeps_the_newest_files(tmp_path):
+    app, _, _ = _app(tmp_path, sample_rate=1.0, ring_size=3)
+    client = app.test_client()
+    ids = []
+    for _ in range(5):
+        ids.append(client.get("/fast").headers["X-Profile-Id"].split("/")[1])
+        time.sleep(0.002)  # file names start with a ms timestamp
+    kept = _files(tmp_path, "fast")
+    assert len(kept) == 3
+    assert any(name.startswith(ids[-1]) for name in kept)
+    assert not any(name.startswith(ids[0]) for name in kept)
+
+
+def test_fast_requests_below_min_ms_are_discarded(tmp_path):
+    app, _, _ = _app(tmp_path, sample_rate=1.0, min_ms=10_000)
+    app.test_client().get("/fast")
+    assert _files(tmp_path, "fast") == []
+
+
+def test_one_profile_at_a_time(tmp_path):
+    app, profiler, gate = _app(tmp_path, sample_rate=1.0)
+    first = threading.Thread(target=lambda: app.test_client().get("/blocked"))
+    first.start()
+    try:
+        for _ in range(500):
+            if profiler._busy.locked():
+                break
+            threading.Event().wait(0.01)
+        assert profiler._busy.locked()
+        assert "X-Profile-Id" not in app.test_client().get("/fast").headers  # skipped, not queued
+    finally:
+        gate.set()
+        first.join()
+    assert len(_files(tmp_path, "blocked")) == 1
+    assert not profiler._busy.locked()
+
+
+def test_disabled_profiler_is_not_installed(app):
+    assert "profiler" not in app.extensions  # no PROFILE_SAMPLE_RATE / PROFILE_TOKEN in the test env
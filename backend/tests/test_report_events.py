@@ -0,0 +1,83 @@
+import io
+import re
+
+import pytest
+
+from models import ReportEvent
+from services.change_log import ChangeLog
+from services.group_commit import GroupCommitter
+
+
+@pytest.fixture
+def log(monkeypatch):
+    """A fresh change log: the shared one's tail may be past ids the emptied table hands out again."""
+    fresh = ChangeLog(poll_seconds=0.05, gap_seconds=0.1)
+    monkeypatch.setattr("routes.report_routes.change_log", fresh)
+    monkeypatch.setattr("routes.report_routes.SSE_STREAM_SECONDS", 0.3)
+    return fresh
+
+
+def _upload(client, headers, data):
+    return client.post("/api/reports/upload", headers=headers, data={
+        "image": (io.BytesIO(data), "smog.jpg"), "description": "smoke", "lat": "12.9", "lng": "77.5",
+    })
+
+
+def _stream(client, **kwargs):
+    response = client.get("/api/reports/events", **kwargs)
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    response.close()
+    return body
+
+
+def _ids(body):
+    return [int(i) for i in re.findall(r"^id: (\d+)$", body, re.M)]
+
+
+def test_upload_commits_its_event_with_the_report(client, db_session, login, jpeg, log):
+    response = _upload(client, login("Eventful"), jpeg(40))
+    assert response.status_code == 201
+    [event] = db_session.query(ReportEvent).all()
+    assert (event.report_id, event.kind) == (response.get_json()["id"], "created")
+    assert event.payload == response.get_json()
+
+
+def test_group_committed_upload_stages_its_event_in_the_batch(app, client, db_session, login, jpeg, log, monkeypatch):
+    monkeypatch.setitem(app.extensions, "group_commit", GroupCommitter(app, window_ms=1))
+    headers = login("Batched")
+    created = _upload(client, headers, jpeg(41)).get_json()
+    assert _upload(client, headers, jpeg(41)).status_code == 200  # same image again: an update
+    events = db_session.query(ReportEvent).order_by(ReportEvent.id).all()
+    assert [(e.report_id, e.kind) for e in events] == [(created["id"], "created"), (created["id"], "updated")]
+    assert events[0].payload["id"] == created["id"]
+
+
+def test_staged_events_roll_back_with_the_write(db_session, log):
+    log.stage([(1, "updated", {"id": 1})])
+    db_session.rollback()
+    assert db_session.query(ReportEvent).count() == 0
+
+
+def test_resume_from_last_event_id(client, db_session, log):
+    ids = [log.append(report_id, "updated", {"id": report_id}) for report_id in (7, 8, 9)]
+    body = _stream(client, headers={"Last-Event-ID": str(ids[0])})
+    assert body.startswith("retry: ")
+    assert _ids(body) == ids[1:]
+    assert '"report_id": 8' in body and "event: reset" not in body
+
+    assert _ids(_stream(client, query_string={"last_event_id": ids[1]})) == ids[2:]
+    assert _ids(_stream(client, headers={"Last-Event-ID": str(ids[2])})) == []
+
+
+def test_resume_from_a_pruned_id_is_a_reset(client, db_session, log):
+    ids = [log.append(report_id, "updated", {"id": report_id}) for report_id in (7, 8, 9)]
+    db_session.query(ReportEvent).filter(ReportEvent.id == ids[0]).delete()
+    db_session.commit()
+    body = _stream(client, headers={"Last-Event-ID": str(ids[0] - 1)})
+    assert "event: reset" in body
+    assert _ids(body) == []
+
+
+def test_bad_last_event_id_is_400(client):
+    assert client.get("/api/reports/events", headers={"Last-Event-ID": "abc"}).status_code == 400
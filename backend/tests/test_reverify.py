@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from models import Report
+from services.blob_store import blob_ref
+
+
+@pytest.fixture
+def stored(app, db_session, jpeg):
+    """stored(status, details=None, seed=0) -> a committed report whose image is in the blob store."""
+    def make(status, details=None, seed=0):
+        data = jpeg(seed)
+        key = app.extensions["blob_store"].put(data)
+        report = Report(user_name="alice", description="smoke", image_filename=blob_ref(key), image_hash=key,
+                        lat=12.9, lng=77.5, status=status, details=details or {})
+        db_session.add(report)
+        db_session.commit()
+        return report
+    return make
+
+
+def _reverify(app, **kwargs):
+    from routes.report_routes import decide
+    from services.ML.reverify import reverify_reports
+
+    return reverify_reports(app, decide, workers=1, chunk_size=2, log=lambda *_: None, **kwargs)
+
+
+def test_rescoring_merges_details_and_skips_protected_rows(app, db_session, stored):
+    kept = stored("verified", {"near_duplicates": [7], "precautions": "masks"}, seed=1)
+    by_validator = stored("rejected", {"rejected_by": "validator"}, seed=2)
+    flagged = stored("rejected", {"abuse": {"rule": "rate"}}, seed=3)
+    closed = stored("finalized", seed=4)
+
+    published = []
+    state = _reverify(app, publish=published.extend)
+
+    assert state["processed"] == 1
+    assert state["skipped_protected"] == 2
+    db_session.expire_all()
+    details = db_session.get(Report, kept.id).details
+    assert details["near_duplicates"] == [7] and details["precautions"] == "masks"
+    assert "_rescored_at" in details
+    assert db_session.get(Report, by_validator.id).details == {"rejected_by": "validator"}
+    assert db_session.get(Report, flagged.id).status == "rejected"
+    assert db_session.get(Report, closed.id).details == {}
+    assert published == [kept.id]
+
+
+def test_dry_run_writes_nothing_and_checkpoints_resume(app, db_session, stored, tmp_path):
+    report = stored("verified", seed=5)
+    checkpoint = tmp_path / "reverify.json"
+
+    state = _reverify(app, dry_run=True, checkpoint_path=str(checkpoint))
+    assert state["processed"] == 1
+    db_session.expire_all()
+    assert "_rescored_at" not in db_session.get(Report, report.id).details
+    assert json.loads(checkpoint.read_text())["last_id"] == report.id
+
+    assert _reverify(app, dry_run=True, checkpoint_path=str(checkpoint))["processed"] == 1  # resumed past it
+    with pytest.raises(ValueError):
+        _reverify(app, checkpoint_path=str(checkpoint))  # a real run must not resume a dry run's checkpoint
+
+
+# --- validate_report: rejection markers ---
+def _validate(client, report_id, **body):
+    return client.put(f"/api/reports/{report_id}/validate", json=body)
+
+
+def test_validator_rejection_is_marked(client, db_session, stored):
+    report = stored("verified", seed=6)
+    response = _validate(client, report.id, status="rejected", reason="not smoke")
+    details = response.get_json()["report"]["details"]
+    assert details["rejected_by"] == "validator"
+    assert details["rejection_reason"] == "not smoke"
+
+
+def test_finalizing_does_not_mark_a_rejection(client, db_session, stored):
+    report = stored("verified", seed=7)
+    response = _validate(client, report.id, status="finalized", precautions="stay indoors")
+    body = response.get_json()["report"]
+    assert body["status"] == "finalized"
+    assert "rejected_by" not in body["details"]
+    assert body["details"]["precautions"] == "stay indoors"
+
+
+def test_finalizing_a_rejected_report_clears_the_rejection(client, db_session, stored):
+    report = stored("rejected", {"rejected_by": "validator", "rejection_reason": "blurry"}, seed=8)
+    details = _validate(client, report.id, status="finalized").get_json()["report"]["details"]
+    assert "rejected_by" not in details and "rejection_reason" not in details
+
+
+def test_two_step_approval_finalizes(client, db_session, stored):
+    report = stored("verified", seed=9)
+    assert _validate(client, report.id, precautions="masks").get_json()["report"]["status"] == "approved"
+    assert _validate(client, report.id, action_taken="sprinklers").get_json()["report"]["status"] == "finalized"
@@ -0,0 +1,82 @@
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from models import Report, ReportRollup
+from services import rollups
+
+
+def _table(session):
+    rows = session.execute(select(
+        ReportRollup.day, ReportRollup.cell, ReportRollup.status,
+        ReportRollup.report_count, ReportRollup.confidence_sum, ReportRollup.confidence_count,
+    )).all()
+    return {
+        (day, cell, status): (count, round(total, 6), scored)
+        for day, cell, status, count, total, scored in rows if count
+    }
+
+
+def _report(rng, start):
+    return Report(
+        user_name=f"user{rng.randrange(5)}", description="", status=rng.choice(["verified", "rejected", "approved"]),
+        lat=28.5 + rng.random() * 0.5, lng=77.0 + rng.random() * 0.5,
+        pollution_confidence=rng.choice([None, rng.uniform(0, 100)]),
+        created_at=start + timedelta(hours=rng.randrange(96)),
+    )
+
+
+def test_incremental_rollups_match_rebuild(db_session):
+    rng = random.Random(11)
+    start = datetime(2026, 3, 1)
+    reports = [_report(rng, start) for _ in range(200)]
+    db_session.add_all(reports)
+    db_session.commit()
+
+    for report in rng.sample(reports, 40):  # ORM attribute changes
+        report.status = "finalized"
+        report.pollution_confidence = rng.uniform(0, 100)
+    for report in rng.sample(reports, 10):
+        report.lat += 1.0
+        report.created_at -= timedelta(days=2)
+    db_session.commit()
+
+    db_session.execute(update(Report), [  # bulk UPDATE by primary key (group commit, reverify)
+        {"id": r.id, "status": "rejected", "pollution_confidence": 12.5} for r in rng.sample(reports, 30)
+    ])
+    db_session.commit()
+
+    for report in rng.sample(reports, 15):
+        db_session.delete(report)
+    db_session.commit()
+
+    incremental = _table(db_session)
+    counted, _ = rollups.rebuild()
+    assert counted == 185
+    assert _table(db_session) == incremental
+
+
+def test_stats_totals_match_the_reports(db_session):
+    rng = random.Random(5)
+    db_session.add_all([_report(rng, datetime(2026, 3, 1)) for _ in range(50)])
+    db_session.commit()
+
+    result = rollups.stats(group_by=("status",))
+    by_status = {row["status"]: row["count"] for row in result["rows"]}
+    expected = {}
+    for status, in db_session.execute(select(Report.status)):
+        expected[status] = expected.get(status, 0) + 1
+    assert by_status == expected
+    assert result["total"]["count"] == 50
+
+
+def test_stats_route(client, db_session):
+    rng = random.Random(8)
+    db_session.add_all([_report(rng, datetime(2026, 3, 1)) for _ in range(20)])
+    db_session.commit()
+
+    body = client.get("/api/reports/stats?group_by=day&since=2026-03-01&until=2026-03-31").get_json()
+    assert sum(row["count"] for row in body["rows"]) == body["total"]["count"] == 20
+    for bad in ("group_by=month", "precision=99", "since=yesterday", "cell=AAAA"):
+        assert client.get(f"/api/reports/stats?{bad}").status_code == 400
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from models import Report
+from services import search_service
+from services.ML import embedding_store as stores
+from services.ML.embedding_store import EmbeddingStore
+from services.search_service import ReportIndex, SearchError, parse_search_args, search_reports, tokenize
+
+
+@pytest.fixture
+def index(monkeypatch):
+    fresh = ReportIndex()
+    monkeypatch.setattr(search_service, "report_index", fresh)
+    return fresh
+
+
+@pytest.fixture
+def reports(db_session):
+    rows = [
+        Report(user_name="a", description="Garbage burning near the market", lat=12.9, lng=77.5, status="verified"),
+        Report(user_name="b", description="thick smoke from a factory chimney", lat=28.6, lng=77.2, status="verified"),
+        Report(user_name="c", description="dust from construction", lat=12.95, lng=77.55, status="rejected",
+               precautions="wear masks", govt_action="garbage collection drive"),
+    ]
+    db_session.add_all(rows)
+    db_session.commit()
+    return rows
+
+
+def test_tokenize_drops_stopwords_and_single_letters():
+    assert tokenize("The smoke, near a FACTORY x2!") == ["smoke", "factory", "x2"]
+
+
+def test_keyword_ranking_and_filters(index, reports):
+    garbage, _, dust = reports
+    hits = search_reports("garbage burning", k=5)
+    assert [rid for rid, _, _ in hits] == [garbage.id, dust.id]  # dust matches via its govt_action
+    assert set(hits[0][2]) == {"keywords"}
+
+    assert [rid for rid, _, _ in search_reports("garbage", statuses=["rejected"])] == [dust.id]
+    assert [rid for rid, _, _ in search_reports("garbage", bbox=(77.0, 12.0, 78.0, 13.0))] == [garbage.id, dust.id]
+    assert search_reports("garbage", statuses=["finalized"]) == []
+
+
+def test_updated_text_replaces_old_postings(index, reports, db_session):
+    garbage = reports[0]
+    index.refresh(force=True)
+    garbage.description = "vehicle exhaust"
+    garbage.updated_at = datetime.utcnow()
+    db_session.commit()
+    index.refresh(force=True)
+    with index._lock:
+        assert index.bm25(["market"]) == []
+        assert index.bm25(["exhaust"])[0][0] == garbage.id
+
+
+def test_late_commit_with_an_older_timestamp_is_not_missed(index, reports, db_session):
+    """A row stamped before the previous refresh but committed after it is picked up by the overlap window."""
+    index.refresh(force=True)
+    late = Report(user_name="d", description="crop stubble fire", lat=1.0, lng=2.0, status="verified",
+                  updated_at=datetime.utcnow() - timedelta(seconds=5))
+    db_session.add(late)
+    db_session.commit()
+    index.refresh(force=True)
+    with index._lock:
+        assert index.bm25(["stubble"])[0][0] == late.id
+
+
+def test_semantic_rankings_are_fused_with_keywords(index, reports, tmp_path, monkeypatch):
+    garbage, smoke, _ = reports
+    image_store, description_store = EmbeddingStore(str(tmp_path / "img")), EmbeddingStore(str(tmp_path / "desc"))
+    monkeypatch.setattr(stores, "embedding_store", image_store)
+    monkeypatch.setattr(stores, "description_store", description_store)
+    query = np.eye(8, dtype=np.float32)[0]
+    image_store.add_many([smoke.id, garbage.id], [query, np.eye(8)[1]])
+    description_store.add_many([smoke.id], [query])
+
+    hits = search_reports("chimney", k=3, encode_query=lambda text: query)
+    assert hits[0][0] == smoke.id  # first in all three lists
+    assert set(hits[0][2]) == {"image", "description", "keywords"}
+    assert hits[0][2]["image"] == pytest.approx(1.0, abs=1e-3)
+
+    only_rejected = search_reports("chimney", statuses=["rejected"], encode_query=lambda text: query)
+    assert smoke.id not in [rid for rid, _, _ in only_rejected]
+
+
+def test_route(client, index, reports):
+    response = client.get("/api/reports/search?q=smoke+chimney&k=2")
+    assert response.status_code == 200
+    assert response.get_json()["results"][0]["report"]["id"] == reports[1].id
+    assert client.get("/api/reports/search").status_code == 400
+
+
+@pytest.mark.parametrize("args", [{}, {"q": "x", "k": "many"}, {"q": "x", "bbox": "1,2"}])
+def test_bad_arguments(args):
+    with pytest.raises(SearchError):
+        parse_search_args(args)
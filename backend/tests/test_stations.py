@@ -0,0 +1,83 @@
+import math
+import random
+
+from services.AQI.stations import ReadingCache, StationRegistry, chord_to_km, to_unit_vector
+
+
+def _km(lat1, lng1, lat2, lng2):
+    return chord_to_km(math.dist(to_unit_vector(lat1, lng1), to_unit_vector(lat2, lng2)))
+
+
+def _registry(n, seed=7):
+    rng = random.Random(seed)
+    registry = StationRegistry(path=None)
+    for uid in range(n):
+        registry.add(uid, f"station {uid}", rng.uniform(-60, 70), rng.uniform(-180, 180))
+    return registry, rng
+
+
+def test_nearest_matches_brute_force():
+    registry, rng = _registry(500)
+    stations = [registry.get(uid) for uid in range(500)]
+    for _ in range(200):
+        lat, lng = rng.uniform(-60, 70), rng.uniform(-180, 180)
+        expected = sorted(stations, key=lambda s: _km(lat, lng, s["lat"], s["lng"]))[:3]
+        got = registry.nearest(lat, lng, k=3)
+        assert [s["uid"] for s, _ in got] == [s["uid"] for s in expected]
+        for (s, km) in got:
+            assert math.isclose(km, _km(lat, lng, s["lat"], s["lng"]), rel_tol=1e-6, abs_tol=1e-6)
+
+
+def test_nearest_across_the_antimeridian():
+    registry = StationRegistry(path=None)
+    registry.add(1, "east", 0.0, 179.9)
+    registry.add(2, "west of the query", 0.0, 170.0)
+    station, km = registry.nearest(0.0, -179.9, k=1)[0]
+    assert station["uid"] == 1
+    assert 20 < km < 25
+
+
+def test_snap_respects_the_radius():
+    registry = StationRegistry(path=None)
+    registry.add(1, "Delhi", 28.6139, 77.2090)
+    assert registry.snap(28.62, 77.21, max_km=5)["uid"] == 1
+    assert registry.snap(19.076, 72.8777, max_km=50) is None  # Mumbai
+
+
+def test_index_is_rebuilt_after_a_station_moves():
+    registry = StationRegistry(path=None)
+    registry.add(1, "a", 10.0, 10.0)
+    registry.add(2, "b", 20.0, 20.0)
+    assert registry.snap(10.0, 10.0, max_km=1)["uid"] == 1
+    registry.add(2, "b", 10.001, 10.0)
+    registry.add(1, "a", 40.0, 40.0)
+    assert registry.snap(10.0, 10.0, max_km=1)["uid"] == 2
+
+
+def test_observe_learns_the_station_behind_a_feed(tmp_path):
+    registry = StationRegistry(path=str(tmp_path / "stations.json"))
+    uid = registry.observe({"idx": 42, "city": {"name": "Anand Vihar", "geo": [28.6469, 77.3152]}})
+    assert uid == 42
+    assert registry.observe({"idx": 43, "city": {}}) is None
+    reloaded = StationRegistry(path=str(tmp_path / "stations.json"))
+    assert reloaded.get(42)["name"] == "Anand Vihar"
+
+
+def test_save_merges_with_other_writers(tmp_path):
+    path = str(tmp_path / "stations.json")
+    first, second = StationRegistry(path=path), StationRegistry(path=path)
+    first.add(1, "a", 1.0, 1.0)
+    first.save()
+    second.add(2, "b", 2.0, 2.0)
+    second.save()
+    assert {1, 2} <= {uid for uid in range(3) if StationRegistry(path=path).get(uid)}
+
+
+def test_reading_cache_expires_and_is_shared(tmp_path):
+    writer = ReadingCache(ttl_seconds=60, shared_dir=str(tmp_path))
+    reader = ReadingCache(ttl_seconds=60, shared_dir=str(tmp_path))  # another worker
+    writer.put(7, {"payload": {"aqius": 80}})
+    assert reader.get(7) == {"payload": {"aqius": 80}}
+    assert reader.get(7, max_age=-1) is None
+    assert reader.get(8) is None
+    assert 0 <= reader.age(7) < 5
@@ -0,0 +1,142 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Report
+from services import storage_maintenance as storage
+from services.blob_store import LocalBlobStore, blob_ref
+
+OLD = time.time() - 400 * 86400
+
+
+@pytest.fixture
+def tree(app, tmp_path, monkeypatch):
+    """Empty verified/, rejected/ and blob store for this test only."""
+    for key in ("UPLOAD_FOLDER", "VERIFIED_FOLDER", "REJECTED_FOLDER"):
+        folder = tmp_path / key.split("_")[0].lower()
+        folder.mkdir(exist_ok=True)
+        monkeypatch.setitem(app.config, key, str(folder))
+    store = LocalBlobStore(str(tmp_path / "blobs"))
+    monkeypatch.setitem(app.extensions, "blob_store", store)
+    return store
+
+
+def _file(app, kind, name, mtime=OLD):
+    path = os.path.join(app.config[f"{kind.upper()}_FOLDER"], name)
+    with open(path, "wb") as f:
+        f.write(name.encode() * 10)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def _blob(store, data, mtime=OLD):
+    key = store.put(data)
+    os.utime(store.path(key), (mtime, mtime))
+    return key
+
+
+def _report(db_session, status="verified", image=None, proofs=(), checked=None):
+    report = Report(user_name="u", description="smoke", lat=1.0, lng=2.0, status=status, image_filename=image,
+                    details={"govt_proofs": list(proofs)}, last_checked_at=checked or datetime.utcnow())
+    db_session.add(report)
+    db_session.commit()
+    return report
+
+
+# --- orphans ---
+def test_orphans_outside_the_grace_period_are_deleted(app, db_session, tree):
+    used, proof = _blob(tree, b"used"), _blob(tree, b"proof")
+    _blob(tree, b"orphan")
+    fresh = _blob(tree, b"fresh", mtime=time.time())
+    legacy_used, legacy_orphan = _file(app, "verified", "kept.jpg"), _file(app, "rejected", "gone.jpg")
+    _report(db_session, image=blob_ref(used), proofs=[blob_ref(proof)])
+    _report(db_session, image="kept.jpg")
+
+    stats = storage.delete_orphans(app, grace_hours=24)
+    assert stats["files"] == 2
+    assert {b.key for b in tree.iter_blobs()} == {used, proof, fresh}
+    assert os.path.exists(legacy_used) and not os.path.exists(legacy_orphan)
+
+
+def test_dry_run_deletes_nothing(app, db_session, tree):
+    orphan = _blob(tree, b"orphan")
+    assert storage.delete_orphans(app, dry_run=True)["files"] == 1
+    assert [b.key for b in tree.iter_blobs()] == [orphan]
+
+
+def test_mostly_orphaned_tree_needs_force(app, db_session, tree):
+    for i in range(100):
+        _file(app, "rejected", f"{i}.jpg")
+    with pytest.raises(RuntimeError, match="--force"):
+        storage.delete_orphans(app)
+    assert len(os.listdir(app.config["REJECTED_FOLDER"])) == 100
+    assert storage.delete_orphans(app, force=True)["files"] == 100
+
+
+# --- archive ---
+def test_old_rejected_files_are_archived_and_still_served(app, client, db_session, tree):
+    old = _file(app, "rejected", "old.jpg")
+    recent = _file(app, "rejected", "recent.jpg", mtime=time.time())
+
+    stats = storage.archive_rejected(app, after_days=30)
+    assert stats["files"] == 1
+    assert not os.path.exists(old) and os.path.exists(recent)
+    assert storage.read_archived(app, "old.jpg") == b"old.jpg" * 10
+    assert storage.read_archived(app, "recent.jpg") is None
+    assert client.get("/api/reports/uploads/rejected/old.jpg").data == b"old.jpg" * 10
+
+    assert storage.archive_rejected(app, after_days=30)["files"] == 0  # nothing left to move
+
+
+# --- retention ---
+def test_retention_clears_expired_rejected_images(app, db_session, tree):
+    stale, recent = _blob(tree, b"stale"), _blob(tree, b"recent")
+    expired = _report(db_session, "rejected", blob_ref(stale), checked=datetime.utcnow() - timedelta(days=400))
+    kept = _report(db_session, "rejected", blob_ref(recent))
+    old_file = _file(app, "rejected", "legacy.jpg")
+    published = []
+
+    stats = storage.enforce_retention(app, retention_days=365, publish=published.extend)
+    assert stats["files"] == 2  # the blob and the legacy file
+    assert published == [expired.id]
+    db_session.expire_all()
+    assert db_session.get(Report, expired.id).image_filename is None
+    assert db_session.get(Report, kept.id).image_filename == blob_ref(recent)
+    assert {b.key for b in tree.iter_blobs()} == {recent}
+    assert not os.path.exists(old_file)
+
+
+def test_retention_keeps_blobs_other_reports_still_use(app, db_session, tree):
+    shared_image, shared_proof = _blob(tree, b"image"), _blob(tree, b"proof")
+    long_ago = datetime.utcnow() - timedelta(days=400)
+    first = _report(db_session, "rejected", blob_ref(shared_image), checked=long_ago)
+    second = _report(db_session, "rejected", blob_ref(shared_proof), checked=long_ago)
+    _report(db_session, "verified", blob_ref(shared_image))
+    _report(db_session, "finalized", proofs=[blob_ref(shared_proof)])
+
+    assert storage.enforce_retention(app, retention_days=365)["files"] == 0
+    assert {b.key for b in tree.iter_blobs()} == {shared_image, shared_proof}
+    db_session.expire_all()
+    assert db_session.get(Report, first.id).image_filename is None  # the expired rows still let go of it
+    assert db_session.get(Report, second.id).image_filename is None
+
+
+def test_expiring_rows_sharing_a_blob_delete_it_once(app, db_session, tree):
+    key = _blob(tree, b"twice")
+    long_ago = datetime.utcnow() - timedelta(days=400)
+    _report(db_session, "rejected", blob_ref(key), checked=long_ago)
+    _report(db_session, "rejected", blob_ref(key), checked=long_ago)
+    assert storage.enforce_retention(app, retention_days=365)["files"] == 1
+    assert list(tree.iter_blobs()) == []
+
+
+def test_retention_dry_run_and_zero_days_change_nothing(app, db_session, tree):
+    key = _blob(tree, b"stale")
+    report = _report(db_session, "rejected", blob_ref(key), checked=datetime.utcnow() - timedelta(days=400))
+    assert storage.enforce_retention(app, retention_days=0)["files"] == 0
+    assert storage.enforce_retention(app, retention_days=365, dry_run=True)["files"] == 1
+    db_session.expire_all()
+    assert db_session.get(Report, report.id).image_filename == blob_ref(key)
+    assert [b.key for b in tree.iter_blobs()] == [key]